@@ -0,0 +1,276 @@
+"""
+Benchmark de todos os métodos de análise sobre uma grelha de pares sintéticos.
+
+Os pares são gerados por gerar_imagens.gerar_par() para cada combinação de:
+- resolução (de 300x300 até 8K);
+- tipo de diferença (nenhuma, uma mancha, milhares de pontos, mudança global de brilho);
+- disposição dos canais (BGR contíguo, vista de BGRA, ordem de colunas).
+
+Para cada caso e método são registados o tempo por megapixel e o número de regiões e,
+para o caso completo, o pico de memória residente (RSS). Cada caso corre num processo
+próprio, para que o pico de memória de um caso não contamine o seguinte.
+
+Os resultados podem ser guardados como referência (JSON) e comparados numa execução
+posterior: a comparação termina com código 1 se algum método ficar mais lento do que a
+referência para além da tolerância.
+
+Utilização (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_metodos [--guardar referencia.json]
+    python -m benchmarks.benchmark_metodos --comparar referencia.json [--tolerancia 10]
+    python -m benchmarks.benchmark_metodos --resolucoes 300x300,1920x1080 --diferencas mancha
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from gerar_imagens import CANAIS, DIFERENCAS, gerar_par
+from processamento.analises import TIPOS_ANALISE, analisar_todos
+
+# Resoluções avaliadas (largura, altura)
+RESOLUCOES = [(300, 300), (1280, 720), (1920, 1080), (3840, 2160), (7680, 4320)]
+
+# Abrandamento máximo (em %) face à referência antes de a comparação falhar
+TOLERANCIA_REGRESSAO = 10.0
+
+# Tempos de referência abaixo deste valor (segundos) são dominados pelo ruído e não são comparados
+TEMPO_MINIMO_COMPARACAO = 0.005
+
+
+def _repor_pico_rss():
+    """
+    Repõe o pico de memória residente do processo (só em Linux).
+
+    Retorna:
+        bool: True se o pico foi reposto
+    """
+
+    try:
+        with open("/proc/self/clear_refs", "w") as ficheiro:
+            ficheiro.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _pico_rss_mb():
+    """
+    Devolve o pico de memória residente do processo em MB.
+
+    Nota:
+        Em Linux é lido o VmHWM (que pode ser reposto por _repor_pico_rss); nos restantes
+        sistemas Unix é usado o ru_maxrss, que conta desde o início do processo.
+    """
+
+    try:
+        with open("/proc/self/status") as ficheiro:
+            for linha in ficheiro:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está em bytes em macOS e em KB nos restantes sistemas
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def _medir_caso(largura, altura, diferenca, canais, repeticoes):
+    """
+    Mede um caso da grelha (executado num processo próprio).
+
+    Retorna:
+        dict: Caso com 'resolucao', 'diferenca', 'canais', 'megapixeis', 'rss_pico_mb',
+            'tempo_total', 'ms_por_mp' e, por método, 'tempo', 'ms_por_mp' e 'num_diferencas'
+    """
+
+    ref, teste = gerar_par(largura, altura, diferenca, canais)
+    megapixeis = largura * altura / 1e6
+    metodos = list(TIPOS_ANALISE)
+
+    # O pico inclui as duas imagens do par, mas não a sua geração
+    _repor_pico_rss()
+
+    melhor_total = float("inf")
+    melhores = {metodo: float("inf") for metodo in metodos}
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultados, duracoes = analisar_todos(ref, teste, metodos = metodos)
+            melhor_total = min(melhor_total, time.perf_counter() - inicio)
+        for metodo in metodos:
+            melhores[metodo] = min(melhores[metodo], duracoes[metodo])
+
+    return {
+        "resolucao": f"{largura}x{altura}",
+        "diferenca": diferenca,
+        "canais": canais,
+        "megapixeis": megapixeis,
+        "rss_pico_mb": round(_pico_rss_mb(), 1),
+        "tempo_total": melhor_total,
+        "ms_por_mp": melhor_total * 1000 / megapixeis,
+        "metodos": {
+            metodo: {
+                "tempo": melhores[metodo],
+                "ms_por_mp": melhores[metodo] * 1000 / megapixeis,
+                "num_diferencas": resultados[metodo][2].get("num_diferencas")
+            }
+            for metodo in metodos
+        }
+    }
+
+
+def _nome_caso(caso):
+    """
+    Identificador de um caso, usado para emparelhar execuções.
+    """
+
+    return f"{caso['resolucao']}/{caso['diferenca']}/{caso['canais']}"
+
+
+def executar(resolucoes = None, diferencas = None, canais = None, repeticoes = 3):
+    """
+    Executa a grelha de casos e imprime uma linha por caso.
+
+    Argumentos:
+        resolucoes (list, opcional): Resoluções (largura, altura). O default é RESOLUCOES.
+        diferencas (list, opcional): Tipos de diferença. O default é DIFERENCAS.
+        canais (list, opcional): Disposições dos canais. O default é CANAIS.
+        repeticoes (int, opcional): Repetições por caso (conta a mais rápida). O default é 3.
+
+    Retorna:
+        dict: Resultados com a plataforma e a lista de casos
+    """
+
+    resolucoes = resolucoes or RESOLUCOES
+    diferencas = diferencas or DIFERENCAS
+    canais = canais or CANAIS
+    metodos = list(TIPOS_ANALISE)
+
+    print(f"{'caso':<34}" + "".join(f"{metodo + ' ms/MP':>18}" for metodo in metodos) +
+          f"{'total ms/MP':>13}{'regiões':>10}{'RSS (MB)':>10}")
+
+    casos = []
+    # Um processo novo por caso: o pico de memória não transita entre casos
+    with ProcessPoolExecutor(max_workers = 1, max_tasks_per_child = 1) as executor:
+        for largura, altura in resolucoes:
+            for diferenca in diferencas:
+                for disposicao in canais:
+                    caso = executor.submit(_medir_caso, largura, altura, diferenca, disposicao, repeticoes).result()
+                    casos.append(caso)
+
+                    regioes = caso["metodos"].get("absdiff", {}).get("num_diferencas")
+                    print(f"{_nome_caso(caso):<34}" +
+                          "".join(f"{caso['metodos'][metodo]['ms_por_mp']:>18.2f}" for metodo in metodos) +
+                          f"{caso['ms_por_mp']:>13.2f}{str(regioes):>10}{caso['rss_pico_mb']:>10.1f}")
+
+    return {
+        "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "plataforma": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "sistema": platform.platform(),
+            "processador": platform.processor() or platform.machine(),
+            "nucleos": os.cpu_count(),
+            "threads_opencv": cv2.getNumThreads()
+        },
+        "repeticoes": repeticoes,
+        "casos": casos
+    }
+
+
+def comparar(atual, referencia, tolerancia = TOLERANCIA_REGRESSAO):
+    """
+    Compara os tempos por megapixel de duas execuções do benchmark.
+
+    Argumentos:
+        atual (dict): Resultados da execução atual
+        referencia (dict): Resultados de referência
+        tolerancia (float, opcional): Abrandamento máximo em %. O default é TOLERANCIA_REGRESSAO.
+
+    Retorna:
+        list: Regressões, cada uma um tuplo (caso, metodo, ms_por_mp_referencia, ms_por_mp_atual, variacao_%)
+
+    Nota:
+        Só são comparados os casos presentes nas duas execuções e cujo tempo de referência
+        seja de pelo menos TEMPO_MINIMO_COMPARACAO.
+    """
+
+    casos_referencia = {_nome_caso(caso): caso for caso in referencia["casos"]}
+    regressoes = []
+
+    for caso in atual["casos"]:
+        base = casos_referencia.get(_nome_caso(caso))
+        if base is None:
+            continue
+
+        for metodo, medida in caso["metodos"].items():
+            medida_base = base["metodos"].get(metodo)
+            if medida_base is None or medida_base["tempo"] < TEMPO_MINIMO_COMPARACAO:
+                continue
+
+            variacao = (medida["ms_por_mp"] / medida_base["ms_por_mp"] - 1) * 100
+            if variacao > tolerancia:
+                regressoes.append((_nome_caso(caso), metodo, medida_base["ms_por_mp"], medida["ms_por_mp"], variacao))
+
+    return regressoes
+
+
+def _lista(texto):
+    """
+    Converte uma lista separada por vírgulas (argumento da linha de comandos).
+    """
+
+    return [valor.strip() for valor in texto.split(",") if valor.strip()]
+
+
+def _resolucoes(texto):
+    """
+    Converte uma lista de resoluções 'LxA' separadas por vírgulas.
+    """
+
+    return [tuple(int(valor) for valor in resolucao.lower().split("x")) for resolucao in _lista(texto)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark dos métodos de análise sobre pares sintéticos.")
+    parser.add_argument("--resolucoes", type = _resolucoes, help = "Resoluções LxA separadas por vírgulas (default: 300x300 até 8K)")
+    parser.add_argument("--diferencas", type = _lista, help = f"Tipos de diferença (default: {','.join(DIFERENCAS)})")
+    parser.add_argument("--canais", type = _lista, help = f"Disposições dos canais (default: {','.join(CANAIS)})")
+    parser.add_argument("--repeticoes", type = int, default = 3, help = "Repetições por caso (default: 3)")
+    parser.add_argument("--guardar", help = "Guarda os resultados neste ficheiro JSON (referência)")
+    parser.add_argument("--comparar", help = "Compara com os resultados de referência deste ficheiro JSON")
+    parser.add_argument("--tolerancia", type = float, default = TOLERANCIA_REGRESSAO,
+                        help = f"Abrandamento máximo em %% na comparação (default: {TOLERANCIA_REGRESSAO:g})")
+    argumentos = parser.parse_args()
+
+    resultados = executar(argumentos.resolucoes, argumentos.diferencas, argumentos.canais, argumentos.repeticoes)
+
+    if argumentos.guardar:
+        with open(argumentos.guardar, "w", encoding = "utf-8") as ficheiro:
+            json.dump(resultados, ficheiro, indent = 2, ensure_ascii = False)
+        print(f"\n📝 Resultados guardados em: {argumentos.guardar}")
+
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding = "utf-8") as ficheiro:
+            referencia = json.load(ficheiro)
+
+        regressoes = comparar(resultados, referencia, argumentos.tolerancia)
+        if not regressoes:
+            print(f"\n✅ Sem regressões acima de {argumentos.tolerancia:g}% face a {argumentos.comparar}")
+        else:
+            print(f"\n❌ {len(regressoes)} regressões acima de {argumentos.tolerancia:g}%:")
+            for nome, metodo, ms_referencia, ms_atual, variacao in regressoes:
+                print(f"   {nome:<34}{metodo:<12}{ms_referencia:>10.2f} → {ms_atual:.2f} ms/MP ({variacao:+.1f}%)")
+            sys.exit(1)
@@ -0,0 +1,135 @@
+"""
+Benchmark do modo pirâmide: velocidade face à exatidão.
+
+Para pares sintéticos de alta resolução com diferenças localizadas, compara a análise à
+resolução completa com o modo pirâmide em várias combinações de níveis e de limiar da
+imagem reduzida. Para cada variante são indicados o tempo total, o tempo de deteção (o total
+sem as etapas 'regioes' e 'overlay', que processam a imagem completa nos dois modos), as
+respetivas acelerações e o erro face à resolução completa (todas as variantes recebem os dados
+da referência pré-calculados, como na cache de referências usada em main.py):
+- absdiff: erro relativo em pixels diferentes e diferença no número de regiões
+- ssim: diferença absoluta no índice e diferença no número de regiões
+
+As variantes marcadas com 'v=<tolerância>' verificam os blocos suspeitos do nível reduzido à
+resolução completa (tolerancia_piramide, TOLERANCIA_PIRAMIDE por omissão em analisar_todos); as
+restantes desativam a verificação. Na coluna dos blocos, 'completa' indica que a verificação
+recorreu à análise completa.
+
+Utilização (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_piramide [repeticoes]
+"""
+
+import contextlib
+import io
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from processamento import perfil
+from processamento.analises import analisar_todos
+from processamento.cache_referencias import calcular_dados_referencia
+from processamento.piramide import TOLERANCIA_PIRAMIDE
+
+# Combinações (niveis, limiar_grosseiro, tolerancia_piramide) avaliadas
+VARIANTES = [(1, 5, None), (2, 2, None), (2, 5, None), (3, 2, None), (3, 5, None),
+             (2, 5, TOLERANCIA_PIRAMIDE), (3, 5, TOLERANCIA_PIRAMIDE), (2, 5, 0)]
+
+# Resoluções avaliadas (largura, altura)
+RESOLUCOES = [(3840, 2160), (7680, 4320)]
+
+
+def _gerar_par(largura, altura, tipo):
+    """
+    Gera um par sintético com fundo texturado e diferenças localizadas.
+
+    Tipos: 'hud' (relógio e contador num canto), 'blocos' (alguns painéis alterados) e
+    'pontos' (pequenos pontos dispersos, o caso mais difícil para a pirâmide).
+    """
+
+    gerador = np.random.default_rng(0)
+    base = gerador.integers(0, 256, (altura // 8, largura // 8, 3), dtype = np.uint8)
+    ref = cv2.resize(base, (largura, altura), interpolation = cv2.INTER_CUBIC)
+    teste = ref.copy()
+
+    if tipo == "hud":
+        cv2.putText(teste, "12:34", (largura - 400, 80), cv2.FONT_HERSHEY_SIMPLEX, 2.5, (255, 255, 255), 5)
+        cv2.putText(teste, "x 1250", (60, 80), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (0, 255, 255), 4)
+    elif tipo == "blocos":
+        for i in range(4):
+            x = largura // 5 * (i + 1)
+            cv2.rectangle(teste, (x - 150, altura // 2 - 100), (x + 150, altura // 2 + 100), (40 * i, 200, 90), -1)
+    elif tipo == "pontos":
+        ys = gerador.integers(0, altura, 300)
+        xs = gerador.integers(0, largura, 300)
+        for x, y in zip(xs, ys):
+            cv2.circle(teste, (int(x), int(y)), 3, (255, 255, 255), -1)
+
+    return ref, teste
+
+
+def _analisar(dados_ref, teste, metodo, repeticoes, **opcoes):
+    """
+    Executa a análise de um método e devolve (melhor tempo, melhor tempo de deteção, métricas).
+    """
+
+    melhor = melhor_deteccao = float("inf")
+    metricas = None
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultados, _ = analisar_todos(None, teste, metodos = [metodo], dados_ref = dados_ref, **opcoes)
+            tempo = time.perf_counter() - inicio
+        metricas = resultados[metodo][2]
+        etapas = metricas.get("perfil", {})
+        comuns = sum(etapas[nome]["duracao"] for nome in ("regioes", "overlay") if nome in etapas)
+        melhor = min(melhor, tempo)
+        melhor_deteccao = min(melhor_deteccao, tempo - comuns)
+    return melhor, melhor_deteccao, metricas
+
+
+def executar(repeticoes = 2):
+    """
+    Executa o benchmark e imprime uma linha por par, método e variante.
+    """
+
+    # Tempos por etapa, para separar a deteção das etapas comuns aos dois modos
+    perfil.ativar()
+
+    print(f"{'resolução':<11}{'tipo':<8}{'método':<9}{'variante':<19}{'tempo (ms)':>11}{'aceleração':>12}"
+          f"{'deteção (ms)':>13}{'aceleração':>12}{'erro':>12}{'Δ regiões':>11}{'blocos':>12}")
+
+    for largura, altura in RESOLUCOES:
+        for tipo in ["hud", "blocos", "pontos"]:
+            ref, teste = _gerar_par(largura, altura, tipo)
+            dados_ref = calcular_dados_referencia(ref)
+
+            for metodo in ["absdiff", "ssim"]:
+                t_base, d_base, base = _analisar(dados_ref, teste, metodo, repeticoes)
+                linhas = [("completa", t_base, d_base, base)]
+                for niveis, limiar, tolerancia in VARIANTES:
+                    t, d, metricas = _analisar(dados_ref, teste, metodo, repeticoes, metodos_piramide = [metodo],
+                                            niveis_piramide = niveis, limiar_piramide = limiar,
+                                            tolerancia_piramide = tolerancia)
+                    variante = f"n={niveis} l={limiar}" + (f" v={tolerancia:g}" if tolerancia is not None else "")
+                    linhas.append((variante, t, d, metricas))
+
+                for variante, tempo, deteccao, metricas in linhas:
+                    if metodo == "absdiff":
+                        erro = abs(metricas["pixels_diferentes"] - base["pixels_diferentes"]) / max(base["pixels_diferentes"], 1)
+                        erro_txt = f"{erro * 100:.2f}% px"
+                    else:
+                        erro_txt = f"{abs(metricas['indice_ssim'] - base['indice_ssim']):.1e}"
+
+                    piramide = metricas.get("piramide")
+                    blocos = f"{piramide['blocos_analisados']}/{piramide['blocos_total']}" if piramide else "-"
+                    if piramide and piramide.get("resolucao_completa"):
+                        blocos = "completa"
+                    print(f"{largura}x{altura:<6}{tipo:<8}{metodo:<9}{variante:<19}{tempo * 1000:>11.1f}"
+                          f"{t_base / tempo:>11.1f}x{deteccao * 1000:>13.1f}{d_base / deteccao:>11.1f}x{erro_txt:>12}"
+                          f"{metricas['num_diferencas'] - base['num_diferencas']:>+11d}{blocos:>12}")
+
+
+if __name__ == "__main__":
+    executar(int(sys.argv[1]) if len(sys.argv) > 1 else 2)
@@ -0,0 +1,121 @@
+"""
+Benchmark do SSIM nativo (processamento.ssim_nativo) face ao scikit-image.
+
+Compara tempo de execução e índice obtido em todos os pares com o mesmo tamanho das pastas
+'imagens/referencia' e 'imagens/teste' e num par sintético de resolução 4K. Para cada par
+são medidas as variantes:
+- scikit-image: structural_similarity(..., full=True), em float64
+- nativo: mapa completo em float32 com buffers reutilizados
+- nativo (só índice): mapa_completo=False, índice acumulado faixa a faixa sem o mapa completo
+- nativo (referência em cache): estatísticas da referência já calculadas
+- nativo (gaussiana): janela gaussiana, comparada com gaussian_weights=True no scikit-image
+
+Utilização (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_ssim [repeticoes]
+
+Requer o scikit-image instalado (apenas para a comparação).
+"""
+
+import sys
+import time
+
+import cv2
+import numpy as np
+from skimage.metrics import structural_similarity
+
+from processamento.lote import encontrar_pares
+from processamento.ssim_nativo import TOLERANCIA_SCORE, calcular_estatisticas, calcular_ssim
+
+
+def _medir(funcao, repeticoes):
+    """
+    Executa a função várias vezes e devolve (melhor tempo em segundos, último resultado).
+    """
+
+    melhor = float("inf")
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def _par_sintetico_4k():
+    """
+    Gera um par de imagens 3840x2160 em cinzentos com ruído e um retângulo alterado.
+    """
+
+    gerador = np.random.default_rng(0)
+    ref = cv2.GaussianBlur(gerador.integers(0, 256, (2160, 3840), dtype = np.uint8), (9, 9), 3)
+    teste = ref.copy()
+    cv2.rectangle(teste, (1000, 600), (1400, 900), 255, -1)
+    return "sintetico_4k", ref, teste
+
+
+def _carregar_pares():
+    """
+    Carrega em cinzentos os pares das pastas de imagens com o mesmo tamanho.
+    """
+
+    pares = []
+    lista, _ = encontrar_pares("imagens/referencia", "imagens/teste")
+    for nome, caminho_ref, caminho_teste in lista:
+        ref = cv2.imread(caminho_ref, cv2.IMREAD_GRAYSCALE)
+        teste = cv2.imread(caminho_teste, cv2.IMREAD_GRAYSCALE)
+        if ref is not None and teste is not None and ref.shape == teste.shape:
+            pares.append((nome, ref, teste))
+    pares.append(_par_sintetico_4k())
+    return pares
+
+
+def executar(repeticoes = 3):
+    """
+    Executa o benchmark e imprime uma linha por par e variante.
+
+    Retorna:
+        bool: True se todos os índices nativos estiverem dentro de TOLERANCIA_SCORE
+    """
+
+    dentro_tolerancia = True
+    print(f"{'par':<18}{'variante':<28}{'tempo (ms)':>12}{'aceleração':>12}{'|Δ índice|':>14}")
+
+    for nome, ref, teste in _carregar_pares():
+        buffers = {}
+        estatisticas_ref = calcular_estatisticas(ref)
+
+        t_skimage, (score_skimage, _) = _medir(
+            lambda: structural_similarity(ref, teste, full = True), repeticoes)
+        t_skimage_g, (score_skimage_g, _) = _medir(
+            lambda: structural_similarity(ref, teste, full = True, gaussian_weights = True, sigma = 1.5,
+                                          use_sample_covariance = False, data_range = 255), repeticoes)
+
+        variantes = [
+            ("scikit-image", t_skimage, score_skimage, t_skimage, score_skimage),
+        ]
+
+        t, (score, _) = _medir(lambda: calcular_ssim(ref, teste, buffers = buffers), repeticoes)
+        variantes.append(("nativo", t, score, t_skimage, score_skimage))
+
+        t, (score, _) = _medir(lambda: calcular_ssim(ref, teste, mapa_completo = False, buffers = buffers), repeticoes)
+        variantes.append(("nativo (só índice)", t, score, t_skimage, score_skimage))
+
+        t, (score, _) = _medir(lambda: calcular_ssim(ref, teste, estatisticas_ref = estatisticas_ref,
+                                                     buffers = buffers), repeticoes)
+        variantes.append(("nativo (referência em cache)", t, score, t_skimage, score_skimage))
+
+        t, (score, _) = _medir(lambda: calcular_ssim(ref, teste, janela = "gaussiana", buffers = buffers), repeticoes)
+        variantes.append(("nativo (gaussiana)", t, score, t_skimage_g, score_skimage_g))
+
+        for variante, tempo, score, tempo_base, score_base in variantes:
+            erro = abs(score - score_base)
+            dentro_tolerancia = dentro_tolerancia and erro < TOLERANCIA_SCORE
+            print(f"{nome:<18}{variante:<28}{tempo * 1000:>12.1f}{tempo_base / tempo:>11.1f}x{erro:>14.2e}")
+
+    print(f"\nTolerância documentada: {TOLERANCIA_SCORE:.0e} -> {'OK' if dentro_tolerancia else 'EXCEDIDA'}")
+    return dentro_tolerancia
+
+
+if __name__ == "__main__":
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    sys.exit(0 if executar(repeticoes) else 1)
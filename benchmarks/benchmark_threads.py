@@ -0,0 +1,111 @@
+"""
+Benchmark da execução em faixas (num_threads) de uma única comparação de alta resolução.
+
+Mede o tempo de analisar_todos num par sintético (por omissão 8K com milhares de pontos
+diferentes) com 1, 2, 4, ... threads, até ao número de núcleos, e verifica que o número
+de regiões e as métricas principais são os mesmos da execução numa só thread.
+
+O paralelismo interno do OpenCV é desligado (cv2.setNumThreads(1)) para que a aceleração
+medida seja apenas a da divisão em faixas.
+
+Utilização (a partir da raiz do projeto):
+    python -m benchmarks.benchmark_threads [--resolucao 7680x4320] [--diferenca pontos] [--threads 1,2,4,8]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import cv2
+
+from gerar_imagens import DIFERENCAS, gerar_par
+from processamento.analises import TIPOS_ANALISE, analisar_todos
+
+# Métricas que têm de coincidir com as da execução numa só thread
+METRICAS_VERIFICADAS = ["num_diferencas", "pixels_diferentes"]
+
+
+def _contagens_threads(maximo):
+    """
+    Devolve 1, 2, 4, ... até ao máximo (incluído).
+    """
+
+    contagens = []
+    num = 1
+    while num < maximo:
+        contagens.append(num)
+        num *= 2
+    return contagens + [maximo]
+
+
+def _medir(ref, teste, num_threads, repeticoes):
+    """
+    Executa todos os métodos com num_threads threads e devolve (melhor tempo total, tempos por método, resultados).
+    """
+
+    metodos = list(TIPOS_ANALISE)
+    melhor_total = float("inf")
+    melhores = {metodo: float("inf") for metodo in metodos}
+    resultados = None
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultados, duracoes = analisar_todos(ref, teste, metodos = metodos, num_threads = num_threads)
+            melhor_total = min(melhor_total, time.perf_counter() - inicio)
+        for metodo in metodos:
+            melhores[metodo] = min(melhores[metodo], duracoes[metodo])
+    return melhor_total, melhores, resultados
+
+
+def executar(largura, altura, diferenca, contagens, repeticoes):
+    """
+    Mede a comparação para cada número de threads e imprime a aceleração face a uma thread.
+
+    Retorna:
+        bool: True se todas as execuções deram as mesmas métricas da execução numa só thread
+    """
+
+    cv2.setNumThreads(1)
+    ref, teste = gerar_par(largura, altura, diferenca)
+    metodos = list(TIPOS_ANALISE)
+
+    print(f"Par {largura}x{altura} ({diferenca}), {os.cpu_count()} núcleos\n")
+    print(f"{'threads':>8}{'total (s)':>12}{'aceleração':>12}{'eficiência':>12}" +
+          "".join(f"{metodo + ' (s)':>16}" for metodo in metodos) + f"{'regiões':>10}")
+
+    base = None
+    coincidem = True
+    for num_threads in contagens:
+        total, tempos, resultados = _medir(ref, teste, num_threads, repeticoes)
+        metricas = {metodo: {chave: resultados[metodo][2].get(chave) for chave in METRICAS_VERIFICADAS}
+                    for metodo in metodos}
+        if base is None:
+            base = (total, metricas)
+        elif metricas != base[1]:
+            coincidem = False
+            print(f"❌ Métricas diferentes com {num_threads} threads: {metricas} vs {base[1]}")
+
+        aceleracao = base[0] / total
+        print(f"{num_threads:>8}{total:>12.3f}{aceleracao:>11.2f}x{aceleracao / num_threads * 100:>11.0f}%" +
+              "".join(f"{tempos[metodo]:>16.3f}" for metodo in metodos) +
+              f"{str(metricas['absdiff']['num_diferencas']):>10}")
+
+    return coincidem
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Aceleração da execução em faixas de uma única comparação.")
+    parser.add_argument("--resolucao", default = "7680x4320", help = "Resolução LxA do par (default: 7680x4320)")
+    parser.add_argument("--diferenca", default = "pontos", choices = DIFERENCAS, help = "Tipo de diferença (default: pontos)")
+    parser.add_argument("--threads", help = "Números de threads separados por vírgulas (default: 1, 2, 4, ... até ao número de núcleos)")
+    parser.add_argument("--repeticoes", type = int, default = 3, help = "Repetições por medição (default: 3)")
+    argumentos = parser.parse_args()
+
+    largura, altura = (int(valor) for valor in argumentos.resolucao.lower().split("x"))
+    contagens = ([int(valor) for valor in argumentos.threads.split(",")] if argumentos.threads
+                 else _contagens_threads(os.cpu_count() or 1))
+
+    if not executar(largura, altura, argumentos.diferenca, contagens, argumentos.repeticoes):
+        raise SystemExit(1)
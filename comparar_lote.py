@@ -0,0 +1,43 @@
+"""
+Comparação em lote de todas as imagens das pastas de referência e de teste.
+
+Ao contrário do main.py, que compara uma única imagem (IMG_NOME) por execução, este script
+encontra todos os pares com o mesmo nome em 'imagens/referencia' e 'imagens/teste' e
+compara-os em paralelo, com um processo por núcleo. No fim é gerado um resumo agregado
+em JSON na pasta 'relatorios/', para além dos relatórios PDF de cada par.
+
+Utilização:
+    python comparar_lote.py [num_processos]
+"""
+
+import os   # Operações com sistema de ficheiros
+import sys  # Argumentos da linha de comandos
+import uuid # Geração de identificadores únicos para identificação de sessões
+
+from output.historico import registar_execucoes
+from output.relatorio import guardar_resumo_lote
+from processamento.lote import executar_lote
+
+# Métodos de análise a aplicar a cada par
+metodos_analise = ["absdiff", "histograma", "ssim"]
+
+# Pastas com as imagens a comparar
+PASTA_REFERENCIA = os.path.join("imagens", "referencia")
+PASTA_TESTE = os.path.join("imagens", "teste")
+
+# A execução tem de estar protegida por __main__ para que os processos do lote
+# possam importar este módulo sem iniciar um novo lote
+if __name__ == "__main__":
+    num_processos = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    resumo = executar_lote(PASTA_REFERENCIA, PASTA_TESTE, metodos_analise, num_processos = num_processos)
+
+    print(f"\n⏱️ Lote concluído em {resumo['duracao_total']:.2f} segundos: {resumo['estados']}")
+    guardar_resumo_lote(resumo, identificador = str(uuid.uuid4())[:8])
+
+    # Todos os pares comparados entram no índice do histórico numa única transação
+    registados = registar_execucoes([
+        dict(par, imagem = par["nome"], duracao_total = par["duracao"])
+        for par in resumo["pares"] if par["estado"] == "ok"
+    ])
+    print(f"🗂️ {registados} resultados registados no índice do histórico")
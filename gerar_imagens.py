@@ -1,7 +1,7 @@
 """
 Módulo auxiliar para gerar imagens de teste artificiais.
 
-Este script cria duas imagens com diferenças visuais simples:
+Executado diretamente, este script cria duas imagens com diferenças visuais simples:
 - Uma imagem de referência com fundo branco e um quadrado azul.
 - Uma imagem de teste com o mesmo conteúdo, mas com um círculo verde adicional.
 
@@ -9,8 +9,13 @@ As imagens são guardadas nas pastas:
 - imagens/referencia/exemplo.png
 - imagens/teste/exemplo.png
 
+A função gerar_par() gera a mesma cena em qualquer resolução, com vários tipos de
+diferença e de disposição dos canais, e é usada pelo benchmark dos métodos
+(benchmarks/benchmark_metodos.py).
+
 Utilização:
     Executar diretamente este ficheiro para gerar as imagens:
+    python gerar_imagens.py
 
 Nota:
     Este módulo é útil para testar a funcionalidade da ferramenta de comparação
@@ -21,23 +26,90 @@ import cv2
 import numpy as np
 import os
 
-# Criar diretórios de destino, se não existirem
-os.makedirs("imagens/referencia", exist_ok = True)
-os.makedirs("imagens/teste", exist_ok = True)
+# Tipos de diferença entre a referência e o teste
+# - nenhuma: imagens idênticas
+# - mancha: uma única região (o círculo verde)
+# - pontos: milhares de pequenos pontos dispersos
+# - brilho: diminuição global do brilho da imagem de teste
+DIFERENCAS = ["nenhuma", "mancha", "pontos", "brilho"]
+
+# Disposição dos canais das imagens geradas
+# - bgr: array contíguo com 3 canais (o que o cv2.imread devolve)
+# - bgra_vista: vista dos 3 primeiros canais de um array BGRA (não contígua, como ao
+#   descartar o canal alfa de uma captura com transparência)
+# - fortran: array com 3 canais em ordem de colunas (ex: vindo de outra biblioteca)
+CANAIS = ["bgr", "bgra_vista", "fortran"]
+
+# Número de pontos do tipo de diferença 'pontos'
+NUM_PONTOS = 2000
+
+
+def _dispor_canais(img, canais):
+    """
+    Converte uma imagem BGR contígua na disposição de canais pedida.
+    """
+
+    if canais == "bgr":
+        return img
+    if canais == "bgra_vista":
+        return cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)[:, :, :3]
+    if canais == "fortran":
+        return np.asfortranarray(img)
+    raise ValueError(f"Disposição de canais desconhecida: {canais}")
+
+
+def gerar_par(largura = 300, altura = 300, diferenca = "mancha", canais = "bgr", semente = 0):
+    """
+    Gera um par de imagens sintético (referência e teste).
+
+    A cena é a do exemplo (fundo branco e quadrado azul ao centro) escalada para a
+    resolução pedida; em 300x300 e com a diferença 'mancha' o par é igual ao exemplo.
+
+    Argumentos:
+        largura (int, opcional): Largura das imagens. O default é 300.
+        altura (int, opcional): Altura das imagens. O default é 300.
+        diferenca (str, opcional): Tipo de diferença (ver DIFERENCAS). O default é 'mancha'.
+        canais (str, opcional): Disposição dos canais (ver CANAIS). O default é 'bgr'.
+        semente (int, opcional): Semente do gerador aleatório (posição dos pontos). O default é 0.
+
+    Retorna:
+        tuple: (img_referencia, img_teste), arrays uint8 com 3 canais
+
+    Erros:
+        ValueError: Se o tipo de diferença ou a disposição dos canais for desconhecido
+    """
+
+    # Criar imagem de referência (branco + quadrado azul)
+    img_referencia = np.full((altura, largura, 3), 255, dtype = np.uint8)
+    cv2.rectangle(img_referencia, (largura // 3, altura // 3), (2 * largura // 3, 2 * altura // 3), (255, 0, 0), -1)
+
+    img_teste = img_referencia.copy()
+    if diferenca == "mancha":
+        # Círculo verde ao centro
+        cv2.circle(img_teste, (largura // 2, altura // 2), max(min(largura, altura) // 15, 1), (0, 255, 0), -1)
+    elif diferenca == "pontos":
+        gerador = np.random.default_rng(semente)
+        xs = gerador.integers(0, largura, NUM_PONTOS)
+        ys = gerador.integers(0, altura, NUM_PONTOS)
+        img_teste[ys, xs] = (0, 0, 255)
+    elif diferenca == "brilho":
+        cv2.subtract(img_teste, (20, 20, 20, 0), dst = img_teste)
+    elif diferenca != "nenhuma":
+        raise ValueError(f"Tipo de diferença desconhecido: {diferenca}")
+
+    return _dispor_canais(img_referencia, canais), _dispor_canais(img_teste, canais)
 
-# Tamanho da imagem que vai ser criada
-altura, largura = 300, 300
 
-# Criar imagem de referência (branco + quadrado azul)
-img_referencia = np.ones((altura, largura, 3), dtype = np.uint8) * 255
-cv2.rectangle(img_referencia, (100, 100), (200, 200), (255, 0, 0), -1)  # Quadrado azul
+if __name__ == "__main__":
+    # Criar diretórios de destino, se não existirem
+    os.makedirs("imagens/referencia", exist_ok = True)
+    os.makedirs("imagens/teste", exist_ok = True)
 
-# Criar imagem de teste (igual, mas com um círculo verde)
-img_teste = img_referencia.copy()
-cv2.circle(img_teste, (150, 150), 20, (0, 255, 0), -1)  # Círculo verde
+    # Imagem de referência com um quadrado azul e imagem de teste com um círculo verde adicional
+    img_referencia, img_teste = gerar_par(300, 300, "mancha")
 
-# Guardar imagens nos respetivos diretórios
-cv2.imwrite("imagens/referencia/exemplo.png", img_referencia)
-cv2.imwrite("imagens/teste/exemplo.png", img_teste)
+    # Guardar imagens nos respetivos diretórios
+    cv2.imwrite("imagens/referencia/exemplo.png", img_referencia)
+    cv2.imwrite("imagens/teste/exemplo.png", img_teste)
 
-print("✅ Imagens de teste geradas com sucesso!")
\ No newline at end of file
+    print("✅ Imagens de teste geradas com sucesso!")
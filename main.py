@@ -9,55 +9,203 @@ Métodos disponíveis:
 - Comparação de Histogramas: Avaliação estatística da distribuição de intensidades.
 - SSIM (Structural Similarity Index): Análise de alterações estruturais perceptíveis.
 
+Utilização:
+    python main.py [imagem] [--metodos absdiff,ssim] [--sem-pdf] [--sem-imagens] [--json metricas.json]
+    python main.py --help
+
 Autor: Inês Marques
 Data: Junho 2025
 Unidade Curricular: Projeto de Engenharia Informática
 """
 
-import cv2  # OpenCV para manipulação de imagens
-import os   # Operações com sistema de ficheiros
-import time # Medição de tempo de execução
-import uuid # Geração de identificadores únicos para identificação de sessões
-
-# Importação de funções do módulo de geração de relatórios
-from output.relatorio import guardar_imagem_resultado, gerar_relatorio_pdf_multimetodo
-
-# Importação de funções do módulo de análise de diferenças
-from processamento.analises import analisar_diferencas
+import argparse # Argumentos da linha de comandos
+import functools # Registo na cache quando a imagem de resultado fica gravada
+import json     # Exportação das métricas (--json)
+import os       # Operações com sistema de ficheiros
+import sys      # Código de saída
+import time     # Medição de tempo de execução
+import uuid     # Geração de identificadores únicos para identificação de sessões
 
 # Lista de métodos de análise a aplicar sequencialmente
 metodos_analise = ["absdiff", "histograma", "ssim"]
 
-# Definir caminhos das imagens de referência e de teste
-# IMG_NOME: Nome do ficheiro de imagem a analisar (deve existir em ambas as pastas)
+# Limiares avaliados pelo absdiff numa única passagem (varrimento de sensibilidade)
+# As regiões e a imagem de resultado usam sempre o limiar por omissão do método (10)
+limiares_absdiff = [5, 10, 20, 30, 50]
+
+# Guarda as imagens de resultado em resolução completa (PNG) na pasta 'relatorios/'
+# A escrita é feita em segundo plano; o PDF usa miniaturas em memória e não depende dela
+guardar_imagens = True
+
+# Gera o relatório PDF (o reportlab só é importado quando o PDF é gerado)
+gerar_pdf = True
+
+# Reutiliza os resultados de execuções anteriores quando o par de ficheiros, os parâmetros
+# e o código de análise são os mesmos (ver processamento/cache_resultados.py)
+usar_cache_resultados = True
+
+# Acrescenta os resultados desta execução ao índice 'historico/indice.sqlite'
+# (consultas: python -m output.historico evolucao menu.png ssim)
+registar_historico = True
+
+# Threads de uma única comparação: a imagem é dividida em faixas processadas em paralelo
+# (útil em imagens de alta resolução; as métricas são as mesmas com qualquer número de threads)
+num_threads = 1
+
+# Resolução de trabalho (largura, altura) para comparar capturas com dimensões diferentes
+# (ex: (1280, 720) para capturas 720p, 1080p e 1440p do mesmo ecrã); None = comparação direta
+resolucao_trabalho = None
+
+# IMG_NOME: Nome do ficheiro de imagem a analisar por omissão (deve existir em ambas as pastas)
 # menu, menu_igual, meme, resol_dif, em_falta
 IMG_NOME = "menu.png"
 
+# Pastas das imagens de referência e de teste
+PASTA_REFERENCIA = os.path.join("imagens", "referencia")
+PASTA_TESTE = os.path.join("imagens", "teste")
+
+# Os argumentos são lidos antes de importar o OpenCV e os módulos de análise,
+# para que 'python main.py --help' (ou um argumento inválido) responda de imediato
+parser = argparse.ArgumentParser(description = "Compara uma imagem de teste com a sua referência.")
+parser.add_argument("imagem", nargs = "?", default = IMG_NOME,
+                    help = f"Nome do ficheiro a comparar, presente nas duas pastas (default: {IMG_NOME})")
+parser.add_argument("--metodos", default = ",".join(metodos_analise),
+                    help = f"Métodos separados por vírgulas (default: {','.join(metodos_analise)})")
+parser.add_argument("--pasta-referencia", default = PASTA_REFERENCIA,
+                    help = f"Pasta das imagens de referência (default: {PASTA_REFERENCIA})")
+parser.add_argument("--pasta-teste", default = PASTA_TESTE, help = f"Pasta das imagens de teste (default: {PASTA_TESTE})")
+parser.add_argument("--sem-pdf", action = "store_true", help = "Não gera o relatório PDF (só métricas)")
+parser.add_argument("--sem-imagens", action = "store_true", help = "Não grava as imagens de resultado (PNG)")
+parser.add_argument("--sem-cache", action = "store_true", help = "Ignora a cache de resultados")
+parser.add_argument("--sem-historico", action = "store_true", help = "Não regista a execução no índice do histórico")
+parser.add_argument("--json", metavar = "FICHEIRO", help = "Grava as métricas de cada método neste ficheiro JSON")
+parser.add_argument("--threads", type = int, default = num_threads,
+                    help = f"Threads da comparação, em faixas da imagem (default: {num_threads})")
+parser.add_argument("--resolucao", metavar = "LxA",
+                    help = "Compara as duas imagens a esta resolução de trabalho (ex: 1280x720), "
+                           "mesmo com dimensões diferentes")
+parser.add_argument("--sem-tolerancia-reamostragem", action = "store_true",
+                    help = "Com --resolucao e dimensões diferentes, não desfoca as imagens nem sobe o limiar e a área mínima")
+parser.add_argument("--referencias-mapeadas", action = "store_true",
+                    help = "Lê a imagem de referência da cache mapeada em memória (os dados derivados já o são sempre)")
+parser.add_argument("--identificar", action = "store_true",
+                    help = "A imagem de teste não tem referência com o mesmo nome: usa a mais parecida do índice de referências")
+argumentos = parser.parse_args()
+
+metodos_analise = [metodo.strip() for metodo in argumentos.metodos.split(",") if metodo.strip()]
+gerar_pdf = gerar_pdf and not argumentos.sem_pdf
+guardar_imagens = guardar_imagens and not argumentos.sem_imagens
+usar_cache_resultados = usar_cache_resultados and not argumentos.sem_cache
+registar_historico = registar_historico and not argumentos.sem_historico
+IMG_NOME = argumentos.imagem
+num_threads = max(1, argumentos.threads)
+
+# Importação de funções do módulo de geração de relatórios
+# (o reportlab só é carregado dentro de gerar_relatorio_pdf_multimetodo)
+from output.relatorio import (aguardar_escritas, gerar_observacoes, guardar_imagem_resultado,
+                              gerar_relatorio_pdf_multimetodo, guardar_perfil, converter_json)
+
+# Índice estruturado dos resultados (evolução e regressões por imagem e método)
+from output.historico import registar_execucao
+
+# Importação de funções do módulo de análise de diferenças
+from processamento.analises import METODOS_DISPONIVEIS, analisar_todos
+from processamento.mosaicos import TAMANHO_MOSAICO
+
+# Importação da cache de dados derivados das imagens de referência
+from processamento.cache_referencias import obter_dados_referencia
+
+# Importação da cache de resultados (pares já comparados com o mesmo código e parâmetros)
+from processamento.cache_resultados import consultar_cache, guardar_resultado, hash_ficheiro
+
+# Zonas a ignorar e região de interesse definidas ao lado da imagem de referência
+from processamento.mascaras import caminho_mascara, carregar_mascara
+
+# Índice das referências, para identificar capturas sem referência com o mesmo nome (--identificar)
+from processamento.indice_referencias import IndiceReferencias
+
+# Procura das imagens sem distinguir maiúsculas/minúsculas na extensão ('menu.png' e 'menu.PNG')
+from processamento.lote import encontrar_imagem
+
+# Resolução de trabalho comum, para capturas com dimensões diferentes (--resolucao)
+from processamento.resolucao import interpretar_resolucao
+
+# Leitura da imagem de teste numa thread, em paralelo com a leitura da referência
+from processamento.leitura import ler_em_segundo_plano
+
+# Instrumentação por etapas, ativada com a variável de ambiente COMPARADOR_PERFIL
+# (ex: COMPARADOR_PERFIL=1 python main.py; COMPARADOR_PERFIL=memoria inclui o pico de memória)
+from processamento import perfil
+
+desconhecidos = [metodo for metodo in metodos_analise if metodo not in METODOS_DISPONIVEIS]
+if desconhecidos or not metodos_analise:
+    parser.error(f"métodos inválidos: {', '.join(desconhecidos) or '(nenhum)'} "
+                 f"(disponíveis: {', '.join(METODOS_DISPONIVEIS)})")
+
+if argumentos.resolucao:
+    try:
+        resolucao_trabalho = interpretar_resolucao(argumentos.resolucao)
+    except ValueError as e:
+        parser.error(str(e))
+
 # Constrói caminhos completos para as imagens usando os.path.join()
 # Garante compatibilidade entre sistemas operativos
-IMG_REFERENCIA = os.path.join("imagens", "referencia", IMG_NOME)
-IMG_TESTE = os.path.join("imagens", "teste", IMG_NOME)
+IMG_REFERENCIA = (encontrar_imagem(argumentos.pasta_referencia, IMG_NOME) or
+                  os.path.join(argumentos.pasta_referencia, IMG_NOME))
+IMG_TESTE = encontrar_imagem(argumentos.pasta_teste, IMG_NOME) or os.path.join(argumentos.pasta_teste, IMG_NOME)
 
 # Carregar imagens pelo OpenCV
-# cv2.imread() retorna array com dados da imagem ou None se falhar
-img_ref = cv2.imread(IMG_REFERENCIA)
-img_teste = cv2.imread(IMG_TESTE)
+# A imagem de teste é descodificada numa thread enquanto a referência é lida da cache;
+# a etapa 'imread' do perfil mede apenas o tempo de espera por ela
+# O resultado é o array com dados da imagem ou None se falhar
+leitura_teste = ler_em_segundo_plano(IMG_TESTE)
+
+def obter_imagem_teste():
+    """
+    Espera pela leitura da imagem de teste e termina se a leitura falhar
+    (ficheiro inexistente, formato inválido).
+    """
+
+    with perfil.etapa("imread"):
+        img = leitura_teste.result()
+    if img is None:
+        print(f"❌ Imagem de teste não encontrada: {IMG_TESTE}")
+        sys.exit(1)
+    return img
+
+# Captura sem referência com o mesmo nome: a referência é a mais parecida do índice
+# (hashes percetuais e histogramas; só a vencedora passa pela análise completa)
+if argumentos.identificar:
+    img_teste = obter_imagem_teste()
+    indice = IndiceReferencias(argumentos.pasta_referencia)
+    indice.atualizar()
+    with perfil.etapa("identificar"):
+        melhor, candidatos = indice.identificar(img_teste)
+    if melhor is None:
+        print(f"❌ Nenhuma referência com as dimensões da imagem de teste entre {len(candidatos)} candidatas")
+        sys.exit(1)
+    IMG_REFERENCIA = melhor["caminho"]
+    IMG_NOME = melhor["nome"]
+    print(f"🧭 Referência identificada: {IMG_REFERENCIA} (distância dos hashes {melhor['distancia_hash']}/128, "
+          f"correlação dos histogramas {melhor['correlacao_histogramas']:.4f})")
 
-# Verifica se ambas as imagens foram carregadas corretamente
-# Falha pode ocorrer por: ficheiro inexistente, formato inválido
-if img_ref is None:
+# A referência vem da cache persistente (imagem descodificada, cinzentos, histograma e
+# estatísticas SSIM), identificada pelo hash do conteúdo do ficheiro
+dados_ref = obter_dados_referencia(IMG_REFERENCIA, mapear = argumentos.referencias_mapeadas)
+img_teste = obter_imagem_teste()
+if dados_ref is None:
     print(f"❌ Imagem de referência não encontrada: {IMG_REFERENCIA}")
-    exit(1)
+    sys.exit(1)
 
-if img_teste is None:
-    print(f"❌ Imagem de teste não encontrada: {IMG_TESTE}")
-    exit(1)
+img_ref = dados_ref["img"]
 
 # Verifica se as imagens têm o mesmo tamanho (altura, largura)
-# Comparação direta só é possível com dimensões idênticas
-if img_ref.shape != img_teste.shape:
-    print("❌ As imagens têm tamanhos diferentes e não podem ser comparadas diretamente.")
-    exit(1)
+# Comparação direta só é possível com dimensões idênticas; com uma resolução de trabalho,
+# as duas imagens são redimensionadas para ela (ver processamento/resolucao.py)
+if img_ref.shape != img_teste.shape and resolucao_trabalho is None:
+    print("❌ As imagens têm tamanhos diferentes e não podem ser comparadas diretamente "
+          "(usar --resolucao, ex: --resolucao 1280x720).")
+    sys.exit(1)
 
 # Gera identificador único para esta sessão de análise
 id_relatorio = str(uuid.uuid4())[:8]
@@ -75,19 +223,65 @@ inicio_global = time.time()
 # - duracao: tempo de execução específico deste método
 resultados = []
 
-# Executa cada método de análise sequencialmente
-for metodo in metodos_analise:
-    print(f"\n🔎 A executar método: {metodo}")
+# Executa todos os métodos de análise sobre o mesmo par de imagens
+# As conversões para cinzentos e os buffers de trabalho são partilhados entre métodos
+# As imagens são primeiro comparadas por mosaicos: zonas idênticas não são analisadas
+# Retorna, por método, a imagem com diferenças destacadas, descrição do tipo e métricas calculadas,
+# bem como o tempo de execução específico de cada método
+# Parâmetros da análise (fazem também parte da chave da cache de resultados)
+opcoes_analise = {
+    "tamanho_mosaico": TAMANHO_MOSAICO,
+    "limiares_absdiff": limiares_absdiff
+}
+if resolucao_trabalho is not None:
+    opcoes_analise["resolucao"] = resolucao_trabalho
+    if argumentos.sem_tolerancia_reamostragem:
+        opcoes_analise["tolerancia_reamostragem"] = None
+    print(f"📐 Resolução de trabalho: {resolucao_trabalho[0]}x{resolucao_trabalho[1]} "
+          f"(referência {img_ref.shape[1]}x{img_ref.shape[0]}, teste {img_teste.shape[1]}x{img_teste.shape[0]})")
+
+# Máscara da referência (ex: imagens/referencia/menu.mascara.json): zonas que mudam sempre
+# (relógios, contadores) ficam fora da análise e, opcionalmente, só a região de interesse é analisada
+try:
+    mascara = carregar_mascara(IMG_REFERENCIA)
+except ValueError as e:
+    print(f"❌ {e}")
+    sys.exit(1)
+if mascara is not None:
+    opcoes_analise["mascara"] = mascara
+    print(f"🎭 Máscara aplicada: {caminho_mascara(IMG_REFERENCIA)} "
+          f"({len(mascara['roi'])} regiões de interesse, {len(mascara['ignorar'])} zonas ignoradas)")
+
+# Hash do ficheiro de teste (chave da cache de resultados e registo no histórico)
+hash_teste = hash_ficheiro(IMG_TESTE)
 
-    # Marca início da execução deste método específico
-    # Permite medir performance individual de cada algoritmo
-    inicio = time.time()
+# Métodos cujo resultado já está em cache não voltam a ser executados
+chaves_cache, em_cache = {}, {}
+if usar_cache_resultados:
+    chaves_cache, em_cache = consultar_cache(dados_ref.get("hash"), hash_teste, metodos_analise, opcoes_analise)
+metodos_a_analisar = [metodo for metodo in metodos_analise if metodo not in em_cache]
 
-    # Retorna a imagem com diferenças destacadas, descrição do tipo, métricas calculadas
-    img_resultado, tipo_analise, metricas = analisar_diferencas(img_ref, img_teste, metodo = metodo)
+resultados_metodos, duracoes = {}, {}
+if metodos_a_analisar:
+    resultados_metodos, duracoes = analisar_todos(img_ref, img_teste, metodos = metodos_a_analisar,
+                                                 dados_ref = dados_ref, num_threads = num_threads, **opcoes_analise)
 
-    # Calcula tempo decorrido para este método
-    duracao = time.time() - inicio
+for metodo in metodos_analise:
+    # Resultado vindo da cache: a imagem de resultado é a da execução original
+    if metodo in em_cache:
+        entrada = em_cache[metodo]
+        print(f"♻️ Resultado do método {metodo} obtido da cache")
+        resultados.append({
+            "metodo": metodo,
+            "tipo_analise": entrada["tipo_analise"],
+            "metricas": entrada["metricas"],
+            "imagem_resultado": entrada["imagem_resultado"],
+            "duracao": 0.0,
+            "em_cache": True
+        })
+        continue
+
+    img_resultado, tipo_analise, metricas = resultados_metodos[metodo]
 
     # Inicializa caminho do resultado como None
     # Só alguns métodos geram imagens de resultado visual
@@ -96,8 +290,15 @@ for metodo in metodos_analise:
     # Guarda imagem de resultado apenas para métodos que geram visualizações
     # "absdiff" e "ssim" criam imagens com diferenças destacadas visualmente
     # "histograma" é análise estatística sem componente visual
-    if metodo in ["absdiff", "ssim"]:
-        caminho_resultado = guardar_imagem_resultado(img_resultado, metodo = metodo, identificador = id_relatorio)
+    # A entrada da cache de um método visual só é escrita depois de a imagem estar gravada
+    # (ao_gravar), para nunca apontar para uma imagem que falhou
+    if metodo in ["absdiff", "ssim"] and guardar_imagens:
+        ao_gravar = None
+        if metodo in chaves_cache:
+            ao_gravar = functools.partial(guardar_resultado, chaves_cache[metodo], metodo, tipo_analise, metricas,
+                                          duracao = duracoes[metodo])
+        caminho_resultado = guardar_imagem_resultado(img_resultado, metodo = metodo, identificador = id_relatorio,
+                                                     assincrono = True, ao_gravar = ao_gravar)
 
     # Adiciona resultado deste método à lista de resultados
     resultados.append({
@@ -105,12 +306,21 @@ for metodo in metodos_analise:
         "tipo_analise": tipo_analise,               # Descrição textual do método
         "metricas": metricas,                       # Dicionário com valores calculados
         "imagem_resultado": caminho_resultado,      # Caminho da imagem
-        "duracao": duracao                          # Tempo de execução em segundos
+        "imagem": img_resultado if metodo in ["absdiff", "ssim"] else None,  # Imagem em memória (para o PDF)
+        "duracao": duracoes[metodo]                 # Tempo de execução em segundos
     })
 
+    # Guarda o resultado na cache (os métodos visuais quando a imagem de resultado ficar gravada, ver acima)
+    if metodo in chaves_cache and metodo not in ["absdiff", "ssim"]:
+        guardar_resultado(chaves_cache[metodo], metodo, tipo_analise, metricas, caminho_resultado, duracoes[metodo])
+
 # Calcula tempo total de execução de todos os métodos
 duracao_total = time.time() - inicio_global
 
+# Resumo das métricas de cada método (OK / ATENÇÃO / PERIGO)
+for resultado in resultados:
+    print(f"📊 {resultado['metodo']}: {gerar_observacoes(resultado['metodo'], resultado['metricas'])}")
+
 # Gera o relatório PDF com todos os resultados
 # Parâmetros:
 # - img_ref_path: caminho da imagem de referência
@@ -118,10 +328,63 @@ duracao_total = time.time() - inicio_global
 # - resultados: lista completa com resultados de todos os métodos
 # - identificador: ID único desta sessão
 # - duracao_total: tempo total de execução
-gerar_relatorio_pdf_multimetodo(
-    img_ref_path = IMG_REFERENCIA,
-    img_teste_path = IMG_TESTE,
-    resultados = resultados,
-    identificador = id_relatorio,
-    duracao_total = duracao_total
-)
\ No newline at end of file
+caminho_relatorio = None
+if gerar_pdf:
+    caminho_relatorio = gerar_relatorio_pdf_multimetodo(
+        img_ref_path = IMG_REFERENCIA,
+        img_teste_path = IMG_TESTE,
+        resultados = resultados,
+        identificador = id_relatorio,
+        duracao_total = duracao_total,
+        img_ref = img_ref,
+        img_teste = img_teste,
+        chave_ref = dados_ref.get("hash"),
+        estatisticas_cache = {"acertos": len(em_cache), "falhas": len(metodos_a_analisar)} if chaves_cache else None
+    )
+
+# Espera que as imagens de resultado fiquem gravadas (a escrita decorreu em paralelo com o PDF)
+# Uma imagem que não foi gravada deixa de ser referida no JSON e no histórico
+falhas_escrita = aguardar_escritas()
+if falhas_escrita:
+    print(f"⚠️ {len(falhas_escrita)} imagens de resultado não foram gravadas (não ficam na cache de resultados)")
+    for resultado in resultados:
+        if resultado["imagem_resultado"] in falhas_escrita:
+            resultado["imagem_resultado"] = None
+
+# Métricas de cada método em JSON (ex: para integração com outras ferramentas)
+if argumentos.json:
+    with open(argumentos.json, "w", encoding = "utf-8") as ficheiro:
+        json.dump({
+            "identificador": id_relatorio,
+            "imagem_referencia": IMG_REFERENCIA,
+            "imagem_teste": IMG_TESTE,
+            "duracao_total": duracao_total,
+            "relatorio": caminho_relatorio,
+            "resultados": [{chave: valor for chave, valor in resultado.items() if chave != "imagem"}
+                           for resultado in resultados]
+        }, ficheiro, indent = 2, ensure_ascii = False, default = converter_json)
+    print(f"📝 Métricas guardadas em: {argumentos.json}")
+
+# Regista a execução no índice do histórico (uma única transação)
+if registar_historico:
+    registar_execucao(
+        imagem = IMG_NOME,
+        resultados = resultados,
+        identificador = id_relatorio,
+        imagem_referencia = IMG_REFERENCIA,
+        imagem_teste = IMG_TESTE,
+        hash_referencia = dados_ref.get("hash"),
+        hash_teste = hash_teste,
+        duracao_total = duracao_total,
+        relatorio = caminho_relatorio
+    )
+
+# Perfil por etapas (leitura, conversões, SSIM, regiões, overlay, escrita, PDF)
+# Só é gerado com a instrumentação ativa
+if perfil.ativo():
+    guardar_perfil(
+        etapas = perfil.recolher(),
+        metodos = {resultado["metodo"]: resultado["metricas"].get("perfil") for resultado in resultados},
+        identificador = id_relatorio,
+        duracao_total = time.time() - inicio_global
+    )
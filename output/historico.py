@@ -0,0 +1,334 @@
+"""
+Índice estruturado dos resultados das comparações, guardado em 'historico/indice.sqlite'.
+
+A pasta 'historico/' guarda os relatórios PDF e as imagens de resultado, mas para seguir a
+evolução de uma métrica ao longo das builds seria preciso abrir os relatórios um a um. Cada
+execução acrescenta ao índice a sua lista de resultados (métricas, durações, identificador e
+hashes das imagens), o que permite consultar tendências e regressões por imagem e método.
+
+O índice é uma base de dados SQLite em modo WAL (leituras não bloqueiam a escrita de outra
+execução). Cada execução, ou cada lote inteiro, é escrita numa única transação.
+
+Consultas a partir da raiz do projeto:
+    python -m output.historico evolucao menu.png ssim [--limite N]
+    python -m output.historico regressoes [--janela N]
+"""
+
+import argparse   # Argumentos da linha de comandos (consultas ao índice)
+import datetime
+import json       # Métricas completas de cada resultado
+import os         # Operações com sistema de ficheiros
+import sqlite3    # Base de dados do índice
+import statistics # Mediana das execuções anteriores
+
+# Ficheiro do índice
+CAMINHO_INDICE = os.path.join("historico", "indice.sqlite")
+
+# Métrica principal de cada método e sentido em que o valor piora
+# (+1: piora quando sobe, -1: piora quando desce)
+METRICAS_PRINCIPAIS = {
+    "absdiff": ("percentagem_diferenca", 1),
+    "histograma": ("correlacao_histogramas", -1),
+    "ssim": ("indice_ssim", -1)
+}
+
+# Variação máxima da métrica principal, face à mediana das execuções anteriores,
+# antes de um resultado ser considerado uma regressão
+TOLERANCIAS = {
+    "absdiff": 0.5,     # Pontos percentuais de pixels diferentes
+    "histograma": 0.01,
+    "ssim": 0.01
+}
+
+# Número de execuções anteriores usadas como termo de comparação
+JANELA_REGRESSOES = 20
+
+# Métricas não guardadas no índice: a lista de regiões cresce com o número de diferenças
+# e o perfil por etapas é específico da execução
+METRICAS_EXCLUIDAS = ("regioes", "perfil")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY,
+    identificador TEXT NOT NULL,
+    data TEXT NOT NULL,
+    imagem TEXT NOT NULL,
+    imagem_referencia TEXT,
+    imagem_teste TEXT,
+    hash_referencia TEXT,
+    hash_teste TEXT,
+    duracao_total REAL,
+    relatorio TEXT
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    execucao INTEGER NOT NULL REFERENCES execucoes(id),
+    metodo TEXT NOT NULL,
+    valor REAL,
+    num_diferencas INTEGER,
+    duracao REAL,
+    em_cache INTEGER NOT NULL DEFAULT 0,
+    metricas TEXT
+);
+CREATE INDEX IF NOT EXISTS execucoes_imagem ON execucoes (imagem, id);
+CREATE INDEX IF NOT EXISTS resultados_execucao ON resultados (execucao, metodo);
+CREATE INDEX IF NOT EXISTS resultados_metodo ON resultados (metodo, execucao);
+"""
+
+
+def _ligar(caminho_indice = CAMINHO_INDICE):
+    """
+    Abre o índice, criando o ficheiro e as tabelas se ainda não existirem.
+
+    Argumentos:
+        caminho_indice (str, opcional): Ficheiro do índice. O default é CAMINHO_INDICE.
+
+    Retorna:
+        sqlite3.Connection: Ligação ao índice, em modo WAL
+    """
+
+    pasta = os.path.dirname(caminho_indice)
+    if pasta:
+        os.makedirs(pasta, exist_ok = True)
+
+    # O timeout cobre a escrita simultânea de duas execuções
+    ligacao = sqlite3.connect(caminho_indice, timeout = 30)
+    ligacao.row_factory = sqlite3.Row
+    ligacao.execute("PRAGMA journal_mode = WAL")
+    # Em modo WAL, NORMAL só sincroniza o disco nos checkpoints
+    ligacao.execute("PRAGMA synchronous = NORMAL")
+    ligacao.executescript(_ESQUEMA)
+    return ligacao
+
+
+def _normalizar_nome(nome):
+    """
+    Normaliza o nome de uma imagem tal como na comparação em lote ('menu.PNG' -> 'menu.png').
+    """
+
+    base, extensao = os.path.splitext(os.path.basename(nome))
+    return base + extensao.lower()
+
+
+def _linha_resultado(resultado):
+    """
+    Converte um resultado de um método nos valores de uma linha da tabela 'resultados'.
+
+    Argumentos:
+        resultado (dict): Resultado com 'metodo', 'metricas', 'duracao' e, opcionalmente, 'em_cache'
+
+    Retorna:
+        tuple: (metodo, valor, num_diferencas, duracao, em_cache, metricas)
+    """
+
+    metodo = resultado["metodo"]
+    metricas = resultado["metricas"]
+    nome_metrica = METRICAS_PRINCIPAIS.get(metodo, (None, 0))[0]
+    valor = metricas.get(nome_metrica)
+
+    return (
+        metodo,
+        float(valor) if valor is not None else None,
+        metricas.get("num_diferencas"),
+        resultado.get("duracao"),
+        int(bool(resultado.get("em_cache"))),
+        json.dumps({nome: v for nome, v in metricas.items() if nome not in METRICAS_EXCLUIDAS},
+                   ensure_ascii = False, default = lambda v: v.item())
+    )
+
+
+def registar_execucoes(execucoes, caminho_indice = CAMINHO_INDICE):
+    """
+    Acrescenta várias execuções ao índice numa única transação.
+
+    Argumentos:
+        execucoes (list): Execuções a registar, cada uma um dicionário com:
+            - imagem (str): Nome da imagem comparada (ex: 'menu.png')
+            - resultados (list): Resultados por método ('metodo', 'metricas', 'duracao'[, 'em_cache'])
+            - identificador (str, opcional): ID da execução
+            - imagem_referencia, imagem_teste (str, opcional): Caminhos das imagens
+            - hash_referencia, hash_teste (str, opcional): Hashes SHA-256 dos ficheiros
+            - duracao_total (float, opcional): Tempo total da execução
+            - relatorio (str, opcional): Caminho do relatório PDF
+        caminho_indice (str, opcional): Ficheiro do índice. O default é CAMINHO_INDICE.
+
+    Retorna:
+        int: Número de resultados registados
+    """
+
+    data = datetime.datetime.now().isoformat(timespec = "seconds")
+    ligacao = _ligar(caminho_indice)
+    registados = 0
+
+    try:
+        # Uma só transação para todas as execuções: o custo de sincronização é pago uma vez
+        with ligacao:
+            for execucao in execucoes:
+                cursor = ligacao.execute(
+                    "INSERT INTO execucoes (identificador, data, imagem, imagem_referencia, imagem_teste, "
+                    "hash_referencia, hash_teste, duracao_total, relatorio) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (execucao.get("identificador", ""), data, _normalizar_nome(execucao["imagem"]),
+                     execucao.get("imagem_referencia"), execucao.get("imagem_teste"),
+                     execucao.get("hash_referencia"), execucao.get("hash_teste"),
+                     execucao.get("duracao_total"), execucao.get("relatorio"))
+                )
+                linhas = [(cursor.lastrowid,) + _linha_resultado(resultado) for resultado in execucao["resultados"]]
+                ligacao.executemany(
+                    "INSERT INTO resultados (execucao, metodo, valor, num_diferencas, duracao, em_cache, metricas) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", linhas
+                )
+                registados += len(linhas)
+    finally:
+        ligacao.close()
+
+    return registados
+
+
+def registar_execucao(imagem, resultados, caminho_indice = CAMINHO_INDICE, **dados_execucao):
+    """
+    Acrescenta uma execução ao índice (ver registar_execucoes).
+
+    Argumentos:
+        imagem (str): Nome da imagem comparada
+        resultados (list): Resultados por método
+        caminho_indice (str, opcional): Ficheiro do índice. O default é CAMINHO_INDICE.
+        **dados_execucao: identificador, imagem_referencia, imagem_teste, hash_referencia,
+            hash_teste, duracao_total e relatorio
+
+    Retorna:
+        int: Número de resultados registados
+    """
+
+    return registar_execucoes([dict(dados_execucao, imagem = imagem, resultados = resultados)], caminho_indice)
+
+
+def consultar_evolucao(imagem, metodo, limite = 200, caminho_indice = CAMINHO_INDICE):
+    """
+    Devolve a evolução da métrica principal de um método para uma imagem.
+
+    Argumentos:
+        imagem (str): Nome da imagem (ex: 'menu.png')
+        metodo (str): Método de análise
+        limite (int, opcional): Número máximo de execuções (as mais recentes). O default é 200.
+        caminho_indice (str, opcional): Ficheiro do índice. O default é CAMINHO_INDICE.
+
+    Retorna:
+        list: Execuções por ordem cronológica, cada uma um dicionário com 'data', 'identificador',
+            'valor', 'num_diferencas', 'duracao', 'em_cache' e 'hash_teste'
+    """
+
+    if not os.path.exists(caminho_indice):
+        return []
+
+    ligacao = _ligar(caminho_indice)
+    try:
+        linhas = ligacao.execute(
+            "SELECT e.data, e.identificador, r.valor, r.num_diferencas, r.duracao, r.em_cache, e.hash_teste "
+            "FROM execucoes e JOIN resultados r ON r.execucao = e.id "
+            "WHERE e.imagem = ? AND r.metodo = ? ORDER BY e.id DESC LIMIT ?",
+            (_normalizar_nome(imagem), metodo, limite)
+        ).fetchall()
+    finally:
+        ligacao.close()
+
+    return [dict(linha, em_cache = bool(linha["em_cache"])) for linha in reversed(linhas)]
+
+
+def detetar_regressoes(janela = JANELA_REGRESSOES, tolerancias = None, caminho_indice = CAMINHO_INDICE):
+    """
+    Compara o resultado mais recente de cada imagem e método com a mediana das execuções anteriores.
+
+    Argumentos:
+        janela (int, opcional): Número de execuções anteriores a considerar. O default é JANELA_REGRESSOES.
+        tolerancias (dict, opcional): Variação máxima por método. O default é TOLERANCIAS.
+        caminho_indice (str, opcional): Ficheiro do índice. O default é CAMINHO_INDICE.
+
+    Retorna:
+        list: Regressões encontradas, cada uma um dicionário com 'imagem', 'metodo', 'data',
+            'identificador', 'valor', 'referencia' (mediana anterior) e 'variacao'
+
+    Nota:
+        Só a métrica principal de cada método (METRICAS_PRINCIPAIS) é comparada. Uma variação
+        no sentido em que a métrica melhora nunca é reportada.
+    """
+
+    if not os.path.exists(caminho_indice):
+        return []
+    tolerancias = {**TOLERANCIAS, **(tolerancias or {})}
+
+    # Só as últimas 'janela' + 1 execuções de cada imagem e método são lidas
+    ligacao = _ligar(caminho_indice)
+    try:
+        linhas = ligacao.execute(
+            "SELECT imagem, metodo, data, identificador, valor FROM ("
+            "  SELECT e.imagem, r.metodo, e.data, e.identificador, r.valor, "
+            "         ROW_NUMBER() OVER (PARTITION BY e.imagem, r.metodo ORDER BY e.id DESC) AS ordem "
+            "  FROM execucoes e JOIN resultados r ON r.execucao = e.id WHERE r.valor IS NOT NULL"
+            ") WHERE ordem <= ? ORDER BY imagem, metodo, ordem",
+            (janela + 1,)
+        ).fetchall()
+    finally:
+        ligacao.close()
+
+    # Agrupa por imagem e método (a primeira linha de cada grupo é a mais recente)
+    grupos = {}
+    for linha in linhas:
+        grupos.setdefault((linha["imagem"], linha["metodo"]), []).append(linha)
+
+    regressoes = []
+    for (imagem, metodo), execucoes in grupos.items():
+        if len(execucoes) < 2 or metodo not in METRICAS_PRINCIPAIS:
+            continue
+
+        atual = execucoes[0]
+        referencia = statistics.median(execucao["valor"] for execucao in execucoes[1:])
+        variacao = atual["valor"] - referencia
+
+        # Variação no sentido em que a métrica piora
+        if variacao * METRICAS_PRINCIPAIS[metodo][1] > tolerancias.get(metodo, 0):
+            regressoes.append({
+                "imagem": imagem,
+                "metodo": metodo,
+                "data": atual["data"],
+                "identificador": atual["identificador"],
+                "valor": atual["valor"],
+                "referencia": referencia,
+                "variacao": variacao
+            })
+
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Consultas ao índice de resultados das comparações.")
+    parser.add_argument("--indice", default = CAMINHO_INDICE, help = f"Ficheiro do índice (default: {CAMINHO_INDICE})")
+    subcomandos = parser.add_subparsers(dest = "comando", required = True)
+
+    evolucao = subcomandos.add_parser("evolucao", help = "Evolução da métrica principal de um método para uma imagem")
+    evolucao.add_argument("imagem", help = "Nome da imagem (ex: menu.png)")
+    evolucao.add_argument("metodo", choices = sorted(METRICAS_PRINCIPAIS), help = "Método de análise")
+    evolucao.add_argument("--limite", type = int, default = 200, help = "Número de execuções (default: 200)")
+
+    regressoes = subcomandos.add_parser("regressoes", help = "Resultados mais recentes piores do que o histórico")
+    regressoes.add_argument("--janela", type = int, default = JANELA_REGRESSOES,
+                            help = f"Execuções anteriores a considerar (default: {JANELA_REGRESSOES})")
+
+    argumentos = parser.parse_args()
+
+    if argumentos.comando == "evolucao":
+        execucoes = consultar_evolucao(argumentos.imagem, argumentos.metodo, argumentos.limite, argumentos.indice)
+        if not execucoes:
+            print(f"⚠️ Sem resultados de {argumentos.metodo} para {argumentos.imagem}")
+        nome_metrica = METRICAS_PRINCIPAIS[argumentos.metodo][0]
+        for execucao in execucoes:
+            valor = f"{execucao['valor']:.4f}" if execucao["valor"] is not None else "n/a"
+            origem = " (cache)" if execucao["em_cache"] else ""
+            print(f"{execucao['data']}  {execucao['identificador']:8}  {nome_metrica} = {valor}{origem}")
+
+    elif argumentos.comando == "regressoes":
+        encontradas = detetar_regressoes(argumentos.janela, caminho_indice = argumentos.indice)
+        if not encontradas:
+            print("✅ Nenhuma regressão encontrada")
+        for regressao in encontradas:
+            print(f"❌ {regressao['imagem']} / {regressao['metodo']}: {regressao['valor']:.4f} "
+                  f"(mediana anterior {regressao['referencia']:.4f}, variação {regressao['variacao']:+.4f}) "
+                  f"em {regressao['data']} [{regressao['identificador']}]")
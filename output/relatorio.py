@@ -1,10 +1,51 @@
 import cv2 # OpenCV para manipulação de imagens
+import numpy as np # Linha temporal das sequências de frames
 import os # Operações com sistema de ficheiros
+import json # Exportação do resumo de execuções em lote
+from collections import OrderedDict # Cache LRU das miniaturas
+import threading # Acesso concorrente à cache de miniaturas (relatórios em paralelo)
+from concurrent.futures import ThreadPoolExecutor # Escrita assíncrona das imagens de resultado
 from datetime import datetime # Para geração de timestamps únicos nos nomes de ficheiros
-from reportlab.lib.pagesizes import A4 # Define o tamanho padrão da página PDF
-from reportlab.pdfgen import canvas # Biblioteca principal para geração de PDFs
 
-def guardar_imagem_resultado(imagem, prefixo = "resultado", metodo = None, identificador = ""):
+from processamento import perfil # Instrumentação por etapas (imwrite, pdf)
+from processamento.leitura import ler_imagem # Leitura reduzida das imagens de resultado da cache
+
+# Lado máximo (em pixels) das miniaturas incluídas no PDF: o dobro dos 400 pt de
+# apresentação, para manter a nitidez na impressão
+LADO_MINIATURA = 800
+
+# Número máximo de miniaturas guardadas em memória (ex: a mesma referência em vários pares)
+MAX_MINIATURAS = 32
+
+_miniaturas = OrderedDict()
+_bloqueio_miniaturas = threading.Lock()
+
+# Escritas de imagens pendentes (ver guardar_imagem_resultado com assincrono=True)
+_escritor = None
+_escritas_pendentes = []
+
+def _escrever_imagem(caminho, imagem, ao_gravar = None):
+    """
+    Escreve uma imagem em disco e indica o resultado na consola.
+
+    A função ao_gravar (se existir) só é chamada, com o caminho, depois de a imagem estar gravada.
+    """
+
+    sucesso = cv2.imwrite(caminho, imagem)
+    if sucesso:
+        print(f"✅ Imagem de resultado guardada em: {caminho}")
+        if ao_gravar is not None:
+            try:
+                ao_gravar(caminho)
+            except Exception as e:
+                # A imagem está gravada; só o registo dependente dela falhou (ex: cache de resultados)
+                print(f"⚠️ Imagem gravada, mas o registo associado falhou: {caminho} ({e})")
+    else:
+        print(f"❌ Falha ao guardar a imagem de resultado em: {caminho}")
+    return sucesso
+
+def guardar_imagem_resultado(imagem, prefixo = "resultado", metodo = None, identificador = "", assincrono = False,
+                             ao_gravar = None):
     """
     Guarda uma imagem processada no diretório 'relatorios/' com nome único baseado no timestamp.
 
@@ -13,9 +54,14 @@ def guardar_imagem_resultado(imagem, prefixo = "resultado", metodo = None, ident
         prefixo (str, opcional): Prefixo do nome do ficheiro. O default é "resultado"
         metodo (str, opcional): Nome do método usado na análise (para incluir no nome). O default é None.
         identificador (str, opcional): ID único da sessão de análise. O default é "".
+        assincrono (bool, opcional): Codifica e escreve a imagem numa thread em segundo plano e
+            devolve logo o caminho; usar aguardar_escritas antes de terminar. O default é False.
+        ao_gravar (callable, opcional): Função chamada com o caminho quando a imagem fica gravada
+            (na thread de escrita, se assíncrono), e nunca se a escrita falhar. Serve para registar
+            o que depende do ficheiro, como a entrada da cache de resultados. O default é None.
 
     Retorna:
-        str: Caminho completo do ficheiro guardado
+        str: Caminho completo do ficheiro guardado (ou a guardar, se assíncrono)
         None: Em caso de erro ao guardar
 
     Nota:
@@ -37,16 +83,83 @@ def guardar_imagem_resultado(imagem, prefixo = "resultado", metodo = None, ident
     nome_ficheiro = f"{prefixo}{sufixo_metodo}_{timestamp}_{identificador}.png"
     caminho = os.path.join(pasta, nome_ficheiro)
 
-    # Tenta guardar a imagem
-    sucesso = cv2.imwrite(caminho, imagem)
-
-    # Feedback sobre o resultado da operação
-    if sucesso:
-        print(f"✅ Imagem de resultado guardada em: {caminho}")
+    # Escrita em segundo plano: o cv2.imwrite liberta o GIL durante a codificação PNG
+    if assincrono:
+        global _escritor
+        if _escritor is None:
+            _escritor = ThreadPoolExecutor(max_workers = 2, thread_name_prefix = "imwrite")
+        _escritas_pendentes.append((caminho, _escritor.submit(_escrever_imagem, caminho, imagem, ao_gravar)))
         return caminho
+
+    # Tenta guardar a imagem (com feedback sobre o resultado da operação)
+    with perfil.etapa("imwrite"):
+        sucesso = _escrever_imagem(caminho, imagem, ao_gravar)
+    return caminho if sucesso else None
+
+def aguardar_escritas():
+    """
+    Aguarda que terminem todas as escritas assíncronas de imagens.
+
+    Retorna:
+        list: Caminhos das imagens que não foi possível guardar (vazia se todas foram gravadas)
+    """
+
+    falhas = []
+    with perfil.etapa("imwrite_espera"):
+        while _escritas_pendentes:
+            caminho, escrita = _escritas_pendentes.pop(0)
+            try:
+                sucesso = escrita.result()
+            except Exception as e:
+                print(f"❌ Falha ao guardar a imagem de resultado em: {caminho} ({e})")
+                sucesso = False
+            if not sucesso:
+                falhas.append(caminho)
+    return falhas
+
+def _miniatura(imagem, chave = None):
+    """
+    Reduz uma imagem OpenCV (BGR) para o tamanho de apresentação no PDF.
+
+    A redução é feita uma única vez com cv2.INTER_AREA e o resultado é entregue ao reportlab
+    já em RGB, sem passar por um ficheiro PNG. Com uma chave (ex: hash da referência),
+    a miniatura fica em cache para os relatórios seguintes.
+
+    Argumentos:
+        imagem (numpy.ndarray): Imagem a reduzir
+        chave (str, opcional): Identificador da imagem para a cache de miniaturas. O default é None.
+
+    Retorna:
+        reportlab.lib.utils.ImageReader: Miniatura pronta a desenhar
+    """
+
+    if chave is not None:
+        with _bloqueio_miniaturas:
+            if chave in _miniaturas:
+                _miniaturas.move_to_end(chave)
+                return _miniaturas[chave]
+
+    # O reportlab e o PIL só são importados quando é gerado um PDF
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+
+    altura, largura = imagem.shape[:2]
+    escala = LADO_MINIATURA / max(altura, largura)
+    if escala < 1:
+        imagem = cv2.resize(imagem, (max(round(largura * escala), 1), max(round(altura * escala), 1)),
+                            interpolation = cv2.INTER_AREA)
+
+    if imagem.ndim == 2:
+        miniatura = ImageReader(Image.fromarray(imagem))
     else:
-        print(f"❌ Falha ao guardar a imagem de resultado em: {caminho}")
-        return None
+        miniatura = ImageReader(Image.fromarray(cv2.cvtColor(imagem, cv2.COLOR_BGR2RGB)))
+
+    if chave is not None:
+        with _bloqueio_miniaturas:
+            _miniaturas[chave] = miniatura
+            if len(_miniaturas) > MAX_MINIATURAS:
+                _miniaturas.popitem(last = False)
+    return miniatura
 
 def gerar_observacoes(metodo, metricas):
     """
@@ -104,7 +217,86 @@ def gerar_observacoes(metodo, metricas):
     # Método não reconhecido ou sem métricas
     return "-"
 
-def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, identificador = "", duracao_total = None):
+def _desenhar_mapa_mosaicos(c, x, y, mosaicos, largura_max = 200, altura_max = 120):
+    """
+    Desenha no PDF o mapa da grelha de mosaicos, com os mosaicos alterados a vermelho.
+
+    Argumentos:
+        c (reportlab.pdfgen.canvas.Canvas): Canvas do relatório
+        x (float): Posição horizontal do canto superior esquerdo
+        y (float): Posição vertical do canto superior esquerdo
+        mosaicos (dict): Resumo dos mosaicos (ver processamento.mosaicos.resumo_mosaicos)
+        largura_max (float, opcional): Largura máxima do mapa em pontos. O default é 200.
+        altura_max (float, opcional): Altura máxima do mapa em pontos. O default é 120.
+
+    Retorna:
+        float: Altura ocupada pelo mapa (incluindo espaço após o mapa)
+    """
+
+    linhas, colunas = mosaicos["linhas"], mosaicos["colunas"]
+    lado = min(largura_max / colunas, altura_max / linhas)
+
+    # Fundo cinzento: mosaicos idênticos, ignorados pela análise
+    c.setFillColorRGB(0.85, 0.85, 0.85)
+    c.rect(x, y - linhas * lado, colunas * lado, linhas * lado, stroke = 0, fill = 1)
+
+    # Mosaicos com alterações
+    c.setFillColorRGB(0.85, 0.1, 0.1)
+    for linha, coluna in mosaicos["alterados"]:
+        c.rect(x + coluna * lado, y - (linha + 1) * lado, lado, lado, stroke = 0, fill = 1)
+
+    c.setFillColorRGB(0, 0, 0)
+    return linhas * lado + 15
+
+def _desenhar_varrimento(c, x, y, varrimento, largura = 200, altura = 80):
+    """
+    Desenha no PDF a curva do varrimento de limiares (percentagem de pixels diferentes por limiar).
+
+    Argumentos:
+        c (reportlab.pdfgen.canvas.Canvas): Canvas do relatório
+        x (float): Posição horizontal do canto superior esquerdo
+        y (float): Posição vertical do canto superior esquerdo
+        varrimento (list): Varrimento de limiares (ver processamento.analises.varrimento_limiares)
+        largura (float, opcional): Largura do gráfico em pontos. O default é 200.
+        altura (float, opcional): Altura do gráfico em pontos. O default é 80.
+
+    Retorna:
+        float: Altura ocupada pelo gráfico (incluindo eixos e espaço após o gráfico)
+    """
+
+    limiares = [ponto["limiar"] for ponto in varrimento]
+    percentagens = [ponto["percentagem_diferenca"] for ponto in varrimento]
+    maximo_x = max(max(limiares), 1)
+    maximo_y = max(max(percentagens), 1e-6)
+
+    # Eixos
+    base = y - altura
+    c.setStrokeColorRGB(0.5, 0.5, 0.5)
+    c.line(x, base, x + largura, base)
+    c.line(x, base, x, y)
+
+    # Curva e pontos (x: limiar, y: % de pixels diferentes)
+    pontos = [(x + l / maximo_x * largura, base + p / maximo_y * altura) for l, p in zip(limiares, percentagens)]
+    c.setStrokeColorRGB(0.85, 0.1, 0.1)
+    c.setFillColorRGB(0.85, 0.1, 0.1)
+    for (x0, y0), (x1, y1) in zip(pontos, pontos[1:]):
+        c.line(x0, y0, x1, y1)
+    for px, py in pontos:
+        c.circle(px, py, 1.5, stroke = 0, fill = 1)
+
+    # Legendas dos eixos
+    c.setFillColorRGB(0, 0, 0)
+    c.setStrokeColorRGB(0, 0, 0)
+    c.setFont("Helvetica", 8)
+    c.drawString(x + 4, y - 8, f"{maximo_y:.2f}%")
+    c.drawString(x, base - 10, "0")
+    c.drawRightString(x + largura, base - 10, f"limiar {maximo_x}")
+    c.setFont("Helvetica", 11)
+    return altura + 30
+
+@perfil.medir("pdf")
+def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, identificador = "", duracao_total = None,
+                                    img_ref = None, img_teste = None, chave_ref = None, estatisticas_cache = None):
     """
     Gera um relatório PDF detalhado com os resultados de múltiplos métodos de comparação.
 
@@ -118,12 +310,24 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
     Argumentos:
         img_ref_path (str): Caminho para a imagem de referência
         img_teste_path (str): Caminho para a imagem de teste
-        resultados (list): Lista de dicionários com resultados de cada método
+        resultados (list): Lista de dicionários com resultados de cada método. Cada resultado pode
+            incluir a chave 'imagem' (numpy.ndarray) com a imagem de resultado já em memória.
         identificador (str, opcional): ID único desta sessão de análise. O default é "".
         duracao_total (float, optional): Tempo total de execução da análise (em segundos).
+        img_ref (numpy.ndarray, opcional): Imagem de referência já carregada. O default é None.
+        img_teste (numpy.ndarray, opcional): Imagem de teste já carregada. O default é None.
+        chave_ref (str, opcional): Identificador da referência (ex: hash do ficheiro) para reutilizar
+            a sua miniatura entre relatórios. O default é None.
+        estatisticas_cache (dict, opcional): Acertos e falhas da cache de resultados
+            ({'acertos': n, 'falhas': n}). O default é None.
+
+    Retorna:
+        str: Caminho do ficheiro PDF gerado
 
     Nota:
         O ficheiro é guardado automaticamente na pasta 'relatorios/' com timestamp e ID.
+        As imagens fornecidas em memória são incluídas como miniaturas (ver _miniatura);
+        as restantes são lidas dos caminhos indicados.
     """
 
     # Preparação do ficheiro de output
@@ -135,6 +339,15 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
     nome_ficheiro = f"relatorio_multimetodo_{timestamp}_{identificador}.pdf"
     caminho = os.path.join(pasta, nome_ficheiro)
 
+    # O reportlab só é importado quando é gerado um PDF (o modo só de métricas nunca o carrega)
+    from reportlab import rl_config
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    # As imagens do PDF são gravadas em binário (só comprimidas com zlib) em vez de ASCII85:
+    # sem a extensão C do reportlab, a codificação ASCII85 em Python dominava o tempo do PDF
+    rl_config.useA85 = 0
+
     # Cria o canvas PDF com tamanho A4
     c = canvas.Canvas(caminho, pagesize = A4)
     largura, altura = A4
@@ -158,6 +371,12 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
         c.drawString(margem, y, f"Tempo de Execução: {duracao_total:.2f} segundos")
         y -= 20
 
+    # Utilização da cache de resultados (métodos reutilizados vs. executados)
+    if estatisticas_cache is not None:
+        c.drawString(margem, y, f"Cache de Resultados: {estatisticas_cache['acertos']} acertos, "
+                                f"{estatisticas_cache['falhas']} falhas")
+        y -= 20
+
     # Caminhos das imagens analisadas
     c.drawString(margem, y, f"Imagem de Referência: {img_ref_path}")
     y -= 20
@@ -166,9 +385,10 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
     y -= 10
 
     # Lista com as imagens base a incluir no relatório
+    # Imagens já em memória são desenhadas a partir de miniaturas, sem reler os ficheiros
     imagens_base = [
-        ("Imagem de Referência", img_ref_path),
-        ("Imagem de Teste", img_teste_path)
+        ("Imagem de Referência", _miniatura(img_ref, chave_ref) if img_ref is not None else img_ref_path),
+        ("Imagem de Teste", _miniatura(img_teste) if img_teste is not None else img_teste_path)
     ]
 
     # Processa cada imagem base
@@ -217,6 +437,7 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
         tipo_analise = resultado["tipo_analise"]                # Descrição do tipo de análise
         metricas = resultado["metricas"]                        # Dicionário com valores calculados
         img_resultado_path = resultado["imagem_resultado"]      # Caminho da imagem de resultado
+        img_resultado = resultado.get("imagem")                 # Imagem de resultado em memória (opcional)
         duracao = resultado["duracao"]                          # Tempo de execução deste método
 
         # Título do método atual
@@ -226,8 +447,11 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
 
         c.setFont("Helvetica", 11)
 
-        # Tempo de execução do método
-        c.drawString(margem, y, f"Tempo de execução: {duracao:.2f} segundos")
+        # Tempo de execução do método (nulo quando o resultado vem da cache)
+        if resultado.get("em_cache"):
+            c.drawString(margem, y, "Tempo de execução: resultado reutilizado da cache")
+        else:
+            c.drawString(margem, y, f"Tempo de execução: {duracao:.2f} segundos")
         y -= 20
 
         # Número de diferenças detetadas
@@ -239,6 +463,14 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
             c.drawString(margem, y, "Número de diferenças detetadas: n/a")
             y -= 20
 
+        # Maior região com diferenças (as regiões vêm ordenadas por área decrescente)
+        regioes = metricas.get("regioes")
+        if regioes:
+            maior = regioes[0]
+            c.drawString(margem, y, f"Maior região: {maior['largura']}x{maior['altura']} px em ({maior['x']}, {maior['y']}), "
+                                    f"{maior['area']} pixels diferentes")
+            y -= 20
+
         # Percentagem de pixels diferentes (para método pixel-a-pixel)
         if "pixels_diferentes" in metricas and "total_pixels" in metricas:
             percentagem = metricas.get("percentagem_diferenca", 0.0)
@@ -261,6 +493,48 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
             y -= 20
             y -= 10
 
+        # Zonas ignoradas e região de interesse (quando a referência tem máscara)
+        mascara = metricas.get("mascara")
+        if mascara:
+            x, y_recorte, largura_recorte, altura_recorte = mascara["recorte"]
+            c.drawString(margem, y, f"Máscara: {mascara['pixels_analisados']} pixels analisados, "
+                                    f"{mascara['pixels_ignorados']} ignorados (recorte {largura_recorte}x{altura_recorte} "
+                                    f"em ({x}, {y_recorte}))")
+            y -= 20
+
+        # Varrimento de limiares do absdiff (quando pedido)
+        varrimento = metricas.get("varrimento_limiares")
+        if varrimento:
+            c.drawString(margem, y, "Varrimento de limiares: " + ", ".join(
+                f"{ponto['limiar']} → {ponto['percentagem_diferenca']:.2f}%" for ponto in varrimento))
+            y -= 15
+
+            if y < 150:
+                c.showPage()
+                y = altura - margem
+            y -= _desenhar_varrimento(c, margem, y, varrimento)
+
+        # Resumo da comparação prévia por mosaicos (quando usada)
+        mosaicos = metricas.get("mosaicos")
+        if mosaicos:
+            c.drawString(margem, y, f"Mosaicos ignorados: {mosaicos['ignorados']} de {mosaicos['total']} "
+                                    f"({mosaicos['tamanho']}x{mosaicos['tamanho']} px, "
+                                    f"{len(mosaicos['alterados'])} com alterações)")
+            y -= 20
+
+            # Mapa dos mosaicos: cinzento = ignorado, vermelho = alterado
+            if y < 200:
+                c.showPage()
+                y = altura - margem
+            y -= _desenhar_mapa_mosaicos(c, margem, y, mosaicos)
+
+        # Resumo do modo pirâmide (quando usado)
+        piramide = metricas.get("piramide")
+        if piramide:
+            c.drawString(margem, y, f"Modo pirâmide: {piramide['niveis']} níveis, {piramide['blocos_analisados']} de "
+                                    f"{piramide['blocos_total']} blocos analisados à resolução completa")
+            y -= 20
+
         # Gera observação qualitativa baseada nas métricas
         observacao = gerar_observacoes(metodo, metricas)
         c.setFont("Helvetica-Oblique", 11)      # Itálico para destacar observações
@@ -268,11 +542,12 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
         y -= 30
 
         # Só inclui imagem para métodos que geram visualizações de diferenças
-        if metodo in ["absdiff", "ssim"] and img_resultado_path:
-            # Indica o caminho da imagem de resultado
-            c.setFont("Helvetica", 10)
-            c.drawString(margem, y, f"Imagem de Resultado: {img_resultado_path}")
-            y -= 30
+        if metodo in ["absdiff", "ssim"] and (img_resultado_path or img_resultado is not None):
+            # Indica o caminho da imagem de resultado (se tiver sido guardada)
+            if img_resultado_path:
+                c.setFont("Helvetica", 10)
+                c.drawString(margem, y, f"Imagem de Resultado: {img_resultado_path}")
+                y -= 30
 
             # Título da imagem de resultado
             c.setFont("Helvetica-Bold", 12)
@@ -290,7 +565,12 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
                 imagem_largura = 400
                 imagem_altura = 400
                 x_centrada = (largura - imagem_largura) / 2
-                c.drawImage(img_resultado_path, x_centrada, y - imagem_altura,
+                if img_resultado is None:
+                    # Sem imagem em memória (ex: resultado da cache): miniatura a partir do ficheiro,
+                    # reduzida logo na descodificação
+                    img_resultado = ler_imagem(img_resultado_path, lado_minimo = LADO_MINIATURA)
+                fonte = _miniatura(img_resultado) if img_resultado is not None else img_resultado_path
+                c.drawImage(fonte, x_centrada, y - imagem_altura,
                             width = imagem_largura, height = imagem_altura, preserveAspectRatio = True)
             except Exception as e:
                 # Erro a carregar imagem de resultado
@@ -314,4 +594,187 @@ def gerar_relatorio_pdf_multimetodo(img_ref_path, img_teste_path, resultados, id
 
     # Guarda e fecha o ficheiro PDF
     c.save()
-    print(f"📝 PDF gerado com sucesso: {caminho}")
\ No newline at end of file
+    print(f"📝 PDF gerado com sucesso: {caminho}")
+    return caminho
+
+def converter_json(valor):
+    """
+    Converte valores NumPy (ex: numpy.float64, numpy.int64) em tipos nativos para JSON.
+    """
+
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"Valor não serializável em JSON: {type(valor).__name__}")
+
+def guardar_resumo_lote(resumo, identificador = ""):
+    """
+    Guarda o resumo agregado de uma execução em lote num ficheiro JSON.
+
+    Para além dos resultados de cada par, o resumo inclui a observação automática de cada
+    método (ver gerar_observacoes) e a contagem de pares por classificação (OK / ATENÇÃO / PERIGO).
+
+    Argumentos:
+        resumo (dict): Resumo devolvido por processamento.lote.executar_lote
+        identificador (str, opcional): ID único da execução em lote. O default é "".
+
+    Retorna:
+        str: Caminho do ficheiro JSON gerado
+    """
+
+    pasta = "relatorios"
+    os.makedirs(pasta, exist_ok = True)
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    nome_ficheiro = f"resumo_lote_{timestamp}_{identificador}.json"
+    caminho = os.path.join(pasta, nome_ficheiro)
+
+    # Classificação agregada por método: {metodo: {"OK": n, "ATENÇÃO": n, "PERIGO": n}}
+    classificacoes = {}
+    for resultado_par in resumo["pares"]:
+        for resultado in resultado_par["resultados"]:
+            observacao = gerar_observacoes(resultado["metodo"], resultado["metricas"])
+            resultado["observacao"] = observacao
+
+            nivel = observacao.split(" ")[0]
+            contagem = classificacoes.setdefault(resultado["metodo"], {})
+            contagem[nivel] = contagem.get(nivel, 0) + 1
+
+    dados = dict(resumo)
+    dados["identificador"] = identificador
+    dados["data"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    dados["classificacoes"] = classificacoes
+
+    with open(caminho, "w", encoding = "utf-8") as ficheiro:
+        json.dump(dados, ficheiro, indent = 2, ensure_ascii = False, default = converter_json)
+
+    print(f"📝 Resumo do lote guardado em: {caminho}")
+    return caminho
+
+def desenhar_linha_temporal(series, marcas = (), largura = 1200, altura_painel = 150, num_frames = None):
+    """
+    Desenha a linha temporal das métricas de uma sequência de frames (um painel por série).
+
+    Com mais valores do que colunas, cada coluna mostra o pior valor dos que lhe
+    correspondem, para que um pico isolado nunca desapareça na redução.
+
+    Argumentos:
+        series (list): Tuplos (titulo, valores, maximo, pior), com 'valores' um array de um valor
+            por frame, ou por grupo de frames consecutivos já reduzido ao pior (NaN = sem valor),
+            'maximo' o topo do eixo vertical e 'pior' igual a 'min' (ex: SSIM) ou 'max'
+            (ex: % de pixels diferentes)
+        marcas (iterable, opcional): Índices de frames a assinalar (ex: os piores). O default é ().
+        largura (int, opcional): Largura da imagem em pixels. O default é 1200.
+        altura_painel (int, opcional): Altura de cada painel em pixels. O default é 150.
+        num_frames (int, opcional): Número de frames representados pelos valores. O default é
+            None (um valor por frame).
+
+    Retorna:
+        numpy.ndarray: Imagem BGR da linha temporal
+    """
+
+    margem_esquerda, margem = 70, 20
+    altura = len(series) * (altura_painel + margem) + margem
+    img = np.full((altura, largura, 3), 255, dtype = np.uint8)
+    area = largura - margem_esquerda - margem
+    if num_frames is None:
+        num_frames = max((len(valores) for _, valores, _, _ in series), default = 0)
+
+    for indice, (titulo, valores, maximo, pior) in enumerate(series):
+        topo = margem + indice * (altura_painel + margem)
+        base = topo + altura_painel
+        cv2.rectangle(img, (margem_esquerda, topo), (margem_esquerda + area, base), (180, 180, 180), 1)
+        cv2.putText(img, titulo, (5, topo + 12), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+        cv2.putText(img, f"{maximo:g}", (5, topo + 28), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (90, 90, 90), 1, cv2.LINE_AA)
+        cv2.putText(img, "0", (5, base), cv2.FONT_HERSHEY_SIMPLEX, 0.35, (90, 90, 90), 1, cv2.LINE_AA)
+        if not len(valores):
+            continue
+
+        # Pior valor por coluna (os NaN dos frames sem valor são ignorados)
+        colunas = min(area, len(valores))
+        inicios = (np.arange(colunas) * len(valores)) // colunas
+        valores = np.asarray(valores, dtype = np.float64)
+        if pior == "min":
+            reduzidos = np.fmin.reduceat(np.where(np.isnan(valores), np.inf, valores), inicios)
+        else:
+            reduzidos = np.fmax.reduceat(np.where(np.isnan(valores), -np.inf, valores), inicios)
+        validos = np.isfinite(reduzidos)
+
+        xs = margem_esquerda + (np.arange(colunas) * area) // max(colunas - 1, 1)
+        ys = base - np.clip(np.where(validos, reduzidos, 0) / max(maximo, 1e-9), 0, 1) * altura_painel
+        pontos = np.stack((xs, ys), axis = 1)[validos].astype(np.int32)
+        if len(pontos):
+            cv2.polylines(img, [pontos.reshape(-1, 1, 2)], False, (160, 60, 20), 1, cv2.LINE_AA)
+
+    # Frames assinalados (linhas verticais vermelhas em todos os painéis)
+    for frame in marcas:
+        x = margem_esquerda + (frame * area) // max(num_frames - 1, 1)
+        cv2.line(img, (x, margem), (x, altura - margem), (0, 0, 220), 1)
+
+    cv2.putText(img, f"frames: {num_frames}", (margem_esquerda, altura - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.35,
+                (90, 90, 90), 1, cv2.LINE_AA)
+    return img
+
+def guardar_resumo_sequencia(resumo, identificador = ""):
+    """
+    Guarda o resumo da comparação de duas sequências de frames num ficheiro JSON.
+
+    Argumentos:
+        resumo (dict): Resumo devolvido por processamento.sequencia.comparar_sequencias
+        identificador (str, opcional): ID único da comparação. O default é "".
+
+    Retorna:
+        str: Caminho do ficheiro JSON gerado
+    """
+
+    pasta = "relatorios"
+    os.makedirs(pasta, exist_ok = True)
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    caminho = os.path.join(pasta, f"resumo_sequencia_{timestamp}_{identificador}.json")
+
+    dados = dict(resumo)
+    dados["identificador"] = identificador
+    dados["data"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    with open(caminho, "w", encoding = "utf-8") as ficheiro:
+        json.dump(dados, ficheiro, indent = 2, ensure_ascii = False, default = converter_json)
+
+    print(f"📝 Resumo da sequência guardado em: {caminho}")
+    return caminho
+
+def guardar_perfil(etapas, metodos = None, identificador = "", duracao_total = None):
+    """
+    Guarda o perfil de execução por etapas num ficheiro JSON (ver processamento.perfil).
+
+    Argumentos:
+        etapas (dict): Resumo das etapas de toda a execução (ver processamento.perfil.recolher)
+        metodos (dict, opcional): Resumo das etapas de cada método ({metodo: etapas}). O default é None.
+        identificador (str, opcional): ID único da sessão de análise. O default é "".
+        duracao_total (float, opcional): Tempo total de execução em segundos. O default é None.
+
+    Retorna:
+        str: Caminho do ficheiro JSON gerado
+    """
+
+    pasta = "relatorios"
+    os.makedirs(pasta, exist_ok = True)
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    nome_ficheiro = f"perfil_{timestamp}_{identificador}.json"
+    caminho = os.path.join(pasta, nome_ficheiro)
+
+    dados = {
+        "identificador": identificador,
+        "data": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "duracao_total": duracao_total,
+        "memoria": any("memoria_pico" in etapa for etapa in etapas.values()),
+        # Etapas ordenadas da mais demorada para a mais rápida
+        "etapas": dict(sorted(etapas.items(), key = lambda item: -item[1]["duracao"])),
+        "metodos": metodos or {}
+    }
+
+    with open(caminho, "w", encoding = "utf-8") as ficheiro:
+        json.dump(dados, ficheiro, indent = 2, ensure_ascii = False, default = converter_json)
+
+    print(f"📝 Perfil de execução guardado em: {caminho}")
+    return caminho
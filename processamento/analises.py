@@ -1,180 +1,1240 @@
+import contextlib # Ciclo de vida das threads de uma comparação
+import time # Medição de tempo de execução por método
+from concurrent.futures import ThreadPoolExecutor # Execução em faixas numa única comparação
+
 import cv2  # OpenCV para manipulação de imagens
+import numpy as np # Buffers de trabalho partilhados entre métodos
+
+# Para análise SSIM (implementação própria em float32, ver processamento.ssim_nativo)
+from processamento.ssim_nativo import JANELAS_DISPONIVEIS, calcular_ssim, tamanho_janela
+
+# Comparação prévia por mosaicos, para ignorar zonas idênticas
+from processamento.mosaicos import (FRACAO_MAXIMA_PARCIAL, TAMANHO_MOSAICO, calcular_hashes_mosaicos,
+                                    dilatar_grelha, mosaicos_alterados, resumo_mosaicos, retangulos_da_grelha)
+
+# Modo pirâmide: deteção de candidatos numa versão reduzida das imagens
+from processamento.piramide import (LIMIAR_GROSSEIRO, METODOS_PIRAMIDE, NIVEIS_PIRAMIDE, TOLERANCIA_PIRAMIDE,
+                                    maximos_por_bloco, verificar_blocos)
+
+# Extração das regiões com diferenças (caixa, área e centróide de cada uma)
+from processamento.regioes import AREA_MINIMA, DISTANCIA_FUSAO, extrair_regioes, faixas_horizontais
+
+# Zonas ignoradas e região de interesse definidas por referência
+from processamento.mascaras import preparar_mascara
+
+# Comparação a uma resolução de trabalho comum (capturas de dispositivos diferentes)
+from processamento.resolucao import (TOLERANCIA_REAMOSTRAGEM, escalar_mascara, escalar_regioes, escalar_retangulo,
+                                     redimensionar, suavizar)
+
+# Instrumentação por etapas (ativa apenas com a variável de ambiente COMPARADOR_PERFIL)
+from processamento import perfil
+
+# Métodos de análise suportados, pela ordem em que são normalmente aplicados
+METODOS_DISPONIVEIS = ["absdiff", "histograma", "ssim"]
+
+# Descrição em texto de cada método (usada nos relatórios)
+TIPOS_ANALISE = {
+    "absdiff": "Diferença Absoluta de Pixels (AbsDiff)",
+    "histograma": "Comparação de Histograma (Correlação)",
+    "ssim": "Índice de Similaridade Estrutural (SSIM)"
+}
 
-# Para análise SSIM
-from skimage.metrics import structural_similarity as ssim
+# Limiar de sensibilidade do absdiff para considerar uma diferença significativa
+# Valores baixos (ex: 5) = mais sensível, deteta variações pequenas
+# Valores altos (ex: 30) = menos sensível, só deteta alterações óbvias
+LIMIAR_DIFERENCA = 10
 
-def analisar_diferencas(img_ref, img_teste, metodo = "absdiff"):
+# Limiar de similaridade estrutural do SSIM (na escala 0-255)
+# Valores mais baixos no mapa SSIM indicam maiores diferenças estruturais
+# 220/255 ≈ 0.86 de similaridade mínima aceitável
+LIMIAR_SIMILARIDADE = 220
+
+def limite_ssim():
     """
-    Compara duas imagens utilizando um dos métodos disponíveis para deteção de diferenças visuais.
+    Devolve o valor do mapa SSIM abaixo do qual um pixel é considerado diferente.
 
-    Esta função é o núcleo do sistema de comparação e aplica um único algoritmo de comparação
-    por chamada. Os métodos disponíveis são:
-    - "absdiff": Diferença absoluta pixel-a-pixel, ideal para detetar alterações pontuais
-    - "histograma": Compara a distribuição de intensidades, útil para mudanças globais de cor/brilho
-    - "ssim": Índice de Similaridade Estrutural, com foco em mudanças na estrutura da imagem
+    Equivale a truncar o mapa * 255 para inteiro e comparar com LIMIAR_SIMILARIDADE, mas sem
+    a conversão para uint8, que fazia com que valores SSIM negativos passassem por semelhantes.
+
+    Retorna:
+        float: Limite sobre o mapa SSIM em float32
+    """
+
+    return (LIMIAR_SIMILARIDADE + 1) / 255
+
+def _criar_contexto(img_ref, img_teste, dados_ref = None, area_minima = AREA_MINIMA, distancia_fusao = DISTANCIA_FUSAO,
+                    limiares_absdiff = None, mascara = None, buffers = None, janela = "uniforme"):
+    """
+    Cria o contexto partilhado entre os métodos de análise de um mesmo par de imagens.
+
+    O contexto guarda as imagens originais, as versões em escala de cinzentos (calculadas
+    apenas na primeira vez que são pedidas) e os buffers de trabalho reutilizados entre métodos.
+    Quando são fornecidos os dados da referência (ver processamento.cache_referencias), a
+    versão em cinzentos, o histograma e as estatísticas SSIM da referência vêm diretamente deles.
+    Com uma máscara, as imagens do contexto passam a ser os recortes da região de interesse
+    (ver _aplicar_mascara).
 
     Argumentos:
-        img_ref (numpy.ndarray): Imagem de referência
-        img_teste (numpy.ndarray): Imagem de teste a comparar
-        metodo (str): Método de análise a aplicar ('absdiff', 'histograma' ou 'ssim'). O default é 'absdiff'.
+        img_ref (numpy.ndarray ou None): Imagem de referência (pode ser None se dados_ref for fornecido)
+        img_teste (numpy.ndarray): Imagem de teste
+        dados_ref (dict, opcional): Dados derivados da imagem de referência. O default é None.
+        area_minima (int, opcional): Área mínima das regiões com diferenças. O default é AREA_MINIMA.
+        distancia_fusao (int, opcional): Distância máxima entre regiões a fundir. O default é DISTANCIA_FUSAO.
+        limiares_absdiff (list, opcional): Limiares do varrimento do absdiff. O default é None (sem varrimento).
+        mascara (dict, opcional): Definição de máscara (ver processamento.mascaras). O default é None.
+        buffers (dict, opcional): Buffers de trabalho de uma comparação anterior, a reutilizar.
+            O default é None (buffers novos).
+        janela (str, opcional): Janela do SSIM ('uniforme' ou 'gaussiana'). O default é 'uniforme'.
 
     Retorna:
-        tuple: (imagem_resultado, tipo_analise, metricas)
-            - imagem_resultado (numpy.ndarray ou None): Imagem com diferenças destacadas visualmente (quando aplicável)
-            - tipo_analise (str): Descrição em texto do método usado
-            - metricas (dict): Dicionário com métricas específicas do método escolhido.
+        dict: Contexto com as imagens e espaço para resultados intermédios
 
     Erros:
-        ValueError: Se o nome do método especificado não for reconhecido.
+        ValueError: Se a máscara não deixar nenhum pixel para analisar ou a janela for desconhecida
     """
 
-    # Parâmetros para destacar diferenças visualmente em todos os métodos
-    cor = (0, 0, 255)  # Cor para realce das diferenças (vermelho)
-    alpha = 0.7        # Transparência do overlay (0.0=transparente, 1.0=opaco)
+    if janela not in JANELAS_DISPONIVEIS:
+        raise ValueError(f"Tipo de janela SSIM desconhecido: {janela}")
 
-    # Método 1: diferença absoluta de pixels (absdiff)
-    if metodo == "absdiff":
-        tipo_analise = "Diferença Absoluta de Pixels (AbsDiff)"
+    contexto = {
+        "img_ref": img_ref,
+        "img_teste": img_teste,
+        "buffers": buffers if buffers is not None else {},
+        "retangulos": {},   # Zonas a analisar por método (ausente = imagem completa)
+        "selecoes": {},     # Grelha de mosaicos a analisar, por método
+        "mosaicos": {},     # Resumo da comparação por mosaicos, por método
+        "piramide": {},     # Resumo do modo pirâmide, por método
+        "area_minima": area_minima,
+        "distancia_fusao": distancia_fusao,
+        "limiar_diferenca": LIMIAR_DIFERENCA,
+        "limiares_absdiff": limiares_absdiff,
+        "janela_ssim": janela,
+        "recorte": None,    # Retângulo (x, y, largura, altura) da região de interesse
+        "mascara": None,    # Máscara uint8 do recorte (255 = analisar), None = recorte completo
+        "pixels_analisados": img_teste.shape[0] * img_teste.shape[1],
+        "executor": None,   # Threads da execução em faixas (ver analisar_todos)
+        "num_faixas": 1,
+        "resolucao": None,  # Imagem de teste nativa e escalas, com resolução de trabalho (ver _preparar_resolucao)
+        "mascara_regioes": None # Máscara das regiões do último método, a ampliar para a resolução nativa
+    }
 
-        # Calcula a diferença absoluta entre as duas imagens pixel a pixel
-        # Resultado: imagem onde cada pixel = |pixel_ref - pixel_teste|
-        diff = cv2.absdiff(img_ref, img_teste)
+    if mascara is not None:
+        _aplicar_mascara(contexto, mascara, dados_ref)
+    elif dados_ref is not None:
+        contexto["img_ref"] = dados_ref["img"]
+        contexto["gray_ref"] = dados_ref["gray"]
+        contexto["gray_reduzida_ref"] = dados_ref.get("gray_reduzida")
+        contexto["hist_ref"] = dados_ref["hist"]
+        contexto["hist_ref_contagens"] = dados_ref["hist_contagens"]
+        # As estatísticas SSIM da cache são as da janela uniforme 7x7
+        if janela == "uniforme":
+            contexto["ssim_ref"] = (dados_ref["ssim_media"], dados_ref["ssim_media_quadrados"])
 
-        # Converte para escala de cinzentos para facilitar a análise de threshold
-        # Necessário porque trabalhamos com uma única intensidade por pixel
-        gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+    return contexto
 
-        # Define o limiar de sensibilidade para considerar uma diferença significativa
-        # Valores baixos (ex: 5) = mais sensível, deteta variações pequenas
-        # Valores altos (ex: 30) = menos sensível, só deteta alterações óbvias
-        limiar_diferenca = 10
+def _aplicar_mascara(contexto, definicao, dados_ref):
+    """
+    Restringe o contexto à região de interesse e neutraliza as zonas ignoradas.
 
-        # Aplica threshold binário para criar máscara de diferenças
-        # Pixels com diferença > limiar_diferenca ficam brancos (255)
-        # Pixels com diferença <= limiar_diferenca ficam pretos (0)
-        _, mask = cv2.threshold(gray_diff, limiar_diferenca, 255, cv2.THRESH_BINARY)
+    As imagens do contexto são substituídas pelos recortes do retângulo que envolve a ROI,
+    pelo que todos os métodos trabalham apenas sobre ele. Nas zonas ignoradas (e nas partes
+    do recorte fora da ROI), a imagem de teste recebe os pixels da referência: deixam de
+    ter diferenças em todos os métodos e a comparação por mosaicos trata-as como idênticas.
+    Dos dados da referência só é aproveitada a versão em cinzentos; o histograma, as
+    estatísticas SSIM e os hashes dos mosaicos dizem respeito à imagem completa.
 
-        # Conta o número total de pixels na imagem (largura × altura)
-        total_pixels = mask.size
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        definicao (dict): Definição de máscara (ver processamento.mascaras)
+        dados_ref (dict ou None): Dados derivados da imagem de referência
+    """
 
-        # Conta pixels brancos na máscara (pixels diferentes)
-        pixels_diferentes = cv2.countNonZero(mask)
+    img_ref = dados_ref["img"] if dados_ref is not None else contexto["img_ref"]
+    img_teste = contexto["img_teste"]
+    (x, y, largura, altura), mascara = preparar_mascara(definicao, img_teste.shape)
 
-        # Calcula percentagem de pixels que são diferentes
-        percentagem_diferenca = (pixels_diferentes / total_pixels) * 100
-        print(f"🧮 {pixels_diferentes} pixels diferentes de {total_pixels} ({percentagem_diferenca:.2f}%)")
+    recorte_ref = img_ref[y:y + altura, x:x + largura]
+    recorte_teste = img_teste[y:y + altura, x:x + largura]
+    if mascara is not None:
+        # Cópia do recorte de teste com os pixels da referência fora da máscara
+        recorte_teste = recorte_teste.copy()
+        cv2.copyTo(recorte_ref, cv2.compare(mascara, 0, cv2.CMP_EQ), recorte_teste)
 
-        # Encontra contornos das regiões diferentes com a máscara binária
-        # RETR_EXTERNAL: só contornos externos (não contornos dentro de outros)
-        # CHAIN_APPROX_SIMPLE: comprime contornos e remove pontos redundantes
-        contornos, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        print(f"🔍 {len(contornos)} regiões com diferenças detetadas")
+    contexto["img_ref"] = recorte_ref
+    contexto["img_teste"] = recorte_teste
+    contexto["img_teste_completa"] = img_teste
+    contexto["recorte"] = (x, y, largura, altura)
+    contexto["mascara"] = mascara
+    contexto["pixels_analisados"] = cv2.countNonZero(mascara) if mascara is not None else largura * altura
 
-        # Cria cópia da imagem de teste para desenhar as diferenças
-        img_resultado = img_teste.copy()
-        overlay = img_resultado.copy()
+    if dados_ref is not None:
+        contexto["gray_ref"] = dados_ref["gray"][y:y + altura, x:x + largura]
 
-        # Desenha cada contorno preenchido na cor vermelha
-        for contorno in contornos:
-            cv2.drawContours(overlay, [contorno], -1, cor, thickness = cv2.FILLED)
+def _repor_recorte(contexto, resultado):
+    """
+    Converte o resultado de um método calculado sobre o recorte da máscara para as
+    coordenadas da imagem completa.
 
-        # Combina overlay com imagem original e utilizando transparência
-        # Fórmula: resultado = (overlay * alpha) + (original * (1-alpha))
-        cv2.addWeighted(overlay, 0.7, img_resultado, 1 - alpha, 0, img_resultado)
+    A imagem de resultado passa a ser a imagem de teste completa com o recorte analisado
+    colado por cima (fora da máscara ficam os pixels originais do teste), as regiões são
+    deslocadas pela origem do recorte e as métricas ganham a chave 'mascara'.
 
-        # Métricas a retornar
-        metricas = {
-            "num_diferencas": len(contornos),                   # Número de regiões diferentes
-            "total_pixels": total_pixels,                       # Total de pixels na imagem
-            "pixels_diferentes": pixels_diferentes,             # Pixels que diferem
-            "percentagem_diferenca": percentagem_diferenca      # % de diferença
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        resultado (tuple): (imagem_resultado, tipo_analise, metricas) do método
+
+    Retorna:
+        tuple: Resultado nas coordenadas da imagem completa
+    """
+
+    if contexto["recorte"] is None:
+        return resultado
+
+    img_resultado, tipo_analise, metricas = resultado
+    x, y, largura, altura = contexto["recorte"]
+    img_completa = contexto["img_teste_completa"]
+
+    if img_resultado is contexto["img_teste"]:
+        # O método não gerou imagem própria (ex: histograma)
+        img_resultado = img_completa
+    elif img_resultado is not None:
+        nova = img_completa.copy()
+        destino = nova[y:y + altura, x:x + largura]
+        if contexto["mascara"] is None:
+            destino[...] = img_resultado
+        else:
+            cv2.copyTo(img_resultado, contexto["mascara"], destino)
+        img_resultado = nova
+
+    for regiao in metricas.get("regioes", []):
+        regiao["x"] += x
+        regiao["y"] += y
+        cx, cy = regiao["centroide"]
+        regiao["centroide"] = [round(cx + x, 2), round(cy + y, 2)]
+
+    metricas["mascara"] = {
+        "recorte": [x, y, largura, altura],
+        "pixels_analisados": contexto["pixels_analisados"],
+        "pixels_ignorados": img_completa.shape[0] * img_completa.shape[1] - contexto["pixels_analisados"]
+    }
+    return img_resultado, tipo_analise, metricas
+
+def _preparar_resolucao(img_ref, img_teste, dados_ref, mascara, resolucao, tolerancia = TOLERANCIA_REAMOSTRAGEM):
+    """
+    Reduz (ou amplia) as duas imagens para a resolução de trabalho.
+
+    A máscara, definida nas coordenadas da referência, é escalada da mesma forma. Se as duas
+    imagens tiverem dimensões nativas diferentes e houver tolerância, as imagens de trabalho
+    são desfocadas para tolerar o erro de reamostragem (ver processamento.resolucao). Os
+    dados da referência só são aproveitados se a referência for usada tal como está.
+
+    Argumentos:
+        img_ref (numpy.ndarray ou None): Imagem de referência (None se dados_ref for fornecido)
+        img_teste (numpy.ndarray): Imagem de teste, à resolução nativa
+        dados_ref (dict ou None): Dados derivados da imagem de referência
+        mascara (dict ou None): Definição de máscara (ver processamento.mascaras)
+        resolucao (tuple): (largura, altura) de trabalho
+        tolerancia (dict, opcional): Tolerância à reamostragem, com as chaves de
+            TOLERANCIA_REAMOSTRAGEM, ou None (sem tolerância). O default é TOLERANCIA_REAMOSTRAGEM.
+
+    Retorna:
+        tuple: (img_ref, img_teste, dados_ref, mascara, nativa), já à resolução de trabalho, com
+            nativa o dicionário guardado em contexto['resolucao']
+    """
+
+    largura, altura = resolucao
+    if img_ref is None:
+        img_ref = dados_ref["img"]
+    altura_ref, largura_ref = img_ref.shape[:2]
+    altura_teste, largura_teste = img_teste.shape[:2]
+
+    with perfil.etapa("redimensionar"):
+        trabalho_ref = redimensionar(img_ref, resolucao)
+        trabalho_teste = redimensionar(img_teste, resolucao)
+
+    if trabalho_ref is not img_ref and mascara is not None:
+        mascara = escalar_mascara(mascara, largura / largura_ref, altura / altura_ref)
+
+    # Fatores de redimensionamento diferentes: o erro de interpolação difere entre as duas imagens
+    if (largura_ref, altura_ref) == (largura_teste, altura_teste):
+        tolerancia = None
+    elif tolerancia is not None:
+        print(f"📐 Dimensões nativas diferentes: tolerância à reamostragem (desfoque {tolerancia['suavizacao']}, "
+              f"limiar {tolerancia['limiar_diferenca']}, área mínima {tolerancia['area_minima']} px)")
+        with perfil.etapa("redimensionar"):
+            trabalho_ref = suavizar(trabalho_ref, tolerancia["suavizacao"])
+            trabalho_teste = suavizar(trabalho_teste, tolerancia["suavizacao"])
+
+    if trabalho_ref is not img_ref:
+        dados_ref = None
+
+    nativa = {
+        "img_teste": img_teste,
+        "escala": (largura_teste / largura, altura_teste / altura),
+        "dimensoes": {
+            "trabalho": [largura, altura],
+            "referencia": [largura_ref, altura_ref],
+            "teste": [largura_teste, altura_teste],
+            "tolerancia_reamostragem": tolerancia
         }
-        return img_resultado, tipo_analise, metricas
+    }
+    return trabalho_ref, trabalho_teste, dados_ref, mascara, nativa
 
-    # Método 2: comparação de histograma (correlação)
-    elif metodo == "histograma":
-        tipo_analise = "Comparação de Histograma (Correlação)"
+def _aplicar_resolucao(contexto, nativa):
+    """
+    Guarda no contexto a imagem de teste nativa e aplica a tolerância à reamostragem, se existir
+    (limiar do absdiff e área mínima das regiões nunca abaixo dos pedidos).
+    """
 
-        # Converte ambas as imagens para a escala de cinzentos
-        # Histograma analisa distribuição de intensidades, não precisa de cor
-        gray_ref = cv2.cvtColor(img_ref, cv2.COLOR_BGR2GRAY)
-        gray_teste = cv2.cvtColor(img_teste, cv2.COLOR_BGR2GRAY)
+    contexto["resolucao"] = nativa
+    tolerancia = nativa["dimensoes"]["tolerancia_reamostragem"]
+    if tolerancia is not None:
+        contexto["limiar_diferenca"] = max(contexto["limiar_diferenca"], tolerancia["limiar_diferenca"])
+        contexto["area_minima"] = max(contexto["area_minima"], tolerancia["area_minima"])
 
-        # Calcula histograma da imagem de referência
-        hist_ref = cv2.calcHist([gray_ref], [0], None, [256], [0, 256])
-        hist_teste = cv2.calcHist([gray_teste], [0], None, [256], [0, 256])
+def _repor_resolucao(contexto, metodo, resultado, cor, alpha):
+    """
+    Converte o resultado de um método calculado à resolução de trabalho para as coordenadas
+    nativas da imagem de teste.
 
-        # Normaliza histogramas para comparação
-        # Remove influência do tamanho total da imagem
-        hist_ref = cv2.normalize(hist_ref, hist_ref).flatten()
-        hist_teste = cv2.normalize(hist_teste, hist_teste).flatten()
+    A máscara das regiões é ampliada (vizinho mais próximo) e o overlay é aplicado sobre a
+    imagem de teste nativa; as caixas e os centróides das regiões (e o recorte da máscara)
+    são escalados, e as métricas ganham a chave 'resolucao'.
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        metodo (str): Método que produziu o resultado
+        resultado (tuple): (imagem_resultado, tipo_analise, metricas), já nas coordenadas da imagem completa
+        cor (tuple): Cor BGR do realce
+        alpha (float): Transparência do overlay (0.0=transparente, 1.0=opaco)
+
+    Retorna:
+        tuple: Resultado nas coordenadas nativas da imagem de teste
+    """
+
+    nativa = contexto["resolucao"]
+    if nativa is None:
+        return resultado
 
-        # Calcula correlação entre histogramas usando método de correlação
-        # HISTCMP_CORREL: retorna valor entre -1 e 1
-        # 1 = correlação perfeita (histogramas idênticos)
-        # 0 = sem correlação
-        # -1 = correlação negativa perfeita
-        score = cv2.compareHist(hist_ref, hist_teste, cv2.HISTCMP_CORREL)
+    _, tipo_analise, metricas = resultado
+    img_teste = nativa["img_teste"]
+    altura, largura = img_teste.shape[:2]
+    mascara_regioes = contexto["mascara_regioes"]
+    contexto["mascara_regioes"] = None
 
-        # O método de histograma não gera imagem de diferenças visuais
-        # Retorna imagem original pois a análise é estatística, não espacial
+    if metodo == "histograma":
+        # O método não gera imagem própria
+        img_resultado = img_teste
+    elif mascara_regioes is None or alpha <= 0:
         img_resultado = img_teste.copy()
+    else:
+        if contexto["recorte"] is not None:
+            # Máscara das regiões sobre a imagem de trabalho completa
+            x, y, largura_recorte, altura_recorte = contexto["recorte"]
+            completa = np.zeros(contexto["img_teste_completa"].shape[:2], dtype = np.uint8)
+            completa[y:y + altura_recorte, x:x + largura_recorte] = mascara_regioes
+            mascara_regioes = completa
+
+        with perfil.etapa("overlay"):
+            mascara_regioes = cv2.resize(mascara_regioes, (largura, altura), interpolation = cv2.INTER_NEAREST)
+            img_resultado = _destacar_regioes(dict(contexto, img_teste = img_teste), mascara_regioes, cor, alpha)
+
+    escala_x, escala_y = nativa["escala"]
+    escalar_regioes(metricas.get("regioes", []), escala_x, escala_y, largura, altura)
+    if "mascara" in metricas:
+        metricas["mascara"]["recorte"] = escalar_retangulo(metricas["mascara"]["recorte"], escala_x, escala_y)
+    metricas["resolucao"] = nativa["dimensoes"]
+    return img_resultado, tipo_analise, metricas
+
+@contextlib.contextmanager
+def _threads(contexto, num_threads):
+    """
+    Ativa a execução em faixas no contexto durante o bloco, com num_threads threads.
+
+    O absdiff, o SSIM, a extração de regiões e o overlay dividem então a imagem em
+    num_threads faixas horizontais processadas em paralelo (o OpenCV liberta o GIL).
+    Com num_threads igual a 1 (ou None) nada muda.
+    """
 
-        # Métricas específicas do método histograma
+    if not num_threads or num_threads <= 1:
+        yield
+        return
+
+    with ThreadPoolExecutor(max_workers = num_threads) as executor:
+        contexto["executor"] = executor
+        contexto["num_faixas"] = num_threads
+        try:
+            yield
+        finally:
+            contexto["executor"] = None
+            contexto["num_faixas"] = 1
+
+def _obter_cinzentos(contexto, chave):
+    """
+    Devolve a versão em escala de cinzentos de uma das imagens do contexto.
+
+    A conversão BGR -> cinzento é feita uma única vez por imagem, mesmo que vários métodos a usem,
+    para um buffer do contexto (reutilizado entre comparações quando os buffers são partilhados).
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        chave (str): 'ref' ou 'teste'
+
+    Retorna:
+        numpy.ndarray: Imagem em escala de cinzentos
+    """
+
+    nome = f"gray_{chave}"
+    if nome not in contexto:
+        with perfil.etapa("cvtColor"):
+            img = contexto[f"img_{chave}"]
+            contexto[nome] = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst = obter_buffer(contexto, nome, img.shape[:2]))
+    return contexto[nome]
+
+def obter_buffer(contexto, nome, forma, dtype = np.uint8):
+    """
+    Devolve um buffer de trabalho do contexto, criando-o apenas se ainda não existir
+    com a forma e o tipo pedidos.
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        nome (str): Nome do buffer (ex: 'overlay')
+        forma (tuple): Dimensões do buffer
+        dtype (opcional): Tipo de dados NumPy do buffer. O default é numpy.uint8.
+
+    Retorna:
+        numpy.ndarray: Buffer com conteúdo indefinido
+    """
+
+    buffer = contexto["buffers"].get(nome)
+    if buffer is None or buffer.shape != forma or buffer.dtype != dtype:
+        buffer = np.empty(forma, dtype = dtype)
+        contexto["buffers"][nome] = buffer
+    return buffer
+
+def _destacar_regioes(contexto, mask, cor, alpha):
+    """
+    Cria a imagem de resultado com as regiões diferentes destacadas por um overlay transparente.
+
+    A cor de realce é misturada com uma tabela de consulta (LUT) por canal, que produz
+    diretamente a única cópia da imagem de teste. Os pixels fora da máscara são depois
+    repostos a partir da imagem de teste, pelo que o custo não depende do número de regiões.
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        mask (numpy.ndarray): Máscara uint8 dos pixels a destacar
+        cor (tuple): Cor BGR do realce
+        alpha (float): Transparência do overlay (0.0=transparente, 1.0=opaco)
+
+    Retorna:
+        numpy.ndarray: Nova imagem com as diferenças destacadas
+    """
+
+    img_teste = contexto["img_teste"]
+
+    # Tabela com o resultado da mistura para cada valor de pixel e canal
+    # Fórmula: resultado = (cor * alpha) + (original * (1-alpha))
+    valores = np.arange(256, dtype = np.float64).reshape(256, 1)
+    lut = np.rint(valores * (1 - alpha) + np.array(cor, dtype = np.float64) * alpha)
+    lut = np.clip(lut, 0, 255).astype(np.uint8).reshape(1, 256, 3)
+
+    executor = contexto["executor"]
+    if executor is None:
+        # Aplica a mistura à imagem inteira (é esta a cópia da imagem de teste) e
+        # repõe os pixels originais fora das regiões destacadas
+        img_resultado = cv2.LUT(img_teste, lut)
+        fora = cv2.compare(mask, 0, cv2.CMP_EQ, dst = obter_buffer(contexto, "mascara_overlay", img_teste.shape[:2]))
+        cv2.copyTo(img_teste, fora, img_resultado)
+        return img_resultado
+
+    # O mesmo, faixa a faixa, nas threads do contexto
+    img_resultado = np.empty(img_teste.shape, dtype = img_teste.dtype)
+
+    def destacar(faixa):
+        y0, y1 = faixa
+        cv2.LUT(img_teste[y0:y1], lut, dst = img_resultado[y0:y1])
+        cv2.copyTo(img_teste[y0:y1], cv2.compare(mask[y0:y1], 0, cv2.CMP_EQ), img_resultado[y0:y1])
+
+    list(executor.map(destacar, faixas_horizontais(img_teste.shape[0], contexto["num_faixas"])))
+    return img_resultado
+
+def _extrair_e_destacar(contexto, mask, cor, alpha):
+    """
+    Extrai as regiões da máscara de diferenças e cria a imagem de resultado com elas destacadas.
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        mask (numpy.ndarray): Máscara uint8 dos pixels diferentes
+        cor (tuple): Cor BGR do realce
+        alpha (float): Transparência do overlay (0.0=transparente, 1.0=opaco)
+
+    Retorna:
+        tuple: (img_resultado, regioes), com as regiões tal como devolvidas por extrair_regioes;
+            com resolução de trabalho, img_resultado é None e a máscara das regiões fica no contexto
+    """
+
+    # Uma única passagem de rotulagem dá caixa, área e centróide de cada região
+    # Regiões abaixo da área mínima (ex: pixels isolados) são descartadas
+    with perfil.etapa("regioes"):
+        regioes, mascara_regioes = extrair_regioes(mask, contexto["area_minima"], contexto["distancia_fusao"],
+                                                   contexto["executor"], contexto["num_faixas"])
+    print(f"🔍 {len(regioes)} regiões com diferenças detetadas")
+
+    if contexto["resolucao"] is not None:
+        # À resolução de trabalho, o overlay é feito sobre a imagem de teste nativa (ver _repor_resolucao)
+        contexto["mascara_regioes"] = mascara_regioes.copy() if regioes else None
+        return None, regioes
+
+    # Sem regiões a destacar, o resultado é apenas uma cópia da imagem de teste
+    if not regioes or alpha <= 0:
+        return contexto["img_teste"].copy(), regioes
+
+    with perfil.etapa("overlay"):
+        return _destacar_regioes(contexto, mascara_regioes, cor, alpha), regioes
+
+def _recorte_cinzentos(contexto, chave, x, y, largura, altura):
+    """
+    Devolve um recorte em escala de cinzentos de uma das imagens do contexto.
+
+    Se a imagem completa já tiver sido convertida (ou vier da cache), devolve uma vista
+    sobre ela; caso contrário converte apenas o recorte pedido.
+    """
+
+    gray = contexto.get(f"gray_{chave}")
+    if gray is not None:
+        return gray[y:y + altura, x:x + largura]
+    return cv2.cvtColor(contexto[f"img_{chave}"][y:y + altura, x:x + largura], cv2.COLOR_BGR2GRAY)
+
+def _dividir_em_faixas(contexto, retangulos):
+    """
+    Prepara os retângulos a processar em paralelo: se forem menos do que as faixas pedidas
+    (ex: a imagem completa), cada um é dividido em faixas horizontais.
+    """
+
+    num_faixas = contexto["num_faixas"]
+    if len(retangulos) >= num_faixas:
+        return retangulos
+    return [(x, y + y0, w, y1 - y0) for x, y, w, h in retangulos for y0, y1 in faixas_horizontais(h, num_faixas)]
+
+def _resultado_identico(contexto, metodo):
+    """
+    Devolve o resultado de um método para duas imagens idênticas, sem qualquer cálculo.
+
+    Usado quando a comparação de mosaicos mostra que nenhum mosaico mudou.
+    """
+
+    img_teste = contexto["img_teste"]
+    total_pixels = contexto["pixels_analisados"]
+
+    if metodo == "absdiff":
         metricas = {
-            "correlacao_histogramas": score,
-            "num_diferencas": None
+            "num_diferencas": 0,
+            "total_pixels": total_pixels,
+            "pixels_diferentes": 0,
+            "percentagem_diferenca": 0.0,
+            "regioes": []
         }
-        return img_resultado, tipo_analise, metricas
-
-    # Método 3: índice de similaridade estrutural (SSIM)
+        if contexto["limiares_absdiff"]:
+            metricas["varrimento_limiares"] = varrimento_limiares(None, total_pixels, contexto["limiares_absdiff"])
+        return img_teste.copy(), TIPOS_ANALISE[metodo], metricas
+    elif metodo == "histograma":
+        return img_teste, TIPOS_ANALISE[metodo], {"correlacao_histogramas": 1.0, "num_diferencas": None}
     elif metodo == "ssim":
-        tipo_analise = "Índice de Similaridade Estrutural (SSIM)"
-
-        # Converte imagens para escala de cinzentos
-        gray_ref = cv2.cvtColor(img_ref, cv2.COLOR_BGR2GRAY)
-        gray_teste = cv2.cvtColor(img_teste, cv2.COLOR_BGR2GRAY)
-
-        # Calcula SSIM com mapa completo de diferenças
-        # score: valor global de similaridade (0 a 1, onde 1 = idêntico)
-        # diff: mapa pixel-a-pixel de similaridade estrutural
-        # full=True: retorna tanto o score global quanto o mapa detalhado
-        score, diff = ssim(gray_ref, gray_teste, full = True)
-        diff = (diff * 255).astype("uint8")
-
-        # Define limiar de similaridade estrutural
-        # Valores mais baixos no mapa SSIM indicam maiores diferenças estruturais
-        # 220/255 ≈ 0.86 de similaridade mínima aceitável
-        limiar_similaridade = 220
-
-        # Aplica threshold invertido (THRESH_BINARY_INV) ao mapa de diferenças para encontrar alterações
-        # Pixels com similaridade < limiar_similaridade ficam brancos (diferentes)
-        # Pixels com similaridade >= limiar_similaridade ficam pretos (similares)
-        _, mask = cv2.threshold(diff, limiar_similaridade, 255, cv2.THRESH_BINARY_INV)
-
-        # Encontra contornos das regiões com baixa similaridade estrutural
-        contornos, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        print(f"🔍 {len(contornos)} regiões com diferenças detetadas")
-
-        # Cria visualização com overlay vermelho nas diferenças estruturais
-        img_resultado = img_teste.copy()
-        overlay = img_resultado.copy()
+        return img_teste.copy(), TIPOS_ANALISE[metodo], {"indice_ssim": 1.0, "num_diferencas": 0, "regioes": []}
+    else:
+        raise ValueError(f"Método de análise desconhecido: {metodo}")
 
-        # Desenha contornos preenchidos para destacar diferenças estruturais
-        for contorno in contornos:
-            cv2.drawContours(overlay, [contorno], -1, cor, thickness = cv2.FILLED)
+def varrimento_limiares(hist_diff, total_pixels, limiares):
+    """
+    Calcula os pixels diferentes para vários limiares a partir do histograma da diferença.
 
-        # Aplica overlay com transparência
-        cv2.addWeighted(overlay, 0.7, img_resultado, 1 - alpha, 0, img_resultado)
+    Um pixel é diferente para o limiar t se a diferença em cinzentos for superior a t
+    (como no cv2.THRESH_BINARY), pelo que a contagem é o total menos a soma acumulada até t.
 
-        # Métricas específicas de SSIM
-        metricas = {
-            "indice_ssim": score,               # Índice global de similaridade estrutural
-            "num_diferencas": len(contornos)    # Número de regiões com diferenças estruturais
+    Argumentos:
+        hist_diff (numpy.ndarray ou None): Histograma de 256 bins da diferença em cinzentos
+            (None para imagens idênticas)
+        total_pixels (int): Número total de pixels da imagem
+        limiares (list): Limiares a avaliar (0 a 255)
+
+    Retorna:
+        list: Um dicionário por limiar, com 'limiar', 'pixels_diferentes' e 'percentagem_diferenca'
+    """
+
+    acumulado = np.cumsum(hist_diff.ravel()) if hist_diff is not None else None
+    varrimento = []
+    for limiar in sorted(set(int(l) for l in limiares)):
+        pixels = 0
+        if acumulado is not None:
+            pixels = total_pixels - int(acumulado[min(max(limiar, 0), 255)])
+        varrimento.append({
+            "limiar": limiar,
+            "pixels_diferentes": pixels,
+            "percentagem_diferenca": (pixels / total_pixels) * 100
+        })
+    return varrimento
+
+def _analisar_absdiff(contexto, cor, alpha):
+    """
+    Método 1: diferença absoluta de pixels (absdiff). Ver analisar_diferencas.
+
+    Se o contexto indicar retângulos para este método (ver _preparar_mosaicos), a diferença
+    só é calculada dentro deles; o resto da máscara fica a zero, o que dá o mesmo resultado
+    porque fora dos retângulos as imagens são idênticas.
+
+    Com uma máscara no contexto, as zonas ignoradas já não têm diferenças (ver _aplicar_mascara)
+    e a percentagem é calculada sobre os pixels analisados.
+
+    Com limiares_absdiff no contexto, o histograma da diferença em cinzentos é acumulado
+    durante a mesma passagem e dá as contagens de pixels diferentes para todos os limiares;
+    as regiões e o overlay continuam a usar apenas limiar_diferenca.
+    """
+
+    tipo_analise = TIPOS_ANALISE["absdiff"]
+    img_ref = contexto["img_ref"]
+    img_teste = contexto["img_teste"]
+    altura, largura = img_teste.shape[:2]
+
+    # Limiar de sensibilidade para considerar uma diferença significativa (ver LIMIAR_DIFERENCA;
+    # mais alto à resolução de trabalho com imagens de dimensões diferentes, ver _aplicar_resolucao)
+    limiar_diferenca = contexto["limiar_diferenca"]
+
+    # Histograma da diferença em cinzentos, só necessário para o varrimento de limiares
+    limiares = contexto["limiares_absdiff"]
+    hist_diff = np.zeros((256, 1), dtype = np.float32) if limiares else None
+
+    mask = obter_buffer(contexto, "mask", (altura, largura))
+    retangulos = contexto["retangulos"].get("absdiff")
+    if retangulos is None:
+        retangulos = [(0, 0, largura, altura)]
+    else:
+        mask.fill(0)
+
+    with perfil.etapa("absdiff"):
+        if contexto["executor"] is not None:
+            for hist in _absdiff_em_faixas(contexto, retangulos, mask, limiar_diferenca, hist_diff is not None):
+                hist_diff += hist.reshape(hist_diff.shape)
+            retangulos = []
+
+        for x, y, w, h in retangulos:
+            ref_recorte = img_ref[y:y + h, x:x + w]
+            teste_recorte = img_teste[y:y + h, x:x + w]
+
+            # Calcula a diferença absoluta entre as duas imagens pixel a pixel
+            # Resultado: imagem onde cada pixel = |pixel_ref - pixel_teste|
+            diff = cv2.absdiff(ref_recorte, teste_recorte,
+                               dst = obter_buffer(contexto, "diff", ref_recorte.shape, img_ref.dtype))
+
+            # Converte para escala de cinzentos para facilitar a análise de threshold
+            # Necessário porque trabalhamos com uma única intensidade por pixel
+            gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY, dst = obter_buffer(contexto, "gray_diff", (h, w)))
+
+            # Aplica threshold binário para criar máscara de diferenças
+            # Pixels com diferença > limiar_diferenca ficam brancos (255)
+            # Pixels com diferença <= limiar_diferenca ficam pretos (0)
+            cv2.threshold(gray_diff, limiar_diferenca, 255, cv2.THRESH_BINARY, dst = mask[y:y + h, x:x + w])
+
+            if hist_diff is not None:
+                cv2.calcHist([gray_diff], [0], None, [256], [0, 256], hist = hist_diff, accumulate = True)
+
+    # Conta o número total de pixels analisados (largura × altura, menos as zonas ignoradas)
+    total_pixels = contexto["pixels_analisados"]
+
+    # Conta pixels brancos na máscara (pixels diferentes)
+    pixels_diferentes = cv2.countNonZero(mask)
+
+    # Calcula percentagem de pixels que são diferentes
+    percentagem_diferenca = (pixels_diferentes / total_pixels) * 100
+    print(f"🧮 {pixels_diferentes} pixels diferentes de {total_pixels} ({percentagem_diferenca:.2f}%)")
+
+    # Regiões ligadas da máscara (conectividade 8) e imagem com as regiões destacadas
+    img_resultado, regioes = _extrair_e_destacar(contexto, mask, cor, alpha)
+
+    # Métricas a retornar
+    metricas = {
+        "num_diferencas": len(regioes),                     # Número de regiões diferentes
+        "total_pixels": total_pixels,                       # Total de pixels na imagem
+        "pixels_diferentes": pixels_diferentes,             # Pixels que diferem
+        "percentagem_diferenca": percentagem_diferenca,     # % de diferença
+        "regioes": regioes                                  # Caixa, área e centróide de cada região
+    }
+
+    # Varrimento de limiares: fora dos retângulos analisados a diferença é 0
+    if hist_diff is not None:
+        hist_diff[0] += total_pixels - hist_diff.sum()
+        metricas["varrimento_limiares"] = varrimento_limiares(hist_diff, total_pixels, limiares)
+    return img_resultado, tipo_analise, metricas
+
+def _absdiff_em_faixas(contexto, retangulos, mask, limiar_diferenca, com_histograma):
+    """
+    Calcula a máscara do absdiff por faixas (ou retângulos) nas threads do contexto.
+
+    Cada faixa usa os seus próprios temporários e escreve apenas a sua parte da máscara.
+
+    Retorna:
+        list: Histogramas da diferença em cinzentos de cada faixa (vazia se com_histograma for False)
+    """
+
+    img_ref = contexto["img_ref"]
+    img_teste = contexto["img_teste"]
+
+    def processar(retangulo):
+        x, y, w, h = retangulo
+        diff = cv2.absdiff(img_ref[y:y + h, x:x + w], img_teste[y:y + h, x:x + w])
+        gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+        cv2.threshold(gray_diff, limiar_diferenca, 255, cv2.THRESH_BINARY, dst = mask[y:y + h, x:x + w])
+        if com_histograma:
+            return cv2.calcHist([gray_diff], [0], None, [256], [0, 256])
+        return None
+
+    hists = contexto["executor"].map(processar, _dividir_em_faixas(contexto, retangulos))
+    return [hist for hist in hists if hist is not None]
+
+def _analisar_histograma(contexto):
+    """
+    Método 2: comparação de histograma (correlação). Ver analisar_diferencas.
+
+    Com retângulos no contexto, o histograma da imagem de teste é obtido a partir do da
+    referência, somando a diferença entre os histogramas dos recortes alterados.
+    Com uma máscara, os dois histogramas contam apenas os pixels analisados.
+    """
+
+    tipo_analise = TIPOS_ANALISE["histograma"]
+    retangulos = contexto["retangulos"].get("histograma")
+
+    with perfil.etapa("histograma"):
+        if retangulos is None:
+            # Imagens em escala de cinzentos (partilhadas com os restantes métodos)
+            # Histograma analisa distribuição de intensidades, não precisa de cor
+            gray_teste = _obter_cinzentos(contexto, "teste")
+
+            # Calcula histograma da imagem de teste
+            hist_teste = cv2.calcHist([gray_teste], [0], contexto["mascara"], [256], [0, 256])
+        else:
+            # Contagens absolutas da referência, corrigidas apenas nas zonas alteradas
+            # (nas zonas ignoradas o teste é igual à referência, pelo que as correções se anulam)
+            hist_teste = _obter_contagens_histograma_ref(contexto).copy()
+            for x, y, w, h in retangulos:
+                recorte_teste = _recorte_cinzentos(contexto, "teste", x, y, w, h)
+                recorte_ref = _recorte_cinzentos(contexto, "ref", x, y, w, h)
+                hist_teste += cv2.calcHist([recorte_teste], [0], None, [256], [0, 256])
+                hist_teste -= cv2.calcHist([recorte_ref], [0], None, [256], [0, 256])
+
+    # Normaliza histogramas para comparação
+    # Remove influência do tamanho total da imagem
+    hist_teste = cv2.normalize(hist_teste, hist_teste).flatten()
+
+    # Histograma normalizado da referência (se não vier da cache)
+    hist_ref = contexto.get("hist_ref")
+    if hist_ref is None:
+        hist_ref = _obter_contagens_histograma_ref(contexto).copy()
+        hist_ref = cv2.normalize(hist_ref, hist_ref).flatten()
+
+    # Calcula correlação entre histogramas usando método de correlação
+    # HISTCMP_CORREL: retorna valor entre -1 e 1
+    # 1 = correlação perfeita (histogramas idênticos)
+    # 0 = sem correlação
+    # -1 = correlação negativa perfeita
+    score = cv2.compareHist(hist_ref, hist_teste, cv2.HISTCMP_CORREL)
+
+    # O método de histograma não gera imagem de diferenças visuais
+    # Retorna a própria imagem de teste (sem cópia) pois a análise é estatística, não espacial
+    img_resultado = contexto["img_teste"]
+
+    # Métricas específicas do método histograma
+    metricas = {
+        "correlacao_histogramas": score,
+        "num_diferencas": None
+    }
+    return img_resultado, tipo_analise, metricas
+
+def _obter_contagens_histograma_ref(contexto):
+    """
+    Devolve o histograma de 256 bins (contagens absolutas) da imagem de referência.
+    """
+
+    if "hist_ref_contagens" not in contexto:
+        gray_ref = _obter_cinzentos(contexto, "ref")
+        contexto["hist_ref_contagens"] = cv2.calcHist([gray_ref], [0], contexto["mascara"], [256], [0, 256])
+    return contexto["hist_ref_contagens"]
+
+def _ssim_em_retangulos(contexto, retangulos, limite):
+    """
+    Calcula o índice SSIM e a máscara de diferenças apenas dentro dos retângulos indicados.
+
+    Cada retângulo é alargado pelo raio da janela SSIM, para que os valores no seu interior
+    sejam exatamente os da imagem completa. Fora dos retângulos as janelas só contêm pixels
+    idênticos nas duas imagens, onde o SSIM é 1; o índice global é reconstruído com esse valor.
+    Com uma máscara no contexto, o índice e a máscara de diferenças só contam os pixels analisados.
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        retangulos (list): Retângulos disjuntos (x, y, largura, altura) a processar
+        limite (float): Valor SSIM abaixo do qual um pixel é considerado diferente
+
+    Retorna:
+        tuple: (score, mask) com a máscara uint8 da imagem completa
+    """
+
+    altura, largura = contexto["img_teste"].shape[:2]
+    raio = (tamanho_janela(contexto["janela_ssim"]) - 1) // 2
+
+    mask = obter_buffer(contexto, "mask_ssim_parcial", (altura, largura))
+    mask.fill(0)
+
+    estatisticas_ref = contexto.get("ssim_ref")
+    mascara = contexto["mascara"]
+
+    def processar(retangulo):
+        x, y, w, h = retangulo
+        soma, contagem = 0.0, 0
+
+        # Recorte alargado pelo raio da janela (limitado às margens da imagem)
+        x0, y0 = max(x - raio, 0), max(y - raio, 0)
+        x1, y1 = min(x + w + raio, largura), min(y + h + raio, altura)
+
+        recorte_ref = _recorte_cinzentos(contexto, "ref", x0, y0, x1 - x0, y1 - y0)
+        recorte_teste = _recorte_cinzentos(contexto, "teste", x0, y0, x1 - x0, y1 - y0)
+        estatisticas_recorte = None
+        if estatisticas_ref is not None:
+            estatisticas_recorte = tuple(e[y0:y1, x0:x1] for e in estatisticas_ref)
+
+        _, mapa = calcular_ssim(recorte_ref, recorte_teste, janela = contexto["janela_ssim"],
+                                estatisticas_ref = estatisticas_recorte)
+        interior = mapa[y - y0:y - y0 + h, x - x0:x - x0 + w]
+        mask[y:y + h, x:x + w] = interior < limite
+
+        # Contribuição para o índice global (que ignora uma margem de 'raio' pixels)
+        iy0, iy1 = max(y, raio), min(y + h, altura - raio)
+        ix0, ix1 = max(x, raio), min(x + w, largura - raio)
+        if iy1 > iy0 and ix1 > ix0:
+            valores = interior[iy0 - y:iy1 - y, ix0 - x:ix1 - x]
+            if mascara is None:
+                soma = float(valores.sum(dtype = np.float64))
+                contagem = (iy1 - iy0) * (ix1 - ix0)
+            else:
+                mascara_valores = mascara[iy0:iy1, ix0:ix1]
+                contagem = cv2.countNonZero(mascara_valores)
+                if contagem:
+                    soma = cv2.mean(valores, mask = mascara_valores)[0] * contagem
+        return soma, contagem
+
+    # Com threads no contexto, os retângulos (ou faixas da imagem) são processados em paralelo
+    executor = contexto["executor"]
+    parciais = executor.map(processar, retangulos) if executor is not None else map(processar, retangulos)
+    soma, contagem = 0.0, 0
+    for soma_retangulo, contagem_retangulo in parciais:
+        soma += soma_retangulo
+        contagem += contagem_retangulo
+
+    if mascara is None:
+        num_pixels_indice = (altura - 2 * raio) * (largura - 2 * raio)
+    else:
+        cv2.bitwise_and(mask, mascara, dst = mask)
+        num_pixels_indice = cv2.countNonZero(mascara[raio:altura - raio, raio:largura - raio])
+    if num_pixels_indice <= 0:
+        return 1.0, mask
+    score = (soma + (num_pixels_indice - contagem)) / num_pixels_indice
+    return score, mask
+
+def _analisar_ssim(contexto, cor, alpha):
+    """
+    Método 3: índice de similaridade estrutural (SSIM). Ver analisar_diferencas.
+    """
+
+    tipo_analise = TIPOS_ANALISE["ssim"]
+
+    # Pixels com similaridade <= LIMIAR_SIMILARIDADE são considerados diferentes
+    limite = limite_ssim()
+
+    retangulos = contexto["retangulos"].get("ssim")
+    if retangulos is None and contexto["executor"] is not None:
+        # Execução em faixas: a imagem completa é dividida em faixas alargadas pelo raio da janela
+        altura, largura = contexto["img_teste"].shape[:2]
+        retangulos = _dividir_em_faixas(contexto, [(0, 0, largura, altura)])
+
+    with perfil.etapa("ssim"):
+        if retangulos is not None:
+            score, mask = _ssim_em_retangulos(contexto, retangulos, limite)
+        else:
+            # Imagens em escala de cinzentos (partilhadas com os restantes métodos)
+            gray_ref = _obter_cinzentos(contexto, "ref")
+            gray_teste = _obter_cinzentos(contexto, "teste")
+
+            # Calcula SSIM com mapa completo de diferenças
+            # score: valor global de similaridade (0 a 1, onde 1 = idêntico)
+            # diff: mapa pixel-a-pixel de similaridade estrutural (float32, -1 a 1)
+            # Se as estatísticas locais da referência vierem da cache, só as do teste são calculadas
+            # Os buffers float32 do SSIM ficam no contexto e são reutilizados entre chamadas
+            score, diff = calcular_ssim(gray_ref, gray_teste, janela = contexto["janela_ssim"],
+                                        estatisticas_ref = contexto.get("ssim_ref"),
+                                        buffers = contexto["buffers"])
+
+            # Cria máscara de diferenças diretamente sobre o mapa em float
+            # Pixels diferentes ficam a 1, pixels similares ficam a 0
+            mask = np.less(diff, limite, out = obter_buffer(contexto, "mask_ssim", diff.shape, np.bool_)).view(np.uint8)
+
+            mascara = contexto["mascara"]
+            if mascara is not None:
+                # Índice e diferenças apenas nos pixels analisados (o índice ignora a margem da janela)
+                raio = (tamanho_janela(contexto["janela_ssim"]) - 1) // 2
+                interior = mascara[raio:mascara.shape[0] - raio, raio:mascara.shape[1] - raio]
+                score = 1.0
+                if cv2.countNonZero(interior):
+                    score = cv2.mean(diff[raio:diff.shape[0] - raio, raio:diff.shape[1] - raio], mask = interior)[0]
+                cv2.bitwise_and(mask, mascara, dst = mask)
+
+    # Regiões com baixa similaridade estrutural e visualização com overlay sobre elas
+    img_resultado, regioes = _extrair_e_destacar(contexto, mask, cor, alpha)
+
+    # Métricas específicas de SSIM
+    metricas = {
+        "indice_ssim": score,               # Índice global de similaridade estrutural
+        "num_diferencas": len(regioes),     # Número de regiões com diferenças estruturais
+        "regioes": regioes                  # Caixa, área e centróide de cada região
+    }
+    return img_resultado, tipo_analise, metricas
+
+def _preparar_mosaicos(contexto, tamanho_mosaico, hashes_ref = None):
+    """
+    Compara os hashes dos mosaicos das duas imagens e prepara os retângulos de cada método.
+
+    - absdiff e histograma só processam os mosaicos alterados;
+    - ssim processa também os mosaicos vizinhos, porque a janela SSIM de um pixel
+      próximo de uma alteração abrange pixels alterados.
+    Se a fração de mosaicos a processar for superior a FRACAO_MAXIMA_PARCIAL, o método
+    analisa a imagem completa.
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        tamanho_mosaico (int): Lado de cada mosaico em pixels
+        hashes_ref (numpy.ndarray, opcional): Hashes já calculados da referência. O default é None.
+    """
+
+    if hashes_ref is None:
+        hashes_ref = calcular_hashes_mosaicos(contexto["img_ref"], tamanho_mosaico)
+    hashes_teste = calcular_hashes_mosaicos(contexto["img_teste"], tamanho_mosaico)
+
+    alterados = mosaicos_alterados(hashes_ref, hashes_teste)
+    contexto["identicas"] = not alterados.any()
+
+    raio_ssim = (tamanho_janela(contexto["janela_ssim"]) - 1) // 2
+    selecoes = {
+        "absdiff": alterados,
+        "histograma": alterados,
+        "ssim": dilatar_grelha(alterados, -(-raio_ssim // tamanho_mosaico))
+    }
+
+    forma = contexto["img_teste"].shape
+    for metodo, analisados in selecoes.items():
+        if np.count_nonzero(analisados) > FRACAO_MAXIMA_PARCIAL * analisados.size:
+            # Demasiados mosaicos alterados: analisa a imagem completa
+            analisados = np.ones_like(analisados)
+        else:
+            contexto["retangulos"][metodo] = retangulos_da_grelha(analisados, tamanho_mosaico, forma)
+        contexto["selecoes"][metodo] = analisados
+        contexto["mosaicos"][metodo] = resumo_mosaicos(alterados, analisados, tamanho_mosaico)
+
+def _preparar_piramide(contexto, metodos_piramide, niveis, limiar_grosseiro, tamanho_bloco, tolerancia = None):
+    """
+    Deteta as regiões candidatas nas imagens reduzidas e restringe a elas os métodos indicados.
+
+    A redução parte das imagens em cinzentos do contexto, partilhadas com o histograma e o SSIM;
+    a da referência vem já reduzida da cache de referências, quando existe com o mesmo número de níveis.
+    Se a comparação por mosaicos também estiver ativa, cada método só analisa os blocos
+    que são simultaneamente mosaicos alterados e candidatos da pirâmide.
+
+    Com tolerancia, os blocos mais suspeitos fora dos candidatos são verificados à resolução
+    completa (ver processamento.piramide.verificar_blocos) e os que têm diferenças passam a
+    ser analisados. Se a estimativa dos pixels diferentes nos suspeitos por verificar for maior
+    do que essa fração dos pixels analisados, os métodos não são restringidos pela pirâmide
+    (só pelos mosaicos, se ativos).
+
+    Argumentos:
+        contexto (dict): Contexto criado por _criar_contexto
+        metodos_piramide (iterable): Métodos a executar em modo pirâmide
+        niveis (int): Número de reduções com cv2.pyrDown
+        limiar_grosseiro (int): Diferença mínima em cinzentos na imagem reduzida
+        tamanho_bloco (int): Lado dos blocos analisados à resolução completa
+        tolerancia (float, opcional): Fração máxima dos pixels analisados com diferenças que pode
+            ficar fora dos blocos selecionados. O default é None (sem verificação).
+
+    Erros:
+        ValueError: Se algum método não suportar o modo pirâmide.
+    """
+
+    for metodo in metodos_piramide:
+        if metodo not in METODOS_PIRAMIDE:
+            raise ValueError(f"O método {metodo} não suporta o modo pirâmide.")
+
+    ref_reduzida = contexto.get("gray_reduzida_ref") if niveis == NIVEIS_PIRAMIDE else None
+    gray_ref = _obter_cinzentos(contexto, "ref") if ref_reduzida is None else None
+    maximos = maximos_por_bloco(gray_ref, _obter_cinzentos(contexto, "teste"), niveis, tamanho_bloco, ref_reduzida)
+    candidatos = maximos > limiar_grosseiro
+
+    verificacao = None
+    if tolerancia is not None:
+        with perfil.etapa("verificacao_piramide"):
+            # Os mosaicos inalterados (se ativos) são idênticos: não há nada a verificar neles
+            if "absdiff" in contexto["selecoes"]:
+                maximos = np.where(contexto["selecoes"]["absdiff"], maximos, 0).astype(np.uint8)
+            candidatos, verificacao = verificar_blocos(contexto["img_ref"], contexto["img_teste"], maximos, candidatos,
+                                                       contexto["limiar_diferenca"], tamanho_bloco,
+                                                       mascara = contexto["mascara"])
+            verificacao["resolucao_completa"] = (verificacao["pixels_fora_estimados"] >
+                                                 tolerancia * contexto["pixels_analisados"])
+
+    raio_ssim = (tamanho_janela(contexto["janela_ssim"]) - 1) // 2
+    forma = contexto["img_teste"].shape
+
+    for metodo in metodos_piramide:
+        selecao = candidatos
+        if metodo == "ssim":
+            # A janela SSIM de um pixel junto a um bloco candidato abrange pixels desse bloco
+            selecao = dilatar_grelha(candidatos, -(-raio_ssim // tamanho_bloco))
+
+        if metodo in contexto["selecoes"]:
+            selecao = selecao & contexto["selecoes"][metodo]
+
+        resumo = {
+            "niveis": niveis,
+            "limiar_grosseiro": limiar_grosseiro,
+            "blocos_total": int(selecao.size),
+            "blocos_analisados": int(np.count_nonzero(selecao))
         }
-        return img_resultado, tipo_analise, metricas
+        contexto["piramide"][metodo] = resumo
+
+        if verificacao is not None:
+            resumo.update(verificacao)
+            if verificacao["resolucao_completa"]:
+                # Diferenças demasiado dispersas: o método mantém a seleção dos mosaicos (ou a imagem completa)
+                continue
+
+        contexto["retangulos"][metodo] = retangulos_da_grelha(selecao, tamanho_bloco, forma)
+
+def _executar_metodo(contexto, metodo, cor, alpha):
+    """
+    Aplica um único método de análise ao contexto de um par de imagens.
+
+    Erros:
+        ValueError: Se o nome do método especificado não for reconhecido.
+    """
 
+    if metodo == "absdiff":
+        return _analisar_absdiff(contexto, cor, alpha)
+    elif metodo == "histograma":
+        return _analisar_histograma(contexto)
+    elif metodo == "ssim":
+        return _analisar_ssim(contexto, cor, alpha)
     else:
         # Exceção se método especificado não for válido
         # Ajuda a detetar erros nos nomes dos métodos
-        raise ValueError(f"Método de análise desconhecido: {metodo}")
\ No newline at end of file
+        raise ValueError(f"Método de análise desconhecido: {metodo}")
+
+def analisar_diferencas(img_ref, img_teste, metodo = "absdiff", dados_ref = None, cor = (0, 0, 255), alpha = 0.7,
+                        area_minima = AREA_MINIMA, distancia_fusao = DISTANCIA_FUSAO, limiares_absdiff = None,
+                        mascara = None, num_threads = 1, resolucao = None, janela = "uniforme",
+                        tolerancia_reamostragem = TOLERANCIA_REAMOSTRAGEM):
+    """
+    Compara duas imagens utilizando um dos métodos disponíveis para deteção de diferenças visuais.
+
+    Esta função é o núcleo do sistema de comparação e aplica um único algoritmo de comparação
+    por chamada. Os métodos disponíveis são:
+    - "absdiff": Diferença absoluta pixel-a-pixel, ideal para detetar alterações pontuais
+    - "histograma": Compara a distribuição de intensidades, útil para mudanças globais de cor/brilho
+    - "ssim": Índice de Similaridade Estrutural, com foco em mudanças na estrutura da imagem
+
+    Para aplicar vários métodos ao mesmo par de imagens, usar analisar_todos, que partilha
+    as conversões para escala de cinzentos e os buffers de trabalho entre métodos.
+
+    Argumentos:
+        img_ref (numpy.ndarray): Imagem de referência
+        img_teste (numpy.ndarray): Imagem de teste a comparar
+        metodo (str): Método de análise a aplicar ('absdiff', 'histograma' ou 'ssim'). O default é 'absdiff'.
+        dados_ref (dict, opcional): Dados da referência vindos da cache (ver processamento.cache_referencias).
+            Quando fornecido, img_ref pode ser None. O default é None.
+        cor (tuple, opcional): Cor BGR para realce das diferenças. O default é (0, 0, 255) (vermelho).
+        alpha (float, opcional): Transparência do overlay (0.0=transparente, 1.0=opaco). O default é 0.7.
+        area_minima (int, opcional): Área mínima (em pixels) de uma região com diferenças; regiões
+            mais pequenas não são contadas nem destacadas. O default é AREA_MINIMA.
+        distancia_fusao (int, opcional): Regiões cujas caixas fiquem a esta distância (em pixels)
+            ou menos são fundidas numa só. O default é DISTANCIA_FUSAO (sem fusão).
+        limiares_absdiff (list, opcional): Limiares adicionais a avaliar no método 'absdiff', numa única
+            passagem. As métricas incluem então 'varrimento_limiares'. O default é None (sem varrimento).
+        mascara (dict, opcional): Zonas a ignorar e região de interesse (ver processamento.mascaras).
+            Só os pixels analisados contam para as métricas, as regiões vêm nas coordenadas da imagem
+            completa e as métricas incluem 'mascara'. O default é None (imagem completa).
+        num_threads (int, opcional): Threads de uma única comparação: a imagem é dividida em faixas
+            horizontais (alargadas pelo raio da janela no SSIM) processadas em paralelo, e as regiões
+            cortadas pelas fronteiras das faixas são reconstituídas, pelo que as regiões são as mesmas
+            da execução numa só thread. O default é 1.
+        resolucao (tuple, opcional): (largura, altura) de trabalho. As duas imagens, que podem então ter
+            dimensões diferentes, são redimensionadas para ela antes da análise (ver processamento.resolucao);
+            a imagem de resultado e as regiões vêm nas coordenadas nativas da imagem de teste e as
+            métricas incluem 'resolucao'. O default é None (imagens comparadas tal como são).
+        janela (str, opcional): Janela das médias locais do SSIM: 'uniforme' (7x7, como no scikit-image)
+            ou 'gaussiana' (sigma 1.5). As estatísticas da referência em cache só são usadas com a
+            janela uniforme. O default é 'uniforme'.
+        tolerancia_reamostragem (dict, opcional): Com resolucao e dimensões nativas diferentes, desfoque
+            das imagens de trabalho e limiar do absdiff e área mínima das regiões a usar no mínimo, para
+            tolerar o erro de reamostragem ({'suavizacao', 'limiar_diferenca', 'area_minima'}). A tolerância
+            aplicada é indicada em metricas['resolucao']. None desativa-a. O default é TOLERANCIA_REAMOSTRAGEM.
+
+    Retorna:
+        tuple: (imagem_resultado, tipo_analise, metricas)
+            - imagem_resultado (numpy.ndarray ou None): Imagem com diferenças destacadas visualmente (quando aplicável)
+            - tipo_analise (str): Descrição em texto do método usado
+            - metricas (dict): Dicionário com métricas específicas do método escolhido. Para 'absdiff'
+              e 'ssim' inclui 'regioes', a lista de regiões (caixa, área e centróide) por área decrescente.
+
+    Erros:
+        ValueError: Se o nome do método ou a janela não forem reconhecidos ou se a máscara
+            não deixar nenhum pixel para analisar.
+    """
+
+    nativa = None
+    if resolucao is not None:
+        img_ref, img_teste, dados_ref, mascara, nativa = _preparar_resolucao(img_ref, img_teste, dados_ref, mascara,
+                                                                             resolucao, tolerancia_reamostragem)
+
+    contexto = _criar_contexto(img_ref, img_teste, dados_ref, area_minima, distancia_fusao, limiares_absdiff, mascara,
+                               janela = janela)
+    if nativa is not None:
+        _aplicar_resolucao(contexto, nativa)
+    with _threads(contexto, num_threads):
+        resultado = _repor_recorte(contexto, _executar_metodo(contexto, metodo, cor, alpha))
+        return _repor_resolucao(contexto, metodo, resultado, cor, alpha)
+
+def analisar_todos(img_ref, img_teste, metodos = METODOS_DISPONIVEIS, dados_ref = None, cor = (0, 0, 255), alpha = 0.7,
+                   tamanho_mosaico = None, metodos_piramide = (), niveis_piramide = NIVEIS_PIRAMIDE,
+                   limiar_piramide = LIMIAR_GROSSEIRO, tolerancia_piramide = TOLERANCIA_PIRAMIDE,
+                   area_minima = AREA_MINIMA, distancia_fusao = DISTANCIA_FUSAO, limiares_absdiff = None,
+                   mascara = None, num_threads = 1, buffers = None, resolucao = None, janela = "uniforme",
+                   tolerancia_reamostragem = TOLERANCIA_REAMOSTRAGEM):
+    """
+    Compara duas imagens com vários métodos, partilhando o pré-processamento entre eles.
+
+    As conversões para escala de cinzentos são feitas uma única vez e reutilizadas por
+    'histograma' e 'ssim', e os buffers temporários (diferença, máscara, overlay) são
+    reutilizados entre métodos. Cada método continua a ser cronometrado individualmente;
+    o custo de uma conversão partilhada é contabilizado no primeiro método que a usa.
+
+    Com tamanho_mosaico, as imagens são primeiro comparadas mosaico a mosaico por hash
+    (ver processamento.mosaicos). Se forem idênticas, todos os métodos devolvem de imediato
+    métricas de diferença nula; caso contrário, cada método só processa os mosaicos alterados.
+    As métricas incluem então a chave 'mosaicos' com o resumo dos mosaicos ignorados.
+
+    Os métodos em metodos_piramide ('absdiff' e/ou 'ssim') detetam primeiro as regiões
+    candidatas numa versão reduzida das imagens e só as analisam à resolução completa
+    (ver processamento.piramide). O resultado é aproximado; as métricas incluem a chave
+    'piramide' com o número de blocos analisados. Com tolerancia_piramide, os blocos mais
+    suspeitos do nível reduzido são verificados à resolução completa e acrescentados à seleção
+    se tiverem diferenças; o método volta à análise completa se a estimativa dos pixels
+    diferentes deixados de fora ultrapassar a tolerância.
+
+    Com a instrumentação ativa (ver processamento.perfil), as métricas de cada método
+    incluem a chave 'perfil' com o tempo de cada etapa (cvtColor, ssim, regioes, overlay, ...).
+
+    Argumentos:
+        img_ref (numpy.ndarray): Imagem de referência
+        img_teste (numpy.ndarray): Imagem de teste a comparar
+        metodos (list, opcional): Métodos a aplicar, pela ordem indicada. O default é METODOS_DISPONIVEIS.
+        dados_ref (dict, opcional): Dados da referência vindos da cache (ver processamento.cache_referencias).
+            Quando fornecido, img_ref pode ser None. O default é None.
+        cor (tuple, opcional): Cor BGR para realce das diferenças. O default é (0, 0, 255) (vermelho).
+        alpha (float, opcional): Transparência do overlay (0.0=transparente, 1.0=opaco). O default é 0.7.
+        tamanho_mosaico (int, opcional): Lado dos mosaicos da comparação prévia por hash
+            (ex: TAMANHO_MOSAICO). O default é None (sem comparação prévia).
+        metodos_piramide (iterable, opcional): Métodos a executar em modo pirâmide. O default é () (nenhum).
+        niveis_piramide (int, opcional): Número de reduções do modo pirâmide. O default é NIVEIS_PIRAMIDE.
+        limiar_piramide (int, opcional): Limiar de diferença na imagem reduzida; valores mais baixos
+            são mais exatos e mais lentos. O default é LIMIAR_GROSSEIRO.
+        tolerancia_piramide (float, opcional): Fração máxima dos pixels analisados com diferenças
+            (limiar do absdiff) que pode ficar fora dos blocos selecionados, segundo a estimativa
+            feita a partir do nível reduzido; acima dela o método é executado à resolução completa.
+            None desativa a verificação. O default é TOLERANCIA_PIRAMIDE.
+        area_minima (int, opcional): Área mínima das regiões com diferenças. O default é AREA_MINIMA.
+        distancia_fusao (int, opcional): Distância máxima entre regiões a fundir. O default é DISTANCIA_FUSAO.
+        limiares_absdiff (list, opcional): Limiares do varrimento do absdiff (ver analisar_diferencas).
+            O default é None (sem varrimento).
+        mascara (dict, opcional): Zonas a ignorar e região de interesse (ver analisar_diferencas).
+            Os mosaicos e a pirâmide são calculados apenas sobre o recorte da região de interesse.
+            O default é None (imagem completa).
+        num_threads (int, opcional): Threads de uma única comparação (ver analisar_diferencas). O default é 1.
+        buffers (dict, opcional): Dicionário onde os buffers de trabalho (cinzentos, máscaras, SSIM)
+            ficam guardados e são reutilizados pela chamada seguinte com imagens do mesmo tamanho
+            (ex: frames de um vídeo, ver processamento.sequencia). O default é None (buffers novos).
+        resolucao (tuple, opcional): (largura, altura) de trabalho (ver analisar_diferencas). Os mosaicos
+            e a pirâmide são calculados à resolução de trabalho. O default é None.
+        janela (str, opcional): Janela do SSIM, 'uniforme' ou 'gaussiana' (ver analisar_diferencas).
+            O default é 'uniforme'.
+        tolerancia_reamostragem (dict, opcional): Tolerância ao erro de reamostragem com dimensões nativas
+            diferentes (ver analisar_diferencas); None desativa-a. O default é TOLERANCIA_REAMOSTRAGEM.
+
+    Retorna:
+        tuple: (resultados, duracoes)
+            - resultados (dict): {metodo: (imagem_resultado, tipo_analise, metricas)}, tal como
+              devolvido por analisar_diferencas para cada método
+            - duracoes (dict): {metodo: tempo de execução em segundos}
+
+    Erros:
+        ValueError: Se algum dos métodos especificados ou a janela não forem reconhecidos ou se
+            a máscara não deixar nenhum pixel para analisar.
+    """
+
+    nativa = None
+    if resolucao is not None:
+        img_ref, img_teste, dados_ref, mascara, nativa = _preparar_resolucao(img_ref, img_teste, dados_ref, mascara,
+                                                                             resolucao, tolerancia_reamostragem)
+
+    contexto = _criar_contexto(img_ref, img_teste, dados_ref, area_minima, distancia_fusao, limiares_absdiff, mascara,
+                               buffers, janela)
+    if nativa is not None:
+        _aplicar_resolucao(contexto, nativa)
+    resultados = {}
+    duracoes = {}
+
+    # Comparação prévia por mosaicos (o tempo é contabilizado no primeiro método)
+    inicio = time.time()
+    marca = perfil.marcar()
+    with perfil.etapa("mosaicos"):
+        if tamanho_mosaico:
+            hashes_ref = None
+            if dados_ref is not None and mascara is None and tamanho_mosaico == TAMANHO_MOSAICO:
+                hashes_ref = dados_ref.get("hashes_mosaicos")
+            _preparar_mosaicos(contexto, tamanho_mosaico, hashes_ref)
+
+            if contexto["identicas"]:
+                print("✅ Todos os mosaicos são idênticos: imagens iguais")
+
+    if metodos_piramide and not contexto.get("identicas"):
+        with perfil.etapa("piramide"):
+            _preparar_piramide(contexto, metodos_piramide, niveis_piramide, limiar_piramide,
+                               tamanho_mosaico or TAMANHO_MOSAICO, tolerancia_piramide)
+
+    # Com num_threads > 1, cada método processa as faixas da imagem em paralelo
+    with _threads(contexto, num_threads):
+        for metodo in metodos:
+            print(f"\n🔎 A executar método: {metodo}")
+
+            if contexto.get("identicas"):
+                resultados[metodo] = _resultado_identico(contexto, metodo)
+            else:
+                resultados[metodo] = _executar_metodo(contexto, metodo, cor, alpha)
+            resultados[metodo] = _repor_recorte(contexto, resultados[metodo])
+            resultados[metodo] = _repor_resolucao(contexto, metodo, resultados[metodo], cor, alpha)
+
+            if metodo in contexto["mosaicos"]:
+                resultados[metodo][2]["mosaicos"] = contexto["mosaicos"][metodo]
+            if metodo in contexto["piramide"]:
+                resultados[metodo][2]["piramide"] = contexto["piramide"][metodo]
+
+            # Etapas medidas durante este método (só com a instrumentação ativa)
+            if perfil.ativo():
+                resultados[metodo][2]["perfil"] = perfil.resumir(marca)
+                marca = perfil.marcar()
+
+            duracoes[metodo] = time.time() - inicio
+            inicio = time.time()
+
+    return resultados, duracoes
@@ -0,0 +1,251 @@
+"""
+Cache persistente dos dados derivados das imagens de referência.
+
+As imagens de referência raramente mudam, mas cada execução voltava a descodificá-las e a
+recalcular a versão em escala de cinzentos, o histograma normalizado e as estatísticas locais
+usadas pelo SSIM. Este módulo guarda esses dados em disco, na pasta 'cache/referencias/',
+com uma entrada por imagem identificada pelo hash SHA-256 do conteúdo do ficheiro.
+
+Como a chave é o próprio conteúdo, uma imagem de referência alterada gera automaticamente uma
+nova entrada e a antiga deixa de ser usada. O tamanho total da cache é limitado e, quando o
+limite é ultrapassado, são removidas as entradas usadas há mais tempo (LRU).
+
+Cada entrada é uma pasta com um ficheiro .npy por array. Os arrays derivados maiores
+(ARRAYS_MAPEADOS: cinzentos, estatísticas SSIM em float32 e versão reduzida da pirâmide,
+~32 MB numa captura 2796x1290) são sempre abertos com numpy.load(mmap_mode='r'): não são
+copiados para a memória do processo ao ler a entrada, só as páginas usadas são carregadas,
+e os processos de um lote partilham as mesmas páginas (cache de páginas do sistema
+operativo). Com mapear=True, o mesmo acontece com a imagem descodificada e os restantes
+arrays. Os arrays mapeados são só de leitura. Sem compressão: com np.savez_compressed a
+leitura ficaria mais lenta do que descodificar o PNG original.
+"""
+
+import hashlib # Hash do conteúdo das imagens de referência
+import os      # Operações com sistema de ficheiros
+import shutil  # Remoção das entradas mapeadas (pastas)
+
+import cv2     # OpenCV para manipulação de imagens
+import numpy as np
+
+# Estatísticas locais do SSIM (janela uniforme 7x7, a usada pelo método 'ssim')
+from processamento.ssim_nativo import calcular_estatisticas
+
+# Hashes dos mosaicos usados na comparação prévia
+from processamento.mosaicos import calcular_hashes_mosaicos
+
+# Versão reduzida usada pelo modo pirâmide
+from processamento.piramide import NIVEIS_PIRAMIDE, reduzir
+
+# Instrumentação por etapas (leitura da cache e cálculo dos dados)
+from processamento import perfil
+
+# Pasta onde as entradas da cache são guardadas
+PASTA_CACHE = os.path.join("cache", "referencias")
+
+# Tamanho máximo da cache em bytes: 4 GB por omissão (~95 referências 2796x1290, ~165 em 1080p),
+# configurável com a variável de ambiente COMPARADOR_CACHE_REFERENCIAS_MB
+LIMITE_BYTES = int(os.environ.get("COMPARADOR_CACHE_REFERENCIAS_MB", 4096)) * 1024 ** 2
+
+# Versão do formato das entradas; alterar sempre que os dados guardados mudarem
+VERSAO_CACHE = 6
+
+# Arrays derivados que são sempre lidos mapeados em memória
+ARRAYS_MAPEADOS = ("gray", "ssim_media", "ssim_media_quadrados", "gray_reduzida")
+
+# Extensão das entradas (pastas com um .npy por array)
+EXTENSAO_ENTRADA = ".mapa"
+
+# Lê também a imagem e os restantes arrays mapeados em memória (ver obter_dados_referencia)
+MAPEAR_MEMORIA = False
+
+
+def calcular_dados_referencia(img_ref):
+    """
+    Calcula todos os dados derivados de uma imagem de referência.
+
+    Argumentos:
+        img_ref (numpy.ndarray): Imagem de referência (BGR)
+
+    Retorna:
+        dict: Dados da referência com as chaves:
+            - img: imagem BGR descodificada
+            - gray: imagem em escala de cinzentos
+            - hist: histograma de 256 bins normalizado (como no método 'histograma')
+            - hist_contagens: o mesmo histograma, com as contagens absolutas
+            - ssim_media, ssim_media_quadrados: estatísticas locais do SSIM (float32)
+            - hashes_mosaicos: hashes dos mosaicos de TAMANHO_MOSAICO pixels (ver processamento.mosaicos)
+            - gray_reduzida: imagem em cinzentos reduzida NIVEIS_PIRAMIDE vezes (ver processamento.piramide)
+    """
+
+    gray = cv2.cvtColor(img_ref, cv2.COLOR_BGR2GRAY)
+    media, media_quadrados = calcular_estatisticas(gray)
+
+    hist_contagens = cv2.calcHist([gray], [0], None, [256], [0, 256])
+
+    return {
+        "img": img_ref,
+        "gray": gray,
+        "hist": cv2.normalize(hist_contagens, None).flatten(),
+        "hist_contagens": hist_contagens,
+        "ssim_media": media,
+        "ssim_media_quadrados": media_quadrados,
+        "hashes_mosaicos": calcular_hashes_mosaicos(img_ref),
+        "gray_reduzida": reduzir(gray, NIVEIS_PIRAMIDE)
+    }
+
+
+def _caminho_entrada(pasta_cache, hash_conteudo):
+    """
+    Devolve o caminho da pasta da entrada correspondente a um hash.
+    """
+
+    return os.path.join(pasta_cache, f"v{VERSAO_CACHE}_{hash_conteudo}{EXTENSAO_ENTRADA}")
+
+
+def _tamanho_entrada(caminho):
+    """
+    Devolve o tamanho em bytes de uma entrada (pasta, ou ficheiro .npz de versões anteriores).
+    """
+
+    if not os.path.isdir(caminho):
+        return os.stat(caminho).st_size
+    return sum(entrada.stat().st_size for entrada in os.scandir(caminho))
+
+
+def _ler_entrada(caminho_entrada, mapear):
+    """
+    Lê os arrays de uma entrada da cache.
+
+    Os ARRAYS_MAPEADOS são sempre mapeados em memória; os restantes só com mapear.
+
+    Erros:
+        OSError, ValueError, KeyError: Se a entrada não existir ou estiver corrompida
+    """
+
+    dados = {}
+    for nome in os.listdir(caminho_entrada):
+        chave, extensao = os.path.splitext(nome)
+        if extensao == ".npy":
+            modo = "r" if mapear or chave in ARRAYS_MAPEADOS else None
+            dados[chave] = np.load(os.path.join(caminho_entrada, nome), mmap_mode = modo, allow_pickle = False)
+    if "img" not in dados:
+        raise KeyError("img")
+    return dados
+
+
+def _escrever_entrada(caminho_entrada, dados):
+    """
+    Escreve uma entrada da cache, com todos os arrays.
+
+    A entrada é escrita primeiro numa pasta temporária e só depois renomeada, para que
+    processos concorrentes (ex: execução em lote) nunca leiam uma entrada incompleta.
+    """
+
+    caminho_temporario = f"{caminho_entrada}.{os.getpid()}.tmp"
+    os.makedirs(caminho_temporario, exist_ok = True)
+    for chave, valor in dados.items():
+        np.save(os.path.join(caminho_temporario, f"{chave}.npy"), valor)
+    try:
+        os.replace(caminho_temporario, caminho_entrada)
+    except OSError:
+        # Outro processo escreveu a mesma entrada entretanto (uma pasta não é substituída)
+        shutil.rmtree(caminho_temporario, ignore_errors = True)
+
+
+def _aplicar_limite(pasta_cache, limite_bytes):
+    """
+    Remove as entradas usadas há mais tempo até o tamanho da cache ficar abaixo do limite.
+
+    A data de modificação de cada entrada é atualizada sempre que é lida, por isso
+    ordenar por essa data corresponde a ordenar por último acesso.
+    """
+
+    entradas = []
+    for nome in os.listdir(pasta_cache):
+        # As entradas .npz de versões anteriores também contam (e são as primeiras a sair)
+        if not nome.endswith((".npz", EXTENSAO_ENTRADA)):
+            continue
+        caminho = os.path.join(pasta_cache, nome)
+        try:
+            entradas.append((os.stat(caminho).st_mtime, _tamanho_entrada(caminho), caminho))
+        except FileNotFoundError:
+            # Removida entretanto por outro processo
+            continue
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        try:
+            if os.path.isdir(caminho):
+                shutil.rmtree(caminho)
+            else:
+                os.remove(caminho)
+            print(f"🗑️ Entrada removida da cache de referências: {caminho}")
+        except FileNotFoundError:
+            pass
+        total -= tamanho
+
+
+def obter_dados_referencia(caminho_referencia, pasta_cache = PASTA_CACHE, limite_bytes = LIMITE_BYTES,
+                           mapear = None):
+    """
+    Devolve os dados derivados de uma imagem de referência, usando a cache sempre que possível.
+
+    O ficheiro é sempre lido para calcular o hash do conteúdo, mas só é descodificado
+    quando não existe entrada válida na cache.
+
+    Argumentos:
+        caminho_referencia (str): Caminho da imagem de referência
+        pasta_cache (str, opcional): Pasta da cache. O default é PASTA_CACHE.
+        limite_bytes (int, opcional): Tamanho máximo da cache. O default é LIMITE_BYTES.
+        mapear (bool, opcional): Mapeia em memória também a imagem e os restantes arrays
+            (só de leitura). O default é None (MAPEAR_MEMORIA).
+
+    Retorna:
+        dict: Dados da referência (ver calcular_dados_referencia), com a chave adicional
+              'hash' (SHA-256 do ficheiro)
+        None: Se o ficheiro não existir ou não for uma imagem válida
+    """
+
+    try:
+        with open(caminho_referencia, "rb") as ficheiro:
+            conteudo = ficheiro.read()
+    except OSError:
+        return None
+
+    if mapear is None:
+        mapear = MAPEAR_MEMORIA
+    hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+    caminho_entrada = _caminho_entrada(pasta_cache, hash_conteudo)
+
+    # Tenta ler a entrada da cache
+    try:
+        with perfil.etapa("cache_referencia"):
+            dados = _ler_entrada(caminho_entrada, mapear)
+
+        # Regista o acesso para a política LRU
+        os.utime(caminho_entrada)
+        dados["hash"] = hash_conteudo
+        return dados
+
+    # Entrada inexistente ou corrompida: recalcula
+    except (OSError, ValueError, KeyError):
+        pass
+
+    with perfil.etapa("imread"):
+        img_ref = cv2.imdecode(np.frombuffer(conteudo, dtype = np.uint8), cv2.IMREAD_COLOR)
+    if img_ref is None:
+        return None
+
+    with perfil.etapa("dados_referencia"):
+        dados = calcular_dados_referencia(img_ref)
+
+    os.makedirs(pasta_cache, exist_ok = True)
+    _escrever_entrada(caminho_entrada, dados)
+
+    _aplicar_limite(pasta_cache, limite_bytes)
+
+    dados["hash"] = hash_conteudo
+    return dados
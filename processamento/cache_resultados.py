@@ -0,0 +1,261 @@
+"""
+Cache persistente dos resultados das comparações.
+
+Após cada build a bateria de comparações é repetida, mas a maioria dos pares de imagens
+é byte a byte igual à da execução anterior. Cada resultado fica guardado em
+'cache/resultados/', identificado por uma chave que combina:
+- o hash SHA-256 dos ficheiros de referência e de teste;
+- o método de análise;
+- os parâmetros da análise (mosaicos, pirâmide, limiares, cor, transparência, ...);
+- a versão do código, isto é, o hash dos módulos de análise. Os limiares internos dos métodos
+  (ex: limiar_diferenca, limiar_similaridade) estão definidos no código, pelo que qualquer
+  alteração a esses valores invalida automaticamente os resultados anteriores.
+
+Cada entrada guarda as métricas e o caminho da imagem de resultado já gravada. Uma entrada
+cuja imagem de resultado já não exista é tratada como ausente.
+
+Limpeza das entradas antigas (a partir da raiz do projeto):
+    python -m processamento.cache_resultados limpar [--dias N]
+"""
+
+import argparse # Argumentos da linha de comandos (limpeza da cache)
+import functools
+import hashlib  # Hash dos ficheiros de imagem e das chaves
+import json     # Formato das entradas
+import os       # Operações com sistema de ficheiros
+import time
+
+# Pasta onde as entradas da cache são guardadas
+PASTA_CACHE = os.path.join("cache", "resultados")
+
+# Entradas não usadas há mais dias do que este valor são removidas pela limpeza
+IDADE_MAXIMA_DIAS = 30
+
+# Módulos cujo código determina os resultados (a sua alteração invalida a cache)
+# cache_referencias.py calcula os cinzentos, o histograma e as estatísticas SSIM da referência usados pela análise
+MODULOS_ANALISE = ["analises.py", "cache_referencias.py", "mascaras.py", "mosaicos.py", "piramide.py", "regioes.py",
+                   "resolucao.py", "ssim_nativo.py"]
+
+
+@functools.lru_cache(maxsize = 1)
+def versao_codigo():
+    """
+    Calcula a versão do código de análise: o hash do conteúdo de MODULOS_ANALISE.
+
+    Retorna:
+        str: Hash SHA-256 (primeiros 16 caracteres)
+    """
+
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    hash_codigo = hashlib.sha256()
+    for nome in MODULOS_ANALISE:
+        with open(os.path.join(pasta, nome), "rb") as ficheiro:
+            hash_codigo.update(nome.encode())
+            hash_codigo.update(ficheiro.read())
+    return hash_codigo.hexdigest()[:16]
+
+
+def hash_ficheiro(caminho):
+    """
+    Calcula o hash SHA-256 do conteúdo de um ficheiro.
+
+    Argumentos:
+        caminho (str): Caminho do ficheiro
+
+    Retorna:
+        str: Hash em hexadecimal
+        None: Se o ficheiro não puder ser lido
+    """
+
+    try:
+        with open(caminho, "rb") as ficheiro:
+            return hashlib.sha256(ficheiro.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def chave_resultado(hash_ref, hash_teste, metodo, parametros = None):
+    """
+    Calcula a chave da entrada de um resultado.
+
+    Argumentos:
+        hash_ref (str): Hash do ficheiro de referência
+        hash_teste (str): Hash do ficheiro de teste
+        metodo (str): Método de análise
+        parametros (dict, opcional): Parâmetros passados à análise (ex: argumentos de analisar_todos).
+            O default é None.
+
+    Retorna:
+        str: Chave em hexadecimal
+    """
+
+    conteudo = json.dumps({
+        "referencia": hash_ref,
+        "teste": hash_teste,
+        "metodo": metodo,
+        "parametros": parametros or {},
+        "codigo": versao_codigo()
+    }, sort_keys = True, default = str)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def obter_resultado(chave, pasta_cache = PASTA_CACHE):
+    """
+    Lê o resultado guardado para uma chave.
+
+    Argumentos:
+        chave (str): Chave devolvida por chave_resultado
+        pasta_cache (str, opcional): Pasta da cache. O default é PASTA_CACHE.
+
+    Retorna:
+        dict: Entrada com 'metodo', 'tipo_analise', 'metricas', 'imagem_resultado' e 'duracao'
+            (tempo da análise original)
+        None: Se não existir entrada válida ou se a sua imagem de resultado tiver sido apagada
+    """
+
+    caminho = os.path.join(pasta_cache, f"{chave}.json")
+    try:
+        with open(caminho, encoding = "utf-8") as ficheiro:
+            entrada = json.load(ficheiro)
+    except (OSError, ValueError):
+        return None
+
+    imagem = entrada.get("imagem_resultado")
+    if imagem and not os.path.exists(imagem):
+        return None
+
+    # Regista o acesso para a limpeza por idade
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+    return entrada
+
+
+def consultar_cache(hash_ref, hash_teste, metodos, parametros = None, pasta_cache = PASTA_CACHE):
+    """
+    Procura na cache os resultados de vários métodos para o mesmo par de imagens.
+
+    Argumentos:
+        hash_ref (str ou None): Hash do ficheiro de referência
+        hash_teste (str ou None): Hash do ficheiro de teste
+        metodos (list): Métodos de análise
+        parametros (dict, opcional): Parâmetros passados à análise. O default é None.
+        pasta_cache (str, opcional): Pasta da cache. O default é PASTA_CACHE.
+
+    Retorna:
+        tuple: (chaves, em_cache)
+            - chaves (dict): {metodo: chave}, vazio se algum dos hashes não estiver disponível
+            - em_cache (dict): {metodo: entrada} para os métodos encontrados na cache
+    """
+
+    if not hash_ref or not hash_teste:
+        return {}, {}
+
+    chaves = {metodo: chave_resultado(hash_ref, hash_teste, metodo, parametros) for metodo in metodos}
+    em_cache = {}
+    for metodo, chave in chaves.items():
+        entrada = obter_resultado(chave, pasta_cache)
+        if entrada is not None:
+            em_cache[metodo] = entrada
+    return chaves, em_cache
+
+
+def guardar_resultado(chave, metodo, tipo_analise, metricas, imagem_resultado = None, duracao = None,
+                      pasta_cache = PASTA_CACHE):
+    """
+    Guarda o resultado de um método na cache.
+
+    O perfil por etapas (metricas['perfil']) não é guardado, por ser específico da execução.
+
+    Argumentos:
+        chave (str): Chave devolvida por chave_resultado
+        metodo (str): Método de análise
+        tipo_analise (str): Descrição do método
+        metricas (dict): Métricas devolvidas pelo método
+        imagem_resultado (str, opcional): Caminho da imagem de resultado gravada. O default é None.
+        duracao (float, opcional): Tempo de execução do método em segundos. O default é None.
+        pasta_cache (str, opcional): Pasta da cache. O default é PASTA_CACHE.
+    """
+
+    entrada = {
+        "metodo": metodo,
+        "tipo_analise": tipo_analise,
+        "metricas": {nome: valor for nome, valor in metricas.items() if nome != "perfil"},
+        "imagem_resultado": imagem_resultado,
+        "duracao": duracao,
+        "codigo": versao_codigo()
+    }
+
+    # Escreve primeiro num ficheiro temporário para que processos concorrentes
+    # (ex: execução em lote) nunca leiam uma entrada incompleta
+    os.makedirs(pasta_cache, exist_ok = True)
+    caminho = os.path.join(pasta_cache, f"{chave}.json")
+    caminho_temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(caminho_temporario, "w", encoding = "utf-8") as ficheiro:
+        json.dump(entrada, ficheiro, ensure_ascii = False, default = lambda valor: valor.item())
+    os.replace(caminho_temporario, caminho)
+
+
+def limpar_cache(idade_maxima_dias = IDADE_MAXIMA_DIAS, pasta_cache = PASTA_CACHE):
+    """
+    Remove as entradas não usadas há mais de 'idade_maxima_dias' dias, as geradas por outra
+    versão do código e as que apontam para imagens de resultado já apagadas.
+
+    Argumentos:
+        idade_maxima_dias (float, opcional): Idade máxima desde o último acesso. O default é IDADE_MAXIMA_DIAS.
+        pasta_cache (str, opcional): Pasta da cache. O default é PASTA_CACHE.
+
+    Retorna:
+        int: Número de entradas removidas
+    """
+
+    if not os.path.isdir(pasta_cache):
+        return 0
+
+    limite = time.time() - idade_maxima_dias * 24 * 3600
+    versao = versao_codigo()
+    removidas = 0
+
+    for nome in os.listdir(pasta_cache):
+        if not nome.endswith(".json"):
+            continue
+        caminho = os.path.join(pasta_cache, nome)
+
+        try:
+            remover = os.path.getmtime(caminho) < limite
+            if not remover:
+                with open(caminho, encoding = "utf-8") as ficheiro:
+                    entrada = json.load(ficheiro)
+                imagem = entrada.get("imagem_resultado")
+                remover = entrada.get("codigo") != versao or bool(imagem and not os.path.exists(imagem))
+        except ValueError:
+            # Entrada corrompida
+            remover = True
+        except OSError:
+            # Removida entretanto por outro processo
+            continue
+
+        if remover:
+            try:
+                os.remove(caminho)
+                removidas += 1
+            except FileNotFoundError:
+                pass
+
+    return removidas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Gestão da cache de resultados das comparações.")
+    subcomandos = parser.add_subparsers(dest = "comando", required = True)
+
+    limpar = subcomandos.add_parser("limpar", help = "Remove entradas antigas, obsoletas ou sem imagem de resultado")
+    limpar.add_argument("--dias", type = float, default = IDADE_MAXIMA_DIAS,
+                        help = f"Idade máxima desde o último acesso (default: {IDADE_MAXIMA_DIAS})")
+    limpar.add_argument("--pasta", default = PASTA_CACHE, help = f"Pasta da cache (default: {PASTA_CACHE})")
+
+    argumentos = parser.parse_args()
+    if argumentos.comando == "limpar":
+        removidas = limpar_cache(argumentos.dias, argumentos.pasta)
+        print(f"🗑️ {removidas} entradas removidas da cache de resultados")
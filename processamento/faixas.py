@@ -0,0 +1,564 @@
+"""
+Análise de imagens muito grandes faixa a faixa, com memória limitada.
+
+As capturas de página inteira ou os panoramas 16K ocupam centenas de MB por imagem e a
+análise normal (ver processamento.analises) mantém várias cópias completas em memória:
+as duas imagens, a diferença, as máscaras, os buffers float32 do SSIM e a imagem de
+resultado. Aqui as imagens são lidas e processadas em faixas horizontais, cuja altura é
+escolhida para que a memória de trabalho caiba num orçamento (ORCAMENTO_MB):
+
+- cada faixa é lida uma única vez para todos os métodos, alargada pelo raio da janela
+  SSIM, para que o mapa SSIM no seu interior seja exatamente o da imagem completa;
+- as métricas globais (pixels diferentes, histogramas, soma do mapa SSIM) são acumuladas
+  faixa a faixa e as regiões são reconstituídas por processamento.regioes.AcumuladorRegioes;
+- a imagem de resultado é escrita faixa a faixa num ficheiro .npy (opcional) e reduzida
+  para uma miniatura (LADO_MINIATURA), que é a imagem devolvida.
+
+Com area_minima > 1, só no fim se sabe que regiões são mantidas: as máscaras de cada faixa
+são guardadas num ficheiro temporário (1 bit por pixel) e a imagem de resultado é escrita
+numa segunda passagem, que volta a ler apenas a imagem de teste.
+
+Leitura por faixas:
+    Os ficheiros .npy (uint8, ordem C) são lidos linha a linha diretamente do disco, sem
+    os mapear em memória. Um numpy.ndarray (ou numpy.memmap) também pode ser passado
+    diretamente. Os formatos comprimidos (PNG, JPEG, ...) não podem ser descodificados por
+    faixas com o OpenCV e são lidos por inteiro; para esses, 'converter' (ver a linha de
+    comandos abaixo) grava uma cópia .npy uma única vez.
+
+Nota:
+    O modo por faixas não usa a comparação por mosaicos, o modo pirâmide nem as máscaras
+    por referência. As regiões e as contagens coincidem com as da análise normal, incluindo
+    a ordem das regiões de igual área: as faixas têm altura par, tal como o recorte rotulado
+    por extrair_regioes, e a rotulagem do OpenCV percorre as linhas duas a duas. As métricas
+    em vírgula flutuante podem diferir no arredondamento (ver tests/test_equivalencia.py).
+
+Utilização (a partir da raiz do projeto):
+    python -m processamento.faixas comparar REF TESTE [--orcamento-mb 256] [--resultados PASTA]
+    python -m processamento.faixas converter IMAGEM [DESTINO.npy]
+"""
+
+import argparse # Interface de linha de comandos
+import json # Exportação das métricas
+import os # Operações com sistema de ficheiros
+import tempfile # Máscaras das faixas entre as duas passagens
+import time # Medição de tempo de execução por método
+
+import cv2  # OpenCV para manipulação de imagens
+import numpy as np
+
+from processamento.analises import LIMIAR_DIFERENCA, METODOS_DISPONIVEIS, TIPOS_ANALISE, limite_ssim, varrimento_limiares
+from processamento.regioes import AREA_MINIMA, DISTANCIA_FUSAO, AcumuladorRegioes, montar_regioes, rotular
+from processamento.ssim_nativo import JANELAS_DISPONIVEIS, calcular_ssim, tamanho_janela
+from output.relatorio import LADO_MINIATURA
+
+# Memória de trabalho por omissão (em MB) para as faixas
+ORCAMENTO_MB = 256
+
+# Estimativa dos bytes de trabalho por pixel de uma faixa com todos os métodos:
+# imagens BGR (6), cinzentos (2), diferença e máscaras do absdiff (5), rótulos int32 (4),
+# buffers float32 do SSIM (32), máscara SSIM (1) e imagem de resultado com a sua máscara (4),
+# arredondada para cima para cobrir os temporários do OpenCV
+BYTES_POR_PIXEL = 64
+
+# Altura mínima (em linhas, sem o alargamento do SSIM) de uma faixa
+ALTURA_MINIMA_FAIXA = 16
+
+# Métodos que produzem regiões (e imagem de resultado com overlay)
+METODOS_REGIOES = ["absdiff", "ssim"]
+
+
+def altura_faixa(largura, orcamento_mb = ORCAMENTO_MB, janela = "uniforme"):
+    """
+    Calcula a altura das faixas para que a memória de trabalho caiba no orçamento.
+
+    Argumentos:
+        largura (int): Largura das imagens em pixels
+        orcamento_mb (float, opcional): Memória de trabalho disponível em MB. O default é ORCAMENTO_MB.
+        janela (str, opcional): Janela do SSIM, que determina o alargamento das faixas. O default é 'uniforme'.
+
+    Retorna:
+        int: Altura (par) de cada faixa, sem o alargamento do SSIM
+
+    Erros:
+        ValueError: Se o orçamento não chegar para uma faixa de ALTURA_MINIMA_FAIXA linhas
+    """
+
+    raio = (tamanho_janela(janela) - 1) // 2
+    linhas = int(orcamento_mb * 1024 * 1024) // (largura * BYTES_POR_PIXEL) - 2 * raio
+
+    # Altura par, para que a rotulagem por faixas siga a ordem da rotulagem completa
+    altura = linhas & ~1
+    if altura < ALTURA_MINIMA_FAIXA:
+        minimo = (ALTURA_MINIMA_FAIXA + 2 * raio) * largura * BYTES_POR_PIXEL / (1024 * 1024)
+        raise ValueError(f"Orçamento de {orcamento_mb} MB insuficiente para imagens com {largura} pixels "
+                         f"de largura (mínimo: {minimo:.1f} MB)")
+    return altura
+
+
+class _LeitorFaixas:
+    """
+    Lê intervalos de linhas de uma imagem BGR (ficheiro .npy, array em memória ou imagem comprimida).
+    """
+
+    def __init__(self, origem):
+        self._array = None
+        self._ficheiro = None
+
+        if isinstance(origem, np.ndarray):
+            self._array = origem
+        elif str(origem).lower().endswith(".npy"):
+            ficheiro = open(origem, "rb")
+            versao = np.lib.format.read_magic(ficheiro)
+            if versao == (1, 0):
+                forma, fortran, dtype = np.lib.format.read_array_header_1_0(ficheiro)
+            else:
+                forma, fortran, dtype = np.lib.format.read_array_header_2_0(ficheiro)
+
+            if fortran or dtype != np.uint8:
+                # Disposição que não permite ler linhas seguidas: mapeia o ficheiro
+                ficheiro.close()
+                self._array = np.load(origem, mmap_mode = "r")
+            else:
+                self._ficheiro = ficheiro
+                self._inicio = ficheiro.tell()
+                self.forma = tuple(forma)
+        else:
+            # Formatos comprimidos: o OpenCV só descodifica a imagem inteira
+            self._array = cv2.imread(str(origem))
+            if self._array is None:
+                raise ValueError(f"Não foi possível ler a imagem: {origem}")
+
+        if self._array is not None:
+            self.forma = self._array.shape
+        if len(self.forma) != 3 or self.forma[2] != 3:
+            self.fechar()
+            raise ValueError(f"Esperada uma imagem BGR (altura, largura, 3), obtido {self.forma}: {origem}")
+
+    def ler(self, y0, y1):
+        """
+        Devolve as linhas [y0, y1) da imagem como array contíguo.
+        """
+
+        if self._array is not None:
+            return np.ascontiguousarray(self._array[y0:y1])
+
+        faixa = np.empty((y1 - y0,) + self.forma[1:], dtype = np.uint8)
+        self._ficheiro.seek(self._inicio + y0 * faixa[0].nbytes)
+        if self._ficheiro.readinto(faixa) != faixa.nbytes:
+            raise ValueError(f"Ficheiro .npy truncado (linhas {y0} a {y1})")
+        return faixa
+
+    def fechar(self):
+        if self._ficheiro is not None:
+            self._ficheiro.close()
+            self._ficheiro = None
+
+
+class _EscritorNpy:
+    """
+    Grava uma imagem num ficheiro .npy faixa a faixa, pela ordem das linhas.
+    """
+
+    def __init__(self, caminho, forma):
+        self._ficheiro = open(caminho, "wb")
+        np.lib.format.write_array_header_1_0(self._ficheiro, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(np.uint8)),
+            "fortran_order": False,
+            "shape": tuple(forma)
+        })
+
+    def escrever(self, faixa):
+        self._ficheiro.write(np.ascontiguousarray(faixa).data)
+
+    def fechar(self):
+        self._ficheiro.close()
+
+
+class _Miniatura:
+    """
+    Reduz uma imagem, recebida faixa a faixa, a uma miniatura com lado máximo LADO_MINIATURA.
+    """
+
+    def __init__(self, forma):
+        altura, largura = forma[:2]
+        self._escala = min(1.0, LADO_MINIATURA / max(altura, largura))
+        self.img = np.zeros((max(1, round(altura * self._escala)), max(1, round(largura * self._escala)), 3),
+                            dtype = np.uint8)
+
+    def adicionar(self, faixa, y0, y1):
+        m0 = min(round(y0 * self._escala), self.img.shape[0])
+        m1 = min(round(y1 * self._escala), self.img.shape[0])
+        if m1 > m0:
+            cv2.resize(faixa, (self.img.shape[1], m1 - m0), dst = self.img[m0:m1], interpolation = cv2.INTER_AREA)
+
+
+def _tabela_overlay(cor, alpha):
+    """
+    Devolve a tabela de consulta (LUT) da mistura da cor de realce (ver analises._destacar_regioes).
+    """
+
+    valores = np.arange(256, dtype = np.float64).reshape(256, 1)
+    lut = np.rint(valores * (1 - alpha) + np.array(cor, dtype = np.float64) * alpha)
+    return np.clip(lut, 0, 255).astype(np.uint8).reshape(1, 256, 3)
+
+
+def _desenhar(estado, teste, mask, y0, y1):
+    """
+    Escreve uma faixa da imagem de resultado: o overlay sobre os pixels da máscara (se houver).
+    """
+
+    faixa = teste
+    if mask is not None and estado["lut"] is not None:
+        faixa = cv2.LUT(teste, estado["lut"])
+        cv2.copyTo(teste, cv2.compare(mask, 0, cv2.CMP_EQ), faixa)
+
+    if estado["escritor"] is not None:
+        estado["escritor"].escrever(faixa)
+    estado["miniatura"].adicionar(faixa, y0, y1)
+
+
+def _acumular_mascara(estado, mask, y0, y1, teste, desenhar):
+    """
+    Acumula os pixels diferentes e as regiões de uma faixa da máscara de um método.
+
+    Sem filtro de área a faixa da imagem de resultado é escrita logo; com filtro, a máscara
+    é guardada (1 bit por pixel) para a segunda passagem.
+    """
+
+    pixels = cv2.countNonZero(mask)
+    estado["pixels_diferentes"] += pixels
+
+    indice = None
+    if pixels:
+        rotulos, stats, centroides = rotular(mask)
+        indice = estado["acumulador"].adicionar(rotulos, stats, centroides, 0, y0)
+    estado["faixas"].append(indice)
+
+    if estado["derrame"] is not None:
+        estado["derrame"].write(np.packbits(mask, axis = 1).data)
+    elif desenhar:
+        _desenhar(estado, teste, mask if pixels else None, y0, y1)
+
+
+def _pintar_mantidas(estado, filtro, teste, indice_faixa, y0, y1):
+    """
+    Segunda passagem: lê a máscara guardada de uma faixa e escreve a imagem de resultado
+    apenas com as regiões mantidas pelo filtro de área.
+    """
+
+    largura = teste.shape[1]
+    bits = np.frombuffer(estado["derrame"].read((y1 - y0) * ((largura + 7) // 8)), dtype = np.uint8)
+    indice = estado["faixas"][indice_faixa]
+
+    mask = None
+    if indice is not None:
+        mask = np.unpackbits(bits.reshape(y1 - y0, -1), axis = 1, count = largura)
+        # A rotulagem da mesma máscara dá os mesmos rótulos da primeira passagem
+        rotulos, _, _ = rotular(mask)
+        mask = estado["acumulador"].mantidos(indice, filtro)[rotulos]
+    _desenhar(estado, teste, mask, y0, y1)
+
+
+def analisar_em_faixas(origem_ref, origem_teste, metodos = METODOS_DISPONIVEIS, cor = (0, 0, 255), alpha = 0.7,
+                       area_minima = AREA_MINIMA, distancia_fusao = DISTANCIA_FUSAO, limiares_absdiff = None,
+                       orcamento_mb = ORCAMENTO_MB, pasta_resultados = None, prefixo = "resultado",
+                       janela = "uniforme"):
+    """
+    Compara duas imagens faixa a faixa, com a memória de trabalho limitada a orcamento_mb.
+
+    Equivalente a processamento.analises.analisar_todos (sem mosaicos, pirâmide nem
+    máscaras), mas a memória usada não depende da altura das imagens.
+
+    Argumentos:
+        origem_ref (str ou numpy.ndarray): Imagem de referência (ficheiro .npy, outra imagem ou array)
+        origem_teste (str ou numpy.ndarray): Imagem de teste (idem)
+        metodos (list, opcional): Métodos a executar. O default é METODOS_DISPONIVEIS.
+        cor (tuple, opcional): Cor BGR do realce. O default é (0, 0, 255) - vermelho.
+        alpha (float, opcional): Transparência do overlay. O default é 0.7.
+        area_minima (int, opcional): Área mínima das regiões. O default é AREA_MINIMA.
+        distancia_fusao (int, opcional): Distância máxima entre regiões a fundir. O default é DISTANCIA_FUSAO.
+        limiares_absdiff (list, opcional): Limiares do varrimento do absdiff. O default é None.
+        orcamento_mb (float, opcional): Memória de trabalho em MB. O default é ORCAMENTO_MB.
+        pasta_resultados (str, opcional): Pasta onde gravar a imagem de resultado completa de cada
+            método com regiões ('{prefixo}_{metodo}.npy'). O default é None (só miniaturas).
+        prefixo (str, opcional): Prefixo dos ficheiros gravados. O default é 'resultado'.
+        janela (str, opcional): Janela do SSIM, 'uniforme' ou 'gaussiana' (ver analisar_diferencas).
+            O default é 'uniforme'.
+
+    Retorna:
+        tuple: (resultados, duracoes), como em analisar_todos; a imagem de cada resultado é
+            uma miniatura (lado máximo LADO_MINIATURA) e as métricas incluem 'faixas' e, se
+            gravada, 'imagem_resultado' (caminho do .npy)
+
+    Erros:
+        ValueError: Se as imagens tiverem tamanhos diferentes, um método ou a janela forem
+            desconhecidos ou o orçamento não chegar para uma faixa
+    """
+
+    if janela not in JANELAS_DISPONIVEIS:
+        raise ValueError(f"Tipo de janela SSIM desconhecido: {janela}")
+
+    for metodo in metodos:
+        if metodo not in TIPOS_ANALISE:
+            raise ValueError(f"Método de análise desconhecido: {metodo}")
+
+    leitor_ref = _LeitorFaixas(origem_ref)
+    leitor_teste = _LeitorFaixas(origem_teste)
+    estados = {}
+    try:
+        if leitor_ref.forma != leitor_teste.forma:
+            raise ValueError("As imagens têm tamanhos diferentes e não podem ser comparadas diretamente.")
+
+        forma = leitor_teste.forma
+        altura, largura = forma[:2]
+        passo = altura_faixa(largura, orcamento_mb, janela)
+        raio = (tamanho_janela(janela) - 1) // 2
+        limite = limite_ssim()
+        com_ssim = "ssim" in metodos
+        com_cinzentos = com_ssim or "histograma" in metodos
+        segunda_passagem = area_minima > 1 and any(metodo in METODOS_REGIOES for metodo in metodos)
+        lut = _tabela_overlay(cor, alpha) if alpha > 0 else None
+
+        duracoes = {metodo: 0.0 for metodo in metodos}
+        for metodo in metodos:
+            estado = {"miniatura": _Miniatura(forma), "escritor": None, "derrame": None, "lut": lut}
+            if metodo in METODOS_REGIOES:
+                estado.update({"acumulador": AcumuladorRegioes(), "pixels_diferentes": 0, "faixas": []})
+                if pasta_resultados is not None:
+                    os.makedirs(pasta_resultados, exist_ok = True)
+                    estado["caminho"] = os.path.join(pasta_resultados, f"{prefixo}_{metodo}.npy")
+                    estado["escritor"] = _EscritorNpy(estado["caminho"], forma)
+                if segunda_passagem:
+                    estado["derrame"] = tempfile.TemporaryFile()
+            estados[metodo] = estado
+
+        hist_diff = np.zeros((256, 1), dtype = np.float64) if "absdiff" in metodos and limiares_absdiff else None
+        hist_ref = np.zeros((256, 1), dtype = np.float64)
+        hist_teste = np.zeros((256, 1), dtype = np.float64)
+        soma_ssim = 0.0
+        buffers_ssim = {}
+
+        faixas = [(y0, min(y0 + passo, altura)) for y0 in range(0, altura, passo)]
+        print(f"🧱 {len(faixas)} faixas de {passo} linhas ({largura}x{altura}, orçamento de {orcamento_mb} MB)")
+
+        for y0, y1 in faixas:
+            # Leitura única da faixa, alargada pelo raio da janela SSIM
+            # (o custo da leitura e das conversões partilhadas conta no primeiro método)
+            inicio = time.perf_counter()
+            e0, e1 = (max(y0 - raio, 0), min(y1 + raio, altura)) if com_ssim else (y0, y1)
+            ref = leitor_ref.ler(e0, e1)
+            teste = leitor_teste.ler(e0, e1)
+            ref_interior, teste_interior = ref[y0 - e0:y1 - e0], teste[y0 - e0:y1 - e0]
+            if com_cinzentos:
+                gray_ref = cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY)
+                gray_teste = cv2.cvtColor(teste, cv2.COLOR_BGR2GRAY)
+            duracoes[metodos[0]] += time.perf_counter() - inicio
+
+            for metodo in metodos:
+                inicio = time.perf_counter()
+                estado = estados[metodo]
+
+                if metodo == "absdiff":
+                    diff = cv2.absdiff(ref_interior, teste_interior)
+                    gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+                    del diff
+                    _, mask = cv2.threshold(gray_diff, LIMIAR_DIFERENCA, 255, cv2.THRESH_BINARY)
+                    if hist_diff is not None:
+                        hist_diff += cv2.calcHist([gray_diff], [0], None, [256], [0, 256]).reshape(hist_diff.shape)
+                    del gray_diff
+                    _acumular_mascara(estado, mask, y0, y1, teste_interior, not segunda_passagem)
+
+                elif metodo == "histograma":
+                    hist_ref += cv2.calcHist([gray_ref[y0 - e0:y1 - e0]], [0], None, [256], [0, 256]).reshape(hist_ref.shape)
+                    hist_teste += cv2.calcHist([gray_teste[y0 - e0:y1 - e0]], [0], None, [256], [0, 256]).reshape(hist_teste.shape)
+                    _desenhar(estado, teste_interior, None, y0, y1)
+
+                elif metodo == "ssim":
+                    # O mapa no interior da faixa é o da imagem completa (a janela não sai da faixa alargada)
+                    _, mapa = calcular_ssim(gray_ref, gray_teste, janela = janela, buffers = buffers_ssim)
+                    interior = mapa[y0 - e0:y1 - e0]
+
+                    # Contribuição para o índice global (que ignora uma margem de 'raio' pixels)
+                    iy0, iy1 = max(y0, raio), min(y1, altura - raio)
+                    if iy1 > iy0:
+                        soma_ssim += float(interior[iy0 - y0:iy1 - y0, raio:largura - raio].sum(dtype = np.float64))
+
+                    mask = np.less(interior, limite).view(np.uint8)
+                    _acumular_mascara(estado, mask, y0, y1, teste_interior, not segunda_passagem)
+
+                mask = None
+                duracoes[metodo] += time.perf_counter() - inicio
+
+            ref = teste = ref_interior = teste_interior = gray_ref = gray_teste = None
+
+        # Regiões de cada método (e filtro de área)
+        regioes_metodo = {}
+        filtros = {}
+        for metodo in metodos:
+            if metodo not in METODOS_REGIOES:
+                continue
+            inicio = time.perf_counter()
+            caixas, areas, somas_x, somas_y = estados[metodo]["acumulador"].concluir()
+            filtro = areas >= area_minima
+            filtros[metodo] = filtro
+            caixas, areas, somas_x, somas_y = caixas[filtro], areas[filtro], somas_x[filtro], somas_y[filtro]
+            regioes_metodo[metodo] = montar_regioes(caixas, areas, somas_x, somas_y, distancia_fusao)
+            print(f"🔍 {TIPOS_ANALISE[metodo]}: {len(regioes_metodo[metodo])} regiões com diferenças detetadas")
+            duracoes[metodo] += time.perf_counter() - inicio
+
+        # Segunda passagem: imagem de resultado só com as regiões mantidas
+        if segunda_passagem:
+            metodos_pintar = [metodo for metodo in metodos if metodo in METODOS_REGIOES]
+            for metodo in metodos_pintar:
+                estados[metodo]["derrame"].seek(0)
+            for k, (y0, y1) in enumerate(faixas):
+                inicio = time.perf_counter()
+                teste = leitor_teste.ler(y0, y1)
+                duracoes[metodos_pintar[0]] += time.perf_counter() - inicio
+                for metodo in metodos_pintar:
+                    inicio = time.perf_counter()
+                    _pintar_mantidas(estados[metodo], filtros[metodo], teste, k, y0, y1)
+                    duracoes[metodo] += time.perf_counter() - inicio
+
+        # Métricas finais de cada método
+        total_pixels = altura * largura
+        info_faixas = {"altura_faixa": passo, "num_faixas": len(faixas), "orcamento_mb": orcamento_mb}
+        resultados = {}
+        for metodo in metodos:
+            estado = estados[metodo]
+            if metodo == "absdiff":
+                pixels_diferentes = estado["pixels_diferentes"]
+                percentagem_diferenca = (pixels_diferentes / total_pixels) * 100
+                print(f"🧮 {pixels_diferentes} pixels diferentes de {total_pixels} ({percentagem_diferenca:.2f}%)")
+                metricas = {
+                    "num_diferencas": len(regioes_metodo[metodo]),
+                    "total_pixels": total_pixels,
+                    "pixels_diferentes": pixels_diferentes,
+                    "percentagem_diferenca": percentagem_diferenca,
+                    "regioes": regioes_metodo[metodo]
+                }
+                if hist_diff is not None:
+                    metricas["varrimento_limiares"] = varrimento_limiares(hist_diff, total_pixels, limiares_absdiff)
+            elif metodo == "histograma":
+                # Mesma normalização (L2) e correlação da análise normal
+                hist_ref_norm = (hist_ref / max(np.linalg.norm(hist_ref), 1e-12)).astype(np.float32)
+                hist_teste_norm = (hist_teste / max(np.linalg.norm(hist_teste), 1e-12)).astype(np.float32)
+                metricas = {
+                    "correlacao_histogramas": cv2.compareHist(hist_ref_norm, hist_teste_norm, cv2.HISTCMP_CORREL),
+                    "num_diferencas": None
+                }
+            else:
+                num_pixels_indice = (altura - 2 * raio) * (largura - 2 * raio)
+                metricas = {
+                    "indice_ssim": soma_ssim / num_pixels_indice if num_pixels_indice > 0 else 1.0,
+                    "num_diferencas": len(regioes_metodo[metodo]),
+                    "regioes": regioes_metodo[metodo]
+                }
+
+            metricas["faixas"] = info_faixas
+            if estado["escritor"] is not None:
+                metricas["imagem_resultado"] = estado["caminho"]
+            resultados[metodo] = (estado["miniatura"].img, TIPOS_ANALISE[metodo], metricas)
+
+        return resultados, duracoes
+
+    finally:
+        leitor_ref.fechar()
+        leitor_teste.fechar()
+        for estado in estados.values():
+            if estado["escritor"] is not None:
+                estado["escritor"].fechar()
+            if estado["derrame"] is not None:
+                estado["derrame"].close()
+
+
+def converter_para_npy(caminho_imagem, caminho_npy = None):
+    """
+    Grava uma cópia .npy de uma imagem, para poder ser lida por faixas.
+
+    Nota:
+        A imagem é descodificada por inteiro uma única vez; as comparações seguintes
+        leem apenas as faixas.
+
+    Retorna:
+        str: Caminho do ficheiro .npy gravado
+
+    Erros:
+        ValueError: Se a imagem não puder ser lida
+    """
+
+    img = cv2.imread(caminho_imagem)
+    if img is None:
+        raise ValueError(f"Não foi possível ler a imagem: {caminho_imagem}")
+    caminho_npy = caminho_npy or os.path.splitext(caminho_imagem)[0] + ".npy"
+    np.save(caminho_npy, img)
+    return caminho_npy
+
+
+def _pico_memoria_mb():
+    """
+    Devolve o pico de memória residente do processo em MB (None fora de Linux).
+    """
+
+    try:
+        with open("/proc/self/status") as ficheiro:
+            for linha in ficheiro:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Comparação de imagens muito grandes faixa a faixa.")
+    subcomandos = parser.add_subparsers(dest = "comando", required = True)
+
+    comparar = subcomandos.add_parser("comparar", help = "Compara duas imagens com a memória limitada")
+    comparar.add_argument("referencia", help = "Imagem de referência (.npy para leitura por faixas)")
+    comparar.add_argument("teste", help = "Imagem de teste (.npy para leitura por faixas)")
+    comparar.add_argument("--metodos", default = ",".join(METODOS_DISPONIVEIS),
+                          help = f"Métodos separados por vírgulas (default: {','.join(METODOS_DISPONIVEIS)})")
+    comparar.add_argument("--orcamento-mb", type = float, default = ORCAMENTO_MB,
+                          help = f"Memória de trabalho em MB (default: {ORCAMENTO_MB})")
+    comparar.add_argument("--area-minima", type = int, default = AREA_MINIMA,
+                          help = f"Área mínima das regiões (default: {AREA_MINIMA})")
+    comparar.add_argument("--resultados", metavar = "PASTA",
+                          help = "Grava as imagens de resultado (.npy completo e miniatura PNG) nesta pasta")
+    comparar.add_argument("--json", metavar = "FICHEIRO", help = "Grava as métricas de cada método neste ficheiro JSON")
+
+    conversao = subcomandos.add_parser("converter", help = "Grava uma cópia .npy de uma imagem")
+    conversao.add_argument("imagem", help = "Imagem a converter")
+    conversao.add_argument("destino", nargs = "?", help = "Ficheiro .npy (default: mesmo nome com extensão .npy)")
+    argumentos = parser.parse_args()
+
+    if argumentos.comando == "converter":
+        print(f"💾 Imagem gravada em: {converter_para_npy(argumentos.imagem, argumentos.destino)}")
+        raise SystemExit(0)
+
+    metodos = [metodo.strip() for metodo in argumentos.metodos.split(",") if metodo.strip()]
+    prefixo = os.path.splitext(os.path.basename(argumentos.teste))[0]
+    try:
+        resultados, duracoes = analisar_em_faixas(argumentos.referencia, argumentos.teste, metodos,
+                                                  area_minima = argumentos.area_minima,
+                                                  orcamento_mb = argumentos.orcamento_mb,
+                                                  pasta_resultados = argumentos.resultados, prefixo = prefixo)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+    for metodo, (miniatura, tipo_analise, metricas) in resultados.items():
+        resumo = {chave: valor for chave, valor in metricas.items() if chave not in ("regioes", "faixas")}
+        print(f"📊 {tipo_analise} ({duracoes[metodo]:.2f} s): {resumo}")
+        if argumentos.resultados:
+            cv2.imwrite(os.path.join(argumentos.resultados, f"{prefixo}_{metodo}_miniatura.png"), miniatura)
+
+    pico = _pico_memoria_mb()
+    if pico is not None:
+        print(f"🧠 Pico de memória do processo: {pico:.0f} MB")
+
+    if argumentos.json:
+        with open(argumentos.json, "w", encoding = "utf-8") as ficheiro:
+            json.dump({metodo: metricas for metodo, (_, _, metricas) in resultados.items()}, ficheiro,
+                      ensure_ascii = False, indent = 2)
+        print(f"📝 Métricas guardadas em: {argumentos.json}")
@@ -0,0 +1,411 @@
+"""
+Índice das imagens de referência para encontrar a referência de uma captura sem nome.
+
+A comparação normal emparelha as imagens pelo nome do ficheiro, mas os bots de captura
+produzem capturas sem nome conhecido. Compará-las com todas as referências (SSIM completo)
+seria demasiado lento, por isso cada referência é resumida em descritores compactos:
+- dHash e pHash de 64 bits (hashes percetuais, robustos a ruído e pequenas alterações);
+- o histograma normalizado de 256 bins, o mesmo que o método 'histograma' usa.
+
+A procura junta os candidatos por baldes LSH (cada hash é dividido em BANDAS_LSH bandas de
+16 bits; duas imagens a uma distância de Hamming inferior a BANDAS_LSH partilham pelo menos
+uma banda), ordena-os pela distância de Hamming e pela correlação dos histogramas e devolve
+os k melhores. Só a melhor referência é depois comparada com a análise completa.
+
+O índice é guardado em 'cache/indice_referencias.npz' e atualizado de forma incremental:
+só as referências novas ou alteradas (data de modificação ou tamanho) são lidas.
+
+Utilização (a partir da raiz do projeto):
+    python -m processamento.indice_referencias atualizar
+    python -m processamento.indice_referencias procurar captura.png [-k 5]
+"""
+
+import argparse # Argumentos da linha de comandos
+import os       # Operações com sistema de ficheiros
+import time     # Medição do tempo de procura
+
+import cv2      # OpenCV para manipulação de imagens
+import numpy as np
+
+from processamento.leitura import ler_antecipadamente
+from processamento.lote import listar_imagens
+
+# Pasta com as imagens de referência
+PASTA_REFERENCIA = os.path.join("imagens", "referencia")
+
+# Ficheiro do índice
+CAMINHO_INDICE = os.path.join("cache", "indice_referencias.npz")
+
+# Versão do formato do índice; alterar sempre que os descritores mudarem
+VERSAO_INDICE = 1
+
+# Número de bandas de 16 bits em que cada hash de 64 bits é dividido (baldes LSH)
+BANDAS_LSH = 4
+
+# Número de candidatos devolvidos por omissão
+NUM_CANDIDATOS = 5
+
+# Peso da correlação dos histogramas na distância final (a distância dos hashes vai de 0 a 1)
+PESO_HISTOGRAMA = 0.5
+
+
+def _bits_para_inteiro(bits):
+    """
+    Converte uma matriz booleana de 64 elementos num inteiro de 64 bits.
+    """
+
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def calcular_descritores(gray):
+    """
+    Calcula os descritores compactos de uma imagem em escala de cinzentos.
+
+    Argumentos:
+        gray (numpy.ndarray): Imagem em escala de cinzentos (uint8)
+
+    Retorna:
+        dict: Descritores com as chaves:
+            - dhash: hash de diferenças (int de 64 bits), da imagem reduzida a 9x8
+            - phash: hash percetual (int de 64 bits), das frequências baixas da DCT 32x32
+            - hist: histograma de 256 bins normalizado (como no método 'histograma')
+    """
+
+    # dHash: cada bit indica se um pixel é mais claro do que o vizinho à direita
+    reduzida = cv2.resize(gray, (9, 8), interpolation = cv2.INTER_AREA).astype(np.int16)
+    dhash = _bits_para_inteiro(reduzida[:, 1:] > reduzida[:, :-1])
+
+    # pHash: coeficientes 8x8 de frequência mais baixa comparados com a sua mediana
+    # (a componente contínua fica de fora da mediana, por dominar o valor)
+    dct = cv2.dct(cv2.resize(gray, (32, 32), interpolation = cv2.INTER_AREA).astype(np.float32))[:8, :8]
+    phash = _bits_para_inteiro(dct > np.median(dct.ravel()[1:]))
+
+    hist = cv2.normalize(cv2.calcHist([gray], [0], None, [256], [0, 256]), None).flatten()
+
+    return {"dhash": dhash, "phash": phash, "hist": hist}
+
+
+def _contar_bits(valores):
+    """
+    Conta os bits a 1 de cada elemento de um array uint64 (distância de Hamming após XOR).
+    """
+
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(valores).astype(np.int64)
+    return np.unpackbits(valores.view(np.uint8).reshape(-1, 8), axis = 1).sum(axis = 1, dtype = np.int64)
+
+
+def _bandas(valor):
+    """
+    Divide um hash de 64 bits nas chaves dos seus baldes LSH.
+    """
+
+    largura = 64 // BANDAS_LSH
+    mascara = (1 << largura) - 1
+    return [(banda, (valor >> (banda * largura)) & mascara) for banda in range(BANDAS_LSH)]
+
+
+class IndiceReferencias:
+    """
+    Índice em memória (e em disco) dos descritores das imagens de referência.
+
+    Argumentos:
+        pasta_referencia (str, opcional): Pasta das imagens de referência. O default é PASTA_REFERENCIA.
+        caminho_indice (str, opcional): Ficheiro do índice; None para não o guardar. O default é CAMINHO_INDICE.
+    """
+
+    def __init__(self, pasta_referencia = PASTA_REFERENCIA, caminho_indice = CAMINHO_INDICE):
+        self.pasta_referencia = pasta_referencia
+        self.caminho_indice = caminho_indice
+
+        # Uma entrada por referência: {caminho: {'nome', 'assinatura', 'forma', 'dhash', 'phash', 'hist'}}
+        self._entradas = {}
+
+        # Arrays e baldes derivados das entradas, reconstruídos apenas quando o índice muda
+        self._caminhos = []
+        self._baldes = {}
+        self._dhash = np.empty(0, dtype = np.uint64)
+        self._phash = np.empty(0, dtype = np.uint64)
+        self._hists = np.empty((0, 256), dtype = np.float32)
+
+        if caminho_indice:
+            self._carregar()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _carregar(self):
+        """
+        Lê o índice guardado em disco (um ficheiro inexistente, de outra versão ou corrompido é ignorado).
+        """
+
+        try:
+            with np.load(self.caminho_indice, allow_pickle = False) as ficheiro:
+                # Cada acesso a um NpzFile volta a ler o array, por isso são todos lidos uma vez
+                dados = {chave: ficheiro[chave] for chave in ficheiro.files}
+            if int(dados["versao"]) != VERSAO_INDICE:
+                return
+            for i, caminho in enumerate(dados["caminhos"].tolist()):
+                self._entradas[caminho] = {
+                    "nome": str(dados["nomes"][i]),
+                    "assinatura": tuple(dados["assinaturas"][i].tolist()),
+                    "forma": tuple(dados["formas"][i].tolist()),
+                    "dhash": int(dados["dhash"][i]),
+                    "phash": int(dados["phash"][i]),
+                    "hist": dados["hists"][i]
+                }
+        except (OSError, ValueError, KeyError):
+            self._entradas = {}
+        self._reconstruir()
+
+    def guardar(self):
+        """
+        Guarda o índice em disco (escrita atómica, através de um ficheiro temporário).
+        """
+
+        if not self.caminho_indice:
+            return
+
+        entradas = list(self._entradas.items())
+        pasta = os.path.dirname(self.caminho_indice)
+        if pasta:
+            os.makedirs(pasta, exist_ok = True)
+
+        caminho_temporario = f"{self.caminho_indice}.{os.getpid()}.tmp"
+        with open(caminho_temporario, "wb") as ficheiro:
+            np.savez(ficheiro,
+                     versao = VERSAO_INDICE,
+                     caminhos = np.array([caminho for caminho, _ in entradas], dtype = str),
+                     nomes = np.array([entrada["nome"] for _, entrada in entradas], dtype = str),
+                     assinaturas = np.array([entrada["assinatura"] for _, entrada in entradas], dtype = np.int64).reshape(-1, 2),
+                     formas = np.array([entrada["forma"] for _, entrada in entradas], dtype = np.int64).reshape(-1, 2),
+                     dhash = np.array([entrada["dhash"] for _, entrada in entradas], dtype = np.uint64),
+                     phash = np.array([entrada["phash"] for _, entrada in entradas], dtype = np.uint64),
+                     hists = np.array([entrada["hist"] for _, entrada in entradas], dtype = np.float32).reshape(-1, 256))
+        os.replace(caminho_temporario, self.caminho_indice)
+
+    def _reconstruir(self):
+        """
+        Reconstrói os arrays de hashes e histogramas e os baldes LSH a partir das entradas.
+        """
+
+        self._caminhos = list(self._entradas)
+        entradas = [self._entradas[caminho] for caminho in self._caminhos]
+        self._dhash = np.array([entrada["dhash"] for entrada in entradas], dtype = np.uint64)
+        self._phash = np.array([entrada["phash"] for entrada in entradas], dtype = np.uint64)
+        self._hists = np.array([entrada["hist"] for entrada in entradas], dtype = np.float32).reshape(-1, 256)
+
+        self._baldes = {}
+        for posicao, entrada in enumerate(entradas):
+            self._adicionar_baldes(posicao, entrada)
+
+    def _adicionar_baldes(self, posicao, entrada):
+        """
+        Regista uma entrada nos baldes das bandas dos seus dois hashes.
+        """
+
+        for tipo in ("dhash", "phash"):
+            for banda, valor in _bandas(entrada[tipo]):
+                self._baldes.setdefault((tipo, banda, valor), []).append(posicao)
+
+    def adicionar(self, caminho, img = None):
+        """
+        Acrescenta (ou substitui) uma referência no índice.
+
+        Uma referência nova é acrescentada aos arrays e aos baldes sem reconstruir o índice.
+
+        Argumentos:
+            caminho (str): Caminho da imagem de referência
+            img (numpy.ndarray, opcional): Imagem BGR já descodificada. O default é None (lê o ficheiro).
+
+        Retorna:
+            bool: True se a referência foi indexada; False se não for uma imagem válida
+        """
+
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            return False
+
+        if img is None:
+            img = cv2.imread(caminho)
+        if img is None:
+            return False
+
+        entrada = calcular_descritores(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        entrada["nome"] = os.path.basename(caminho)
+        entrada["assinatura"] = (estado.st_mtime_ns, estado.st_size)
+        entrada["forma"] = tuple(img.shape[:2])
+
+        substituida = caminho in self._entradas
+        self._entradas[caminho] = entrada
+        if substituida:
+            self._reconstruir()
+        else:
+            self._caminhos.append(caminho)
+            self._dhash = np.append(self._dhash, np.uint64(entrada["dhash"]))
+            self._phash = np.append(self._phash, np.uint64(entrada["phash"]))
+            self._hists = np.vstack((self._hists, entrada["hist"][np.newaxis]))
+            self._adicionar_baldes(len(self._caminhos) - 1, entrada)
+        return True
+
+    def remover(self, caminho):
+        """
+        Retira uma referência do índice.
+        """
+
+        if self._entradas.pop(caminho, None) is not None:
+            self._reconstruir()
+
+    def atualizar(self):
+        """
+        Sincroniza o índice com a pasta de referência e guarda-o se tiver mudado.
+
+        Só as referências novas ou alteradas (data de modificação ou tamanho) são lidas;
+        as que deixaram de existir são retiradas.
+
+        Retorna:
+            tuple: (adicionadas, removidas), o número de referências indexadas e retiradas
+        """
+
+        imagens = set(listar_imagens(self.pasta_referencia).values())
+
+        removidas = [caminho for caminho in self._entradas if caminho not in imagens]
+        for caminho in removidas:
+            self._entradas.pop(caminho)
+        if removidas:
+            self._reconstruir()
+
+        a_ler = []
+        for caminho in sorted(imagens):
+            entrada = self._entradas.get(caminho)
+            try:
+                estado = os.stat(caminho)
+            except OSError:
+                continue
+            if entrada is None or entrada["assinatura"] != (estado.st_mtime_ns, estado.st_size):
+                a_ler.append(caminho)
+
+        # As referências seguintes são descodificadas enquanto os descritores da atual são calculados
+        adicionadas = 0
+        for caminho, img in ler_antecipadamente(a_ler):
+            if img is not None and self.adicionar(caminho, img):
+                adicionadas += 1
+            elif caminho in self._entradas:
+                self.remover(caminho)
+
+        if adicionadas or removidas:
+            self.guardar()
+        return adicionadas, len(removidas)
+
+    def procurar(self, img, k = NUM_CANDIDATOS, descritores = None):
+        """
+        Procura as referências mais parecidas com uma imagem.
+
+        Argumentos:
+            img (numpy.ndarray): Imagem a identificar (BGR ou escala de cinzentos)
+            k (int, opcional): Número de candidatos a devolver. O default é NUM_CANDIDATOS.
+            descritores (dict, opcional): Descritores da imagem já calculados (ver calcular_descritores).
+                O default é None.
+
+        Retorna:
+            list: Até k candidatos, do mais parecido para o menos parecido, cada um um dicionário com
+                'caminho', 'nome', 'forma', 'distancia_hash' (bits diferentes nos dois hashes, 0 a 128),
+                'correlacao_histogramas' e 'distancia' (hashes e histogramas combinados)
+        """
+
+        if not self._caminhos:
+            return []
+
+        if descritores is None:
+            gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            descritores = calcular_descritores(gray)
+
+        # Candidatos: referências que partilham pelo menos uma banda de um dos hashes
+        candidatos = set()
+        for tipo in ("dhash", "phash"):
+            for banda, valor in _bandas(descritores[tipo]):
+                candidatos.update(self._baldes.get((tipo, banda, valor), ()))
+
+        # Poucos candidatos nos baldes: a comparação dos hashes com todas as referências continua a ser barata
+        if len(candidatos) < k:
+            posicoes = np.arange(len(self._caminhos))
+        else:
+            posicoes = np.fromiter(candidatos, dtype = np.int64, count = len(candidatos))
+
+        distancia_hash = (_contar_bits(self._dhash[posicoes] ^ np.uint64(descritores["dhash"])) +
+                          _contar_bits(self._phash[posicoes] ^ np.uint64(descritores["phash"])))
+
+        # Correlação dos histogramas (a mesma fórmula de cv2.HISTCMP_CORREL), vetorizada
+        hists = self._hists[posicoes] - self._hists[posicoes].mean(axis = 1, keepdims = True)
+        hist = descritores["hist"] - descritores["hist"].mean()
+        denominador = np.sqrt((hists * hists).sum(axis = 1) * float((hist * hist).sum()))
+        correlacao = np.divide(hists @ hist, denominador, out = np.ones(len(posicoes)), where = denominador > 0)
+
+        distancia = distancia_hash / 128 + PESO_HISTOGRAMA * (1 - correlacao) / 2
+        melhores = np.argsort(distancia, kind = "stable")[:k]
+
+        candidatos = []
+        for i in melhores:
+            caminho = self._caminhos[posicoes[i]]
+            entrada = self._entradas[caminho]
+            candidatos.append({
+                "caminho": caminho,
+                "nome": entrada["nome"],
+                "forma": entrada["forma"],
+                "distancia_hash": int(distancia_hash[i]),
+                "correlacao_histogramas": float(correlacao[i]),
+                "distancia": float(distancia[i])
+            })
+        return candidatos
+
+    def identificar(self, img, k = NUM_CANDIDATOS):
+        """
+        Devolve a referência mais parecida com uma imagem entre as que têm as mesmas dimensões.
+
+        Argumentos:
+            img (numpy.ndarray): Imagem a identificar (BGR)
+            k (int, opcional): Número de candidatos considerados. O default é NUM_CANDIDATOS.
+
+        Retorna:
+            tuple: (melhor, candidatos)
+                - melhor (dict ou None): Melhor candidato com as mesmas dimensões (None se não houver)
+                - candidatos (list): Todos os candidatos devolvidos por procurar
+        """
+
+        candidatos = self.procurar(img, k)
+        forma = tuple(img.shape[:2])
+        melhor = next((candidato for candidato in candidatos if candidato["forma"] == forma), None)
+        return melhor, candidatos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Índice das imagens de referência (procura por semelhança).")
+    parser.add_argument("--pasta-referencia", default = PASTA_REFERENCIA,
+                        help = f"Pasta das imagens de referência (default: {PASTA_REFERENCIA})")
+    subcomandos = parser.add_subparsers(dest = "comando", required = True)
+    subcomandos.add_parser("atualizar", help = "Indexa as referências novas ou alteradas")
+    procura = subcomandos.add_parser("procurar", help = "Procura as referências mais parecidas com uma imagem")
+    procura.add_argument("imagem", help = "Caminho da imagem a identificar")
+    procura.add_argument("-k", type = int, default = NUM_CANDIDATOS, help = f"Número de candidatos (default: {NUM_CANDIDATOS})")
+    argumentos = parser.parse_args()
+
+    indice = IndiceReferencias(argumentos.pasta_referencia)
+    adicionadas, removidas = indice.atualizar()
+    print(f"🗂️ Índice com {len(indice)} referências ({adicionadas} indexadas, {removidas} retiradas)")
+
+    if argumentos.comando == "procurar":
+        img = cv2.imread(argumentos.imagem)
+        if img is None:
+            print(f"❌ Imagem não encontrada: {argumentos.imagem}")
+            raise SystemExit(1)
+
+        inicio = time.perf_counter()
+        descritores = calcular_descritores(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        meio = time.perf_counter()
+        candidatos = indice.procurar(img, argumentos.k, descritores)
+        fim = time.perf_counter()
+        print(f"🔎 Descritores em {(meio - inicio) * 1000:.2f} ms, procura em {(fim - meio) * 1000:.3f} ms")
+        for candidato in candidatos:
+            print(f"   {candidato['nome']:<30} hash: {candidato['distancia_hash']:>3}/128  "
+                  f"histograma: {candidato['correlacao_histogramas']:.4f}  distância: {candidato['distancia']:.4f}")
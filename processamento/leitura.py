@@ -0,0 +1,195 @@
+"""
+Leitura (descodificação) das imagens: modo mais barato para cada uso e leitura antecipada.
+
+- Miniaturas: quando só é preciso uma versão pequena da imagem (ex: a imagem de resultado
+  de um método vindo da cache, para o PDF), é usado o maior fator IMREAD_REDUCED_COLOR_*
+  que ainda dá pelo menos o lado pedido. Nos JPEG a redução é feita pelo próprio
+  descodificador (DCT reduzida), sem descodificar a imagem completa. As dimensões são lidas
+  do cabeçalho do ficheiro (PNG e JPEG), sem descodificar a imagem.
+- Leitura antecipada: ler_antecipadamente descodifica os ficheiros seguintes numa pool de
+  threads (o OpenCV liberta o GIL durante a descodificação) enquanto o atual é analisado,
+  com um número limitado de imagens em espera; ler_em_segundo_plano faz o mesmo para uma
+  única imagem (ex: a imagem de teste, enquanto a referência é carregada da cache).
+  As etapas do perfil são registadas por thread: quem usa uma leitura antecipada mede o
+  tempo de espera pelo resultado (etapa 'imread'), que é o que atrasa a análise.
+
+Nota:
+    A análise continua a descodificar as imagens a cores, mesmo para os métodos que só usam
+    cinzentos ('histograma' e 'ssim'). Com IMREAD_GRAYSCALE, a conversão para cinzentos é feita
+    pelo libpng com correção de gama (diferenças até 71 níveis face ao cv2.cvtColor nas capturas
+    PNG de exemplo), o que alteraria as métricas, e a descodificação não fica mais rápida.
+"""
+
+import struct # Cabeçalhos PNG e JPEG
+from collections import deque # Leituras em curso, pela ordem de pedido
+from concurrent.futures import ThreadPoolExecutor # Pool de threads de leitura
+import threading
+
+import cv2  # OpenCV para leitura de imagens
+
+# Threads da pool de leitura
+THREADS_LEITURA = 2
+
+# Número máximo de imagens lidas antecipadamente (em curso ou à espera de serem usadas)
+ANTECIPACAO = 4
+
+# Fatores de redução na descodificação, do maior para o menor
+MODOS_REDUZIDOS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+]
+
+# Marcadores JPEG SOF (início de frame) com as dimensões da imagem
+_MARCADORES_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Pool de leitura partilhada, criada no primeiro pedido
+_executor = None
+_bloqueio_executor = threading.Lock()
+
+
+def dimensoes_imagem(caminho):
+    """
+    Lê as dimensões de uma imagem PNG ou JPEG a partir do cabeçalho, sem a descodificar.
+
+    Argumentos:
+        caminho (str): Caminho da imagem
+
+    Retorna:
+        tuple: (altura, largura)
+        None: Se o formato não for PNG nem JPEG ou o cabeçalho não puder ser lido
+    """
+
+    try:
+        with open(caminho, "rb") as ficheiro:
+            inicio = ficheiro.read(24)
+            if inicio[:8] == b"\x89PNG\r\n\x1a\n" and inicio[12:16] == b"IHDR":
+                largura, altura = struct.unpack(">II", inicio[16:24])
+                return altura, largura
+
+            if inicio[:2] != b"\xff\xd8":
+                return None
+
+            # Percorre os segmentos JPEG até ao primeiro SOF
+            ficheiro.seek(2)
+            while True:
+                marcador = ficheiro.read(2)
+                if len(marcador) < 2 or marcador[0] != 0xFF:
+                    return None
+                while marcador[1] == 0xFF:  # Bytes de enchimento
+                    marcador = marcador[1:] + ficheiro.read(1)
+                tamanho = ficheiro.read(2)
+                if len(tamanho) < 2:
+                    return None
+                if marcador[1] in _MARCADORES_SOF:
+                    dados = ficheiro.read(5)
+                    if len(dados) < 5:
+                        return None
+                    altura, largura = struct.unpack(">HH", dados[1:5])
+                    return altura, largura
+                ficheiro.seek(struct.unpack(">H", tamanho)[0] - 2, 1)
+    except OSError:
+        return None
+
+
+def modo_leitura(dimensoes = None, lado_minimo = None):
+    """
+    Escolhe o modo de leitura mais barato que ainda dá uma imagem com o lado pedido.
+
+    Argumentos:
+        dimensoes (tuple, opcional): (altura, largura) da imagem completa. O default é None (desconhecidas).
+        lado_minimo (int, opcional): Lado maior mínimo da imagem lida. O default é None (resolução completa).
+
+    Retorna:
+        tuple: (modo, fator), com o modo a passar ao cv2.imread e o fator de redução (1 = completa)
+    """
+
+    if lado_minimo is not None and dimensoes is not None:
+        lado = max(dimensoes)
+        for fator, modo in MODOS_REDUZIDOS:
+            # O OpenCV arredonda as dimensões reduzidas para cima
+            if -(-lado // fator) >= lado_minimo:
+                return modo, fator
+    return cv2.IMREAD_COLOR, 1
+
+
+def ler_imagem(caminho, lado_minimo = None):
+    """
+    Lê uma imagem a cores (BGR), reduzida na descodificação quando basta uma versão pequena.
+
+    Argumentos:
+        caminho (str): Caminho da imagem
+        lado_minimo (int, opcional): Lado maior mínimo da imagem devolvida. O default é None
+            (resolução completa).
+
+    Retorna:
+        numpy.ndarray: Imagem BGR
+        None: Se o ficheiro não existir ou não for uma imagem válida
+    """
+
+    dimensoes = dimensoes_imagem(caminho) if lado_minimo is not None else None
+    modo, _ = modo_leitura(dimensoes, lado_minimo)
+    return cv2.imread(caminho, modo)
+
+
+def _obter_executor():
+    """
+    Devolve a pool de threads de leitura, criando-a no primeiro pedido.
+    """
+
+    global _executor
+    with _bloqueio_executor:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers = THREADS_LEITURA, thread_name_prefix = "leitura")
+        return _executor
+
+
+def ler_em_segundo_plano(caminho, lado_minimo = None):
+    """
+    Inicia a leitura de uma imagem na pool de leitura.
+
+    Argumentos:
+        caminho (str): Caminho da imagem
+        lado_minimo (int, opcional): Ver ler_imagem. O default é None.
+
+    Retorna:
+        concurrent.futures.Future: Leitura em curso; result() devolve o mesmo que ler_imagem
+    """
+
+    return _obter_executor().submit(ler_imagem, caminho, lado_minimo)
+
+
+def ler_antecipadamente(itens, ler = ler_imagem, antecipacao = ANTECIPACAO):
+    """
+    Gerador que lê os itens na pool de leitura, antecipadamente, e os devolve pela ordem original.
+
+    Enquanto o item atual é usado, os ANTECIPACAO seguintes já estão a ser lidos; a memória
+    das imagens em espera fica assim limitada. Se o gerador for fechado antes do fim, as
+    leituras ainda não iniciadas são canceladas.
+
+    Argumentos:
+        itens (iterable): Itens a ler (ex: caminhos, ou pares de caminhos com um 'ler' próprio)
+        ler (callable, opcional): Função que lê um item. O default é ler_imagem.
+        antecipacao (int, opcional): Número máximo de leituras em curso. O default é ANTECIPACAO.
+
+    Retorna:
+        generator: Tuplos (item, resultado de ler(item))
+    """
+
+    executor = _obter_executor()
+    iterador = iter(itens)
+    pendentes = deque()
+    try:
+        for item in iterador:
+            pendentes.append((item, executor.submit(ler, item)))
+            if len(pendentes) >= max(antecipacao, 1):
+                break
+        while pendentes:
+            item, leitura = pendentes.popleft()
+            for seguinte in iterador:
+                pendentes.append((seguinte, executor.submit(ler, seguinte)))
+                break
+            yield item, leitura.result()
+    finally:
+        for _, leitura in pendentes:
+            leitura.cancel()
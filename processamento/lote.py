@@ -0,0 +1,354 @@
+"""
+Execução em lote das comparações de imagens.
+
+Este módulo encontra todos os pares de imagens com o mesmo nome nas pastas de referência
+e de teste e distribui as comparações por um conjunto limitado de processos. Cada processo
+importa o OpenCV e o reportlab uma única vez e reutiliza-os para todos os
+pares que lhe forem atribuídos.
+
+Os pares em falta (imagem apenas numa das pastas) ou com tamanhos diferentes são
+registados no resumo e ignorados, sem interromper o lote.
+"""
+
+import functools # Registo na cache quando a imagem de resultado fica gravada
+import os    # Operações com sistema de ficheiros
+import time  # Medição de tempo de execução
+import uuid  # Geração de identificadores únicos para cada par
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2   # OpenCV para manipulação de imagens
+
+# Extensões de imagem aceites (comparadas sem distinção de maiúsculas/minúsculas)
+EXTENSOES_IMAGEM = {".png", ".jpg", ".jpeg", ".bmp"}
+
+
+def listar_imagens(pasta):
+    """
+    Lista as imagens de uma pasta indexadas por uma chave normalizada.
+
+    A chave é o nome do ficheiro com a extensão em minúsculas, de forma a que
+    'menu.PNG' e 'menu.png' sejam considerados o mesmo ficheiro.
+
+    Argumentos:
+        pasta (str): Caminho da pasta a listar
+
+    Retorna:
+        dict: {chave_normalizada: caminho_completo}
+    """
+
+    imagens = {}
+    if not os.path.isdir(pasta):
+        return imagens
+
+    for nome in sorted(os.listdir(pasta)):
+        base, extensao = os.path.splitext(nome)
+        if extensao.lower() in EXTENSOES_IMAGEM:
+            imagens[base + extensao.lower()] = os.path.join(pasta, nome)
+    return imagens
+
+
+def encontrar_imagem(pasta, nome):
+    """
+    Procura uma imagem numa pasta sem distinguir maiúsculas/minúsculas na extensão.
+
+    Argumentos:
+        pasta (str): Pasta onde procurar
+        nome (str): Nome do ficheiro (ex: 'menu.png' encontra 'menu.PNG')
+
+    Retorna:
+        str: Caminho da imagem
+        None: Se a imagem não existir na pasta
+    """
+
+    base, extensao = os.path.splitext(os.path.basename(nome))
+    return listar_imagens(pasta).get(base + extensao.lower())
+
+
+def encontrar_pares(pasta_referencia, pasta_teste):
+    """
+    Encontra os pares de imagens com o mesmo nome nas pastas de referência e de teste.
+
+    Argumentos:
+        pasta_referencia (str): Pasta com as imagens de referência
+        pasta_teste (str): Pasta com as imagens de teste
+
+    Retorna:
+        tuple: (pares, em_falta)
+            - pares (list): Lista de tuplos (nome, caminho_referencia, caminho_teste)
+            - em_falta (list): Lista de dicionários com as imagens sem par
+    """
+
+    referencias = listar_imagens(pasta_referencia)
+    testes = listar_imagens(pasta_teste)
+
+    pares = []
+    em_falta = []
+
+    for chave in sorted(set(referencias) | set(testes)):
+        if chave in referencias and chave in testes:
+            pares.append((chave, referencias[chave], testes[chave]))
+        elif chave in referencias:
+            em_falta.append({"nome": chave, "estado": "sem_teste", "caminho": referencias[chave]})
+        else:
+            em_falta.append({"nome": chave, "estado": "sem_referencia", "caminho": testes[chave]})
+
+    return pares, em_falta
+
+
+def _iniciar_trabalhador():
+    """
+    Inicializa cada processo do lote.
+
+    O paralelismo é feito entre processos, por isso limita-se o OpenCV a uma thread por
+    processo para evitar que os processos compitam pelos mesmos núcleos.
+    """
+
+    cv2.setNumThreads(1)
+
+
+def comparar_par(nome, caminho_referencia, caminho_teste, metodos, gerar_pdf = True, usar_cache = True):
+    """
+    Compara um único par de imagens com todos os métodos indicados.
+
+    Esta função é executada dentro dos processos do lote e nunca lança exceções:
+    qualquer problema é devolvido no campo 'estado' do resultado. Se a referência tiver
+    um ficheiro de máscara (ver processamento.mascaras), as zonas ignoradas e a região
+    de interesse são aplicadas a todos os métodos.
+
+    Argumentos:
+        nome (str): Nome normalizado do par
+        caminho_referencia (str): Caminho da imagem de referência
+        caminho_teste (str): Caminho da imagem de teste
+        metodos (list): Métodos de análise a aplicar
+        gerar_pdf (bool, opcional): Gera o relatório PDF do par. O default é True.
+        usar_cache (bool, opcional): Reutiliza os resultados em cache dos métodos já executados
+            para o mesmo par. O default é True.
+
+    Retorna:
+        dict: Resultado do par com estado, métricas por método e duração
+    """
+
+    # Importações feitas aqui para que o processo principal não as necessite
+    from processamento.analises import analisar_todos
+    from processamento.cache_referencias import obter_dados_referencia
+    from processamento.cache_resultados import consultar_cache, guardar_resultado, hash_ficheiro
+    from processamento.leitura import ler_em_segundo_plano
+    from processamento.mascaras import carregar_mascara
+    from processamento.mosaicos import TAMANHO_MOSAICO
+    from processamento import perfil
+    from output.relatorio import aguardar_escritas, guardar_imagem_resultado, gerar_relatorio_pdf_multimetodo
+
+    resultado_par = {
+        "nome": nome,
+        "imagem_referencia": caminho_referencia,
+        "imagem_teste": caminho_teste,
+        "estado": "ok",
+        "resultados": [],
+        "duracao": 0.0
+    }
+
+    # Descarta etapas de pares anteriores que terminaram sem perfil (ex: erro de leitura)
+    if perfil.ativo():
+        perfil.recolher()
+
+    inicio_par = time.time()
+    try:
+        # A referência (e os seus dados derivados) vem da cache partilhada entre processos,
+        # enquanto a imagem de teste é descodificada numa thread
+        leitura_teste = ler_em_segundo_plano(caminho_teste)
+        dados_ref = obter_dados_referencia(caminho_referencia)
+        with perfil.etapa("imread"):
+            img_teste = leitura_teste.result()
+
+        if dados_ref is None or img_teste is None:
+            resultado_par["estado"] = "erro_leitura"
+            return resultado_par
+
+        img_ref = dados_ref["img"]
+
+        # Comparação direta só é possível com dimensões idênticas
+        if img_ref.shape != img_teste.shape:
+            resultado_par["estado"] = "tamanhos_diferentes"
+            resultado_par["detalhe"] = f"{img_ref.shape} vs {img_teste.shape}"
+            return resultado_par
+
+        identificador = str(uuid.uuid4())[:8]
+        resultado_par["identificador"] = identificador
+
+        # Métodos cujo resultado já está em cache não voltam a ser executados
+        # A máscara da referência (se existir) faz parte dos parâmetros e, por isso, da chave da cache
+        opcoes_analise = {"tamanho_mosaico": TAMANHO_MOSAICO}
+        mascara = carregar_mascara(caminho_referencia)
+        if mascara is not None:
+            opcoes_analise["mascara"] = mascara
+        chaves_cache, em_cache = {}, {}
+        resultado_par["hash_referencia"] = dados_ref.get("hash")
+        resultado_par["hash_teste"] = hash_ficheiro(caminho_teste)
+        if usar_cache:
+            chaves_cache, em_cache = consultar_cache(resultado_par["hash_referencia"], resultado_par["hash_teste"],
+                                                     metodos, opcoes_analise)
+        metodos_a_analisar = [metodo for metodo in metodos if metodo not in em_cache]
+        if chaves_cache:
+            resultado_par["cache"] = {"acertos": len(em_cache), "falhas": len(metodos_a_analisar)}
+
+        # Todos os métodos partilham as conversões para cinzentos e os buffers de trabalho
+        # e ignoram os mosaicos idênticos nas duas imagens
+        if metodos_a_analisar:
+            resultados_metodos, duracoes = analisar_todos(img_ref, img_teste, metodos = metodos_a_analisar,
+                                                         dados_ref = dados_ref, **opcoes_analise)
+
+        for metodo in metodos:
+            # Resultado vindo da cache: a imagem de resultado é a da execução original
+            if metodo in em_cache:
+                entrada = em_cache[metodo]
+                resultado_par["resultados"].append({
+                    "metodo": metodo,
+                    "tipo_analise": entrada["tipo_analise"],
+                    "metricas": entrada["metricas"],
+                    "imagem_resultado": entrada["imagem_resultado"],
+                    "duracao": 0.0,
+                    "em_cache": True
+                })
+                continue
+
+            img_resultado, tipo_analise, metricas = resultados_metodos[metodo]
+
+            # A entrada da cache de um método visual só é escrita depois de a imagem estar gravada
+            caminho_resultado = None
+            if metodo in ["absdiff", "ssim"]:
+                ao_gravar = None
+                if metodo in chaves_cache:
+                    ao_gravar = functools.partial(guardar_resultado, chaves_cache[metodo], metodo, tipo_analise,
+                                                  metricas, duracao = duracoes[metodo])
+                caminho_resultado = guardar_imagem_resultado(img_resultado, metodo = metodo, identificador = identificador,
+                                                             assincrono = True, ao_gravar = ao_gravar)
+
+            resultado_par["resultados"].append({
+                "metodo": metodo,
+                "tipo_analise": tipo_analise,
+                "metricas": metricas,
+                "imagem_resultado": caminho_resultado,
+                "imagem": img_resultado if metodo in ["absdiff", "ssim"] else None,
+                "duracao": duracoes[metodo]
+            })
+
+            # Guarda o resultado na cache (os métodos visuais quando a imagem ficar gravada, ver acima)
+            if metodo in chaves_cache and metodo not in ["absdiff", "ssim"]:
+                guardar_resultado(chaves_cache[metodo], metodo, tipo_analise, metricas, caminho_resultado,
+                                  duracoes[metodo])
+
+        resultado_par["duracao"] = time.time() - inicio_par
+
+        if gerar_pdf:
+            resultado_par["relatorio"] = gerar_relatorio_pdf_multimetodo(
+                img_ref_path = caminho_referencia,
+                img_teste_path = caminho_teste,
+                resultados = resultado_par["resultados"],
+                identificador = identificador,
+                duracao_total = resultado_par["duracao"],
+                img_ref = img_ref,
+                img_teste = img_teste,
+                chave_ref = dados_ref.get("hash"),
+                estatisticas_cache = resultado_par.get("cache")
+            )
+
+    # Um par com problemas não pode interromper o lote
+    except Exception as e:
+        resultado_par["estado"] = "erro"
+        resultado_par["detalhe"] = str(e)
+
+    # As imagens ficam apenas no processo do par: o resultado devolvido só leva os caminhos
+    # Uma imagem que não foi gravada deixa de ser referida no resumo
+    falhas_escrita = aguardar_escritas()
+    for resultado in resultado_par["resultados"]:
+        resultado.pop("imagem", None)
+        if resultado["imagem_resultado"] in falhas_escrita:
+            resultado["imagem_resultado"] = None
+    if falhas_escrita:
+        resultado_par["imagens_em_falta"] = len(falhas_escrita)
+
+    resultado_par["duracao"] = time.time() - inicio_par
+
+    # Perfil por etapas deste par (só com a instrumentação ativa, ver processamento.perfil)
+    if perfil.ativo():
+        resultado_par["perfil"] = perfil.recolher()
+    return resultado_par
+
+
+def executar_lote(pasta_referencia, pasta_teste, metodos, num_processos = None, gerar_pdf = True, usar_cache = True):
+    """
+    Compara em paralelo todos os pares de imagens das pastas de referência e de teste.
+
+    O número de tarefas pendentes é limitado a duas por processo, para que lotes com
+    milhares de imagens não acumulem resultados em memória antes de serem recolhidos.
+
+    Argumentos:
+        pasta_referencia (str): Pasta com as imagens de referência
+        pasta_teste (str): Pasta com as imagens de teste
+        metodos (list): Métodos de análise a aplicar em cada par
+        num_processos (int, opcional): Número máximo de processos. O default é o número de núcleos.
+        gerar_pdf (bool, opcional): Gera um relatório PDF por par. O default é True.
+        usar_cache (bool, opcional): Reutiliza os resultados em cache de pares já comparados. O default é True.
+
+    Retorna:
+        dict: Resumo agregado com os resultados de todos os pares
+    """
+
+    num_processos = num_processos or os.cpu_count() or 1
+    pares, em_falta = encontrar_pares(pasta_referencia, pasta_teste)
+
+    for falta in em_falta:
+        print(f"⚠️ Par incompleto ignorado: {falta['nome']} ({falta['estado']})")
+
+    print(f"🔎 {len(pares)} pares encontrados, a comparar com {num_processos} processos")
+
+    inicio_global = time.time()
+    resultados_pares = []
+
+    with ProcessPoolExecutor(max_workers = num_processos, initializer = _iniciar_trabalhador) as executor:
+        pendentes = set()
+        fila = iter(pares)
+
+        # Submete tarefas até ao limite e recolhe à medida que terminam
+        while True:
+            for nome, caminho_ref, caminho_teste in fila:
+                pendentes.add(executor.submit(comparar_par, nome, caminho_ref, caminho_teste, metodos, gerar_pdf,
+                                              usar_cache))
+                if len(pendentes) >= 2 * num_processos:
+                    break
+
+            if not pendentes:
+                break
+
+            concluidos, pendentes = wait(pendentes, return_when = FIRST_COMPLETED)
+            for futuro in concluidos:
+                resultado_par = futuro.result()
+                resultados_pares.append(resultado_par)
+
+                if resultado_par["estado"] == "ok":
+                    print(f"✅ {resultado_par['nome']} ({resultado_par['duracao']:.2f}s)")
+                else:
+                    print(f"⚠️ {resultado_par['nome']} ignorado: {resultado_par['estado']}")
+
+    duracao_total = time.time() - inicio_global
+
+    # Ordena por nome para que o resumo seja estável entre execuções
+    resultados_pares.sort(key = lambda r: r["nome"])
+
+    estados = {}
+    for resultado_par in resultados_pares:
+        estados[resultado_par["estado"]] = estados.get(resultado_par["estado"], 0) + 1
+    for falta in em_falta:
+        estados[falta["estado"]] = estados.get(falta["estado"], 0) + 1
+
+    return {
+        "pasta_referencia": pasta_referencia,
+        "pasta_teste": pasta_teste,
+        "metodos": list(metodos),
+        "num_processos": num_processos,
+        "num_pares": len(pares),
+        "estados": estados,
+        "duracao_total": duracao_total,
+        "pares": resultados_pares,
+        "em_falta": em_falta
+    }
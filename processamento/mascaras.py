@@ -0,0 +1,154 @@
+"""
+Máscaras por referência: zonas a ignorar e região de interesse (ROI).
+
+Os menus dos jogos têm zonas que mudam sempre (relógios, contadores de moedas, banners
+animados) e que só inflacionam a percentagem de diferença. Cada imagem de referência pode
+ter, ao seu lado, um ficheiro JSON com o mesmo nome e a extensão '.mascara.json'
+(ex: 'imagens/referencia/menu.mascara.json' para 'menu.PNG'):
+
+    {
+        "roi": [[0, 120, 1290, 2400]],
+        "ignorar": [[1050, 30, 200, 60], [40, 30, 300, 60]]
+    }
+
+- roi: retângulos [x, y, largura, altura] a analisar (opcional; sem ROI é analisada a imagem toda)
+- ignorar: retângulos [x, y, largura, altura] a ignorar dentro da ROI (opcional)
+
+Um retângulo isolado pode ser indicado sem a lista exterior (ex: "roi": [0, 120, 1290, 2400]).
+Os métodos de análise (ver processamento.analises) recortam as imagens ao retângulo que
+envolve a ROI, pelo que uma ROI pequena num ecrã grande custa proporcionalmente menos.
+"""
+
+import json # Formato das definições
+import os   # Operações com sistema de ficheiros
+
+import numpy as np
+
+# Extensão dos ficheiros de máscara (substitui a extensão da imagem de referência)
+EXTENSAO_MASCARA = ".mascara.json"
+
+
+def caminho_mascara(caminho_referencia):
+    """
+    Devolve o caminho do ficheiro de máscara de uma imagem de referência.
+
+    Argumentos:
+        caminho_referencia (str): Caminho da imagem de referência
+
+    Retorna:
+        str: Caminho do ficheiro de máscara (ex: 'imagens/referencia/menu.mascara.json')
+    """
+
+    return os.path.splitext(caminho_referencia)[0] + EXTENSAO_MASCARA
+
+
+def _normalizar_retangulos(valor, campo):
+    """
+    Converte o valor de um campo da definição numa lista de retângulos (x, y, largura, altura).
+
+    Erros:
+        ValueError: Se algum retângulo for inválido
+    """
+
+    if valor is None:
+        return []
+    if len(valor) == 4 and all(isinstance(v, (int, float)) for v in valor):
+        valor = [valor]
+
+    retangulos = []
+    for retangulo in valor:
+        if len(retangulo) != 4 or not all(isinstance(v, (int, float)) for v in retangulo):
+            raise ValueError(f"Retângulo inválido em '{campo}': {retangulo} (esperado [x, y, largura, altura])")
+        x, y, largura, altura = (int(v) for v in retangulo)
+        if largura <= 0 or altura <= 0:
+            raise ValueError(f"Retângulo vazio em '{campo}': {retangulo}")
+        retangulos.append([x, y, largura, altura])
+    return retangulos
+
+
+def carregar_mascara(caminho_referencia):
+    """
+    Lê a definição de máscara guardada ao lado de uma imagem de referência.
+
+    Argumentos:
+        caminho_referencia (str): Caminho da imagem de referência
+
+    Retorna:
+        dict: Definição com 'roi' e 'ignorar' (listas de retângulos [x, y, largura, altura])
+        None: Se a referência não tiver ficheiro de máscara
+
+    Erros:
+        ValueError: Se o ficheiro de máscara não for válido
+    """
+
+    caminho = caminho_mascara(caminho_referencia)
+    try:
+        with open(caminho, encoding = "utf-8") as ficheiro:
+            dados = json.load(ficheiro)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise ValueError(f"Ficheiro de máscara inválido ({caminho}): {e}")
+
+    if not isinstance(dados, dict):
+        raise ValueError(f"Ficheiro de máscara inválido ({caminho}): esperado um objeto JSON")
+
+    return {
+        "roi": _normalizar_retangulos(dados.get("roi"), "roi"),
+        "ignorar": _normalizar_retangulos(dados.get("ignorar"), "ignorar")
+    }
+
+
+def preparar_mascara(definicao, forma):
+    """
+    Converte uma definição de máscara no recorte e na máscara a usar na análise.
+
+    Argumentos:
+        definicao (dict): Definição com 'roi' e/ou 'ignorar' (ver carregar_mascara)
+        forma (tuple): Dimensões da imagem (altura, largura[, canais])
+
+    Retorna:
+        tuple: (recorte, mascara)
+            - recorte (tuple): Retângulo (x, y, largura, altura) que envolve a ROI
+            - mascara (numpy.ndarray ou None): Máscara uint8 do recorte (255 = analisar, 0 = ignorar);
+              None quando todo o recorte é analisado
+
+    Erros:
+        ValueError: Se a ROI ficar fora da imagem ou não sobrar nenhum pixel para analisar
+    """
+
+    altura, largura = forma[:2]
+
+    def limitar(retangulo):
+        x, y, w, h = retangulo
+        x0, y0 = min(max(x, 0), largura), min(max(y, 0), altura)
+        x1, y1 = min(max(x + w, 0), largura), min(max(y + h, 0), altura)
+        return x0, y0, x1, y1
+
+    rois = [limitar(roi) for roi in definicao.get("roi") or [[0, 0, largura, altura]]]
+    rois = [(x0, y0, x1, y1) for x0, y0, x1, y1 in rois if x1 > x0 and y1 > y0]
+    if not rois:
+        raise ValueError("A região de interesse da máscara fica fora da imagem")
+
+    # Retângulo que envolve a ROI (as imagens são recortadas a ele)
+    rx0, ry0 = min(r[0] for r in rois), min(r[1] for r in rois)
+    rx1, ry1 = max(r[2] for r in rois), max(r[3] for r in rois)
+
+    ignorados = [limitar(retangulo) for retangulo in definicao.get("ignorar") or []]
+    ignorados = [(x0, y0, x1, y1) for x0, y0, x1, y1 in ignorados
+                 if x1 > max(x0, rx0) and y1 > max(y0, ry0) and x0 < rx1 and y0 < ry1]
+
+    # Uma única ROI sem zonas ignoradas: basta o recorte
+    recorte = (rx0, ry0, rx1 - rx0, ry1 - ry0)
+    if len(rois) == 1 and not ignorados:
+        return recorte, None
+
+    mascara = np.zeros((ry1 - ry0, rx1 - rx0), dtype = np.uint8)
+    for x0, y0, x1, y1 in rois:
+        mascara[y0 - ry0:y1 - ry0, x0 - rx0:x1 - rx0] = 255
+    for x0, y0, x1, y1 in ignorados:
+        mascara[max(y0 - ry0, 0):max(y1 - ry0, 0), max(x0 - rx0, 0):max(x1 - rx0, 0)] = 0
+
+    if not mascara.any():
+        raise ValueError("A máscara ignora toda a região de interesse")
+    return recorte, mascara
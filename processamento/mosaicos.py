@@ -0,0 +1,155 @@
+"""
+Deteção de mosaicos alterados entre duas imagens, por comparação de hashes.
+
+As imagens são divididas numa grelha de mosaicos quadrados e o conteúdo de cada mosaico
+é resumido por um hash BLAKE2b. Mosaicos com o mesmo hash nas duas imagens são idênticos
+e podem ser ignorados pelos métodos de análise:
+- se nenhum mosaico mudou, a comparação termina de imediato com métricas de diferença nula;
+- caso contrário, os métodos só processam os mosaicos alterados (mais uma margem, no caso
+  do SSIM) e os resultados são reunidos em métricas ao nível da imagem completa.
+
+Os hashes da imagem de referência podem vir da cache de referências
+(ver processamento.cache_referencias), pelo que só os da imagem de teste são calculados.
+"""
+
+import hashlib # Hash do conteúdo de cada mosaico
+
+import cv2     # OpenCV para a dilatação da grelha de mosaicos
+import numpy as np
+
+# Lado de cada mosaico, em pixels
+TAMANHO_MOSAICO = 64
+
+# Número de bytes de cada hash
+BYTES_HASH = 16
+
+# Acima desta fração de mosaicos a analisar, a análise da imagem completa é mais rápida
+FRACAO_MAXIMA_PARCIAL = 0.5
+
+
+def calcular_hashes_mosaicos(img, tamanho = TAMANHO_MOSAICO):
+    """
+    Calcula o hash de cada mosaico de uma imagem.
+
+    Os mosaicos da última linha e coluna podem ser mais pequenos, se as dimensões da
+    imagem não forem múltiplas do tamanho do mosaico.
+
+    Argumentos:
+        img (numpy.ndarray): Imagem a dividir em mosaicos
+        tamanho (int, opcional): Lado de cada mosaico em pixels. O default é TAMANHO_MOSAICO.
+
+    Retorna:
+        numpy.ndarray: Grelha (linhas x colunas) de hashes, com dtype bytes de BYTES_HASH
+    """
+
+    altura, largura = img.shape[:2]
+    linhas = -(-altura // tamanho)
+    colunas = -(-largura // tamanho)
+
+    hashes = np.empty((linhas, colunas), dtype = f"S{BYTES_HASH}")
+    for linha in range(linhas):
+        faixa = img[linha * tamanho:(linha + 1) * tamanho]
+        for coluna in range(colunas):
+            mosaico = np.ascontiguousarray(faixa[:, coluna * tamanho:(coluna + 1) * tamanho])
+            hashes[linha, coluna] = hashlib.blake2b(mosaico, digest_size = BYTES_HASH).digest()
+    return hashes
+
+
+def mosaicos_alterados(hashes_ref, hashes_teste):
+    """
+    Compara as grelhas de hashes das duas imagens.
+
+    Argumentos:
+        hashes_ref (numpy.ndarray): Grelha de hashes da imagem de referência
+        hashes_teste (numpy.ndarray): Grelha de hashes da imagem de teste
+
+    Retorna:
+        numpy.ndarray: Grelha booleana, True nos mosaicos cujo conteúdo mudou
+    """
+
+    return hashes_ref != hashes_teste
+
+
+def dilatar_grelha(grelha, margem):
+    """
+    Alarga a seleção de mosaicos em 'margem' mosaicos em todas as direções.
+
+    Argumentos:
+        grelha (numpy.ndarray): Grelha booleana de mosaicos selecionados
+        margem (int): Número de mosaicos a acrescentar à volta de cada mosaico selecionado
+
+    Retorna:
+        numpy.ndarray: Nova grelha booleana
+    """
+
+    if margem <= 0:
+        return grelha.copy()
+
+    elemento = np.ones((2 * margem + 1, 2 * margem + 1), dtype = np.uint8)
+    return cv2.dilate(grelha.astype(np.uint8), elemento).astype(bool)
+
+
+def retangulos_da_grelha(grelha, tamanho, forma):
+    """
+    Converte uma grelha de blocos selecionados em retângulos disjuntos, em pixels.
+
+    Em cada linha da grelha, os blocos selecionados consecutivos formam um retângulo.
+    Os retângulos não se sobrepõem, pelo que cada pixel é processado no máximo uma vez.
+
+    Argumentos:
+        grelha (numpy.ndarray): Grelha booleana de blocos selecionados
+        tamanho (int): Lado de cada bloco em pixels
+        forma (tuple): Dimensões (altura, largura, ...) da imagem completa
+
+    Retorna:
+        list: Lista de retângulos (x, y, largura, altura), recortados aos limites da imagem
+    """
+
+    altura, largura = forma[:2]
+    retangulos = []
+
+    for linha in range(grelha.shape[0]):
+        selecionados = np.flatnonzero(grelha[linha])
+        if selecionados.size == 0:
+            continue
+
+        # Separa a linha em sequências de colunas consecutivas
+        quebras = np.flatnonzero(np.diff(selecionados) > 1)
+        inicios = np.concatenate(([selecionados[0]], selecionados[quebras + 1]))
+        fins = np.concatenate((selecionados[quebras], [selecionados[-1]]))
+
+        y0 = linha * tamanho
+        y1 = min(y0 + tamanho, altura)
+        for inicio, fim in zip(inicios, fins):
+            x0 = int(inicio) * tamanho
+            x1 = min((int(fim) + 1) * tamanho, largura)
+            retangulos.append((x0, y0, x1 - x0, y1 - y0))
+
+    return retangulos
+
+
+def resumo_mosaicos(alterados, analisados, tamanho):
+    """
+    Cria o resumo dos mosaicos a incluir nas métricas e no relatório.
+
+    Argumentos:
+        alterados (numpy.ndarray): Grelha booleana dos mosaicos com conteúdo diferente
+        analisados (numpy.ndarray): Grelha booleana dos mosaicos processados pelo método
+        tamanho (int): Lado de cada mosaico em pixels
+
+    Retorna:
+        dict: Resumo com tamanho, dimensões da grelha, contagens e mosaicos alterados
+    """
+
+    total = int(alterados.size)
+    num_analisados = int(np.count_nonzero(analisados))
+
+    return {
+        "tamanho": tamanho,
+        "linhas": int(alterados.shape[0]),
+        "colunas": int(alterados.shape[1]),
+        "total": total,
+        "analisados": num_analisados,
+        "ignorados": total - num_analisados,
+        "alterados": [[int(linha), int(coluna)] for linha, coluna in np.argwhere(alterados)]
+    }
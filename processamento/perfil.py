@@ -0,0 +1,210 @@
+"""
+Instrumentação leve por etapas (leitura, conversões, SSIM, regiões, overlay, escrita, PDF).
+
+Cada etapa é medida com um intervalo time.perf_counter:
+
+    with etapa("ssim"):
+        ...
+
+A instrumentação é ativada pela variável de ambiente COMPARADOR_PERFIL (qualquer valor
+diferente de '' e '0') ou pela função ativar(). Com COMPARADOR_PERFIL=memoria, é também
+registado o pico de memória alocada em cada etapa (via tracemalloc, o que torna a execução
+visivelmente mais lenta). Desativada, etapa() devolve sempre o mesmo gestor de contexto
+vazio e o custo é apenas o de uma chamada de função.
+
+As etapas são registadas por thread, pelo que execuções em paralelo não se misturam.
+"""
+
+import contextlib
+import functools
+import os
+import threading
+import time
+import tracemalloc
+
+# Variável de ambiente que ativa a instrumentação ('memoria' inclui o pico de memória)
+VARIAVEL_AMBIENTE = "COMPARADOR_PERFIL"
+
+_ativo = os.environ.get(VARIAVEL_AMBIENTE, "") not in ("", "0")
+_memoria = os.environ.get(VARIAVEL_AMBIENTE, "") == "memoria"
+
+# Gestor de contexto partilhado por todas as etapas quando a instrumentação está desativada
+_NULO = contextlib.nullcontext()
+
+# Registo de etapas de cada thread
+_local = threading.local()
+
+
+def ativar(memoria = False):
+    """
+    Ativa a instrumentação no processo atual.
+
+    Argumentos:
+        memoria (bool, opcional): Regista também o pico de memória de cada etapa. O default é False.
+    """
+
+    global _ativo, _memoria
+    _ativo = True
+    _memoria = memoria
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def desativar():
+    """
+    Desativa a instrumentação no processo atual (as etapas já registadas mantêm-se).
+    """
+
+    global _ativo, _memoria
+    _ativo = False
+    if _memoria and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memoria = False
+
+
+def ativo():
+    """
+    Indica se a instrumentação está ativa.
+    """
+
+    return _ativo
+
+
+def _registos():
+    """
+    Devolve a lista de etapas registadas na thread atual.
+    """
+
+    registos = getattr(_local, "registos", None)
+    if registos is None:
+        registos = _local.registos = []
+        _local.abertas = []
+    return registos
+
+
+class _Etapa:
+    """
+    Gestor de contexto que mede uma etapa e a acrescenta ao registo da thread.
+    """
+
+    __slots__ = ("nome", "inicio", "memoria_inicio", "pico")
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        _registos()
+        self.memoria_inicio = None
+        if _memoria and tracemalloc.is_tracing():
+            # O pico é reposto no início de cada etapa; a etapa exterior guarda o pico
+            # observado até aqui para não o perder
+            atual, pico = tracemalloc.get_traced_memory()
+            if _local.abertas:
+                exterior = _local.abertas[-1]
+                exterior.pico = max(exterior.pico, pico)
+            tracemalloc.reset_peak()
+            self.memoria_inicio = atual
+            self.pico = atual
+        _local.abertas.append(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        duracao = time.perf_counter() - self.inicio
+        _local.abertas.pop()
+
+        registo = {"etapa": self.nome, "duracao": duracao}
+        if self.memoria_inicio is not None:
+            self.pico = max(self.pico, tracemalloc.get_traced_memory()[1])
+            registo["memoria_pico"] = self.pico - self.memoria_inicio
+            if _local.abertas:
+                exterior = _local.abertas[-1]
+                exterior.pico = max(exterior.pico, self.pico)
+
+        _registos().append(registo)
+        return False
+
+
+def etapa(nome):
+    """
+    Mede uma etapa com um bloco 'with'. Sem efeito se a instrumentação estiver desativada.
+
+    Argumentos:
+        nome (str): Nome da etapa (ex: 'imread', 'ssim', 'overlay')
+
+    Retorna:
+        Gestor de contexto da etapa
+    """
+
+    if not _ativo:
+        return _NULO
+    return _Etapa(nome)
+
+
+def medir(nome):
+    """
+    Decorador que mede cada chamada da função como uma etapa.
+
+    Argumentos:
+        nome (str): Nome da etapa (ex: 'pdf')
+
+    Retorna:
+        Decorador a aplicar à função
+    """
+
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def funcao_medida(*args, **kwargs):
+            with etapa(nome):
+                return funcao(*args, **kwargs)
+        return funcao_medida
+    return decorador
+
+
+def marcar():
+    """
+    Devolve a posição atual do registo da thread, para usar com resumir.
+    """
+
+    if not _ativo:
+        return 0
+    return len(_registos())
+
+
+def resumir(desde = 0):
+    """
+    Agrupa por nome as etapas registadas na thread atual a partir de uma marca.
+
+    Argumentos:
+        desde (int, opcional): Marca devolvida por marcar(). O default é 0 (todas as etapas).
+
+    Retorna:
+        dict: {etapa: {'duracao': segundos, 'chamadas': n[, 'memoria_pico': bytes]}}
+    """
+
+    resumo = {}
+    for registo in _registos()[desde:]:
+        entrada = resumo.setdefault(registo["etapa"], {"duracao": 0.0, "chamadas": 0})
+        entrada["duracao"] += registo["duracao"]
+        entrada["chamadas"] += 1
+        if "memoria_pico" in registo:
+            entrada["memoria_pico"] = max(entrada.get("memoria_pico", 0), registo["memoria_pico"])
+    return resumo
+
+
+def recolher():
+    """
+    Devolve o resumo de todas as etapas da thread atual e limpa o registo.
+
+    Retorna:
+        dict: Resumo tal como devolvido por resumir()
+    """
+
+    resumo = resumir()
+    _registos().clear()
+    return resumo
+
+
+# Com a variável de ambiente, o tracemalloc é iniciado logo na importação
+if _memoria:
+    ativar(memoria = True)
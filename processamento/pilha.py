@@ -0,0 +1,347 @@
+"""
+Comparação de uma referência com muitas capturas de teste, em blocos empilhados.
+
+Verificar o mesmo ecrã em dezenas de dispositivos ou builds com analisar_diferencas repete,
+para cada par, o trabalho do lado da referência e as chamadas por imagem. Aqui as capturas
+de teste são empilhadas num único array (N, altura, largura, 3) e processadas em bloco:
+
+- a diferença absoluta, a conversão para cinzentos e o threshold são uma única chamada
+  OpenCV cada, sobre o bloco visto como uma imagem (N * altura, largura), contra a
+  referência replicada uma única vez para o tamanho do bloco;
+- o histograma e a versão em cinzentos da referência são calculados uma única vez;
+- os buffers de trabalho passam de um bloco para o seguinte.
+
+A rotulagem das regiões, as contagens, os histogramas de 256 bins e a correlação são feitos
+imagem a imagem, sobre vistas dos buffers do bloco, para que as métricas sejam idênticas às
+de analisar_diferencas. O SSIM (janelas locais em float32) não é empilhado: cada captura é
+analisada com os dados da referência calculados uma única vez.
+
+Utilização (a partir da raiz do projeto):
+    python -m processamento.pilha REFERENCIA TESTE [TESTE ...] [--metodos absdiff,histograma] [--bloco 16]
+
+Cada TESTE pode ser uma imagem ou uma pasta de imagens.
+"""
+
+import argparse # Interface de linha de comandos
+import contextlib # Silenciar as mensagens por captura do SSIM
+import io
+import json # Exportação das métricas
+import os # Operações com sistema de ficheiros
+import time # Medição de tempo de execução
+
+import cv2  # OpenCV para manipulação de imagens
+import numpy as np
+
+from processamento.analises import (LIMIAR_DIFERENCA, METODOS_DISPONIVEIS, TIPOS_ANALISE, analisar_diferencas,
+                                    obter_buffer, varrimento_limiares)
+from processamento.cache_referencias import calcular_dados_referencia
+from processamento.leitura import ler_antecipadamente
+from processamento.lote import listar_imagens
+from processamento.mascaras import preparar_mascara
+from processamento.regioes import AREA_MINIMA, DISTANCIA_FUSAO, extrair_regioes
+
+# Métodos aplicados por omissão (os que são calculados em bloco)
+METODOS_PILHA = ["absdiff", "histograma"]
+
+# Número de capturas processadas em cada bloco (limita a memória dos buffers de trabalho)
+TAMANHO_BLOCO = 16
+
+
+def _blocos(testes, forma, tamanho_bloco):
+    """
+    Agrupa as capturas de teste em blocos (n, altura, largura, canais) de até tamanho_bloco imagens.
+
+    As capturas soltas são copiadas para um bloco reutilizado de um grupo para o seguinte,
+    pelo que cada bloco só é válido até ao pedido do seguinte.
+
+    Argumentos:
+        testes (numpy.ndarray ou iterable): Array (N, altura, largura, canais) ou iterável de
+            arrays, cada um uma captura (altura, largura, canais) ou um bloco (n, altura, largura, canais)
+        forma (tuple): Dimensões da imagem de referência
+        tamanho_bloco (int): Número máximo de capturas por bloco
+
+    Retorna:
+        generator: Blocos (vistas dos blocos recebidos, sem cópia)
+
+    Erros:
+        ValueError: Se uma captura não tiver as dimensões da referência
+    """
+
+    if isinstance(testes, np.ndarray):
+        testes = [testes]
+
+    pilha = None    # Bloco onde as capturas soltas são empilhadas
+    num_pilha = 0
+    for bloco in testes:
+        if bloco.shape[-len(forma):] != forma or bloco.ndim not in (len(forma), len(forma) + 1):
+            raise ValueError(f"Dimensões diferentes da referência: {bloco.shape[-len(forma):]} vs {forma}")
+
+        if bloco.ndim == len(forma):
+            if pilha is None:
+                pilha = np.empty((tamanho_bloco,) + forma, dtype = bloco.dtype)
+            pilha[num_pilha] = bloco
+            num_pilha += 1
+            if num_pilha == tamanho_bloco:
+                yield pilha
+                num_pilha = 0
+            continue
+
+        # Bloco já empilhado: as capturas soltas pendentes são processadas primeiro, para manter a ordem
+        if num_pilha:
+            yield pilha[:num_pilha]
+            num_pilha = 0
+        for inicio in range(0, bloco.shape[0], tamanho_bloco):
+            yield bloco[inicio:inicio + tamanho_bloco]
+
+    if num_pilha:
+        yield pilha[:num_pilha]
+
+
+def _contiguo(estado, bloco):
+    """
+    Copia um bloco não contíguo (ex: o recorte da região de interesse) para um buffer reutilizado.
+    """
+
+    contiguo = obter_buffer(estado, "bloco", bloco.shape)
+    np.copyto(contiguo, bloco)
+    return contiguo
+
+
+def _deslocar_regioes(regioes, x, y):
+    """
+    Desloca as regiões calculadas no recorte da máscara para as coordenadas da imagem completa
+    (como processamento.analises._repor_recorte).
+    """
+
+    for regiao in regioes:
+        regiao["x"] += x
+        regiao["y"] += y
+        cx, cy = regiao["centroide"]
+        regiao["centroide"] = [round(cx + x, 2), round(cy + y, 2)]
+    return regioes
+
+
+def analisar_pilha(img_ref, testes, metodos = METODOS_PILHA, dados_ref = None, area_minima = AREA_MINIMA,
+                   distancia_fusao = DISTANCIA_FUSAO, limiares_absdiff = None, mascara = None,
+                   tamanho_bloco = TAMANHO_BLOCO):
+    """
+    Compara uma imagem de referência com uma pilha de capturas de teste do mesmo tamanho.
+
+    Argumentos:
+        img_ref (numpy.ndarray): Imagem de referência (BGR). Pode ser None se dados_ref for fornecido.
+        testes (numpy.ndarray ou iterable): Capturas de teste, como um array (N, altura, largura, 3)
+            ou um iterável (ex: gerador) de capturas ou de blocos empilhados
+        metodos (list, opcional): Métodos a aplicar. O default é METODOS_PILHA.
+        dados_ref (dict, opcional): Dados da referência (ver processamento.cache_referencias). O default é None.
+        area_minima (int, opcional): Área mínima das regiões com diferenças. O default é AREA_MINIMA.
+        distancia_fusao (int, opcional): Distância máxima entre regiões a fundir. O default é DISTANCIA_FUSAO.
+        limiares_absdiff (list, opcional): Limiares do varrimento do absdiff. O default é None (sem varrimento).
+        mascara (dict, opcional): Zonas a ignorar e região de interesse (ver processamento.mascaras).
+            O default é None (imagem completa).
+        tamanho_bloco (int, opcional): Número máximo de capturas processadas em conjunto. O default é TAMANHO_BLOCO.
+
+    Retorna:
+        list: Um dicionário {metodo: metricas} por captura, pela ordem das capturas, com as
+            mesmas métricas que analisar_diferencas devolveria para cada par
+
+    Erros:
+        ValueError: Se um método for desconhecido, uma captura tiver dimensões diferentes das
+            da referência ou a máscara não deixar nenhum pixel para analisar
+    """
+
+    for metodo in metodos:
+        if metodo not in TIPOS_ANALISE:
+            raise ValueError(f"Método de análise desconhecido: {metodo}")
+
+    if img_ref is None:
+        img_ref = dados_ref["img"]
+    if "ssim" in metodos and dados_ref is None:
+        # O SSIM é feito captura a captura, com as estatísticas da referência calculadas uma única vez
+        dados_ref = calcular_dados_referencia(img_ref)
+
+    # Recorte e máscara da região de interesse, comuns a todas as capturas
+    recorte = None
+    mascara_recorte = None
+    x, y, largura, altura = 0, 0, img_ref.shape[1], img_ref.shape[0]
+    if mascara is not None:
+        (x, y, largura, altura), mascara_recorte = preparar_mascara(mascara, img_ref.shape)
+        recorte = (x, y, largura, altura)
+    total_pixels = cv2.countNonZero(mascara_recorte) if mascara_recorte is not None else largura * altura
+    resumo_mascara = None
+    if recorte is not None:
+        resumo_mascara = {
+            "recorte": [x, y, largura, altura],
+            "pixels_analisados": total_pixels,
+            "pixels_ignorados": img_ref.shape[0] * img_ref.shape[1] - total_pixels
+        }
+
+    ref = img_ref[y:y + altura, x:x + largura]
+
+    # Histograma normalizado da referência, calculado uma única vez
+    hist_ref = None
+    if "histograma" in metodos:
+        if dados_ref is not None and recorte is None:
+            hist_ref = dados_ref["hist"]
+        else:
+            gray_ref = (dados_ref["gray"][y:y + altura, x:x + largura] if dados_ref is not None
+                        else cv2.cvtColor(ref, cv2.COLOR_BGR2GRAY))
+            hist_ref = cv2.calcHist([gray_ref], [0], mascara_recorte, [256], [0, 256])
+            hist_ref = cv2.normalize(hist_ref, hist_ref).flatten()
+
+    estado = {"buffers": {}}
+    ref_replicada = None
+    resultados = []
+    for bloco_completo in _blocos(testes, img_ref.shape, max(1, tamanho_bloco)):
+        n = bloco_completo.shape[0]
+        bloco = bloco_completo[:, y:y + altura, x:x + largura]
+        metricas_bloco = [{} for _ in range(n)]
+
+        if "absdiff" in metodos:
+            # Diferença do bloco inteiro numa única chamada, contra a referência replicada uma
+            # única vez para o tamanho do bloco (reutilizada em todos os blocos)
+            if ref_replicada is None or len(ref_replicada) < n:
+                ref_replicada = np.ascontiguousarray(np.broadcast_to(ref, (n,) + ref.shape))
+            if not bloco.flags.c_contiguous:
+                bloco = _contiguo(estado, bloco)
+            diff = obter_buffer(estado, "diff", bloco.shape)
+            cv2.absdiff(bloco.reshape(n * altura, largura, 3), ref_replicada[:n].reshape(n * altura, largura, 3),
+                        dst = diff.reshape(n * altura, largura, 3))
+
+            # Cinzentos e threshold do bloco inteiro, visto como uma única imagem (n * altura, largura)
+            gray_diff = obter_buffer(estado, "gray_diff", (n, altura, largura))
+            cv2.cvtColor(diff.reshape(n * altura, largura, 3), cv2.COLOR_BGR2GRAY,
+                         dst = gray_diff.reshape(n * altura, largura))
+            if mascara_recorte is not None:
+                # Nas zonas ignoradas a análise por par não tem diferenças (recebe os pixels da referência)
+                np.bitwise_and(gray_diff, mascara_recorte, out = gray_diff)
+            mask = obter_buffer(estado, "mask", (n, altura, largura))
+            cv2.threshold(gray_diff.reshape(n * altura, largura), LIMIAR_DIFERENCA, 255, cv2.THRESH_BINARY,
+                          dst = mask.reshape(n * altura, largura))
+
+            # Contagem por captura sobre vistas do bloco (mais rápida do que numpy.count_nonzero por eixo)
+            contagens = [cv2.countNonZero(mask[i]) for i in range(n)]
+
+            for i in range(n):
+                regioes, _ = extrair_regioes(mask[i], area_minima, distancia_fusao)
+                pixels_diferentes = contagens[i]
+                metricas = {
+                    "num_diferencas": len(regioes),
+                    "total_pixels": total_pixels,
+                    "pixels_diferentes": pixels_diferentes,
+                    "percentagem_diferenca": (pixels_diferentes / total_pixels) * 100,
+                    "regioes": _deslocar_regioes(regioes, x, y) if recorte is not None else regioes
+                }
+                if limiares_absdiff:
+                    hist_diff = cv2.calcHist([gray_diff[i]], [0], None, [256], [0, 256])
+                    hist_diff[0] += total_pixels - hist_diff.sum()
+                    metricas["varrimento_limiares"] = varrimento_limiares(hist_diff, total_pixels, limiares_absdiff)
+                if resumo_mascara is not None:
+                    metricas["mascara"] = dict(resumo_mascara)
+                metricas_bloco[i]["absdiff"] = metricas
+
+        if "histograma" in metodos:
+            # Conversão para cinzentos do bloco inteiro (cópia contígua apenas se for um recorte)
+            if not bloco.flags.c_contiguous:
+                bloco = _contiguo(estado, bloco)
+            gray_teste = obter_buffer(estado, "gray_teste", (n, altura, largura))
+            cv2.cvtColor(bloco.reshape(n * altura, largura, 3), cv2.COLOR_BGR2GRAY,
+                         dst = gray_teste.reshape(n * altura, largura))
+            for i in range(n):
+                hist_teste = cv2.calcHist([gray_teste[i]], [0], mascara_recorte, [256], [0, 256])
+                hist_teste = cv2.normalize(hist_teste, hist_teste).flatten()
+                metricas = {
+                    "correlacao_histogramas": cv2.compareHist(hist_ref, hist_teste, cv2.HISTCMP_CORREL),
+                    "num_diferencas": None
+                }
+                if resumo_mascara is not None:
+                    metricas["mascara"] = dict(resumo_mascara)
+                metricas_bloco[i]["histograma"] = metricas
+
+        if "ssim" in metodos:
+            for i in range(n):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _, _, metricas_bloco[i]["ssim"] = analisar_diferencas(
+                        None, bloco_completo[i], "ssim", dados_ref, area_minima = area_minima,
+                        distancia_fusao = distancia_fusao, mascara = mascara)
+
+        # Métodos pela ordem pedida, como na análise por par
+        resultados.extend({metodo: metricas_captura[metodo] for metodo in metodos} for metricas_captura in metricas_bloco)
+    return resultados
+
+
+def ler_capturas(caminhos):
+    """
+    Gerador das capturas de teste indicadas, descodificadas antecipadamente numa pool de
+    threads enquanto as anteriores são analisadas.
+
+    Argumentos:
+        caminhos (list): Imagens e/ou pastas de imagens (as pastas são percorridas por ordem alfabética)
+
+    Retorna:
+        generator: Tuplos (caminho, imagem)
+
+    Erros:
+        ValueError: Se uma imagem não puder ser lida
+    """
+
+    ficheiros = [ficheiro for caminho in caminhos
+                 for ficheiro in (listar_imagens(caminho).values() if os.path.isdir(caminho) else [caminho])]
+    for ficheiro, img in ler_antecipadamente(ficheiros):
+        if img is None:
+            raise ValueError(f"Não foi possível ler a imagem: {ficheiro}")
+        yield ficheiro, img
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Compara uma referência com muitas capturas de teste, em bloco.")
+    parser.add_argument("referencia", help = "Imagem de referência")
+    parser.add_argument("testes", nargs = "+", help = "Capturas de teste (imagens ou pastas)")
+    parser.add_argument("--metodos", default = ",".join(METODOS_PILHA),
+                        help = f"Métodos separados por vírgulas (default: {','.join(METODOS_PILHA)})")
+    parser.add_argument("--bloco", type = int, default = TAMANHO_BLOCO,
+                        help = f"Capturas processadas em conjunto (default: {TAMANHO_BLOCO})")
+    parser.add_argument("--json", help = "Ficheiro onde gravar as métricas de todas as capturas")
+    argumentos = parser.parse_args()
+
+    metodos = [metodo.strip() for metodo in argumentos.metodos.split(",") if metodo.strip()]
+    desconhecidos = [metodo for metodo in metodos if metodo not in METODOS_DISPONIVEIS]
+    if desconhecidos or not metodos:
+        parser.error(f"métodos inválidos: {', '.join(desconhecidos) or '(nenhum)'} "
+                     f"(disponíveis: {', '.join(METODOS_DISPONIVEIS)})")
+
+    img_ref = cv2.imread(argumentos.referencia)
+    if img_ref is None:
+        print(f"❌ Não foi possível ler a imagem de referência: {argumentos.referencia}")
+        raise SystemExit(1)
+
+    # Os caminhos são guardados à medida que as capturas são lidas pelo gerador
+    nomes = []
+    def capturas():
+        for caminho, img in ler_capturas(argumentos.testes):
+            nomes.append(caminho)
+            yield img
+
+    inicio = time.perf_counter()
+    try:
+        resultados = analisar_pilha(img_ref, capturas(), metodos, tamanho_bloco = argumentos.bloco)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    duracao = time.perf_counter() - inicio
+
+    for caminho, metricas in zip(nomes, resultados):
+        partes = []
+        if "absdiff" in metricas:
+            partes.append(f"absdiff {metricas['absdiff']['percentagem_diferenca']:.2f}%")
+        if "histograma" in metricas:
+            partes.append(f"histograma {metricas['histograma']['correlacao_histogramas']:.4f}")
+        if "ssim" in metricas:
+            partes.append(f"ssim {metricas['ssim']['indice_ssim']:.4f}")
+        print(f"📄 {os.path.basename(caminho)}: {', '.join(partes)}")
+    print(f"\n⏱️ {len(resultados)} capturas comparadas em {duracao:.2f} segundos")
+
+    if argumentos.json:
+        with open(argumentos.json, "w", encoding = "utf-8") as ficheiro:
+            json.dump([{"teste": caminho, **metricas} for caminho, metricas in zip(nomes, resultados)],
+                      ficheiro, indent = 2, ensure_ascii = False)
+        print(f"📝 Métricas guardadas em: {argumentos.json}")
@@ -0,0 +1,560 @@
+"""
+Vigilância de uma pasta de capturas com as comparações organizadas em pipeline.
+
+Quando as capturas chegam continuamente a 'imagens/teste', a execução do main.py é
+estritamente sequencial: leitura, métodos, gravação das imagens de resultado e PDF. O
+processador fica parado durante as leituras e escritas, e o disco fica parado durante o SSIM.
+Aqui cada captura passa por quatro etapas, cada uma com as suas threads:
+
+    descodificar -> analisar -> codificar -> relatorio
+
+- descodificar: leitura da captura e da referência (mantida em memória), máscara e cache de resultados
+- analisar: analisar_todos (o OpenCV liberta o GIL durante os cálculos)
+- codificar: gravação das imagens de resultado em PNG e da cache de resultados
+- relatorio: relatório PDF e registo no índice do histórico
+
+As etapas estão ligadas por filas limitadas (TAMANHO_FILA): uma etapa lenta enche a sua
+fila de entrada e a anterior fica bloqueada até haver espaço, pelo que a memória ocupada
+pelas imagens em trânsito é limitada e, em regime estável, o débito é o da etapa mais
+lenta e não a soma de todas. As estatísticas (ver Pipeline.estatisticas) mostram o débito,
+a profundidade de cada fila e a ocupação das threads de cada etapa.
+
+São usadas threads e não processos (como em processamento.lote) para que as imagens
+passem entre etapas sem serem copiadas.
+"""
+
+import os # Operações com sistema de ficheiros
+import queue # Filas limitadas entre etapas
+import threading # Trabalhadores de cada etapa
+import time # Débito e ocupação das etapas
+import uuid # Geração de identificadores únicos para cada captura
+from collections import deque # Instantes das conclusões recentes
+
+import cv2  # OpenCV para manipulação de imagens
+
+from output.historico import registar_execucao
+from output.relatorio import gerar_observacoes, gerar_relatorio_pdf_multimetodo, guardar_imagem_resultado
+from processamento.analises import METODOS_DISPONIVEIS, analisar_todos
+from processamento.cache_referencias import obter_dados_referencia
+from processamento.cache_resultados import consultar_cache, guardar_resultado, hash_ficheiro
+from processamento.lote import encontrar_imagem, listar_imagens
+from processamento.mascaras import caminho_mascara, carregar_mascara
+from processamento.mosaicos import TAMANHO_MOSAICO
+
+# Capacidade de cada fila entre etapas (capturas em espera)
+TAMANHO_FILA = 4
+
+# Segundos entre varrimentos da pasta de teste
+INTERVALO_VARRIMENTO = 1.0
+
+# Segundos entre impressões das estatísticas
+INTERVALO_ESTATISTICAS = 10.0
+
+# Janela (em segundos) do débito recente, que ignora os períodos sem capturas mais antigos
+JANELA_DEBITO = 60.0
+
+# Etapas da comparação, pela ordem em que cada captura as atravessa
+ETAPAS = ["descodificar", "analisar", "codificar", "relatorio"]
+
+# Fim do trabalho de uma etapa (um por trabalhador)
+_FIM = object()
+
+
+def trabalhadores_por_omissao():
+    """
+    Devolve o número de threads de cada etapa por omissão.
+
+    A análise usa os núcleos disponíveis; as etapas de disco precisam de poucas threads
+    e o PDF (reportlab, em Python puro) é gerado por uma só.
+
+    Retorna:
+        dict: {etapa: número de threads}
+    """
+
+    return {"descodificar": 2, "analisar": os.cpu_count() or 1, "codificar": 2, "relatorio": 1}
+
+
+class Pipeline:
+    """
+    Etapas com as suas threads, ligadas por filas limitadas.
+
+    Cada etapa é uma função que recebe um item e devolve o item para a etapa seguinte
+    (ou None para o descartar). Uma exceção descarta o item e é contada nos erros da etapa.
+    """
+
+    def __init__(self, etapas, tamanho_fila = TAMANHO_FILA):
+        """
+        Argumentos:
+            etapas (list): Tuplos (nome, funcao, num_trabalhadores), pela ordem das etapas
+            tamanho_fila (int, opcional): Capacidade de cada fila. O default é TAMANHO_FILA.
+        """
+
+        self._etapas = etapas
+        self._filas = [queue.Queue(maxsize = tamanho_fila) for _ in etapas]
+        self.tamanho_fila = tamanho_fila
+        self.inicio = time.perf_counter()
+
+        self._bloqueio = threading.Lock()
+        self._concluidos = 0
+        self._conclusoes = deque(maxlen = 10000)
+        self._ativos = [num_trabalhadores for _, _, num_trabalhadores in etapas]
+        self._estatisticas = [{"processados": 0, "erros": 0, "ocupado": 0.0, "bloqueado": 0.0, "fila_maxima": 0}
+                              for _ in etapas]
+
+        self._threads = []
+        for indice, (nome, _, num_trabalhadores) in enumerate(etapas):
+            for numero in range(num_trabalhadores):
+                thread = threading.Thread(target = self._trabalhar, args = (indice,), name = f"{nome}-{numero}",
+                                          daemon = True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _colocar(self, indice, item, parar = None):
+        """
+        Coloca um item na fila de uma etapa, esperando por espaço (contrapressão).
+
+        Retorna:
+            bool: False se 'parar' tiver sido ativado durante a espera
+        """
+
+        fila = self._filas[indice]
+        while True:
+            try:
+                fila.put(item, timeout = 0.5)
+                break
+            except queue.Full:
+                if parar is not None and parar.is_set():
+                    return False
+
+        estatisticas = self._estatisticas[indice]
+        with self._bloqueio:
+            estatisticas["fila_maxima"] = max(estatisticas["fila_maxima"], fila.qsize())
+        return True
+
+    def submeter(self, item, parar = None):
+        """
+        Entrega um item à primeira etapa; bloqueia enquanto a sua fila estiver cheia.
+
+        Argumentos:
+            item: Item a processar
+            parar (threading.Event, opcional): Interrompe a espera quando ativado. O default é None.
+
+        Retorna:
+            bool: True se o item foi aceite
+        """
+
+        return self._colocar(0, item, parar)
+
+    def _trabalhar(self, indice):
+        """
+        Ciclo de um trabalhador: retira itens da fila da etapa, processa-os e passa-os à seguinte.
+        """
+
+        nome, funcao, _ = self._etapas[indice]
+        estatisticas = self._estatisticas[indice]
+        ultima = indice == len(self._etapas) - 1
+
+        while True:
+            item = self._filas[indice].get()
+            if item is _FIM:
+                break
+
+            inicio = time.perf_counter()
+            try:
+                item = funcao(item)
+                erro = False
+            except Exception as e:
+                print(f"⚠️ Erro na etapa {nome}: {e}")
+                item, erro = None, True
+            duracao = time.perf_counter() - inicio
+
+            with self._bloqueio:
+                estatisticas["processados"] += 1
+                estatisticas["erros"] += erro
+                estatisticas["ocupado"] += duracao
+                if ultima and item is not None:
+                    self._concluidos += 1
+                    self._conclusoes.append(time.perf_counter())
+
+            if item is not None and not ultima:
+                inicio = time.perf_counter()
+                self._colocar(indice + 1, item)
+                with self._bloqueio:
+                    estatisticas["bloqueado"] += time.perf_counter() - inicio
+
+        # O último trabalhador a terminar passa o fim à etapa seguinte
+        with self._bloqueio:
+            self._ativos[indice] -= 1
+            restantes = self._ativos[indice]
+        if restantes == 0 and not ultima:
+            for _ in range(self._etapas[indice + 1][2]):
+                self._filas[indice + 1].put(_FIM)
+
+    def fechar(self):
+        """
+        Termina o pipeline depois de processar todos os itens já submetidos.
+        """
+
+        for _ in range(self._etapas[0][2]):
+            self._filas[0].put(_FIM)
+        for thread in self._threads:
+            thread.join()
+
+    def estatisticas(self):
+        """
+        Devolve o débito do pipeline e o estado de cada etapa.
+
+        A ocupação de uma etapa é a fração do tempo em que as suas threads estiveram a
+        processar; a etapa mais ocupada é a que limita o débito ('estrangulamento').
+
+        Retorna:
+            dict: 'decorrido', 'concluidos', 'debito' (itens por segundo desde o início),
+                'debito_recente' (itens por segundo nos últimos JANELA_DEBITO segundos), 'estrangulamento' e,
+                em 'etapas', por etapa: 'trabalhadores', 'processados', 'erros', 'fila',
+                'fila_maxima', 'tempo_medio', 'ocupacao' e 'bloqueado' (segundos à espera de
+                espaço na fila seguinte)
+        """
+
+        agora = time.perf_counter()
+        decorrido = max(agora - self.inicio, 1e-9)
+        etapas = {}
+        with self._bloqueio:
+            for (nome, _, num_trabalhadores), fila, estatisticas in zip(self._etapas, self._filas, self._estatisticas):
+                processados = estatisticas["processados"]
+                etapas[nome] = {
+                    "trabalhadores": num_trabalhadores,
+                    "processados": processados,
+                    "erros": estatisticas["erros"],
+                    "fila": fila.qsize(),
+                    "fila_maxima": estatisticas["fila_maxima"],
+                    "tempo_medio": estatisticas["ocupado"] / processados if processados else 0.0,
+                    "ocupacao": estatisticas["ocupado"] / (decorrido * num_trabalhadores),
+                    "bloqueado": estatisticas["bloqueado"]
+                }
+            concluidos = self._concluidos
+            recentes = sum(1 for instante in self._conclusoes if agora - instante <= JANELA_DEBITO)
+
+        return {
+            "decorrido": decorrido,
+            "concluidos": concluidos,
+            "debito": concluidos / decorrido,
+            "debito_recente": recentes / min(decorrido, JANELA_DEBITO),
+            "estrangulamento": max(etapas, key = lambda nome: etapas[nome]["ocupacao"]) if etapas else None,
+            "etapas": etapas
+        }
+
+    def resumo(self):
+        """
+        Devolve as estatísticas numa linha de texto (débito, filas e ocupação por etapa).
+        """
+
+        estatisticas = self.estatisticas()
+        etapas = " | ".join(
+            f"{nome} {dados['fila']}/{self.tamanho_fila} {dados['ocupacao'] * 100:.0f}%"
+            for nome, dados in estatisticas["etapas"].items())
+        return (f"📈 {estatisticas['concluidos']} concluídas ({estatisticas['debito'] * 60:.1f}/min, "
+                f"{estatisticas['debito_recente'] * 60:.1f}/min no último minuto) | "
+                f"filas e ocupação: {etapas} | limitado por: {estatisticas['estrangulamento']}")
+
+
+class VigiaPasta:
+    """
+    Compara, em pipeline, cada captura nova (ou alterada) da pasta de teste com a referência
+    com o mesmo nome.
+
+    As referências ficam em memória (relidas quando o ficheiro ou a máscara mudam), tal como
+    no serviço de comparação (ver processamento.servico).
+    """
+
+    def __init__(self, pasta_referencia, pasta_teste, metodos = METODOS_DISPONIVEIS, gerar_pdf = True,
+                 guardar_imagens = True, usar_cache = True, registar_historico = True, trabalhadores = None,
+                 tamanho_fila = TAMANHO_FILA):
+        """
+        Argumentos:
+            pasta_referencia (str): Pasta das imagens de referência
+            pasta_teste (str): Pasta vigiada
+            metodos (list, opcional): Métodos de análise. O default é METODOS_DISPONIVEIS.
+            gerar_pdf (bool, opcional): Gera o relatório PDF de cada captura. O default é True.
+            guardar_imagens (bool, opcional): Grava as imagens de resultado (PNG). O default é True.
+            usar_cache (bool, opcional): Reutiliza a cache de resultados. O default é True.
+            registar_historico (bool, opcional): Regista cada captura no índice do histórico. O default é True.
+            trabalhadores (dict, opcional): Threads por etapa (ver trabalhadores_por_omissao). O default é None.
+            tamanho_fila (int, opcional): Capacidade de cada fila. O default é TAMANHO_FILA.
+        """
+
+        self.pasta_referencia = pasta_referencia
+        self.pasta_teste = pasta_teste
+        self.metodos = list(metodos)
+        self.gerar_pdf = gerar_pdf
+        self.guardar_imagens = guardar_imagens
+        self.usar_cache = usar_cache
+        self.registar_historico = registar_historico
+
+        # Referências em memória: {caminho: (assinatura do ficheiro e da máscara, dados_ref)}
+        self._referencias = {}
+        self._bloqueio_referencias = threading.Lock()
+
+        # Capturas já submetidas e capturas vistas no último varrimento: {caminho: assinatura}
+        self._submetidas = {}
+        self._vistas = {}
+
+        num_trabalhadores = dict(trabalhadores_por_omissao(), **(trabalhadores or {}))
+        funcoes = {"descodificar": self._descodificar, "analisar": self._analisar,
+                   "codificar": self._codificar, "relatorio": self._relatorio}
+        self.pipeline = Pipeline([(etapa, funcoes[etapa], max(1, num_trabalhadores[etapa])) for etapa in ETAPAS],
+                                 tamanho_fila)
+
+    def _obter_referencia(self, caminho):
+        """
+        Devolve os dados de uma referência, lendo-a apenas se for nova ou tiver sido alterada.
+        """
+
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            return None
+        try:
+            estado_mascara = os.stat(caminho_mascara(caminho))
+            assinatura_mascara = (estado_mascara.st_mtime_ns, estado_mascara.st_size)
+        except OSError:
+            assinatura_mascara = None
+        assinatura = (estado.st_mtime_ns, estado.st_size, assinatura_mascara)
+
+        with self._bloqueio_referencias:
+            entrada = self._referencias.get(caminho)
+            if entrada is not None and entrada[0] == assinatura:
+                return entrada[1]
+
+            dados_ref = obter_dados_referencia(caminho)
+            if dados_ref is not None:
+                dados_ref["mascara"] = carregar_mascara(caminho)
+                self._referencias[caminho] = (assinatura, dados_ref)
+            return dados_ref
+
+    def varrer(self, parar = None, estaveis = True):
+        """
+        Procura capturas novas ou alteradas na pasta de teste e entrega-as ao pipeline.
+
+        Com estaveis=True, uma captura só é entregue quando o tamanho e a data de alteração
+        se mantêm entre dois varrimentos (para não ler ficheiros ainda a ser escritos).
+        A entrega bloqueia enquanto a fila da primeira etapa estiver cheia.
+
+        Argumentos:
+            parar (threading.Event, opcional): Interrompe o varrimento quando ativado. O default é None.
+            estaveis (bool, opcional): Espera que cada captura esteja estável. O default é True.
+
+        Retorna:
+            int: Número de capturas entregues
+        """
+
+        vistas = {}
+        entregues = 0
+        for nome, caminho in listar_imagens(self.pasta_teste).items():
+            try:
+                estado = os.stat(caminho)
+            except OSError:
+                continue
+            assinatura = (estado.st_mtime_ns, estado.st_size)
+            vistas[caminho] = assinatura
+
+            if self._submetidas.get(caminho) == assinatura:
+                continue
+            if estaveis and self._vistas.get(caminho) != assinatura:
+                continue
+
+            trabalho = {"nome": nome, "caminho_teste": caminho, "inicio": time.perf_counter()}
+            if not self.pipeline.submeter(trabalho, parar):
+                break
+            self._submetidas[caminho] = assinatura
+            entregues += 1
+
+        self._vistas = vistas
+        return entregues
+
+    def _descodificar(self, trabalho):
+        """
+        Etapa 'descodificar': referência, captura, máscara e consulta da cache de resultados.
+        """
+
+        nome = trabalho["nome"]
+        caminho_referencia = encontrar_imagem(self.pasta_referencia, nome)
+        dados_ref = self._obter_referencia(caminho_referencia) if caminho_referencia else None
+        if dados_ref is None:
+            print(f"⚠️ {nome} ignorada: sem imagem de referência")
+            return None
+
+        img_teste = cv2.imread(trabalho["caminho_teste"])
+        if img_teste is None:
+            print(f"⚠️ {nome} ignorada: erro de leitura")
+            return None
+        if dados_ref["img"].shape != img_teste.shape:
+            print(f"⚠️ {nome} ignorada: tamanhos diferentes ({dados_ref['img'].shape} vs {img_teste.shape})")
+            return None
+
+        # A máscara da referência (se existir) faz parte dos parâmetros e, por isso, da chave da cache
+        opcoes_analise = {"tamanho_mosaico": TAMANHO_MOSAICO}
+        if dados_ref["mascara"] is not None:
+            opcoes_analise["mascara"] = dados_ref["mascara"]
+
+        hash_teste = hash_ficheiro(trabalho["caminho_teste"])
+        chaves_cache, em_cache = {}, {}
+        if self.usar_cache:
+            chaves_cache, em_cache = consultar_cache(dados_ref.get("hash"), hash_teste, self.metodos, opcoes_analise)
+
+        trabalho.update({
+            "identificador": str(uuid.uuid4())[:8],
+            "caminho_referencia": caminho_referencia,
+            "dados_ref": dados_ref,
+            "img_teste": img_teste,
+            "hash_teste": hash_teste,
+            "opcoes_analise": opcoes_analise,
+            "chaves_cache": chaves_cache,
+            "em_cache": em_cache
+        })
+        return trabalho
+
+    def _analisar(self, trabalho):
+        """
+        Etapa 'analisar': executa os métodos que não estão na cache de resultados.
+        """
+
+        metodos_a_analisar = [metodo for metodo in self.metodos if metodo not in trabalho["em_cache"]]
+        resultados_metodos, duracoes = {}, {}
+        if metodos_a_analisar:
+            dados_ref = trabalho["dados_ref"]
+            resultados_metodos, duracoes = analisar_todos(dados_ref["img"], trabalho["img_teste"],
+                                                         metodos = metodos_a_analisar, dados_ref = dados_ref,
+                                                         **trabalho["opcoes_analise"])
+        trabalho["resultados_metodos"] = resultados_metodos
+        trabalho["duracoes"] = duracoes
+        return trabalho
+
+    def _codificar(self, trabalho):
+        """
+        Etapa 'codificar': grava as imagens de resultado (PNG) e guarda os resultados na cache.
+        """
+
+        identificador = trabalho["identificador"]
+        resultados = []
+        for metodo in self.metodos:
+            # Resultado vindo da cache: a imagem de resultado é a da execução original
+            if metodo in trabalho["em_cache"]:
+                entrada = trabalho["em_cache"][metodo]
+                resultados.append({
+                    "metodo": metodo,
+                    "tipo_analise": entrada["tipo_analise"],
+                    "metricas": entrada["metricas"],
+                    "imagem_resultado": entrada["imagem_resultado"],
+                    "duracao": 0.0,
+                    "em_cache": True
+                })
+                continue
+
+            img_resultado, tipo_analise, metricas = trabalho["resultados_metodos"][metodo]
+            duracao = trabalho["duracoes"][metodo]
+
+            caminho_resultado = None
+            if metodo in ["absdiff", "ssim"] and self.guardar_imagens:
+                caminho_resultado = guardar_imagem_resultado(img_resultado, metodo = metodo, identificador = identificador)
+
+            resultados.append({
+                "metodo": metodo,
+                "tipo_analise": tipo_analise,
+                "metricas": metricas,
+                "imagem_resultado": caminho_resultado,
+                "imagem": img_resultado if metodo in ["absdiff", "ssim"] else None,
+                "duracao": duracao
+            })
+
+            # Guarda o resultado na cache (os métodos visuais só se a imagem de resultado foi gravada)
+            if metodo in trabalho["chaves_cache"] and (metodo not in ["absdiff", "ssim"] or caminho_resultado):
+                guardar_resultado(trabalho["chaves_cache"][metodo], metodo, tipo_analise, metricas,
+                                  caminho_resultado, duracao)
+
+        trabalho["resultados"] = resultados
+        del trabalho["resultados_metodos"]
+        return trabalho
+
+    def _relatorio(self, trabalho):
+        """
+        Etapa 'relatorio': relatório PDF, registo no histórico e resumo na consola.
+        """
+
+        dados_ref = trabalho["dados_ref"]
+        resultados = trabalho["resultados"]
+        duracao_analise = sum(resultado["duracao"] for resultado in resultados)
+        em_cache = trabalho["em_cache"]
+
+        caminho_relatorio = None
+        if self.gerar_pdf:
+            caminho_relatorio = gerar_relatorio_pdf_multimetodo(
+                img_ref_path = trabalho["caminho_referencia"],
+                img_teste_path = trabalho["caminho_teste"],
+                resultados = resultados,
+                identificador = trabalho["identificador"],
+                duracao_total = duracao_analise,
+                img_ref = dados_ref["img"],
+                img_teste = trabalho["img_teste"],
+                chave_ref = dados_ref.get("hash"),
+                estatisticas_cache = ({"acertos": len(em_cache), "falhas": len(self.metodos) - len(em_cache)}
+                                      if trabalho["chaves_cache"] else None)
+            )
+
+        if self.registar_historico:
+            registar_execucao(
+                imagem = trabalho["nome"],
+                resultados = resultados,
+                identificador = trabalho["identificador"],
+                imagem_referencia = trabalho["caminho_referencia"],
+                imagem_teste = trabalho["caminho_teste"],
+                hash_referencia = dados_ref.get("hash"),
+                hash_teste = trabalho["hash_teste"],
+                duracao_total = duracao_analise,
+                relatorio = caminho_relatorio
+            )
+
+        observacoes = ", ".join(f"{resultado['metodo']}: {gerar_observacoes(resultado['metodo'], resultado['metricas']).split(' ')[0]}"
+                                for resultado in resultados)
+        print(f"✅ {trabalho['nome']} ({time.perf_counter() - trabalho['inicio']:.2f}s desde a chegada) - {observacoes}")
+
+        # As imagens deixam de ser necessárias: o item concluído só leva os caminhos
+        for resultado in resultados:
+            resultado.pop("imagem", None)
+        for chave in ("dados_ref", "img_teste"):
+            trabalho.pop(chave, None)
+        trabalho["relatorio"] = caminho_relatorio
+        return trabalho
+
+    def executar(self, parar, uma_vez = False, intervalo = INTERVALO_VARRIMENTO,
+                 intervalo_estatisticas = INTERVALO_ESTATISTICAS):
+        """
+        Vigia a pasta até 'parar' ser ativado (ou, com uma_vez, processa as capturas existentes).
+
+        Argumentos:
+            parar (threading.Event): Termina a vigilância quando ativado
+            uma_vez (bool, opcional): Processa as capturas já presentes e termina. O default é False.
+            intervalo (float, opcional): Segundos entre varrimentos. O default é INTERVALO_VARRIMENTO.
+            intervalo_estatisticas (float, opcional): Segundos entre impressões das estatísticas.
+                O default é INTERVALO_ESTATISTICAS.
+
+        Retorna:
+            dict: Estatísticas finais do pipeline (ver Pipeline.estatisticas)
+        """
+
+        ultima_impressao = time.perf_counter()
+        try:
+            while not parar.is_set():
+                self.varrer(parar, estaveis = not uma_vez)
+                if uma_vez:
+                    break
+
+                if time.perf_counter() - ultima_impressao >= intervalo_estatisticas:
+                    print(self.pipeline.resumo())
+                    ultima_impressao = time.perf_counter()
+                parar.wait(intervalo)
+        finally:
+            # As capturas já entregues são concluídas antes de terminar
+            self.pipeline.fechar()
+
+        print(self.pipeline.resumo())
+        return self.pipeline.estatisticas()
@@ -0,0 +1,200 @@
+"""
+Comparação em pirâmide (do grosseiro para o fino) para capturas de alta resolução.
+
+As duas imagens (em cinzentos) são reduzidas com cv2.pyrDown e comparadas a baixa resolução. Os blocos
+onde a diferença reduzida ultrapassa um limiar são as regiões candidatas; só essas são
+depois analisadas à resolução completa, pelos mesmos métodos e com a mesma reunião de
+resultados usada na comparação por mosaicos (ver processamento.mosaicos).
+
+Ao contrário da comparação por mosaicos, este modo é aproximado: uma alteração muito
+pequena ou muito ténue pode desaparecer na redução e não ser analisada. O limiar da
+imagem reduzida (limiar_grosseiro) controla o compromisso entre velocidade e exatidão;
+valores mais baixos analisam mais blocos e aproximam-se do resultado à resolução completa.
+Ver benchmarks/benchmark_piramide.py.
+
+Quando é preciso um limite para o erro, a pirâmide é verificada a partir do nível reduzido
+(verificar_blocos): os blocos que não são candidatos mas têm alguma diferença reduzida são
+ordenados pela diferença máxima, e só os mais suspeitos (FRACAO_VERIFICACAO dos blocos) são
+comparados à resolução completa. Os que têm pixels diferentes passam a ser analisados; os
+pixels diferentes nos suspeitos por verificar são estimados a partir dos menos suspeitos dos
+verificados. Se a estimativa ultrapassar a tolerância, o método é executado à resolução completa.
+A diferença à resolução completa nunca é calculada para a imagem inteira.
+"""
+
+import cv2
+import numpy as np
+
+from processamento.mosaicos import TAMANHO_MOSAICO, dilatar_grelha
+
+# Número de reduções por omissão (cada nível divide largura e altura por 2)
+NIVEIS_PIRAMIDE = 2
+
+# Limiar de diferença em cinzentos na imagem reduzida (metade do limiar do absdiff)
+LIMIAR_GROSSEIRO = 5
+
+# Fração máxima dos pixels analisados com diferenças fora dos blocos selecionados, estimada na
+# verificação (0,01%: o erro estimado na percentagem de pixels diferentes do absdiff fica abaixo de 0,01 pontos)
+TOLERANCIA_PIRAMIDE = 0.0001
+
+# Fração máxima dos blocos da grelha verificados à resolução completa
+FRACAO_VERIFICACAO = 0.1
+
+# Métodos que suportam o modo pirâmide (o histograma é uma medida global)
+METODOS_PIRAMIDE = ["absdiff", "ssim"]
+
+
+def reduzir(img, niveis = NIVEIS_PIRAMIDE):
+    """
+    Reduz uma imagem 'niveis' vezes com cv2.pyrDown.
+
+    Argumentos:
+        img (numpy.ndarray): Imagem a reduzir
+        niveis (int, opcional): Número de reduções. O default é NIVEIS_PIRAMIDE.
+
+    Retorna:
+        numpy.ndarray: Imagem reduzida
+    """
+
+    for _ in range(niveis):
+        img = cv2.pyrDown(img)
+    return img
+
+
+def maximos_por_bloco(img_ref, img_teste, niveis = NIVEIS_PIRAMIDE, tamanho_bloco = TAMANHO_MOSAICO,
+                      ref_reduzida = None):
+    """
+    Calcula, para cada bloco, a maior diferença em cinzentos entre as imagens reduzidas.
+
+    Argumentos:
+        img_ref (numpy.ndarray): Imagem de referência (cinzentos ou BGR)
+        img_teste (numpy.ndarray): Imagem de teste (cinzentos ou BGR)
+        niveis (int, opcional): Número de reduções. O default é NIVEIS_PIRAMIDE.
+        tamanho_bloco (int, opcional): Lado dos blocos da grelha, em pixels da imagem completa.
+            Deve ser múltiplo de 2**niveis. O default é TAMANHO_MOSAICO.
+        ref_reduzida (numpy.ndarray, opcional): img_ref já reduzida 'niveis' vezes (ex: a
+            'gray_reduzida' da cache de referências). O default é None (reduz img_ref).
+
+    Retorna:
+        numpy.ndarray: Grelha uint8 de máximos, alinhada com a grelha de mosaicos do mesmo tamanho
+
+    Erros:
+        ValueError: Se tamanho_bloco não for múltiplo de 2**niveis.
+    """
+
+    escala = 2 ** niveis
+    if tamanho_bloco % escala:
+        raise ValueError(f"O tamanho do bloco ({tamanho_bloco}) tem de ser múltiplo de {escala}.")
+
+    # Diferença entre as imagens reduzidas
+    if ref_reduzida is None:
+        ref_reduzida = reduzir(img_ref, niveis)
+    diff = cv2.absdiff(ref_reduzida, reduzir(img_teste, niveis))
+    if diff.ndim == 3:
+        diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+
+    # Um pixel de margem compensa o espalhamento do filtro gaussiano do pyrDown
+    diff = cv2.dilate(diff, np.ones((3, 3), dtype = np.uint8))
+
+    # Agrupa os pixels reduzidos em blocos e guarda o máximo de cada um
+    altura, largura = img_teste.shape[:2]
+    linhas = -(-altura // tamanho_bloco)
+    colunas = -(-largura // tamanho_bloco)
+    lado = tamanho_bloco // escala
+
+    preenchido = np.zeros((linhas * lado, colunas * lado), dtype = np.uint8)
+    h = min(diff.shape[0], preenchido.shape[0])
+    w = min(diff.shape[1], preenchido.shape[1])
+    preenchido[:h, :w] = diff[:h, :w]
+
+    return preenchido.reshape(linhas, lado, colunas, lado).max(axis = (1, 3))
+
+
+def grelha_candidatos(img_ref, img_teste, niveis = NIVEIS_PIRAMIDE, limiar_grosseiro = LIMIAR_GROSSEIRO,
+                      tamanho_bloco = TAMANHO_MOSAICO):
+    """
+    Deteta os blocos candidatos a conter diferenças, a partir das imagens reduzidas.
+
+    Argumentos:
+        img_ref (numpy.ndarray): Imagem de referência (cinzentos ou BGR)
+        img_teste (numpy.ndarray): Imagem de teste (cinzentos ou BGR)
+        niveis (int, opcional): Número de reduções. O default é NIVEIS_PIRAMIDE.
+        limiar_grosseiro (int, opcional): Diferença mínima em cinzentos na imagem reduzida.
+            O default é LIMIAR_GROSSEIRO.
+        tamanho_bloco (int, opcional): Lado dos blocos da grelha, em pixels da imagem completa.
+            Deve ser múltiplo de 2**niveis. O default é TAMANHO_MOSAICO.
+
+    Retorna:
+        numpy.ndarray: Grelha booleana de blocos, alinhada com a grelha de mosaicos do mesmo tamanho
+
+    Erros:
+        ValueError: Se tamanho_bloco não for múltiplo de 2**niveis.
+    """
+
+    return maximos_por_bloco(img_ref, img_teste, niveis, tamanho_bloco) > limiar_grosseiro
+
+
+def verificar_blocos(img_ref, img_teste, maximos, selecao, limiar, tamanho_bloco = TAMANHO_MOSAICO,
+                     fracao = FRACAO_VERIFICACAO, mascara = None):
+    """
+    Verifica à resolução completa os blocos suspeitos que ficaram fora da seleção da pirâmide.
+
+    São suspeitos os blocos não selecionados com diferença reduzida (maximos) não nula. Os mais
+    suspeitos, até 'fracao' dos blocos da grelha, são comparados bloco a bloco como no método
+    absdiff; os que têm pixels diferentes são acrescentados à seleção. Os pixels diferentes nos
+    suspeitos por verificar são estimados pela média da metade menos suspeita dos verificados
+    (a diferença reduzida de um bloco não verificado nunca é maior do que a dessa metade).
+
+    Argumentos:
+        img_ref (numpy.ndarray): Imagem de referência (BGR)
+        img_teste (numpy.ndarray): Imagem de teste (BGR)
+        maximos (numpy.ndarray): Grelha de máximos devolvida por maximos_por_bloco
+        selecao (numpy.ndarray): Grelha booleana dos blocos já selecionados
+        limiar (int): Diferença mínima em cinzentos de um pixel diferente (limiar do absdiff)
+        tamanho_bloco (int, opcional): Lado dos blocos da grelha. O default é TAMANHO_MOSAICO.
+        fracao (float, opcional): Fração máxima dos blocos verificados. O default é FRACAO_VERIFICACAO.
+        mascara (numpy.ndarray, opcional): Máscara uint8 (255 = analisar); os restantes pixels
+            não são contados. O default é None (todos os pixels).
+
+    Retorna:
+        tuple: (selecao_refinada, resumo)
+            - selecao_refinada (numpy.ndarray): Nova grelha booleana com os blocos encontrados
+            - resumo (dict): blocos_suspeitos, blocos_verificados, blocos_refinados e
+              pixels_fora_estimados (0 se todos os suspeitos foram verificados)
+    """
+
+    # Suspeitos por ordem decrescente de diferença reduzida
+    suspeitos = np.flatnonzero(~selecao & (maximos > 0))
+    suspeitos = suspeitos[np.argsort(maximos.ravel()[suspeitos], kind = "stable")[::-1]]
+    verificados = suspeitos[:max(1, int(fracao * maximos.size))]
+
+    colunas = maximos.shape[1]
+    contagens = np.zeros(len(verificados), dtype = np.int64)
+    for i, indice in enumerate(verificados):
+        y = indice // colunas * tamanho_bloco
+        x = indice % colunas * tamanho_bloco
+        diff = cv2.absdiff(img_ref[y:y + tamanho_bloco, x:x + tamanho_bloco],
+                           img_teste[y:y + tamanho_bloco, x:x + tamanho_bloco])
+        if diff.ndim == 3:
+            diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+        _, diferentes = cv2.threshold(diff, limiar, 255, cv2.THRESH_BINARY)
+        if mascara is not None:
+            diferentes &= mascara[y:y + tamanho_bloco, x:x + tamanho_bloco]
+        contagens[i] = cv2.countNonZero(diferentes)
+
+    refinada = selecao.copy()
+    refinada.ravel()[verificados[contagens > 0]] = True
+
+    # Extrapolação para os suspeitos que ficaram por verificar
+    por_verificar = len(suspeitos) - len(verificados)
+    estimados = 0
+    if por_verificar > 0:
+        menos_suspeitos = contagens[len(contagens) // 2:]
+        estimados = int(np.ceil(menos_suspeitos.mean() * por_verificar))
+
+    resumo = {
+        "blocos_suspeitos": int(len(suspeitos)),
+        "blocos_verificados": int(len(verificados)),
+        "blocos_refinados": int(np.count_nonzero(contagens)),
+        "pixels_fora_estimados": estimados
+    }
+    return refinada, resumo
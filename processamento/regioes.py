@@ -0,0 +1,424 @@
+"""
+Extração de regiões com diferenças a partir de uma máscara binária.
+
+Uma única passagem de cv2.connectedComponentsWithStats rotula a máscara e devolve, para
+cada região, a caixa envolvente, a área e o centróide. As regiões mais pequenas do que
+uma área mínima (ex: um pixel isolado a cintilar) são descartadas e, opcionalmente, as
+caixas próximas umas das outras são fundidas numa só região.
+
+A máscara devolvida contém apenas os pixels das regiões mantidas e serve diretamente
+para desenhar o overlay, sem voltar a percorrer a máscara.
+"""
+
+import cv2  # OpenCV para a rotulagem de componentes ligados
+import numpy as np
+
+# Área mínima (em pixels) de uma região: abaixo de um bloco 2x2 são pixels isolados a cintilar
+# ou restos de anti-aliasing, não alterações visíveis; 1 mantém todas as regiões
+AREA_MINIMA = 4
+
+# Distância máxima (em pixels) entre caixas a fundir; 0 desativa a fusão
+DISTANCIA_FUSAO = 0
+
+
+def _pares_proximos(caixas, distancia):
+    """
+    Devolve os pares de caixas cujas versões alargadas pela distância se tocam.
+
+    Em vez de comparar todas as caixas entre si (matriz n x n), as caixas são ordenadas
+    por x0 e cada uma só é comparada com as seguintes cujo x0 ainda fica dentro do seu
+    alcance horizontal (sort-and-sweep); a sobreposição vertical é verificada apenas
+    nesses candidatos.
+
+    Argumentos:
+        caixas (numpy.ndarray): Caixas (x0, y0, x1, y1) com x1 e y1 exclusivos, int64
+        distancia (int): Distância máxima entre caixas a fundir
+
+    Retorna:
+        tuple: (i, j) arrays com os índices (nas caixas originais) de cada par próximo
+    """
+
+    ordem = np.argsort(caixas[:, 0], kind = "stable")
+    x0, y0, x1, y1 = (caixas[ordem, i] for i in range(4))
+
+    # Candidatos de cada caixa: as seguintes (por x0) com x0 < x1 + distancia; como x0 <= x0
+    # da candidata < x1 da candidata, a condição simétrica em x verifica-se sempre
+    fim = np.searchsorted(x0, x1 + distancia, side = "left")
+    inicio = np.arange(1, len(x0) + 1)
+    contagens = np.maximum(fim - inicio, 0)
+    i = np.repeat(np.arange(len(x0)), contagens)
+    j = np.arange(contagens.sum()) - np.repeat(np.cumsum(contagens) - contagens, contagens) + i + 1
+
+    proximas = (y0[i] < y1[j] + distancia) & (y0[j] < y1[i] + distancia)
+    return ordem[i[proximas]], ordem[j[proximas]]
+
+
+def _fundir_caixas(caixas, areas, somas_x, somas_y, distancia):
+    """
+    Funde as caixas que ficam a 'distancia' pixels ou menos umas das outras.
+
+    Repete até não haver caixas a fundir, porque uma caixa fundida pode ficar próxima
+    de outras que antes estavam afastadas.
+
+    Argumentos:
+        caixas (numpy.ndarray): Caixas (x0, y0, x1, y1) com x1 e y1 exclusivos, int64
+        areas (numpy.ndarray): Área de cada caixa
+        somas_x (numpy.ndarray): Soma das coordenadas x dos pixels de cada caixa
+        somas_y (numpy.ndarray): Soma das coordenadas y dos pixels de cada caixa
+        distancia (int): Distância máxima entre caixas a fundir
+
+    Retorna:
+        tuple: (caixas, areas, somas_x, somas_y) após a fusão
+    """
+
+    while len(caixas) > 1:
+        i, j = _pares_proximos(caixas, distancia)
+        if not len(i):
+            break
+
+        # Grupos de caixas ligadas: cada caixa fica com o menor índice do seu grupo
+        # (propagação do mínimo pelos pares próximos, com compressão de caminhos)
+        pai = np.arange(len(caixas))
+        while True:
+            novo = pai.copy()
+            np.minimum.at(novo, i, pai[j])
+            np.minimum.at(novo, j, pai[i])
+            novo = novo[novo]
+            if np.array_equal(novo, pai):
+                break
+            pai = novo
+
+        grupos, indices = np.unique(pai, return_inverse = True)
+
+        # Caixa envolvente e somas de cada grupo
+        x0, y0, x1, y1 = (caixas[:, k] for k in range(4))
+        novas = np.empty((len(grupos), 4), dtype = caixas.dtype)
+        novas[:, :2] = np.iinfo(caixas.dtype).max
+        novas[:, 2:] = np.iinfo(caixas.dtype).min
+        np.minimum.at(novas[:, 0], indices, x0)
+        np.minimum.at(novas[:, 1], indices, y0)
+        np.maximum.at(novas[:, 2], indices, x1)
+        np.maximum.at(novas[:, 3], indices, y1)
+
+        caixas = novas
+        areas = np.bincount(indices, areas)
+        somas_x = np.bincount(indices, somas_x)
+        somas_y = np.bincount(indices, somas_y)
+
+    return caixas, areas, somas_x, somas_y
+
+
+def faixas_horizontais(altura, num_faixas):
+    """
+    Divide um intervalo de linhas em faixas horizontais contíguas de altura semelhante.
+
+    As fronteiras interiores ficam em linhas pares, para que a rotulagem de cada faixa
+    percorra os pixels pela mesma ordem que a rotulagem da máscara completa (ver
+    _extrair_em_faixas).
+
+    Argumentos:
+        altura (int): Número de linhas a dividir
+        num_faixas (int): Número de faixas pretendido
+
+    Retorna:
+        list: Faixas (y0, y1) com y1 exclusivo, pela ordem das linhas
+    """
+
+    num_faixas = max(1, min(num_faixas, altura // 2))
+    limites = [0] + [(altura * i // num_faixas) & ~1 for i in range(1, num_faixas)] + [altura]
+    return [(y0, y1) for y0, y1 in zip(limites, limites[1:]) if y1 > y0]
+
+
+def montar_regioes(caixas, areas, somas_x, somas_y, distancia_fusao):
+    """
+    Funde as caixas próximas (se pedido) e devolve as regiões por área decrescente.
+
+    Argumentos:
+        caixas (numpy.ndarray): Caixas (x0, y0, x1, y1) das componentes, pela ordem de rotulagem
+        areas (numpy.ndarray): Área de cada componente (float64)
+        somas_x (numpy.ndarray): Soma das coordenadas x dos pixels de cada componente
+        somas_y (numpy.ndarray): Soma das coordenadas y dos pixels de cada componente
+        distancia_fusao (int): Distância máxima entre caixas a fundir
+
+    Retorna:
+        list: Regiões (ver extrair_regioes)
+    """
+
+    if distancia_fusao > 0:
+        caixas, areas, somas_x, somas_y = _fundir_caixas(caixas, areas, somas_x, somas_y, distancia_fusao)
+
+    regioes = []
+    for indice in np.argsort(-areas, kind = "stable"):
+        x0, y0, x1, y1 = (int(v) for v in caixas[indice])
+        area = areas[indice]
+        regioes.append({
+            "x": x0,
+            "y": y0,
+            "largura": x1 - x0,
+            "altura": y1 - y0,
+            "area": int(area),
+            "centroide": [round(float(somas_x[indice] / area), 2), round(float(somas_y[indice] / area), 2)]
+        })
+    return regioes
+
+
+def rotular(recorte):
+    """
+    Rotula as componentes ligadas (conectividade 8) de um recorte da máscara.
+
+    Retorna:
+        tuple: (rotulos, stats, centroides), sem o rótulo 0 (fundo) em stats e centroides
+    """
+
+    # Conectividade 8, a mesma dos contornos usados anteriormente (cv2.findContours)
+    _, rotulos, stats, centroides = cv2.connectedComponentsWithStats(recorte, connectivity = 8, ltype = cv2.CV_32S)
+    return rotulos, stats[1:].astype(np.int64), centroides[1:]
+
+
+def _pares_fronteira(superior, inferior, base_superior, base_inferior):
+    """
+    Devolve os pares de fragmentos de duas faixas consecutivas que se tocam na fronteira.
+
+    Com conectividade 8, um pixel da última linha da faixa superior toca os três pixels
+    por baixo dele (diagonais incluídas) na primeira linha da faixa inferior.
+
+    Argumentos:
+        superior (numpy.ndarray): Rótulos da última linha da faixa superior
+        inferior (numpy.ndarray): Rótulos da primeira linha da faixa inferior
+        base_superior (int): Índice global do primeiro fragmento da faixa superior
+        base_inferior (int): Índice global do primeiro fragmento da faixa inferior
+
+    Retorna:
+        numpy.ndarray: Pares (i, j) de índices globais de fragmentos, sem repetições
+    """
+
+    largura = len(superior)
+    pares = []
+    for deslocamento in (-1, 0, 1):
+        a = superior[max(0, -deslocamento):largura - max(0, deslocamento)]
+        b = inferior[max(0, deslocamento):largura - max(0, -deslocamento)]
+        tocam = (a > 0) & (b > 0)
+        pares.append(np.stack((a[tocam] - 1 + base_superior, b[tocam] - 1 + base_inferior), axis = 1))
+    return np.unique(np.concatenate(pares), axis = 0)
+
+
+class AcumuladorRegioes:
+    """
+    Junta as regiões de uma máscara rotulada por faixas horizontais.
+
+    Cada faixa é rotulada à parte (ver rotular) e entregue pela ordem das linhas. Os
+    fragmentos de uma mesma região em faixas vizinhas são unidos pelos pixels que se tocam
+    na fronteira, e a caixa, a área e as somas das coordenadas de cada região resultam das
+    dos seus fragmentos. Só a última linha de rótulos da faixa anterior fica guardada, pelo
+    que a memória usada não depende da altura da máscara, apenas do número de fragmentos.
+
+    Cada região fica identificada pelo seu primeiro fragmento (faixa e rótulo), a mesma
+    ordem que a rotulagem da máscara completa daria quando as fronteiras ficam em linhas
+    pares (ver faixas_horizontais).
+
+    Usado pela rotulagem em paralelo (ver _extrair_em_faixas) e pela análise de imagens
+    muito grandes faixa a faixa (ver processamento.faixas).
+    """
+
+    def __init__(self):
+        self._caixas = []       # Caixas (x0, y0, x1, y1) dos fragmentos de cada faixa, em coordenadas globais
+        self._areas = []        # Área dos fragmentos de cada faixa
+        self._somas = []        # Somas das coordenadas (x, y) dos pixels dos fragmentos de cada faixa
+        self._pares = []        # Pares de fragmentos que se tocam nas fronteiras
+        self._bases = [0]       # Índice global do primeiro fragmento de cada faixa
+        self._anterior = None   # (última linha de rótulos, base, linha seguinte, x0) da faixa anterior
+        self._regiao = None     # Região de cada fragmento (depois de concluir)
+
+    def adicionar(self, rotulos, stats, centroides, x0, y0):
+        """
+        Acrescenta os fragmentos de uma faixa (a seguir, em linhas, às anteriores).
+
+        Argumentos:
+            rotulos (numpy.ndarray): Rótulos da faixa, tal como devolvidos por rotular
+            stats (numpy.ndarray): Estatísticas dos fragmentos, sem o fundo
+            centroides (numpy.ndarray): Centróides dos fragmentos, sem o fundo
+            x0 (int): Coluna da imagem onde começa a faixa
+            y0 (int): Linha da imagem onde começa a faixa
+
+        Retorna:
+            int: Índice da faixa (a usar em mantidos)
+        """
+
+        base = self._bases[-1]
+        anterior = self._anterior
+        if anterior is not None and anterior[2] == y0 and anterior[3] == x0 and len(stats):
+            self._pares.append(_pares_fronteira(anterior[0], rotulos[0], anterior[1], base))
+
+        esquerda = stats[:, cv2.CC_STAT_LEFT] + x0
+        topo = stats[:, cv2.CC_STAT_TOP] + y0
+        self._caixas.append(np.stack((esquerda, topo, esquerda + stats[:, cv2.CC_STAT_WIDTH],
+                                      topo + stats[:, cv2.CC_STAT_HEIGHT]), axis = 1))
+        areas = stats[:, cv2.CC_STAT_AREA].astype(np.float64)
+        self._areas.append(areas)
+        # Os centróides fundidos são a média pesada pela área, por isso guardam-se somas
+        self._somas.append((centroides + (x0, y0)) * areas[:, None])
+
+        self._anterior = (rotulos[-1].copy(), base, y0 + rotulos.shape[0], x0)
+        self._bases.append(base + len(stats))
+        return len(self._bases) - 2
+
+    def concluir(self):
+        """
+        Une os fragmentos que se tocam e calcula a caixa, a área e as somas de cada região.
+
+        Retorna:
+            tuple: (caixas, areas, somas_x, somas_y), pela ordem de rotulagem (ver montar_regioes)
+        """
+
+        pai = np.arange(self._bases[-1])
+        for pares in self._pares:
+            for i, j in pares:
+                while pai[i] != i:
+                    i = pai[i]
+                while pai[j] != j:
+                    j = pai[j]
+                # A raiz é sempre o fragmento mais antigo, o que preserva a ordem de rotulagem
+                if i != j:
+                    pai[max(i, j)] = min(i, j)
+
+        # Região de cada fragmento (as raízes, por ordem crescente, são a ordem de rotulagem)
+        for i in range(len(pai)):
+            pai[i] = pai[pai[i]]
+        _, regiao = np.unique(pai, return_inverse = True)
+        self._regiao = regiao
+
+        num_regioes = int(regiao.max()) + 1 if len(regiao) else 0
+        if not num_regioes:
+            vazio = np.zeros(0, dtype = np.float64)
+            return np.zeros((0, 4), dtype = np.int64), vazio, vazio, vazio
+
+        fragmentos = np.concatenate(self._caixas)
+        caixas = np.empty((num_regioes, 4), dtype = np.int64)
+        caixas[:, :2] = np.iinfo(np.int64).max
+        caixas[:, 2:] = np.iinfo(np.int64).min
+        np.minimum.at(caixas[:, 0], regiao, fragmentos[:, 0])
+        np.minimum.at(caixas[:, 1], regiao, fragmentos[:, 1])
+        np.maximum.at(caixas[:, 2], regiao, fragmentos[:, 2])
+        np.maximum.at(caixas[:, 3], regiao, fragmentos[:, 3])
+
+        somas = np.concatenate(self._somas)
+        areas = np.bincount(regiao, np.concatenate(self._areas), minlength = num_regioes)
+        somas_x = np.bincount(regiao, somas[:, 0], minlength = num_regioes)
+        somas_y = np.bincount(regiao, somas[:, 1], minlength = num_regioes)
+        return caixas, areas, somas_x, somas_y
+
+    def mantidos(self, indice_faixa, filtro):
+        """
+        Devolve a tabela rótulo -> valor da máscara (0 ou 255) de uma faixa, depois de concluir.
+
+        Argumentos:
+            indice_faixa (int): Índice da faixa devolvido por adicionar
+            filtro (numpy.ndarray): Regiões mantidas (bool, pela ordem devolvida por concluir)
+
+        Retorna:
+            numpy.ndarray: Tabela uint8 a indexar com os rótulos da faixa
+        """
+
+        inicio, fim = self._bases[indice_faixa], self._bases[indice_faixa + 1]
+        return np.concatenate(([0], filtro[self._regiao[inicio:fim]] * 255)).astype(np.uint8)
+
+
+def _extrair_em_faixas(recorte, rx, ry, executor, num_faixas):
+    """
+    Rotula o recorte da máscara em faixas horizontais, em paralelo, e junta os fragmentos.
+
+    Cada faixa é rotulada numa thread (o OpenCV liberta o GIL) e os fragmentos são juntos
+    por AcumuladorRegioes. Como as fronteiras das faixas ficam em linhas pares, as regiões,
+    e a ordem das de igual área, coincidem com as de extrair_regioes sem faixas.
+
+    Retorna:
+        tuple: (caixas, areas, somas_x, somas_y, pintar_mantidas), com pintar_mantidas uma função
+            que recebe o filtro das regiões mantidas e pinta os seus pixels numa máscara
+    """
+
+    faixas = faixas_horizontais(recorte.shape[0], num_faixas)
+    partes = list(executor.map(lambda faixa: rotular(recorte[faixa[0]:faixa[1]]), faixas))
+
+    acumulador = AcumuladorRegioes()
+    for (y0, _), (rotulos, stats, centroides) in zip(faixas, partes):
+        acumulador.adicionar(rotulos, stats, centroides, rx, ry + y0)
+    caixas, areas, somas_x, somas_y = acumulador.concluir()
+
+    def pintar_mantidas(filtro, destino):
+        # Cada faixa pinta os seus fragmentos das regiões mantidas
+        def pintar(k):
+            y0, y1 = faixas[k]
+            destino[ry + y0:ry + y1, rx:rx + recorte.shape[1]] = acumulador.mantidos(k, filtro)[partes[k][0]]
+        list(executor.map(pintar, range(len(partes))))
+
+    return caixas, areas, somas_x, somas_y, pintar_mantidas
+
+
+def extrair_regioes(mask, area_minima = AREA_MINIMA, distancia_fusao = DISTANCIA_FUSAO, executor = None,
+                    num_faixas = 1):
+    """
+    Extrai as regiões de uma máscara binária numa única passagem de rotulagem.
+
+    A rotulagem é feita apenas dentro do retângulo que envolve os pixels diferentes, o que
+    torna o custo proporcional à zona alterada e não à resolução da imagem. Com um executor
+    e mais de uma faixa, o retângulo é rotulado em faixas horizontais em paralelo e as
+    regiões cortadas pelas fronteiras são reconstituídas (ver _extrair_em_faixas).
+
+    Argumentos:
+        mask (numpy.ndarray): Máscara uint8 (pixels diferentes com valor diferente de zero)
+        area_minima (int, opcional): Área mínima (em pixels) de uma região; regiões mais pequenas
+            são descartadas. O default é AREA_MINIMA (1 mantém todas).
+        distancia_fusao (int, opcional): Distância máxima entre caixas a fundir numa só região.
+            O default é DISTANCIA_FUSAO (sem fusão).
+        executor (concurrent.futures.Executor, opcional): Threads para a rotulagem em faixas.
+            O default é None (uma única passagem).
+        num_faixas (int, opcional): Número de faixas com executor. O default é 1.
+
+    Retorna:
+        tuple: (regioes, mascara_regioes)
+            - regioes (list): Regiões ordenadas por área decrescente, cada uma um dicionário com
+              'x', 'y', 'largura', 'altura', 'area' (pixels diferentes) e 'centroide' ([x, y])
+            - mascara_regioes (numpy.ndarray): Máscara uint8 dos pixels das regiões mantidas; é a
+              própria 'mask' quando nenhuma região foi descartada pelo filtro de área
+    """
+
+    # Retângulo que envolve todos os pixels diferentes
+    rx, ry, rw, rh = cv2.boundingRect(mask)
+    if rw == 0 or rh == 0:
+        return [], mask
+
+    # O retângulo começa numa linha par: a rotulagem percorre a máscara em blocos de duas linhas,
+    # e a ordem dos rótulos (que desempata as regiões com a mesma área) fica igual à da máscara
+    # completa e à da análise faixa a faixa (ver processamento.faixas)
+    rh += ry & 1
+    ry &= ~1
+    recorte = mask[ry:ry + rh, rx:rx + rw]
+
+    if executor is not None and num_faixas > 1 and rh >= 4:
+        caixas, areas, somas_x, somas_y, pintar_mantidas = _extrair_em_faixas(recorte, rx, ry, executor, num_faixas)
+    else:
+        rotulos, stats, centroides = rotular(recorte)
+        x0 = stats[:, cv2.CC_STAT_LEFT] + rx
+        y0 = stats[:, cv2.CC_STAT_TOP] + ry
+        caixas = np.stack((x0, y0, x0 + stats[:, cv2.CC_STAT_WIDTH], y0 + stats[:, cv2.CC_STAT_HEIGHT]), axis = 1)
+        areas = stats[:, cv2.CC_STAT_AREA].astype(np.float64)
+
+        # Os centróides fundidos são a média pesada pela área, por isso guardam-se somas
+        centroides = centroides + (rx, ry)
+        somas_x = centroides[:, 0] * areas
+        somas_y = centroides[:, 1] * areas
+
+        def pintar_mantidas(filtro, destino):
+            mantidos = np.concatenate(([0], filtro * 255)).astype(np.uint8)
+            destino[ry:ry + rh, rx:rx + rw] = mantidos[rotulos]
+
+    # Descarta as componentes abaixo da área mínima e apaga-as de uma cópia da máscara
+    mascara_regioes = mask
+    if area_minima > 1:
+        filtro = areas >= area_minima
+        if not filtro.all():
+            mascara_regioes = np.zeros_like(mask)
+            pintar_mantidas(filtro, mascara_regioes)
+            caixas, areas, somas_x, somas_y = caixas[filtro], areas[filtro], somas_x[filtro], somas_y[filtro]
+
+    return montar_regioes(caixas, areas, somas_x, somas_y, distancia_fusao), mascara_regioes
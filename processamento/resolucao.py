@@ -0,0 +1,159 @@
+"""
+Comparação a uma resolução de trabalho comum (capturas de dispositivos diferentes).
+
+Os dispositivos de teste produzem o mesmo ecrã em 720p, 1080p ou 1440p, e a comparação
+direta exige imagens com as mesmas dimensões. Com uma resolução de trabalho, as duas imagens
+são reduzidas (ou ampliadas) para ela com cv2.INTER_AREA e todos os métodos correm aí; as
+regiões com diferenças e a imagem de resultado voltam depois às coordenadas nativas da
+imagem de teste (ver processamento.analises.analisar_todos com 'resolucao').
+
+A mesma opção limita o custo de cada comparação em capturas de resolução muito alta,
+mesmo quando as duas imagens têm as mesmas dimensões.
+
+Nota:
+    A resolução de trabalho é uma escala de cada eixo para as dimensões pedidas: imagens com
+    proporções diferentes ficam deformadas da mesma forma e continuam comparáveis, mas as
+    regiões mapeadas de volta só são exatas ao nível do pixel da resolução de trabalho.
+    As métricas de pixels (total_pixels, pixels_diferentes, regioes[].area) são contadas à
+    resolução de trabalho; as percentagens não dependem dela.
+
+    Imagens com dimensões nativas diferentes são redimensionadas com fatores diferentes e o erro
+    de interpolação não é o mesmo nas duas: sem tolerância, o mesmo ecrã em 720p e em 1080p dá
+    milhares de pequenas regiões ao longo das arestas (~2% de pixels diferentes). Nesse caso, por
+    omissão, as duas imagens de trabalho recebem um desfoque gaussiano leve e o absdiff usa um
+    limiar e uma área mínima mais altos (TOLERANCIA_REAMOSTRAGEM, parâmetro tolerancia_reamostragem
+    de analisar_todos; None desativa-a). A tolerância aplicada fica em metricas['resolucao'].
+    Com as mesmas dimensões nativas, o redimensionamento é igual nas duas imagens e nada disto
+    é aplicado.
+"""
+
+import math # Arredondamento das caixas para fora
+
+import cv2  # OpenCV para redimensionamento
+
+# Resolução de trabalho sugerida (largura, altura) para comparar capturas de dispositivos diferentes
+RESOLUCAO_TRABALHO = (1280, 720)
+
+# Tolerância ao erro de reamostragem, quando as duas imagens têm dimensões nativas diferentes
+TOLERANCIA_REAMOSTRAGEM = {
+    "suavizacao": 1.0,      # Desvio padrão do desfoque gaussiano aplicado às duas imagens de trabalho
+    "limiar_diferenca": 15, # Limiar do absdiff (em vez de analises.LIMIAR_DIFERENCA)
+    "area_minima": 16       # Área mínima das regiões (em pixels da resolução de trabalho)
+}
+
+
+def interpretar_resolucao(texto):
+    """
+    Converte uma resolução escrita como 'LARGURAxALTURA' (ex: '1280x720').
+
+    Argumentos:
+        texto (str): Resolução em texto
+
+    Retorna:
+        tuple: (largura, altura)
+
+    Erros:
+        ValueError: Se o texto não tiver o formato esperado ou as dimensões não forem positivas
+    """
+
+    try:
+        largura, altura = (int(parte) for parte in texto.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"Resolução inválida: {texto} (formato LARGURAxALTURA, ex: 1280x720)") from None
+    if largura <= 0 or altura <= 0:
+        raise ValueError(f"Resolução inválida: {texto} (as dimensões têm de ser positivas)")
+    return largura, altura
+
+
+def redimensionar(img, resolucao):
+    """
+    Redimensiona uma imagem para a resolução de trabalho com interpolação por área.
+
+    Argumentos:
+        img (numpy.ndarray): Imagem a redimensionar
+        resolucao (tuple): (largura, altura) de trabalho
+
+    Retorna:
+        numpy.ndarray: Imagem redimensionada (a própria imagem, se já tiver essas dimensões)
+    """
+
+    largura, altura = resolucao
+    if img.shape[1] == largura and img.shape[0] == altura:
+        return img
+    return cv2.resize(img, (largura, altura), interpolation = cv2.INTER_AREA)
+
+
+def suavizar(img, sigma):
+    """
+    Aplica um desfoque gaussiano leve, que atenua o erro de interpolação nas arestas.
+
+    Argumentos:
+        img (numpy.ndarray): Imagem à resolução de trabalho
+        sigma (float): Desvio padrão do desfoque
+
+    Retorna:
+        numpy.ndarray: Nova imagem desfocada
+    """
+
+    return cv2.GaussianBlur(img, (0, 0), sigma)
+
+
+def escalar_retangulo(retangulo, escala_x, escala_y):
+    """
+    Escala um retângulo [x, y, largura, altura], arredondando para fora (o resultado cobre sempre o original).
+    """
+
+    x, y, largura, altura = retangulo
+    x0, y0 = math.floor(x * escala_x), math.floor(y * escala_y)
+    x1, y1 = math.ceil((x + largura) * escala_x), math.ceil((y + altura) * escala_y)
+    return [x0, y0, x1 - x0, y1 - y0]
+
+
+def escalar_mascara(definicao, escala_x, escala_y):
+    """
+    Converte uma definição de máscara (ver processamento.mascaras) para a resolução de trabalho.
+
+    Argumentos:
+        definicao (dict): Definição com 'roi' e/ou 'ignorar', em coordenadas da referência
+        escala_x (float): Escala horizontal (trabalho / referência)
+        escala_y (float): Escala vertical (trabalho / referência)
+
+    Retorna:
+        dict: Nova definição, com os retângulos escalados
+    """
+
+    escalada = dict(definicao)
+    for campo in ("roi", "ignorar"):
+        if definicao.get(campo):
+            escalada[campo] = [escalar_retangulo(retangulo, escala_x, escala_y) for retangulo in definicao[campo]]
+    return escalada
+
+
+def escalar_regioes(regioes, escala_x, escala_y, largura_maxima, altura_maxima):
+    """
+    Converte as regiões com diferenças para as coordenadas nativas da imagem de teste.
+
+    As caixas são arredondadas para fora e limitadas à imagem; a área mantém-se em pixels
+    da resolução de trabalho.
+
+    Argumentos:
+        regioes (list): Regiões tal como devolvidas por processamento.regioes.extrair_regioes
+        escala_x (float): Escala horizontal (teste / trabalho)
+        escala_y (float): Escala vertical (teste / trabalho)
+        largura_maxima (int): Largura da imagem de teste
+        altura_maxima (int): Altura da imagem de teste
+
+    Retorna:
+        list: As mesmas regiões, alteradas no próprio lugar
+    """
+
+    for regiao in regioes:
+        x, y, largura, altura = escalar_retangulo((regiao["x"], regiao["y"], regiao["largura"], regiao["altura"]),
+                                                  escala_x, escala_y)
+        regiao["x"], regiao["y"] = max(x, 0), max(y, 0)
+        regiao["largura"] = min(x + largura, largura_maxima) - regiao["x"]
+        regiao["altura"] = min(y + altura, altura_maxima) - regiao["y"]
+        # Centróide medido entre centros de pixels: o centro do pixel i fica em (i + 0.5) * escala - 0.5
+        cx, cy = regiao["centroide"]
+        regiao["centroide"] = [round((cx + 0.5) * escala_x - 0.5, 2), round((cy + 0.5) * escala_y - 0.5, 2)]
+    return regioes
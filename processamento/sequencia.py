@@ -0,0 +1,435 @@
+"""
+Comparação de sequências de frames (vídeos ou pastas de frames numerados) com uma gravação de referência.
+
+Os frames das duas origens são lidos por geradores (cv2.VideoCapture ou uma pasta de
+imagens) e comparados aos pares, pela ordem, sem nunca serem extraídos para PNG:
+
+- um par de frames igual ao anterior (mesmo hash do conteúdo nas duas origens) não é
+  analisado de novo e repete as métricas do anterior (ex: menus parados);
+- os buffers de trabalho (cinzentos, máscaras e buffers float32 do SSIM) passam de um par
+  para o seguinte (ver processamento.analises.analisar_todos com 'buffers');
+- as métricas de cada frame são escritas à medida num ficheiro JSON Lines; a linha temporal
+  é um resumo de tamanho fixo (no máximo CAPACIDADE_LINHA_TEMPORAL valores por métrica:
+  quando enche, cada par de valores vizinhos é fundido no pior dos dois), pelo que a memória
+  não cresce com a duração;
+- só as imagens de resultado dos NUM_PIORES piores frames são mantidas e gravadas.
+
+No fim são gravados na pasta 'relatorios/' o resumo JSON, a linha temporal (PNG) com os
+valores de SSIM e de absdiff de cada frame e as imagens dos piores frames.
+
+Utilização (a partir da raiz do projeto):
+    python -m processamento.sequencia REFERENCIA TESTE [--metodos absdiff,ssim] [--piores 5]
+
+REFERENCIA e TESTE podem ser ficheiros de vídeo ou pastas de frames (ordenados pelo número no nome).
+"""
+
+import argparse # Interface de linha de comandos
+import contextlib # Silenciar as mensagens por frame
+import hashlib # Hash do conteúdo de cada frame
+import heapq # Piores frames
+import io
+import json # Métricas por frame (JSON Lines)
+import os # Operações com sistema de ficheiros
+import re # Ordenação natural dos nomes dos frames
+import time # Duração e débito
+import uuid # Geração de identificadores únicos
+from datetime import datetime # Nome do ficheiro de métricas por frame
+
+import cv2  # OpenCV para leitura de vídeos e imagens
+import numpy as np # Resumo de tamanho fixo da linha temporal
+
+from output.relatorio import converter_json, desenhar_linha_temporal, guardar_imagem_resultado, guardar_resumo_sequencia
+from processamento.analises import METODOS_DISPONIVEIS, TIPOS_ANALISE, analisar_todos
+from processamento.leitura import ler_antecipadamente
+from processamento.lote import listar_imagens
+from processamento.mosaicos import TAMANHO_MOSAICO
+
+# Métodos aplicados por omissão a cada par de frames
+METODOS_SEQUENCIA = ["absdiff", "ssim"]
+
+# Número de piores frames cujas imagens de resultado são gravadas
+NUM_PIORES = 5
+
+# Pasta onde são gravados os resultados
+PASTA_RESULTADOS = "relatorios"
+
+# Bytes do hash do conteúdo de cada frame
+BYTES_HASH = 16
+
+# Métricas mostradas na linha temporal: (método, métrica, título, pior valor)
+SERIES_LINHA_TEMPORAL = [
+    ("ssim", "indice_ssim", "SSIM", "min"),
+    ("absdiff", "percentagem_diferenca", "AbsDiff %", "max"),
+    ("histograma", "correlacao_histogramas", "Histograma", "min")
+]
+
+# Número máximo de valores guardados por métrica na linha temporal (par, e acima das
+# ~1100 colunas do desenho, para que cada coluna continue a mostrar o pior valor)
+CAPACIDADE_LINHA_TEMPORAL = 2048
+
+
+class _LinhaTemporal:
+    """
+    Resumo de tamanho fixo dos valores de uma métrica ao longo dos frames.
+
+    Cada valor guardado é o pior de 'passo' frames consecutivos; quando a capacidade se esgota,
+    os valores são fundidos aos pares e o passo duplica. O mínimo, a média e o máximo são
+    acumulados à parte e são exatos.
+    """
+
+    def __init__(self, pior, capacidade = CAPACIDADE_LINHA_TEMPORAL):
+        self._fundir = np.fmin if pior == "min" else np.fmax
+        self._valores = np.empty(capacidade, dtype = np.float64)
+        self._usados = 0
+        self.passo = 1
+        self.num_frames = 0
+        self.soma = 0.0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    def acrescentar(self, valor):
+        if self.num_frames % self.passo == 0:
+            if self._usados == len(self._valores):
+                # Capacidade esgotada: funde os valores aos pares (o passo passa para o dobro)
+                metade = len(self._valores) // 2
+                self._valores[:metade] = self._fundir(self._valores[0::2], self._valores[1::2])
+                self._usados = metade
+                self.passo *= 2
+            self._valores[self._usados] = valor
+            self._usados += 1
+        else:
+            self._valores[self._usados - 1] = self._fundir(self._valores[self._usados - 1], valor)
+
+        self.num_frames += 1
+        self.soma += valor
+        self.minimo = min(self.minimo, valor)
+        self.maximo = max(self.maximo, valor)
+
+    def valores(self):
+        """
+        Devolve os valores guardados (o pior de cada grupo de 'passo' frames).
+        """
+
+        return self._valores[:self._usados]
+
+    def estatisticas(self):
+        return {"minimo": self.minimo, "media": self.soma / self.num_frames, "maximo": self.maximo}
+
+
+def _chave_natural(caminho):
+    """
+    Chave de ordenação natural ('frame_2' antes de 'frame_10').
+    """
+
+    return [int(parte) if parte.isdigit() else parte.lower() for parte in re.split(r"(\d+)", os.path.basename(caminho))]
+
+
+def ler_frames(origem):
+    """
+    Gerador dos frames de um vídeo ou de uma pasta de frames.
+
+    Nos vídeos, o mesmo array é reutilizado para todos os frames (cv2.VideoCapture.read),
+    pelo que cada frame só é válido até ao pedido do seguinte.
+
+    Argumentos:
+        origem (str): Ficheiro de vídeo ou pasta com um frame por imagem
+
+    Retorna:
+        generator: Tuplos (indice, tempo, frame), com 'tempo' em segundos (None numa pasta)
+
+    Erros:
+        ValueError: Se a origem não puder ser aberta ou um frame da pasta não puder ser lido
+    """
+
+    if os.path.isdir(origem):
+        # Os frames seguintes são descodificados antecipadamente, enquanto o atual é comparado
+        caminhos = sorted(listar_imagens(origem).values(), key = _chave_natural)
+        for indice, (caminho, frame) in enumerate(ler_antecipadamente(caminhos)):
+            if frame is None:
+                raise ValueError(f"Não foi possível ler o frame: {caminho}")
+            yield indice, None, frame
+        return
+
+    captura = cv2.VideoCapture(origem)
+    if not captura.isOpened():
+        raise ValueError(f"Não foi possível abrir o vídeo: {origem}")
+    try:
+        fps = captura.get(cv2.CAP_PROP_FPS) or 0
+        frame = None
+        indice = 0
+        while True:
+            sucesso, frame = captura.read(frame)
+            if not sucesso:
+                break
+            yield indice, (indice / fps if fps > 0 else None), frame
+            indice += 1
+    finally:
+        captura.release()
+
+
+def contar_frames(origem):
+    """
+    Devolve o número de frames de um vídeo ou de uma pasta de frames, sem os descodificar.
+
+    Nos vídeos, o número vem dos metadados do contentor (CAP_PROP_FRAME_COUNT) e pode ser
+    aproximado em alguns formatos.
+
+    Argumentos:
+        origem (str): Ficheiro de vídeo ou pasta com um frame por imagem
+
+    Retorna:
+        int: Número de frames
+        None: Se o vídeo não indicar o número de frames (ou não puder ser aberto)
+    """
+
+    if os.path.isdir(origem):
+        return len(listar_imagens(origem))
+
+    captura = cv2.VideoCapture(origem)
+    try:
+        total = int(captura.get(cv2.CAP_PROP_FRAME_COUNT)) if captura.isOpened() else 0
+    finally:
+        captura.release()
+    return total if total > 0 else None
+
+
+def _contar_sobrantes(origem, frames, emparelhados, extra):
+    """
+    Conta os frames de uma origem que ficaram sem par.
+
+    Argumentos:
+        origem (str): Vídeo ou pasta de frames
+        frames (generator): Gerador de ler_frames da origem, já parado
+        emparelhados (int): Frames da origem comparados com um frame da outra
+        extra (int): Frames já lidos do gerador mas sem par (0 ou 1)
+
+    Retorna:
+        int: Número de frames sem par
+    """
+
+    total = contar_frames(origem)
+    if total is not None:
+        # O número de frames é conhecido: os restantes não são descodificados
+        frames.close()
+        return max(total - emparelhados, 0)
+    return extra + sum(1 for _ in frames)
+
+
+def _hash_frame(frame):
+    """
+    Devolve o hash do conteúdo de um frame.
+    """
+
+    return hashlib.blake2b(frame if frame.flags.c_contiguous else frame.copy(), digest_size = BYTES_HASH).digest()
+
+
+def _gravidade(metricas_frame):
+    """
+    Devolve a gravidade das diferenças de um frame (maior = pior), para escolher os piores frames.
+
+    Usa o SSIM se tiver sido calculado, depois a percentagem do absdiff e, por fim, a correlação
+    dos histogramas.
+    """
+
+    if "ssim" in metricas_frame:
+        return 1 - metricas_frame["ssim"]["indice_ssim"]
+    if "absdiff" in metricas_frame:
+        return metricas_frame["absdiff"]["percentagem_diferenca"] / 100
+    return 1 - metricas_frame["histograma"]["correlacao_histogramas"]
+
+
+def _resumir_metricas(metricas):
+    """
+    Devolve as métricas de um método sem as listas que crescem com a imagem (regiões, mosaicos alterados).
+    """
+
+    resumo = {chave: valor for chave, valor in metricas.items() if chave not in ("regioes", "mosaicos", "perfil")}
+    if "mosaicos" in metricas:
+        resumo["mosaicos_analisados"] = metricas["mosaicos"].get("analisados")
+    return resumo
+
+
+def comparar_sequencias(origem_ref, origem_teste, metodos = METODOS_SEQUENCIA, num_piores = NUM_PIORES,
+                        identificador = None, pasta_resultados = PASTA_RESULTADOS, tamanho_mosaico = TAMANHO_MOSAICO,
+                        **opcoes_analise):
+    """
+    Compara, frame a frame, uma sequência de teste com a sequência de referência.
+
+    Argumentos:
+        origem_ref (str): Vídeo ou pasta de frames de referência
+        origem_teste (str): Vídeo ou pasta de frames de teste
+        metodos (list, opcional): Métodos aplicados a cada par de frames. O default é METODOS_SEQUENCIA.
+        num_piores (int, opcional): Número de piores frames com imagens de resultado gravadas.
+            O default é NUM_PIORES.
+        identificador (str, opcional): ID único da comparação. O default é None (gerado).
+        pasta_resultados (str, opcional): Pasta das métricas por frame. O default é PASTA_RESULTADOS.
+        tamanho_mosaico (int, opcional): Lado dos mosaicos da comparação prévia por hash; em
+            frames quase parados só os mosaicos alterados são analisados. O default é TAMANHO_MOSAICO.
+        **opcoes_analise: Restantes parâmetros de analisar_todos (ex: area_minima, mascara)
+
+    Retorna:
+        dict: Resumo com 'frames_comparados', 'frames_repetidos', 'frames_sobrantes', 'duracao',
+            'frames_por_segundo', 'metricas_frames' (ficheiro JSON Lines), 'linha_temporal' (PNG),
+            'piores' (frame, tempo, gravidade, métricas e imagens gravadas) e 'estatisticas'
+            (mínimo, média e máximo de cada métrica da linha temporal)
+
+    Erros:
+        ValueError: Se um método for desconhecido, uma origem não puder ser lida ou os frames
+            das duas origens tiverem tamanhos diferentes
+    """
+
+    for metodo in metodos:
+        if metodo not in TIPOS_ANALISE:
+            raise ValueError(f"Método de análise desconhecido: {metodo}")
+
+    identificador = identificador or str(uuid.uuid4())[:8]
+    series = [serie for serie in SERIES_LINHA_TEMPORAL if serie[0] in metodos]
+    linha_temporal = {metrica: _LinhaTemporal(pior) for _, metrica, _, pior in series}
+
+    os.makedirs(pasta_resultados, exist_ok = True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    caminho_frames = os.path.join(pasta_resultados, f"sequencia_frames_{timestamp}_{identificador}.jsonl")
+
+    buffers = {}
+    piores = []     # Heap (gravidade, -frame, dados) com os num_piores piores frames
+    anterior = None # (hash_ref, hash_teste, metricas_frame) do par anterior
+    comparados = repetidos = 0
+    sobrantes = {"referencia": 0, "teste": 0}
+    extra_ref = 0   # Frame de referência lido quando o teste já tinha terminado
+
+    inicio = time.perf_counter()
+    frames_ref = ler_frames(origem_ref)
+    frames_teste = ler_frames(origem_teste)
+    with open(caminho_frames, "w", encoding = "utf-8") as ficheiro_frames:
+        while True:
+            # As origens avançam uma de cada vez, para que nenhum frame sem par se perca
+            par_ref = next(frames_ref, None)
+            if par_ref is None:
+                break
+            par_teste = next(frames_teste, None)
+            if par_teste is None:
+                extra_ref = 1
+                break
+            (indice, tempo, frame_ref), (_, tempo_teste, frame_teste) = par_ref, par_teste
+
+            if frame_ref.shape != frame_teste.shape:
+                raise ValueError(f"Frame {indice}: tamanhos diferentes ({frame_ref.shape} vs {frame_teste.shape})")
+
+            hashes = (_hash_frame(frame_ref), _hash_frame(frame_teste))
+            repetido = anterior is not None and anterior[:2] == hashes
+            if repetido:
+                # Par igual ao anterior: as métricas repetem-se sem nova análise
+                metricas_frame = anterior[2]
+                repetidos += 1
+            else:
+                # As mensagens de cada método por frame inundariam a consola
+                with contextlib.redirect_stdout(io.StringIO()):
+                    resultados, _ = analisar_todos(frame_ref, frame_teste, metodos = metodos, buffers = buffers,
+                                                   tamanho_mosaico = tamanho_mosaico, **opcoes_analise)
+                metricas_frame = {metodo: _resumir_metricas(resultados[metodo][2]) for metodo in metodos}
+
+                # Só as imagens dos piores frames ficam em memória
+                gravidade = _gravidade(metricas_frame)
+                if num_piores > 0 and (len(piores) < num_piores or gravidade > piores[0][0]):
+                    dados = {
+                        "frame": indice,
+                        "tempo": tempo if tempo is not None else tempo_teste,
+                        "gravidade": gravidade,
+                        "metricas": {metodo: resultados[metodo][2] for metodo in metodos},
+                        # Cópias: as imagens de resultado usam buffers reutilizados no frame seguinte
+                        "imagens": {metodo: resultados[metodo][0].copy() for metodo in metodos
+                                    if metodo in ["absdiff", "ssim"] and resultados[metodo][0] is not None}
+                    }
+                    if len(piores) < num_piores:
+                        heapq.heappush(piores, (gravidade, -indice, dados))
+                    else:
+                        heapq.heapreplace(piores, (gravidade, -indice, dados))
+                resultados = None
+            anterior = (hashes[0], hashes[1], metricas_frame)
+            comparados += 1
+
+            for metodo, metrica, _, _ in series:
+                linha_temporal[metrica].acrescentar(float(metricas_frame[metodo][metrica]))
+
+            ficheiro_frames.write(json.dumps({"frame": indice, "tempo": tempo, "repetido": repetido, **metricas_frame},
+                                             ensure_ascii = False, default = converter_json) + "\n")
+
+            if comparados % 100 == 0:
+                print(f"🎞️ {comparados} frames comparados ({comparados / (time.perf_counter() - inicio):.1f} frames/s)")
+
+        # Frames a mais numa das origens (sequências com durações diferentes)
+        sobrantes["referencia"] = _contar_sobrantes(origem_ref, frames_ref, comparados, extra_ref)
+        sobrantes["teste"] = _contar_sobrantes(origem_teste, frames_teste, comparados, 0)
+
+    duracao = time.perf_counter() - inicio
+
+    # Imagens dos piores frames, do pior para o menos mau
+    lista_piores = []
+    for gravidade, _, dados in sorted(piores, key = lambda entrada: (-entrada[0], -entrada[1])):
+        imagens = {}
+        for metodo, imagem in dados.pop("imagens").items():
+            imagens[metodo] = guardar_imagem_resultado(imagem, prefixo = f"sequencia_frame{dados['frame']:06d}",
+                                                       metodo = metodo, identificador = identificador)
+        dados["imagens"] = imagens
+        lista_piores.append(dados)
+
+    caminho_linha_temporal = None
+    if comparados and series:
+        maximos = {"percentagem_diferenca": max(linha_temporal["percentagem_diferenca"].maximo, 1e-6)
+                   if "percentagem_diferenca" in linha_temporal else 1}
+        img_linha = desenhar_linha_temporal(
+            [(titulo, linha_temporal[metrica].valores(), maximos.get(metrica, 1), pior)
+             for _, metrica, titulo, pior in series],
+            marcas = [dados["frame"] for dados in lista_piores], num_frames = comparados)
+        caminho_linha_temporal = guardar_imagem_resultado(img_linha, prefixo = "linha_temporal", identificador = identificador)
+
+    estatisticas = {metrica: linha.estatisticas() for metrica, linha in linha_temporal.items() if linha.num_frames}
+
+    return {
+        "referencia": origem_ref,
+        "teste": origem_teste,
+        "metodos": list(metodos),
+        "frames_comparados": comparados,
+        "frames_repetidos": repetidos,
+        "frames_sobrantes": sobrantes,
+        "duracao": duracao,
+        "frames_por_segundo": comparados / duracao if duracao > 0 else 0.0,
+        "metricas_frames": caminho_frames,
+        "linha_temporal": caminho_linha_temporal,
+        "estatisticas": estatisticas,
+        "piores": lista_piores
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Comparação de uma sequência de frames (vídeo ou pasta) com a referência.")
+    parser.add_argument("referencia", help = "Vídeo ou pasta de frames de referência")
+    parser.add_argument("teste", help = "Vídeo ou pasta de frames de teste")
+    parser.add_argument("--metodos", default = ",".join(METODOS_SEQUENCIA),
+                        help = f"Métodos separados por vírgulas (default: {','.join(METODOS_SEQUENCIA)})")
+    parser.add_argument("--piores", type = int, default = NUM_PIORES,
+                        help = f"Número de piores frames com imagens gravadas (default: {NUM_PIORES})")
+    argumentos = parser.parse_args()
+
+    metodos = [metodo.strip() for metodo in argumentos.metodos.split(",") if metodo.strip()]
+    desconhecidos = [metodo for metodo in metodos if metodo not in METODOS_DISPONIVEIS]
+    if desconhecidos or not metodos:
+        parser.error(f"métodos inválidos: {', '.join(desconhecidos) or '(nenhum)'} "
+                     f"(disponíveis: {', '.join(METODOS_DISPONIVEIS)})")
+
+    identificador = str(uuid.uuid4())[:8]
+    try:
+        resumo = comparar_sequencias(argumentos.referencia, argumentos.teste, metodos, argumentos.piores, identificador)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+    print(f"\n⏱️ {resumo['frames_comparados']} frames comparados em {resumo['duracao']:.2f} segundos "
+          f"({resumo['frames_por_segundo']:.1f} frames/s, {resumo['frames_repetidos']} repetidos)")
+    if any(resumo["frames_sobrantes"].values()):
+        print(f"⚠️ Frames sem par: {resumo['frames_sobrantes']}")
+    for metrica, valores in resumo["estatisticas"].items():
+        print(f"📊 {metrica}: mínimo {valores['minimo']:.4f}, média {valores['media']:.4f}, máximo {valores['maximo']:.4f}")
+    for dados in resumo["piores"]:
+        print(f"🔻 Frame {dados['frame']} (gravidade {dados['gravidade']:.4f})")
+    guardar_resumo_sequencia(resumo, identificador)
@@ -0,0 +1,503 @@
+"""
+Serviço de comparação de longa duração, com as referências mantidas em memória.
+
+Cada execução do main.py paga o arranque do Python, a importação do OpenCV e do reportlab
+e a leitura da referência. O serviço faz esse trabalho uma única vez: as referências
+(imagem descodificada e dados derivados, ver processamento.cache_referencias) ficam em
+memória e cada pedido só descodifica a imagem de teste e corre a análise.
+
+API HTTP (em TCP local e/ou num socket Unix):
+- POST /comparar?referencia=menu.png[&metodos=absdiff,ssim][&pdf=1]
+    Corpo: bytes da imagem de teste (PNG, JPEG, ...).
+    Resposta: métricas, observação (OK / ATENÇÃO / PERIGO) de cada método e veredicto global.
+    Com pdf=1 o relatório é gerado em segundo plano, depois de a resposta ser enviada.
+- GET /relatorio?identificador=ID   Estado do relatório PDF de um pedido
+- GET /saude                        Estado do serviço
+- GET /estatisticas                 Latência dos pedidos (p50, p95, p99) e contadores
+
+Os pedidos são recebidos por threads próprias, mas a análise corre num conjunto limitado
+de trabalhadores, para que muitos pedidos simultâneos não disputem todos os núcleos.
+"""
+
+import json
+import os
+import socketserver
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from output.relatorio import converter_json, gerar_observacoes, gerar_relatorio_pdf_multimetodo, guardar_imagem_resultado
+from processamento.analises import METODOS_DISPONIVEIS, analisar_todos
+from processamento.cache_referencias import obter_dados_referencia
+from processamento.lote import encontrar_imagem, listar_imagens
+from processamento.mascaras import caminho_mascara, carregar_mascara
+from processamento.mosaicos import TAMANHO_MOSAICO
+
+# Pasta com as imagens de referência
+PASTA_REFERENCIA = os.path.join("imagens", "referencia")
+
+# Endereço TCP por omissão (apenas local)
+ANFITRIAO = "127.0.0.1"
+PORTA = 8765
+
+# Tamanho máximo do corpo de um pedido (imagem de teste)
+TAMANHO_MAXIMO_PEDIDO = 64 * 1024 * 1024
+
+# Número de latências guardadas para as estatísticas (as mais recentes)
+AMOSTRAS_LATENCIA = 1000
+
+# Número de estados de relatórios PDF guardados (os mais recentes)
+MAX_RELATORIOS = 1000
+
+# Gravidade de cada classificação de gerar_observacoes (o veredicto é a mais grave)
+GRAVIDADES = {"OK": 0, "ATENÇÃO": 1, "PERIGO": 2}
+
+
+class ErroPedido(Exception):
+    """
+    Pedido inválido, devolvido ao cliente com o código HTTP indicado.
+    """
+
+    def __init__(self, codigo, mensagem):
+        super().__init__(mensagem)
+        self.codigo = codigo
+
+
+class ServicoComparacao:
+    """
+    Estado do serviço: referências em memória, trabalhadores, relatórios e estatísticas.
+
+    Argumentos:
+        pasta_referencia (str, opcional): Pasta das imagens de referência. O default é PASTA_REFERENCIA.
+        num_trabalhadores (int, opcional): Número de análises em simultâneo. O default é o número de núcleos.
+    """
+
+    def __init__(self, pasta_referencia = PASTA_REFERENCIA, num_trabalhadores = None):
+        self.pasta_referencia = pasta_referencia
+        self.num_trabalhadores = num_trabalhadores or os.cpu_count() or 1
+        self.inicio = time.time()
+
+        # Referências em memória: {nome: (assinatura do ficheiro, dados_ref)}
+        self._referencias = {}
+        self._bloqueio_referencias = threading.Lock()
+        # Um bloqueio por referência: a mesma referência é lida uma só vez, e uma leitura
+        # demorada não atrasa os pedidos que usam outras referências
+        self._bloqueios_leitura = {}
+
+        self._trabalhadores = ThreadPoolExecutor(max_workers = self.num_trabalhadores)
+        # Os relatórios PDF são gerados um de cada vez, fora do caminho dos pedidos
+        self._executor_pdf = ThreadPoolExecutor(max_workers = 1)
+        # Estado dos relatórios: escrito pela thread dos PDF e lido pelas threads dos pedidos HTTP
+        self._relatorios = OrderedDict()
+        self._bloqueio_relatorios = threading.Lock()
+
+        self._bloqueio_estatisticas = threading.Lock()
+        self._latencias = deque(maxlen = AMOSTRAS_LATENCIA)
+        self._pedidos = 0
+        self._erros = 0
+        self._em_curso = 0
+
+    def carregar_referencias(self):
+        """
+        Carrega para memória todas as referências da pasta.
+
+        Retorna:
+            int: Número de referências carregadas
+        """
+
+        for nome in listar_imagens(self.pasta_referencia):
+            self.obter_referencia(nome)
+        with self._bloqueio_referencias:
+            return len(self._referencias)
+
+    def obter_referencia(self, nome):
+        """
+        Devolve os dados de uma referência, lendo-a apenas se for nova ou tiver sido alterada.
+
+        A máscara da referência (ver processamento.mascaras) é guardada nos dados, em 'mascara',
+        e também é relida quando o seu ficheiro muda.
+
+        Argumentos:
+            nome (str): Nome do ficheiro na pasta de referência (a extensão não distingue maiúsculas)
+
+        Retorna:
+            dict: Dados da referência (ver processamento.cache_referencias.obter_dados_referencia)
+            None: Se a referência não existir ou não for uma imagem válida
+
+        Erros:
+            ValueError: Se o ficheiro de máscara da referência não for válido
+        """
+
+        caminho = encontrar_imagem(self.pasta_referencia, nome)
+        if caminho is None:
+            return None
+
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            return None
+        try:
+            estado_mascara = os.stat(caminho_mascara(caminho))
+            assinatura_mascara = (estado_mascara.st_mtime_ns, estado_mascara.st_size)
+        except OSError:
+            assinatura_mascara = None
+        assinatura = (estado.st_mtime_ns, estado.st_size, assinatura_mascara)
+
+        with self._bloqueio_referencias:
+            entrada = self._referencias.get(caminho)
+            if entrada is not None and entrada[0] == assinatura:
+                return entrada[1]
+            bloqueio_leitura = self._bloqueios_leitura.setdefault(caminho, threading.Lock())
+
+        with bloqueio_leitura:
+            # Outra thread pode ter lido a referência enquanto esta esperava
+            with self._bloqueio_referencias:
+                entrada = self._referencias.get(caminho)
+            if entrada is not None and entrada[0] == assinatura:
+                return entrada[1]
+
+            dados_ref = obter_dados_referencia(caminho)
+            if dados_ref is not None:
+                dados_ref["caminho"] = caminho
+                dados_ref["mascara"] = carregar_mascara(caminho)
+                with self._bloqueio_referencias:
+                    self._referencias[caminho] = (assinatura, dados_ref)
+            return dados_ref
+
+    def comparar(self, conteudo, referencia, metodos = None, gerar_pdf = False):
+        """
+        Compara uma imagem de teste com uma referência em memória, num dos trabalhadores.
+
+        A descodificação da imagem de teste também corre no trabalhador, para que o número
+        de pedidos a ocupar o processador nunca ultrapasse o número de trabalhadores.
+
+        Argumentos:
+            conteudo (bytes): Conteúdo do ficheiro da imagem de teste
+            referencia (str): Nome da imagem de referência
+            metodos (list, opcional): Métodos de análise. O default é METODOS_DISPONIVEIS.
+            gerar_pdf (bool, opcional): Gera o relatório PDF em segundo plano. O default é False.
+
+        Retorna:
+            dict: Resposta com 'identificador', 'referencia', 'veredicto', 'duracao' e, por método,
+                'metricas', 'observacao' e 'duracao'
+
+        Erros:
+            ErroPedido: Se a referência não existir, a imagem de teste for inválida ou as
+                dimensões forem diferentes
+        """
+
+        return self._trabalhadores.submit(self._comparar, conteudo, referencia, metodos, gerar_pdf).result()
+
+    def _comparar(self, conteudo, referencia, metodos, gerar_pdf):
+        """
+        Executa a comparação de um pedido (ver comparar).
+        """
+
+        inicio = time.perf_counter()
+        metodos = list(metodos or METODOS_DISPONIVEIS)
+        desconhecidos = [metodo for metodo in metodos if metodo not in METODOS_DISPONIVEIS]
+        if desconhecidos:
+            raise ErroPedido(400, f"Métodos desconhecidos: {', '.join(desconhecidos)}")
+
+        dados_ref = self.obter_referencia(referencia)
+        if dados_ref is None:
+            raise ErroPedido(404, f"Referência não encontrada: {referencia}")
+
+        img_teste = cv2.imdecode(np.frombuffer(conteudo, dtype = np.uint8), cv2.IMREAD_COLOR)
+        if img_teste is None:
+            raise ErroPedido(400, "Imagem de teste inválida")
+
+        img_ref = dados_ref["img"]
+        if img_ref.shape != img_teste.shape:
+            raise ErroPedido(422, f"Tamanhos diferentes: {img_ref.shape} vs {img_teste.shape}")
+
+        resultados_metodos, duracoes = analisar_todos(img_ref, img_teste, metodos = metodos, dados_ref = dados_ref,
+                                                     tamanho_mosaico = TAMANHO_MOSAICO, mascara = dados_ref["mascara"])
+
+        identificador = str(uuid.uuid4())[:8]
+        resultados = []
+        veredicto = "OK"
+        for metodo in metodos:
+            img_resultado, tipo_analise, metricas = resultados_metodos[metodo]
+            observacao = gerar_observacoes(metodo, metricas)
+            nivel = observacao.split(" ")[0]
+            if GRAVIDADES.get(nivel, 0) > GRAVIDADES[veredicto]:
+                veredicto = nivel
+
+            resultados.append({
+                "metodo": metodo,
+                "tipo_analise": tipo_analise,
+                "metricas": metricas,
+                "observacao": observacao,
+                "imagem": img_resultado if metodo in ["absdiff", "ssim"] else None,
+                "imagem_resultado": None,
+                "duracao": duracoes[metodo]
+            })
+
+        resposta = {
+            "identificador": identificador,
+            "referencia": os.path.basename(dados_ref["caminho"]),
+            "veredicto": veredicto,
+            "duracao": time.perf_counter() - inicio,
+            "resultados": [{chave: valor for chave, valor in resultado.items()
+                            if chave not in ("imagem", "imagem_resultado")} for resultado in resultados]
+        }
+
+        if gerar_pdf:
+            self._registar_relatorio(identificador, {"estado": "pendente"})
+            self._executor_pdf.submit(self._gerar_relatorio, identificador, dados_ref, img_teste, resultados,
+                                      resposta["duracao"])
+            resposta["relatorio"] = "pendente"
+
+        return resposta
+
+    def _registar_relatorio(self, identificador, estado):
+        """
+        Guarda o estado do relatório de um pedido (só os MAX_RELATORIOS mais recentes).
+        """
+
+        with self._bloqueio_relatorios:
+            self._relatorios[identificador] = estado
+            self._relatorios.move_to_end(identificador)
+            while len(self._relatorios) > MAX_RELATORIOS:
+                self._relatorios.popitem(last = False)
+
+    def _gerar_relatorio(self, identificador, dados_ref, img_teste, resultados, duracao):
+        """
+        Grava as imagens de resultado e gera o relatório PDF de um pedido (em segundo plano).
+        """
+
+        try:
+            for resultado in resultados:
+                if resultado["imagem"] is not None:
+                    resultado["imagem_resultado"] = guardar_imagem_resultado(
+                        resultado["imagem"], metodo = resultado["metodo"], identificador = identificador)
+
+            caminho = gerar_relatorio_pdf_multimetodo(
+                img_ref_path = dados_ref["caminho"],
+                img_teste_path = f"{identificador} (pedido ao serviço)",
+                resultados = resultados,
+                identificador = identificador,
+                duracao_total = duracao,
+                img_ref = dados_ref["img"],
+                img_teste = img_teste,
+                chave_ref = dados_ref.get("hash")
+            )
+            self._registar_relatorio(identificador, {"estado": "pronto", "caminho": caminho})
+        except Exception as e:
+            self._registar_relatorio(identificador, {"estado": "erro", "detalhe": str(e)})
+
+    def estado_relatorio(self, identificador):
+        """
+        Devolve o estado do relatório PDF de um pedido ('pendente', 'pronto' ou 'erro').
+
+        Retorna:
+            dict: Estado do relatório
+            None: Se o pedido não tiver relatório
+        """
+
+        with self._bloqueio_relatorios:
+            return self._relatorios.get(identificador)
+
+    def registar_pedido(self, latencia, erro = False):
+        """
+        Regista a latência de um pedido de comparação terminado.
+        """
+
+        with self._bloqueio_estatisticas:
+            self._pedidos += 1
+            self._erros += int(erro)
+            if not erro:
+                self._latencias.append(latencia)
+
+    def alterar_em_curso(self, variacao):
+        """
+        Atualiza o número de pedidos de comparação em curso.
+        """
+
+        with self._bloqueio_estatisticas:
+            self._em_curso += variacao
+
+    def estatisticas(self):
+        """
+        Devolve as estatísticas dos pedidos de comparação.
+
+        Retorna:
+            dict: Contadores e latências em milissegundos (p50, p95, p99 e máxima) dos
+                AMOSTRAS_LATENCIA pedidos mais recentes
+        """
+
+        with self._bloqueio_estatisticas:
+            latencias = np.array(self._latencias, dtype = np.float64) * 1000
+            dados = {"pedidos": self._pedidos, "erros": self._erros, "em_curso": self._em_curso}
+
+        dados["amostras"] = int(latencias.size)
+        if latencias.size:
+            p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+            dados["latencia_ms"] = {"p50": p50, "p95": p95, "p99": p99, "maxima": latencias.max(),
+                                    "media": latencias.mean()}
+        with self._bloqueio_relatorios:
+            dados["relatorios_pendentes"] = sum(1 for estado in self._relatorios.values()
+                                                if estado["estado"] == "pendente")
+        return dados
+
+    def saude(self):
+        """
+        Devolve o estado do serviço.
+        """
+
+        with self._bloqueio_referencias:
+            caminhos = list(self._referencias)
+
+        return {
+            "estado": "ok",
+            "tempo_ativo": time.time() - self.inicio,
+            "referencias": sorted(os.path.basename(caminho) for caminho in caminhos),
+            "trabalhadores": self.num_trabalhadores
+        }
+
+    def fechar(self):
+        """
+        Termina os trabalhadores, esperando pelos relatórios em curso.
+        """
+
+        self._trabalhadores.shutdown()
+        self._executor_pdf.shutdown()
+
+
+class _Pedido(BaseHTTPRequestHandler):
+    """
+    Tratamento dos pedidos HTTP (o serviço está em self.server.servico).
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _responder(self, codigo, dados):
+        corpo = json.dumps(dados, ensure_ascii = False, default = converter_json).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self):
+        servico = self.server.servico
+        url = urlparse(self.path)
+        parametros = parse_qs(url.query)
+
+        if url.path == "/saude":
+            self._responder(200, servico.saude())
+        elif url.path == "/estatisticas":
+            self._responder(200, servico.estatisticas())
+        elif url.path == "/relatorio":
+            identificador = parametros.get("identificador", [""])[0]
+            estado = servico.estado_relatorio(identificador)
+            if estado is None:
+                self._responder(404, {"erro": f"Relatório desconhecido: {identificador}"})
+            else:
+                self._responder(200, estado)
+        else:
+            self._responder(404, {"erro": f"Caminho desconhecido: {url.path}"})
+
+    def do_POST(self):
+        servico = self.server.servico
+        url = urlparse(self.path)
+        if url.path != "/comparar":
+            self._responder(404, {"erro": f"Caminho desconhecido: {url.path}"})
+            return
+
+        inicio = time.perf_counter()
+        servico.alterar_em_curso(1)
+        try:
+            parametros = parse_qs(url.query)
+            referencia = parametros.get("referencia", [""])[0]
+            if not referencia:
+                raise ErroPedido(400, "Parâmetro 'referencia' em falta")
+            metodos = [metodo for valor in parametros.get("metodos", []) for metodo in valor.split(",") if metodo]
+            gerar_pdf = parametros.get("pdf", ["0"])[0] not in ("", "0")
+
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            if tamanho <= 0:
+                raise ErroPedido(400, "Corpo do pedido vazio (imagem de teste em falta)")
+            if tamanho > TAMANHO_MAXIMO_PEDIDO:
+                raise ErroPedido(413, "Imagem de teste demasiado grande")
+            conteudo = self.rfile.read(tamanho)
+
+            resposta = servico.comparar(conteudo, referencia, metodos, gerar_pdf)
+            servico.registar_pedido(time.perf_counter() - inicio)
+            self._responder(200, resposta)
+
+        except ErroPedido as e:
+            servico.registar_pedido(time.perf_counter() - inicio, erro = True)
+            self._responder(e.codigo, {"erro": str(e)})
+        except Exception as e:
+            servico.registar_pedido(time.perf_counter() - inicio, erro = True)
+            self._responder(500, {"erro": str(e)})
+        finally:
+            servico.alterar_em_curso(-1)
+
+    def log_message(self, formato, *args):
+        # Sem registo por pedido: a latência fica nas estatísticas do serviço
+        pass
+
+
+class _ServidorTCP(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # O BaseHTTPRequestHandler espera um endereço (anfitrião, porta)
+        pedido, _ = super().get_request()
+        return pedido, ("unix", 0)
+
+
+def iniciar_servico(servico, anfitriao = ANFITRIAO, porta = PORTA, socket_unix = None):
+    """
+    Inicia os servidores HTTP (TCP e/ou socket Unix), cada um na sua thread.
+
+    Argumentos:
+        servico (ServicoComparacao): Estado do serviço
+        anfitriao (str, opcional): Endereço TCP. O default é ANFITRIAO.
+        porta (int ou None, opcional): Porta TCP; None desativa o TCP. O default é PORTA.
+        socket_unix (str, opcional): Caminho do socket Unix. O default é None (sem socket Unix).
+
+    Retorna:
+        list: Servidores iniciados (terminar com parar_servico)
+    """
+
+    servidores = []
+    if porta is not None:
+        servidores.append(_ServidorTCP((anfitriao, porta), _Pedido))
+    if socket_unix:
+        # Remove um socket deixado por uma execução anterior
+        if os.path.exists(socket_unix):
+            os.remove(socket_unix)
+        servidores.append(_ServidorUnix(socket_unix, _Pedido))
+
+    for servidor in servidores:
+        servidor.servico = servico
+        threading.Thread(target = servidor.serve_forever, daemon = True).start()
+    return servidores
+
+
+def parar_servico(servico, servidores):
+    """
+    Para os servidores e os trabalhadores do serviço.
+    """
+
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+        if isinstance(servidor, _ServidorUnix) and os.path.exists(servidor.server_address):
+            os.remove(servidor.server_address)
+    servico.fechar()
@@ -0,0 +1,250 @@
+"""
+Implementação própria do índice de similaridade estrutural (SSIM) com OpenCV/NumPy.
+
+Substitui skimage.metrics.structural_similarity no método 'ssim'. Todos os cálculos são
+feitos em float32, com filtros separáveis do OpenCV (cv2.blur para a janela uniforme e
+cv2.GaussianBlur para a janela gaussiana) e com buffers de trabalho reutilizáveis entre
+chamadas, em vez das várias matrizes float64 temporárias criadas pelo scikit-image.
+
+Tolerância em relação ao scikit-image:
+    Com os parâmetros por omissão (janela uniforme 7x7) o índice global difere do de
+    skimage.metrics.structural_similarity(gray_ref, gray_teste) em menos de TOLERANCIA_SCORE.
+    Com janela gaussiana corresponde a structural_similarity(..., gaussian_weights=True,
+    sigma=1.5, use_sample_covariance=False) com a mesma tolerância. Os valores do mapa
+    diferem em menos de 1e-3 (ver benchmarks/benchmark_ssim.py).
+"""
+
+import cv2
+import numpy as np
+
+# Diferença máxima garantida entre o índice global calculado aqui e o do scikit-image
+TOLERANCIA_SCORE = 1e-4
+
+# Tipos de janela suportados
+JANELAS_DISPONIVEIS = ["uniforme", "gaussiana"]
+
+# Constantes de estabilização do SSIM (Wang et al., 2004) para imagens de 8 bits
+K1 = 0.01
+K2 = 0.03
+DATA_RANGE = 255
+
+# Linhas de cada faixa no cálculo só do índice (mapa_completo=False)
+ALTURA_FAIXA_INDICE = 128
+
+# Desvio padrão da janela gaussiana e número de desvios padrão incluídos (como no scikit-image)
+SIGMA_GAUSSIANA = 1.5
+TRUNCAR_GAUSSIANA = 3.5
+
+
+def tamanho_janela(janela = "uniforme", tamanho = 7):
+    """
+    Devolve a dimensão efetiva da janela, em pixels.
+
+    Para a janela gaussiana a dimensão é determinada pelo desvio padrão (11 para sigma=1.5),
+    tal como no scikit-image.
+
+    Argumentos:
+        janela (str, opcional): 'uniforme' ou 'gaussiana'. O default é 'uniforme'.
+        tamanho (int, opcional): Dimensão da janela uniforme. O default é 7.
+
+    Retorna:
+        int: Dimensão (ímpar) da janela
+    """
+
+    if janela == "gaussiana":
+        return 2 * int(TRUNCAR_GAUSSIANA * SIGMA_GAUSSIANA + 0.5) + 1
+    return tamanho
+
+
+def _obter_buffer(buffers, nome, forma):
+    """
+    Devolve um buffer float32 reutilizável, criando-o se não existir com a forma pedida.
+    """
+
+    if buffers is None:
+        return np.empty(forma, dtype = np.float32)
+
+    chave = f"ssim_{nome}"
+    buffer = buffers.get(chave)
+    if buffer is None or buffer.shape != forma or buffer.dtype != np.float32:
+        buffer = np.empty(forma, dtype = np.float32)
+        buffers[chave] = buffer
+    return buffer
+
+
+def _filtrar(origem, destino, janela, tamanho):
+    """
+    Aplica o filtro da janela (média local) com reflexão nas margens, escrevendo em 'destino'.
+    """
+
+    if janela == "uniforme":
+        cv2.blur(origem, (tamanho, tamanho), dst = destino, borderType = cv2.BORDER_REFLECT)
+    elif janela == "gaussiana":
+        cv2.GaussianBlur(origem, (tamanho, tamanho), SIGMA_GAUSSIANA, dst = destino,
+                         sigmaY = SIGMA_GAUSSIANA, borderType = cv2.BORDER_REFLECT)
+    else:
+        raise ValueError(f"Tipo de janela SSIM desconhecido: {janela}")
+    return destino
+
+
+def calcular_estatisticas(gray, janela = "uniforme", tamanho = 7):
+    """
+    Calcula as estatísticas locais de uma imagem que não dependem da outra imagem do par.
+
+    Podem ser calculadas uma única vez para a imagem de referência e reutilizadas
+    (ver processamento.cache_referencias).
+
+    Argumentos:
+        gray (numpy.ndarray): Imagem em escala de cinzentos
+        janela (str, opcional): 'uniforme' ou 'gaussiana'. O default é 'uniforme'.
+        tamanho (int, opcional): Dimensão da janela uniforme. O default é 7.
+
+    Retorna:
+        tuple: (media, media_quadrados), médias locais de x e de x² em float32
+    """
+
+    tamanho = tamanho_janela(janela, tamanho)
+    img = gray.astype(np.float32)
+
+    media = _filtrar(img, np.empty_like(img), janela, tamanho)
+
+    # O quadrado é calculado no próprio buffer da imagem convertida
+    np.multiply(img, img, out = img)
+    media_quadrados = _filtrar(img, np.empty_like(img), janela, tamanho)
+    return media, media_quadrados
+
+
+def calcular_ssim(gray_ref, gray_teste, janela = "uniforme", tamanho = 7, mapa_completo = True,
+                  estatisticas_ref = None, buffers = None):
+    """
+    Calcula o índice SSIM entre duas imagens em escala de cinzentos.
+
+    O índice global é a média do mapa pixel-a-pixel sem a margem da janela. Com
+    mapa_completo=False essa média é acumulada faixa a faixa (ALTURA_FAIXA_INDICE linhas,
+    alargadas pelo raio da janela), sem nunca criar o mapa float32 da imagem completa: a
+    memória de trabalho passa a depender da largura das imagens, não da área.
+
+    Argumentos:
+        gray_ref (numpy.ndarray): Imagem de referência em escala de cinzentos
+        gray_teste (numpy.ndarray): Imagem de teste em escala de cinzentos
+        janela (str, opcional): 'uniforme' ou 'gaussiana'. O default é 'uniforme'.
+        tamanho (int, opcional): Dimensão da janela uniforme. O default é 7.
+        mapa_completo (bool, opcional): Se False, devolve apenas o índice global. O default é True.
+        estatisticas_ref (tuple, opcional): (media, media_quadrados) da referência já calculadas
+            com a mesma janela (ver calcular_estatisticas). O default é None.
+        buffers (dict, opcional): Dicionário onde os buffers de trabalho são guardados e
+            reutilizados entre chamadas com imagens do mesmo tamanho. O default é None.
+
+    Retorna:
+        tuple: (score, mapa)
+            - score (float): Índice SSIM global (0 a 1, onde 1 = idêntico)
+            - mapa (numpy.ndarray ou None): Mapa SSIM float32 pixel-a-pixel; None se mapa_completo=False.
+              Quando são usados buffers, o mapa é reescrito na chamada seguinte.
+
+    Erros:
+        ValueError: Se as imagens tiverem tamanhos diferentes ou a janela for desconhecida.
+    """
+
+    if gray_ref.shape != gray_teste.shape:
+        raise ValueError("As imagens têm tamanhos diferentes e não podem ser comparadas diretamente.")
+
+    tamanho = tamanho_janela(janela, tamanho)
+    margem = (tamanho - 1) // 2
+    altura, largura = gray_ref.shape[:2]
+
+    if mapa_completo or altura <= 2 * margem + ALTURA_FAIXA_INDICE:
+        mapa = _mapa_ssim(gray_ref, gray_teste, janela, tamanho, estatisticas_ref, buffers, "")
+        score = float(mapa[margem:altura - margem, margem:largura - margem].mean(dtype = np.float64))
+        return score, (mapa if mapa_completo else None)
+
+    # Só o índice: cada faixa de linhas interiores [y0, y1) é calculada com 'margem' linhas
+    # de cada lado, pelo que os seus valores são os do mapa da imagem completa
+    soma = 0.0
+    for y0 in range(margem, altura - margem, ALTURA_FAIXA_INDICE):
+        y1 = min(y0 + ALTURA_FAIXA_INDICE, altura - margem)
+        a, b = y0 - margem, y1 + margem
+        estatisticas_faixa = None
+        if estatisticas_ref is not None:
+            estatisticas_faixa = tuple(e[a:b] for e in estatisticas_ref)
+        mapa = _mapa_ssim(gray_ref[a:b], gray_teste[a:b], janela, tamanho, estatisticas_faixa, buffers, "faixa_")
+        soma += float(mapa[margem:margem + y1 - y0, margem:largura - margem].sum(dtype = np.float64))
+
+    return soma / ((altura - 2 * margem) * (largura - 2 * margem)), None
+
+
+def _mapa_ssim(gray_ref, gray_teste, janela, tamanho, estatisticas_ref, buffers, prefixo):
+    """
+    Calcula o mapa SSIM float32 de duas imagens (ou faixas) do mesmo tamanho.
+
+    Os buffers de trabalho são guardados com o prefixo indicado, para que os das faixas
+    não substituam os da imagem completa.
+    """
+
+    forma = gray_ref.shape
+
+    # Covariância amostral na janela uniforme (default do scikit-image) e
+    # populacional na janela gaussiana (formulação original de Wang et al.)
+    if janela == "uniforme":
+        num_pixels_janela = tamanho ** len(forma)
+        cov_norm = num_pixels_janela / (num_pixels_janela - 1)
+    else:
+        cov_norm = 1.0
+
+    c1 = (K1 * DATA_RANGE) ** 2
+    c2 = (K2 * DATA_RANGE) ** 2
+
+    x = _obter_buffer(buffers, f"{prefixo}x", forma)
+    y = _obter_buffer(buffers, f"{prefixo}y", forma)
+    tmp = _obter_buffer(buffers, f"{prefixo}tmp", forma)
+    ux = _obter_buffer(buffers, f"{prefixo}ux", forma)
+    uy = _obter_buffer(buffers, f"{prefixo}uy", forma)
+    vx = _obter_buffer(buffers, f"{prefixo}vx", forma)
+    vy = _obter_buffer(buffers, f"{prefixo}vy", forma)
+    vxy = _obter_buffer(buffers, f"{prefixo}vxy", forma)
+    np.copyto(x, gray_ref, casting = "unsafe")
+    np.copyto(y, gray_teste, casting = "unsafe")
+
+    # Médias locais de x e x² (da cache, se disponíveis)
+    if estatisticas_ref is not None:
+        np.copyto(ux, estatisticas_ref[0])
+        np.copyto(vx, estatisticas_ref[1])
+    else:
+        _filtrar(x, ux, janela, tamanho)
+        np.multiply(x, x, out = tmp)
+        _filtrar(tmp, vx, janela, tamanho)
+
+    # Médias locais de y, y² e x*y
+    _filtrar(y, uy, janela, tamanho)
+    np.multiply(y, y, out = tmp)
+    _filtrar(tmp, vy, janela, tamanho)
+    np.multiply(x, y, out = tmp)
+    _filtrar(tmp, vxy, janela, tamanho)
+
+    # Variâncias e covariância locais: v = cov_norm * (E[a*b] - E[a]*E[b])
+    # x e y deixam de ser necessários e passam a guardar os produtos das médias
+    np.multiply(ux, ux, out = x)
+    np.subtract(vx, x, out = vx)
+    np.multiply(uy, uy, out = y)
+    np.subtract(vy, y, out = vy)
+    np.multiply(ux, uy, out = tmp)
+    np.subtract(vxy, tmp, out = vxy)
+    if cov_norm != 1.0:
+        vx *= cov_norm
+        vy *= cov_norm
+        vxy *= cov_norm
+
+    # Numerador: (2*ux*uy + C1) * (2*vxy + C2), em tmp
+    tmp *= 2
+    tmp += c1
+    vxy *= 2
+    vxy += c2
+    tmp *= vxy
+
+    # Denominador: (ux² + uy² + C1) * (vx + vy + C2), em x
+    x += y
+    x += c1
+    vx += vy
+    vx += c2
+    x *= vx
+
+    return np.divide(tmp, x, out = tmp)
@@ -0,0 +1,51 @@
+"""
+Serviço de comparação de imagens (daemon) para a integração com a bateria de testes de QA.
+
+As imagens de referência de 'imagens/referencia' são carregadas uma única vez e mantidas
+em memória; cada pedido envia apenas a imagem de teste e recebe as métricas e o veredicto
+em JSON (ver processamento/servico.py para a API completa).
+
+Utilização:
+    python servico.py [--porta 8765] [--socket /tmp/comparador.sock] [--trabalhadores N]
+
+Exemplo de pedido:
+    curl --data-binary @imagens/teste/menu.PNG "http://127.0.0.1:8765/comparar?referencia=menu.png&metodos=absdiff,ssim"
+"""
+
+import argparse
+import signal
+import threading
+import time
+
+from processamento.servico import ANFITRIAO, PASTA_REFERENCIA, PORTA, ServicoComparacao, iniciar_servico, parar_servico
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Serviço de comparação de imagens com referências em memória.")
+    parser.add_argument("--anfitriao", default = ANFITRIAO, help = f"Endereço TCP (default: {ANFITRIAO})")
+    parser.add_argument("--porta", type = int, default = PORTA, help = f"Porta TCP; 0 desativa o TCP (default: {PORTA})")
+    parser.add_argument("--socket", help = "Caminho de um socket Unix onde o serviço também responde")
+    parser.add_argument("--trabalhadores", type = int, help = "Análises em simultâneo (default: número de núcleos)")
+    parser.add_argument("--pasta-referencia", default = PASTA_REFERENCIA,
+                        help = f"Pasta das imagens de referência (default: {PASTA_REFERENCIA})")
+    argumentos = parser.parse_args()
+
+    servico = ServicoComparacao(argumentos.pasta_referencia, argumentos.trabalhadores)
+    inicio = time.time()
+    num_referencias = servico.carregar_referencias()
+    print(f"🗂️ {num_referencias} referências carregadas em {time.time() - inicio:.2f} segundos")
+
+    servidores = iniciar_servico(servico, argumentos.anfitriao, argumentos.porta or None, argumentos.socket)
+    if argumentos.porta:
+        print(f"🚀 Serviço disponível em http://{argumentos.anfitriao}:{argumentos.porta}")
+    if argumentos.socket:
+        print(f"🚀 Serviço disponível no socket Unix {argumentos.socket}")
+
+    # O serviço corre até ser interrompido (Ctrl+C ou SIGTERM)
+    parar = threading.Event()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sinal, lambda *_: parar.set())
+    while not parar.wait(1):
+        pass
+
+    print("\n🛑 A terminar o serviço...")
+    parar_servico(servico, servidores)
@@ -0,0 +1,58 @@
+"""
+Configuração comum dos testes: raiz do projeto no caminho de importação, imagens de exemplo
+e uma pasta de trabalho temporária (os módulos gravam em 'relatorios/' e 'cache/').
+"""
+
+import contextlib
+import io
+import os
+import sys
+
+import cv2
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+PASTA_REFERENCIA = os.path.join(RAIZ, "imagens", "referencia")
+PASTA_TESTE = os.path.join(RAIZ, "imagens", "teste")
+
+
+def ler_exemplo(pasta, nome):
+    """
+    Lê uma imagem de exemplo do projeto (sem distinguir maiúsculas/minúsculas na extensão).
+    """
+
+    from processamento.lote import encontrar_imagem
+    caminho = encontrar_imagem(pasta, nome)
+    assert caminho is not None, f"Imagem de exemplo em falta: {nome}"
+    return cv2.imread(caminho)
+
+
+@pytest.fixture(scope = "session")
+def menu():
+    """
+    Par (referência, teste) da imagem de exemplo menu.png.
+    """
+
+    return ler_exemplo(PASTA_REFERENCIA, "menu.png"), ler_exemplo(PASTA_TESTE, "menu.png")
+
+
+@pytest.fixture(autouse = True)
+def pasta_trabalho(tmp_path, monkeypatch):
+    """
+    Executa cada teste numa pasta temporária, para não deixar relatórios nem caches no projeto.
+    """
+
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@contextlib.contextmanager
+def silencioso():
+    """
+    Silencia as mensagens da análise (uma por método e por região).
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import PASTA_REFERENCIA
+from processamento.cache_referencias import ARRAYS_MAPEADOS, calcular_dados_referencia, obter_dados_referencia
+from processamento.lote import encontrar_imagem
+
+
+@pytest.mark.parametrize("mapear", [False, True])
+def test_entrada_lida_da_cache_igual_aos_dados_calculados(pasta_trabalho, mapear):
+    caminho = encontrar_imagem(PASTA_REFERENCIA, "menu.png")
+    pasta_cache = str(pasta_trabalho / "cache")
+
+    calculados = obter_dados_referencia(caminho, pasta_cache = pasta_cache, mapear = mapear)
+    lidos = obter_dados_referencia(caminho, pasta_cache = pasta_cache, mapear = mapear)
+    esperados = calcular_dados_referencia(calculados["img"].copy())
+
+    assert lidos["hash"] == calculados["hash"]
+    for chave, valor in esperados.items():
+        assert np.array_equal(lidos[chave], valor), chave
+
+
+def test_arrays_derivados_guardados_e_mapeados(pasta_trabalho):
+    caminho = encontrar_imagem(PASTA_REFERENCIA, "menu.png")
+    pasta_cache = pasta_trabalho / "cache"
+    obter_dados_referencia(caminho, pasta_cache = str(pasta_cache), mapear = False)
+    dados = obter_dados_referencia(caminho, pasta_cache = str(pasta_cache), mapear = False)
+
+    (entrada,) = os.listdir(pasta_cache)
+    assert {f"{chave}.npy" for chave in ARRAYS_MAPEADOS} <= set(os.listdir(pasta_cache / entrada))
+    # Os derivados vêm do disco, só de leitura; a imagem é carregada para a memória
+    for chave in ARRAYS_MAPEADOS:
+        assert isinstance(dados[chave], np.memmap)
+        assert not dados[chave].flags.writeable
+    assert not isinstance(dados["img"], np.memmap)
@@ -0,0 +1,115 @@
+"""
+Equivalência dos modos de execução alternativos com analisar_todos nas imagens de exemplo:
+regiões, máscaras e varrimento de limiares têm de dar as mesmas métricas.
+"""
+
+import numpy as np
+import pytest
+
+from conftest import PASTA_REFERENCIA, PASTA_TESTE, ler_exemplo, silencioso
+from processamento.analises import METODOS_DISPONIVEIS, analisar_todos
+from processamento.faixas import analisar_em_faixas
+from processamento.pilha import analisar_pilha
+
+# Pares de exemplo com o mesmo tamanho
+EXEMPLOS = ["menu.png", "meme.png", "exemplo.png"]
+
+# Região de interesse com uma zona ignorada no interior (recortadas aos limites de cada imagem)
+MASCARA = {"roi": [[20, 10, 2000, 1100]], "ignorar": [[60, 40, 150, 120]]}
+
+# Limiares do varrimento do absdiff
+LIMIARES = [5, 10, 20, 50]
+
+# Métricas calculadas por somas em vírgula flutuante (algumas em float32), cuja ordem depende do modo
+METRICAS_APROXIMADAS = {"indice_ssim", "correlacao_histogramas", "percentagem_diferenca"}
+
+
+@pytest.fixture(scope = "module", params = EXEMPLOS)
+def par(request):
+    return ler_exemplo(PASTA_REFERENCIA, request.param), ler_exemplo(PASTA_TESTE, request.param)
+
+
+def comparar_metricas(obtidas, esperadas):
+    """
+    Compara as métricas de um método com as de analisar_todos (regiões e contagens exatas).
+    """
+
+    for nome, valor in esperadas.items():
+        if nome in METRICAS_APROXIMADAS:
+            assert obtidas[nome] == pytest.approx(valor, rel = 1e-6, abs = 1e-9), nome
+        else:
+            assert obtidas[nome] == valor, nome
+
+
+def analisar(img_ref, img_teste, **opcoes):
+    with silencioso():
+        resultados, _ = analisar_todos(img_ref, img_teste, **opcoes)
+    return resultados
+
+
+@pytest.mark.parametrize("opcoes", [{}, {"mascara": MASCARA}, {"limiares_absdiff": LIMIARES}, {"area_minima": 1}])
+def test_threads_igual_a_uma_thread(par, opcoes):
+    img_ref, img_teste = par
+    esperados = analisar(img_ref, img_teste, **opcoes)
+    obtidos = analisar(img_ref, img_teste, num_threads = 4, **opcoes)
+
+    for metodo, (imagem, _, metricas) in esperados.items():
+        comparar_metricas(obtidos[metodo][2], metricas)
+        if imagem is not None:
+            assert np.array_equal(obtidos[metodo][0], imagem), metodo
+
+
+@pytest.mark.parametrize("opcoes", [{}, {"limiares_absdiff": LIMIARES}, {"area_minima": 1}])
+def test_faixas_igual_a_analisar_todos(par, opcoes):
+    # Orçamento pequeno: as imagens de exemplo são divididas em várias faixas
+    img_ref, img_teste = par
+    esperados = analisar(img_ref, img_teste, **opcoes)
+    with silencioso():
+        obtidos, _ = analisar_em_faixas(img_ref, img_teste, orcamento_mb = 4, **opcoes)
+
+    assert obtidos["ssim"][2]["faixas"]["num_faixas"] > 1
+    for metodo, (_, _, metricas) in esperados.items():
+        comparar_metricas(obtidos[metodo][2], metricas)
+
+
+@pytest.mark.parametrize("opcoes", [{}, {"mascara": MASCARA}, {"limiares_absdiff": LIMIARES}, {"area_minima": 1}])
+def test_pilha_igual_a_pares(opcoes):
+    # Várias capturas do mesmo tamanho contra a mesma referência, em blocos de duas capturas
+    img_ref = ler_exemplo(PASTA_REFERENCIA, "menu.png")
+    testes = [ler_exemplo(PASTA_TESTE, nome) for nome in ["menu.png", "menu_igual.png", "meme.png"]]
+    with silencioso():
+        obtidos = analisar_pilha(img_ref, np.stack(testes), metodos = METODOS_DISPONIVEIS, tamanho_bloco = 2,
+                                 **opcoes)
+
+    assert len(obtidos) == len(testes)
+    for img_teste, metricas_captura in zip(testes, obtidos):
+        for metodo, (_, _, metricas) in analisar(img_ref, img_teste, **opcoes).items():
+            comparar_metricas(metricas_captura[metodo], metricas)
+
+
+@pytest.mark.parametrize("opcoes", [{}, {"mascara": MASCARA}, {"limiares_absdiff": LIMIARES}, {"area_minima": 1}])
+def test_resolucao_nativa_igual_a_analisar_todos(par, opcoes):
+    # Resolução de trabalho igual à nativa: sem reamostragem nem tolerância
+    img_ref, img_teste = par
+    altura, largura = img_teste.shape[:2]
+    esperados = analisar(img_ref, img_teste, **opcoes)
+    obtidos = analisar(img_ref, img_teste, resolucao = (largura, altura), **opcoes)
+
+    for metodo, (imagem, _, metricas) in esperados.items():
+        comparar_metricas(obtidos[metodo][2], metricas)
+        if imagem is not None:
+            assert np.array_equal(obtidos[metodo][0], imagem), metodo
+
+
+def test_janela_gaussiana(par):
+    # A janela gaussiana chega ao SSIM pela API pública e dá as mesmas métricas em todos os modos
+    img_ref, img_teste = par
+    esperados = analisar(img_ref, img_teste, metodos = ["ssim"], janela = "gaussiana")
+    uniforme = analisar(img_ref, img_teste, metodos = ["ssim"])
+    assert esperados["ssim"][2]["indice_ssim"] != uniforme["ssim"][2]["indice_ssim"]
+
+    threads = analisar(img_ref, img_teste, metodos = ["ssim"], janela = "gaussiana", num_threads = 4)
+    with silencioso():
+        faixas, _ = analisar_em_faixas(img_ref, img_teste, metodos = ["ssim"], orcamento_mb = 6, janela = "gaussiana")
+    for obtidos in (threads, faixas):
+        comparar_metricas(obtidos["ssim"][2], esperados["ssim"][2])
@@ -0,0 +1,86 @@
+import cv2
+import numpy as np
+
+from conftest import silencioso
+from processamento.analises import analisar_todos
+from processamento.piramide import maximos_por_bloco, verificar_blocos
+
+
+def _par_sintetico(tipo, pontos = 40):
+    gerador = np.random.default_rng(0)
+    base = gerador.integers(0, 256, (90, 160, 3), dtype = np.uint8)
+    ref = cv2.resize(base, (1280, 720), interpolation = cv2.INTER_CUBIC)
+    teste = ref.copy()
+    if tipo == "pontos":
+        # Pontos 2x2 ténues: desaparecem nas imagens reduzidas
+        for x, y in zip(gerador.integers(0, 1278, pontos), gerador.integers(0, 718, pontos)):
+            teste[y:y + 2, x:x + 2] = np.clip(teste[y:y + 2, x:x + 2].astype(np.int16) + 40, 0, 255)
+    else:
+        cv2.rectangle(teste, (600, 300), (799, 449), (40, 200, 90), -1)
+    return ref, teste
+
+
+def _analisar(ref, teste, **opcoes):
+    with silencioso():
+        resultados, _ = analisar_todos(ref, teste, metodos = ["absdiff", "ssim"], **opcoes)
+    return resultados
+
+
+def test_verificacao_refina_selecao():
+    ref, teste = _par_sintetico("pontos", pontos = 10)
+    completa = _analisar(ref, teste)
+    sem_verificacao = _analisar(ref, teste, metodos_piramide = ["absdiff", "ssim"], niveis_piramide = 3,
+                                tolerancia_piramide = None)
+    verificada = _analisar(ref, teste, metodos_piramide = ["absdiff", "ssim"], niveis_piramide = 3)
+
+    # Sem verificação a pirâmide perde os pontos; os blocos suspeitos verificados recuperam-nos
+    assert sem_verificacao["absdiff"][2]["num_diferencas"] < completa["absdiff"][2]["num_diferencas"]
+    for metodo in ["absdiff", "ssim"]:
+        piramide = verificada[metodo][2]["piramide"]
+        assert not piramide["resolucao_completa"]
+        assert piramide["blocos_refinados"] > 0
+        assert piramide["pixels_fora_estimados"] == 0
+        assert piramide["blocos_analisados"] < piramide["blocos_total"]
+        assert verificada[metodo][2]["regioes"] == completa[metodo][2]["regioes"]
+    assert verificada["absdiff"][2]["pixels_diferentes"] == completa["absdiff"][2]["pixels_diferentes"]
+    assert verificada["ssim"][2]["indice_ssim"] == completa["ssim"][2]["indice_ssim"]
+
+
+def test_verificacao_recorre_a_resolucao_completa():
+    # Pontos em quase todos os blocos: são mais os suspeitos do que os que é possível verificar
+    ref, teste = _par_sintetico("pontos", pontos = 400)
+    completa = _analisar(ref, teste)
+    verificada = _analisar(ref, teste, metodos_piramide = ["absdiff", "ssim"], niveis_piramide = 3)
+
+    for metodo in ["absdiff", "ssim"]:
+        piramide = verificada[metodo][2]["piramide"]
+        assert piramide["resolucao_completa"]
+        assert piramide["blocos_verificados"] < piramide["blocos_suspeitos"]
+        assert verificada[metodo][2]["regioes"] == completa[metodo][2]["regioes"]
+    assert verificada["absdiff"][2]["pixels_diferentes"] == completa["absdiff"][2]["pixels_diferentes"]
+    assert verificada["ssim"][2]["indice_ssim"] == completa["ssim"][2]["indice_ssim"]
+
+
+def test_estimativa_dos_blocos_por_verificar():
+    ref, teste = _par_sintetico("pontos")
+    maximos = maximos_por_bloco(ref, teste, 3)
+    selecao = maximos > 5
+
+    refinada, resumo = verificar_blocos(ref, teste, maximos, selecao, 10, fracao = 0.01)
+
+    # Só 2 dos blocos são verificados; os restantes suspeitos entram na estimativa
+    assert resumo["blocos_verificados"] == 2
+    assert resumo["blocos_suspeitos"] > resumo["blocos_verificados"]
+    assert resumo["pixels_fora_estimados"] > 0
+    assert np.count_nonzero(refinada & ~selecao) == resumo["blocos_refinados"]
+
+
+def test_verificacao_mantem_piramide_exata():
+    ref, teste = _par_sintetico("bloco")
+    completa = _analisar(ref, teste)
+    verificada = _analisar(ref, teste, metodos_piramide = ["absdiff"])
+
+    piramide = verificada["absdiff"][2]["piramide"]
+    assert not piramide["resolucao_completa"]
+    assert piramide["blocos_analisados"] < piramide["blocos_total"]
+    assert verificada["absdiff"][2]["pixels_diferentes"] == completa["absdiff"][2]["pixels_diferentes"]
@@ -0,0 +1,73 @@
+import numpy as np
+
+from conftest import silencioso
+from processamento.analises import analisar_todos
+from processamento.regioes import AREA_MINIMA, _fundir_caixas, extrair_regioes
+
+
+def test_contagens_menu(menu):
+    # Regressão: número de regiões e de pixels diferentes de menu.png com os parâmetros por omissão
+    img_ref, img_teste = menu
+    with silencioso():
+        resultados, _ = analisar_todos(img_ref, img_teste)
+
+    absdiff = resultados["absdiff"][2]
+    assert absdiff["pixels_diferentes"] == 795719
+    assert absdiff["num_diferencas"] == 184
+    assert resultados["ssim"][2]["num_diferencas"] == 63
+
+
+def test_contagens_menu_todas_as_regioes(menu):
+    img_ref, img_teste = menu
+    with silencioso():
+        resultados, _ = analisar_todos(img_ref, img_teste, area_minima = 1)
+
+    assert resultados["absdiff"][2]["num_diferencas"] == 726
+    assert resultados["ssim"][2]["num_diferencas"] == 96
+
+
+def test_pixel_isolado_descartado():
+    mask = np.zeros((40, 40), dtype = np.uint8)
+    mask[5, 5] = 255                # Pixel isolado (ruído)
+    mask[20:24, 10:16] = 255        # Região visível, 4x6
+    regioes, mascara_regioes = extrair_regioes(mask)
+
+    assert AREA_MINIMA > 1
+    assert [(r["x"], r["y"], r["largura"], r["altura"], r["area"]) for r in regioes] == [(10, 20, 6, 4, 24)]
+    assert mascara_regioes[5, 5] == 0
+
+
+def _fundir_forca_bruta(caixas, distancia):
+    # Referência: compara todos os pares até não haver caixas a fundir
+    caixas = [list(caixa) for caixa in caixas]
+    fundiu = True
+    while fundiu:
+        fundiu = False
+        for i in range(len(caixas)):
+            for j in range(i + 1, len(caixas)):
+                a, b = caixas[i], caixas[j]
+                if (a[0] < b[2] + distancia and b[0] < a[2] + distancia and
+                        a[1] < b[3] + distancia and b[1] < a[3] + distancia):
+                    caixas[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del caixas[j]
+                    fundiu = True
+                    break
+            if fundiu:
+                break
+    return sorted(map(tuple, caixas))
+
+
+def test_fusao_igual_a_comparacao_de_todos_os_pares():
+    gerador = np.random.default_rng(0)
+    for _ in range(100):
+        n = int(gerador.integers(1, 60))
+        x0 = gerador.integers(0, 400, n)
+        y0 = gerador.integers(0, 400, n)
+        caixas = np.stack([x0, y0, x0 + gerador.integers(1, 30, n), y0 + gerador.integers(1, 30, n)], axis = 1)
+        distancia = int(gerador.integers(0, 20))
+        areas = np.ones(n)
+
+        fundidas, areas_fundidas, _, _ = _fundir_caixas(caixas.astype(np.int64), areas, areas, areas, distancia)
+
+        assert sorted(map(tuple, fundidas.tolist())) == _fundir_forca_bruta(caixas.tolist(), distancia)
+        assert areas_fundidas.sum() == n
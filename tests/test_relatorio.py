@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+from output import relatorio
+from output.relatorio import aguardar_escritas, guardar_imagem_resultado
+
+
+def test_escrita_assincrona_chama_ao_gravar_depois_de_gravar():
+    gravadas = []
+    caminho = guardar_imagem_resultado(np.zeros((8, 8, 3), dtype = np.uint8), metodo = "absdiff", identificador = "t",
+                                       assincrono = True, ao_gravar = gravadas.append)
+
+    assert aguardar_escritas() == []
+    assert gravadas == [caminho]
+    assert os.path.exists(caminho)
+
+
+def test_escrita_falhada_nao_chama_ao_gravar(monkeypatch):
+    monkeypatch.setattr(relatorio.cv2, "imwrite", lambda caminho, imagem: False)
+    gravadas = []
+    caminho = guardar_imagem_resultado(np.zeros((8, 8, 3), dtype = np.uint8), metodo = "ssim", identificador = "t",
+                                       assincrono = True, ao_gravar = gravadas.append)
+
+    assert aguardar_escritas() == [caminho]
+    assert gravadas == []
+
+
+def test_escrita_sincrona_falhada(monkeypatch):
+    monkeypatch.setattr(relatorio.cv2, "imwrite", lambda caminho, imagem: False)
+    gravadas = []
+
+    assert guardar_imagem_resultado(np.zeros((8, 8, 3), dtype = np.uint8), ao_gravar = gravadas.append) is None
+    assert gravadas == []
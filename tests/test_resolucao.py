@@ -0,0 +1,92 @@
+import cv2
+import pytest
+
+from conftest import silencioso
+from output.relatorio import gerar_observacoes
+from processamento.analises import analisar_todos
+from processamento.resolucao import RESOLUCAO_TRABALHO
+
+# Dimensões do mesmo ecrã capturado por dispositivos diferentes (proporção de menu.png)
+DISPOSITIVOS = {"720p": (1280, 590), "1080p": (1920, 886), "1440p": (2560, 1181)}
+
+
+def _captura(img, dimensoes):
+    return cv2.resize(img, dimensoes, interpolation = cv2.INTER_AREA)
+
+
+@pytest.mark.parametrize("dispositivo", sorted(DISPOSITIVOS))
+def test_mesmo_ecra_noutro_dispositivo_e_ok(menu, dispositivo):
+    img_ref, _ = menu
+    img_teste = _captura(img_ref, DISPOSITIVOS[dispositivo])
+
+    with silencioso():
+        resultados, _ = analisar_todos(img_ref, img_teste, resolucao = RESOLUCAO_TRABALHO)
+
+    for metodo, (img_resultado, _, metricas) in resultados.items():
+        assert gerar_observacoes(metodo, metricas).startswith("OK"), (metodo, metricas)
+        assert img_resultado.shape == img_teste.shape
+    assert resultados["absdiff"][2]["num_diferencas"] == 0
+    assert resultados["ssim"][2]["num_diferencas"] == 0
+    assert resultados["absdiff"][2]["resolucao"]["tolerancia_reamostragem"] is not None
+
+
+def test_dispositivos_diferentes_entre_si(menu):
+    img_ref, _ = menu
+    img_720p = _captura(img_ref, DISPOSITIVOS["720p"])
+    img_1440p = _captura(img_ref, DISPOSITIVOS["1440p"])
+
+    with silencioso():
+        resultados, _ = analisar_todos(img_720p, img_1440p, resolucao = RESOLUCAO_TRABALHO)
+
+    for metodo, (_, _, metricas) in resultados.items():
+        assert gerar_observacoes(metodo, metricas).startswith("OK"), (metodo, metricas)
+
+
+def test_alteracao_real_detetada_em_coordenadas_nativas(menu):
+    img_ref, _ = menu
+    img_teste = _captura(img_ref, DISPOSITIVOS["1080p"])
+    cv2.rectangle(img_teste, (600, 300), (799, 449), (0, 255, 0), -1)
+
+    with silencioso():
+        resultados, _ = analisar_todos(img_ref, img_teste, resolucao = RESOLUCAO_TRABALHO)
+
+    for metodo in ("absdiff", "ssim"):
+        regioes = resultados[metodo][2]["regioes"]
+        assert regioes, metodo
+        maior = regioes[0]
+        # A caixa da maior região cobre o retângulo alterado, nas coordenadas da imagem de teste
+        assert maior["x"] <= 600 and maior["y"] <= 300
+        assert maior["x"] + maior["largura"] >= 800 and maior["y"] + maior["altura"] >= 450
+        assert maior["x"] + maior["largura"] <= img_teste.shape[1]
+        assert maior["y"] + maior["altura"] <= img_teste.shape[0]
+
+
+def test_pequena_alteracao_detetada_com_tolerancia(menu):
+    img_ref, _ = menu
+    img_teste = _captura(img_ref, DISPOSITIVOS["1080p"])
+    # Quadrado de 6x6 pixels nativos (4x4 à resolução de trabalho, perto da área mínima tolerada)
+    cv2.rectangle(img_teste, (1000, 500), (1005, 505), (0, 255, 0), -1)
+
+    with silencioso():
+        resultados, _ = analisar_todos(img_ref, img_teste, resolucao = RESOLUCAO_TRABALHO)
+
+    for metodo in ("absdiff", "ssim"):
+        regioes = resultados[metodo][2]["regioes"]
+        assert len(regioes) == 1, metodo
+        (regiao,) = regioes
+        assert regiao["x"] <= 1000 and regiao["y"] <= 500
+        assert regiao["x"] + regiao["largura"] >= 1006 and regiao["y"] + regiao["altura"] >= 506
+
+
+def test_tolerancia_desativada(menu):
+    img_ref, _ = menu
+    img_teste = _captura(img_ref, DISPOSITIVOS["1080p"])
+
+    with silencioso():
+        resultados, _ = analisar_todos(img_ref, img_teste, metodos = ["absdiff"], resolucao = RESOLUCAO_TRABALHO,
+                                       tolerancia_reamostragem = None)
+
+    # Sem tolerância, o erro de reamostragem aparece como muitas pequenas regiões
+    metricas = resultados["absdiff"][2]
+    assert metricas["resolucao"]["tolerancia_reamostragem"] is None
+    assert metricas["num_diferencas"] > 100
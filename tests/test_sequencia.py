@@ -0,0 +1,86 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from conftest import silencioso
+from processamento.sequencia import _LinhaTemporal, comparar_sequencias, contar_frames
+
+
+def _frames(num_frames):
+    """
+    Frames sintéticos 64x48, diferentes entre si.
+    """
+
+    frames = []
+    for indice in range(num_frames):
+        frame = np.full((48, 64, 3), 40, dtype = np.uint8)
+        cv2.rectangle(frame, (4 + indice * 4, 8), (20 + indice * 4, 24), (255, 255, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def _pasta(caminho, num_frames):
+    os.makedirs(caminho)
+    for indice, frame in enumerate(_frames(num_frames)):
+        cv2.imwrite(os.path.join(caminho, f"frame_{indice + 1}.png"), frame)
+    return str(caminho)
+
+
+def _video(caminho, num_frames):
+    escritor = cv2.VideoWriter(str(caminho), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    if not escritor.isOpened():
+        pytest.skip("Sem codificador MJPG disponível")
+    for frame in _frames(num_frames):
+        escritor.write(frame)
+    escritor.release()
+    return str(caminho)
+
+
+@pytest.mark.parametrize("num_ref, num_teste", [(5, 3), (3, 5), (4, 4)])
+def test_frames_sobrantes_pastas(pasta_trabalho, num_ref, num_teste):
+    ref = _pasta(pasta_trabalho / "ref", num_ref)
+    teste = _pasta(pasta_trabalho / "teste", num_teste)
+
+    with silencioso():
+        resumo = comparar_sequencias(ref, teste, num_piores = 0, pasta_resultados = str(pasta_trabalho))
+
+    assert resumo["frames_comparados"] == min(num_ref, num_teste)
+    assert resumo["frames_sobrantes"] == {"referencia": max(num_ref - num_teste, 0),
+                                          "teste": max(num_teste - num_ref, 0)}
+
+
+@pytest.mark.parametrize("num_ref, num_teste", [(5, 3), (3, 5)])
+def test_frames_sobrantes_videos(pasta_trabalho, num_ref, num_teste):
+    ref = _video(pasta_trabalho / "ref.avi", num_ref)
+    teste = _video(pasta_trabalho / "teste.avi", num_teste)
+    assert contar_frames(ref) == num_ref
+
+    with silencioso():
+        resumo = comparar_sequencias(ref, teste, num_piores = 0, pasta_resultados = str(pasta_trabalho))
+
+    assert resumo["frames_comparados"] == min(num_ref, num_teste)
+    assert resumo["frames_sobrantes"] == {"referencia": max(num_ref - num_teste, 0),
+                                          "teste": max(num_teste - num_ref, 0)}
+
+
+def test_linha_temporal_tamanho_fixo():
+    linha = _LinhaTemporal("max", capacidade = 16)
+    valores = np.random.default_rng(0).random(10000)
+    valores[7321] = 5.0
+    for valor in valores:
+        linha.acrescentar(float(valor))
+
+    # O resumo nunca passa da capacidade, mas o pico e as estatísticas são exatos
+    assert len(linha.valores()) <= 16
+    assert linha.num_frames == 10000
+    assert linha.valores().max() == 5.0
+    assert linha.estatisticas()["maximo"] == 5.0
+    assert linha.estatisticas()["minimo"] == pytest.approx(valores.min())
+    assert linha.estatisticas()["media"] == pytest.approx(valores.mean())
+
+    # Cada valor guardado é o pior do seu grupo de 'passo' frames (o último grupo pode estar incompleto)
+    completos = linha.num_frames // linha.passo
+    piores = valores[:completos * linha.passo].reshape(completos, linha.passo).max(axis = 1)
+    assert np.array_equal(linha.valores()[:len(piores)], piores)
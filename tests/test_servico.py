@@ -0,0 +1,45 @@
+import os
+import threading
+
+from conftest import PASTA_REFERENCIA
+from processamento import servico
+from processamento.servico import ServicoComparacao
+
+
+def test_leitura_demorada_nao_bloqueia_outras_referencias(monkeypatch):
+    obter_original = servico.obter_dados_referencia
+    iniciada = threading.Event()
+    liberar = threading.Event()
+    leituras = []
+
+    def obter_lento(caminho):
+        leituras.append(os.path.basename(caminho).lower())
+        if os.path.basename(caminho).lower() == "menu.png":
+            iniciada.set()
+            assert liberar.wait(10)
+        return obter_original(caminho)
+
+    monkeypatch.setattr(servico, "obter_dados_referencia", obter_lento)
+    instancia = ServicoComparacao(PASTA_REFERENCIA, num_trabalhadores = 1)
+    try:
+        resultados = {}
+        threads = [threading.Thread(target = lambda i = i: resultados.setdefault(i, instancia.obter_referencia("menu.png")))
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        assert iniciada.wait(10)
+
+        # Enquanto menu.png é lida, outra referência e o estado do serviço respondem de imediato
+        assert instancia.obter_referencia("exemplo.png") is not None
+        assert instancia.saude()["referencias"] == ["exemplo.png"]
+
+        liberar.set()
+        for thread in threads:
+            thread.join(10)
+
+        # Os dois pedidos simultâneos da mesma referência levam a uma só leitura
+        assert leituras.count("menu.png") == 1
+        assert resultados[0] is resultados[1]
+    finally:
+        liberar.set()
+        instancia.fechar()
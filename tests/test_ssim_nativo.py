@@ -0,0 +1,33 @@
+import cv2
+import numpy as np
+import pytest
+
+from conftest import PASTA_REFERENCIA, PASTA_TESTE, ler_exemplo
+from processamento.ssim_nativo import ALTURA_FAIXA_INDICE, calcular_estatisticas, calcular_ssim
+
+
+@pytest.mark.parametrize("janela", ["uniforme", "gaussiana"])
+def test_so_indice_igual_ao_mapa_completo(janela):
+    gray_ref = cv2.cvtColor(ler_exemplo(PASTA_REFERENCIA, "menu.png"), cv2.COLOR_BGR2GRAY)
+    gray_teste = cv2.cvtColor(ler_exemplo(PASTA_TESTE, "menu.png"), cv2.COLOR_BGR2GRAY)
+    assert gray_ref.shape[0] > 2 * ALTURA_FAIXA_INDICE
+
+    score, mapa = calcular_ssim(gray_ref, gray_teste, janela = janela)
+    score_indice, mapa_indice = calcular_ssim(gray_ref, gray_teste, janela = janela, mapa_completo = False)
+    score_cache, _ = calcular_ssim(gray_ref, gray_teste, janela = janela, mapa_completo = False,
+                                   estatisticas_ref = calcular_estatisticas(gray_ref, janela))
+
+    assert mapa.shape == gray_ref.shape and mapa_indice is None
+    assert score_indice == pytest.approx(score, abs = 1e-12)
+    assert score_cache == pytest.approx(score, abs = 1e-12)
+
+
+def test_so_indice_nao_cria_mapa_completo():
+    gerador = np.random.default_rng(0)
+    gray_ref = gerador.integers(0, 256, (1000, 300), dtype = np.uint8)
+    gray_teste = gray_ref.copy()
+    gray_teste[400:600, 100:200] //= 2
+
+    buffers = {}
+    calcular_ssim(gray_ref, gray_teste, mapa_completo = False, buffers = buffers)
+    assert max(buffer.shape[0] for buffer in buffers.values()) < gray_ref.shape[0]
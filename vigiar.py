@@ -0,0 +1,77 @@
+"""
+Vigilância da pasta de capturas de teste, com as comparações organizadas em pipeline.
+
+Cada captura nova (ou alterada) em 'imagens/teste' é comparada com a referência com o
+mesmo nome em 'imagens/referencia'. A leitura, a análise, a gravação das imagens de
+resultado e o relatório PDF correm em etapas separadas, ligadas por filas limitadas
+(ver processamento/pipeline.py), e o débito e a ocupação de cada etapa são mostrados
+periodicamente.
+
+Utilização:
+    python vigiar.py [--uma-vez] [--trabalhadores-analise N] [--tamanho-fila 4] [--sem-pdf]
+"""
+
+import argparse
+import os
+import signal
+import threading
+
+from processamento.analises import METODOS_DISPONIVEIS
+from processamento.pipeline import (INTERVALO_ESTATISTICAS, INTERVALO_VARRIMENTO, TAMANHO_FILA, VigiaPasta,
+                                    trabalhadores_por_omissao)
+
+# Pastas das imagens de referência e de teste
+PASTA_REFERENCIA = os.path.join("imagens", "referencia")
+PASTA_TESTE = os.path.join("imagens", "teste")
+
+if __name__ == "__main__":
+    trabalhadores = trabalhadores_por_omissao()
+
+    parser = argparse.ArgumentParser(description = "Compara as capturas que chegam à pasta de teste, em pipeline.")
+    parser.add_argument("--pasta-referencia", default = PASTA_REFERENCIA,
+                        help = f"Pasta das imagens de referência (default: {PASTA_REFERENCIA})")
+    parser.add_argument("--pasta-teste", default = PASTA_TESTE, help = f"Pasta vigiada (default: {PASTA_TESTE})")
+    parser.add_argument("--metodos", default = ",".join(METODOS_DISPONIVEIS),
+                        help = f"Métodos separados por vírgulas (default: {','.join(METODOS_DISPONIVEIS)})")
+    parser.add_argument("--uma-vez", action = "store_true", help = "Compara as capturas já presentes e termina")
+    parser.add_argument("--intervalo", type = float, default = INTERVALO_VARRIMENTO,
+                        help = f"Segundos entre varrimentos da pasta (default: {INTERVALO_VARRIMENTO})")
+    parser.add_argument("--intervalo-estatisticas", type = float, default = INTERVALO_ESTATISTICAS,
+                        help = f"Segundos entre impressões do débito e das filas (default: {INTERVALO_ESTATISTICAS})")
+    parser.add_argument("--tamanho-fila", type = int, default = TAMANHO_FILA,
+                        help = f"Capturas em espera entre etapas (default: {TAMANHO_FILA})")
+    for etapa, num in trabalhadores.items():
+        parser.add_argument(f"--trabalhadores-{etapa}", type = int, default = num,
+                            help = f"Threads da etapa {etapa} (default: {num})")
+    parser.add_argument("--sem-pdf", action = "store_true", help = "Não gera os relatórios PDF")
+    parser.add_argument("--sem-imagens", action = "store_true", help = "Não grava as imagens de resultado (PNG)")
+    parser.add_argument("--sem-cache", action = "store_true", help = "Ignora a cache de resultados")
+    parser.add_argument("--sem-historico", action = "store_true", help = "Não regista as capturas no índice do histórico")
+    argumentos = parser.parse_args()
+
+    metodos = [metodo.strip() for metodo in argumentos.metodos.split(",") if metodo.strip()]
+    desconhecidos = [metodo for metodo in metodos if metodo not in METODOS_DISPONIVEIS]
+    if desconhecidos or not metodos:
+        parser.error(f"métodos inválidos: {', '.join(desconhecidos) or '(nenhum)'} "
+                     f"(disponíveis: {', '.join(METODOS_DISPONIVEIS)})")
+
+    trabalhadores = {etapa: getattr(argumentos, f"trabalhadores_{etapa}") for etapa in trabalhadores}
+    vigia = VigiaPasta(argumentos.pasta_referencia, argumentos.pasta_teste, metodos,
+                       gerar_pdf = not argumentos.sem_pdf,
+                       guardar_imagens = not argumentos.sem_imagens,
+                       usar_cache = not argumentos.sem_cache,
+                       registar_historico = not argumentos.sem_historico,
+                       trabalhadores = trabalhadores,
+                       tamanho_fila = max(1, argumentos.tamanho_fila))
+
+    print(f"👀 A vigiar {argumentos.pasta_teste} (threads por etapa: "
+          f"{', '.join(f'{etapa} {num}' for etapa, num in trabalhadores.items())}; filas de {argumentos.tamanho_fila})")
+
+    # A vigilância corre até ser interrompida (Ctrl+C ou SIGTERM)
+    parar = threading.Event()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sinal, lambda *_: parar.set())
+
+    estatisticas = vigia.executar(parar, uma_vez = argumentos.uma_vez, intervalo = argumentos.intervalo,
+                                  intervalo_estatisticas = argumentos.intervalo_estatisticas)
+    print(f"🛑 {estatisticas['concluidos']} capturas comparadas em {estatisticas['decorrido']:.1f} segundos")